@@ -42,7 +42,9 @@ import constants as constantsModule
 import utils.utility as utilityModule
 import hpg_neo4j.db_utility as neo4jDatabaseUtilityModule
 import hpg_neo4j.query_utility as neo4jQueryUtilityModule
+import hpg_neo4j.query_catalog as QC
 import analyses.cs_csrf.semantic_types as CSRFSemanticTypes
+from analyses.general.http_sinks import HttpRequestSinkExpressions
 
 from utils.logging import logger
 from neo4j import GraphDatabase
@@ -228,11 +230,7 @@ def getValueOf(tx, varname, rootContextNode):
 	PROGRAM_NODE_INDEX = '1' # program node
 
 	# for PDG relations
-	query = """
-	MATCH (n_s { Id: '%s' })<-[:PDG_parentOf { Arguments: '%s' }]-(n_t) RETURN collect(distinct n_t) AS resultset
-	"""%(rootContextNode['Id'], varname)
-
-	results = tx.run(query)
+	results = QC.run_query(tx, 'pdg_parents', id=rootContextNode['Id'], varname=varname)
 	for item in results: 
 		childNodes = item['resultset'] 
 		for childNode in childNodes:
@@ -481,103 +479,20 @@ def _get_semantic_type(program_slices, num_slices, document_vars, find_endpoint_
 	@param {int} num_slices: length of program_slices list
 	@param {list} document_vars: fields in HTML forms accessbile by the 'document' DOM API
 	@return {list} the semantic types associated with the given program slices.
+	@description the API patterns of the sources are declared in `CSRFSemanticTypes`, and each
+	program slice string is scanned once for all of them
 	"""
 
-
-	semantic_type = CSRFSemanticTypes.SEM_TYPE_NON_REACHABLE
 	semantic_types = []
 
-	# API patterns to match to asscoiate a program slice string to a semantic type
-	WEB_STORAGE_STRINGS = [
-		'localStorage',
-		'sessionStorage'
-	]
-
-	WIN_LOC_STRINGS = [
-		'window.location',
-		'location.href',
-		'location.hash',
-		'History.getBookmarkedState'
-	]
-
-	WIN_NAME_STRINGS = [
-		'window.name'
-	]
-
-	DOM_READ_STRINGS = [
-		'document.getElement',
-		'.getElementBy',
-		'.getElementsBy',
-		'$(',
-		'jQuery(',
-		'.attr(',
-		'.getAttribute(',
-		'.readAttribute('
-	]
-
-	DOM_READ_COOKIE_STRINGS = [
-		'document.cookie'
-	]
-
-	PM_STRINGS = [
-		'event.data', 
-		'evt.data'
-	]
-
-	DOC_REF_STRINGS = [
-		'document.referrer'
-	]
-
 	if find_endpoint_tags:
 			code = program_slices
 			for var in document_vars:
 				if var in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_DOM_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in WEB_STORAGE_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_LOCAL_STORAGE_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in WIN_LOC_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_WIN_LOC_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in WIN_NAME_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_WIN_NAME_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in DOC_REF_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_DOC_REF_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in DOM_READ_COOKIE_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_COOKIE_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in DOM_READ_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_DOM_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in PM_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_PM_READ
-					semantic_types.append(semantic_type)
+					semantic_types.append(CSRFSemanticTypes.SEM_TYPE_DOM_READ)
 					break
 
+			semantic_types.extend(CSRFSemanticTypes.SOURCE_ENDPOINT_TAG_PATTERN_MATCHER.match(code))
 
 	else:
 		for i in range(num_slices):
@@ -585,85 +500,14 @@ def _get_semantic_type(program_slices, num_slices, document_vars, find_endpoint_
 			code = program_slice[0]
 			idents = program_slice[2]
 
-
 			for var in document_vars:
 				if var in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_DOM_READ
-					semantic_types.append(semantic_type)
-
-			for item in WIN_LOC_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_WIN_LOC_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in DOM_READ_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_DOM_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in WEB_STORAGE_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_LOCAL_STORAGE_READ
-					semantic_types.append(semantic_type)
-					break
+					semantic_types.append(CSRFSemanticTypes.SEM_TYPE_DOM_READ)
 
-			for item in DOM_READ_COOKIE_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_COOKIE_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in WIN_NAME_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_WIN_NAME_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in DOC_REF_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_DOC_REF_READ
-					semantic_types.append(semantic_type)
-					break
-
-			for item in PM_STRINGS:
-				if item in code:
-					semantic_type = CSRFSemanticTypes.SEM_TYPE_PM_READ
-					semantic_types.append(semantic_type)
-					break
+			semantic_types.extend(CSRFSemanticTypes.SOURCE_PATTERN_MATCHER.match(code))
 
 			for identifier in idents:
-
-				for item in WEB_STORAGE_STRINGS:
-					if item in identifier:
-						semantic_type = CSRFSemanticTypes.SEM_TYPE_LOCAL_STORAGE_READ
-						semantic_types.append(semantic_type)
-						break
-
-				for item in DOM_READ_COOKIE_STRINGS:
-					if item in identifier:
-						semantic_type = CSRFSemanticTypes.SEM_TYPE_COOKIE_READ
-						semantic_types.append(semantic_type)
-						break
-
-				for item in WIN_NAME_STRINGS:
-					if item in identifier:
-						semantic_type = CSRFSemanticTypes.SEM_TYPE_WIN_NAME_READ
-						semantic_types.append(semantic_type)
-						break
-
-				for item in DOC_REF_STRINGS:
-					if item in identifier:
-						semantic_type = CSRFSemanticTypes.SEM_TYPE_DOC_REF_READ
-						semantic_types.append(semantic_type)
-						break
-
-				for item in PM_STRINGS:
-					if item in identifier:
-						semantic_type = CSRFSemanticTypes.SEM_TYPE_PM_READ
-						semantic_types.append(semantic_type)
-						break
+				semantic_types.extend(CSRFSemanticTypes.SOURCE_IDENTIFIER_PATTERN_MATCHER.match(identifier))
 
 	if len(semantic_types):
 		return semantic_types
@@ -702,14 +546,7 @@ def getWindowOpenCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the xhr.open() function
 	"""
 
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
-	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-	WHERE callee.Code= 'window'
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'window_open_calls')
 	return results
 
 
@@ -720,14 +557,7 @@ def getXhrOpenCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the xhr.open() function
 	"""
 
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
-	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	WHERE callee.Code <> 'window'
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'xhr_open_calls')
 	return results
 
 
@@ -739,12 +569,7 @@ def getFetchCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the fetch() function
 	"""
 
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}), 
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'fetch_calls')
 	return results
 
 
@@ -758,15 +583,7 @@ def getAjaxCallExpressions(tx):
 
 	# argument a can be ObjectExpression, Identifier, or MemberExpression
 	# variable relation length will capture function chains, e.g., $.ajax({}).done().success().failure() etc.
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf*1..10]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
-	(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier' }),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-	OPTIONAL MATCH (a)-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
-	(n4)-[:AST_parentOf {RelationType: 'value'}]->(aa)
-	RETURN t, n, a, aa
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'ajax_calls')
 
 	return results
 
@@ -778,12 +595,7 @@ def xhrPostCallExpressions(tx):
 
 	@Note: xhrPost is used e.g., in tinytinyrss
 	"""
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'xhrPost'}), 
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'xhr_post_calls')
 	return results
 
 
@@ -796,13 +608,7 @@ def getAsyncRequestCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the asyncRequest() function
 	"""
 
-	query="""
-	MATCH (t)-[:AST_parentOf]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
-	RETURN  tt, t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'async_request_calls')
 	return results
 
 
@@ -814,13 +620,7 @@ def getSetFormCallExpressions(tx):
 	@return 
 	"""
 
-	query = """
-	MATCH (call_expression {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-(member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(set_form {Code:'setForm', Type: 'Identifier'}),
-	(call_expression)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(arg), (t)-[:AST_parentOf]->(call_expression)
-	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
-	RETURN tt, t, call_expression as n, arg as a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'set_form_calls')
 	return results
 
 
@@ -830,13 +630,7 @@ def getPageSpeedExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the asyncRequest() function
 	"""
 
-	query = """
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(run {Type: 'Identifier', Code: 'Run'}),
-	(member_expr)-[:AST_parentOf {RelationType: 'object'}]->(inner_member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(ci {Type: 'Identifier', Code: 'CriticalImages'}), (inner_member_expression)-[:AST_parentOf {RelationType: 'object'}]->(ps {Type: 'Identifier', Code: 'pagespeed'}),
-	(call_expr)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	RETURN t, call_expr AS n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'pagespeed_calls')
 	return results
 
 
@@ -846,17 +640,10 @@ def getAjaxSettingObjectExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = ObjectExpression, a=URL argument of the ajaxSettings{} 
 	"""
 
-	query = """
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf*1..5]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'arguments'}]->(obj_expr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(ajaxSettingsProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(ajaxSettingsIdentifier {Type: 'Identifier', Code: 'ajaxSettings'}),
-	(ajaxSettingsProperty)-[:AST_parentOf {RelationType: 'value'}]->(ajaxSettingsObjExpr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(urlProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(url {Type: 'Identifier', Code: 'url'}),
-	(urlProperty)-[:AST_parentOf {RelationType: 'value'}]->(a)
-	RETURN t, ajaxSettingsProperty AS n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'ajax_setting_objects')
 	return results
 
 
-
 def getHttpRequestCallExpressionUrlArgument(tx, node, function_type):
 	
 	"""
@@ -868,35 +655,8 @@ def getHttpRequestCallExpressionUrlArgument(tx, node, function_type):
 
 	nodeId = node['Id']
 	out = []
-	query = ''
-	if function_type == 'fetch':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}), 
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	elif function_type == 'open':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}), 
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	elif function_type == 'ajax':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
-		(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier', Code: '$'}),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(n3 {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
-		(n4)-[:AST_parentOf {RelationType: 'value'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	elif function_type == 'asyncRequest':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	if len(query):
-		out = tx.run(query)
+	if function_type in ['fetch', 'open', 'ajax', 'asyncRequest']:
+		out = QC.run_query(tx, '%s_call_url_argument'%function_type, id=nodeId)
 	return out
 
 
@@ -1348,23 +1108,7 @@ def getChildsOf(tx, node, relation_type=''):
 	@return {dict}: wrapperNode= a dict containing the parse tree with its root set to input node, format: {'node': node, 'children': [child_node1, child_node2, ...]} 
 	"""
 
-	outNode =  {'node': node, 'children': []} # wrapper around neo4j node
-	nodeId = node['Id']
-	if relation_type != '':
-		query= """
-		MATCH (root { Id: '%s' })-[:AST_parentOf { RelationType: '%s'}]->(child) RETURN collect(distinct child) AS resultset
-		"""%(nodeId, relation_type)
-	else:
-		query= """
-			MATCH (root { Id: '%s' })-[:AST_parentOf]->(child) RETURN collect(distinct child) AS resultset
-			"""%(nodeId)
-
-	results = tx.run(query)
-	for item in results:
-		childNodes = item['resultset']
-		for childNode in childNodes:
-			outNode['children'].append(getChildsOf(tx, childNode))
-	return outNode
+	return neo4jQueryUtilityModule.getChildsOf(tx, node, relation_type=relation_type)
 
 
 
@@ -1378,12 +1122,7 @@ def getIdentifierLocalAndGlobalValues(tx, varname):
 	"""
 
 	stack = []
-	query = """
-		MATCH (n { Type:'Identifier', Code: '%s'})<-[:AST_parentOf {RelationType: 'id'}]-(vdtor {Type: 'VariableDeclarator'})<-[:AST_parentOf {RelationType:'declarations'}]-(vdtion),
-		(vdtor)-[:AST_parentOf {RelationType: 'init'}]->(value)
-		RETURN vdtion, value
-	"""%(varname)
-	results = tx.run(query)
+	results = QC.run_query(tx, 'identifier_declarations', varname=varname)
 
 	for pair in results:
 		# must at most one pair exist, otherwise, there are 2 or more potential values defined for a single variable at different scopes!
@@ -1452,40 +1191,21 @@ def isVariableAFunctionArgumentInCurrentScope(tx, varname, varname_nid):
 	"""
 
 	# Case 1: Function Expression as Variable Decleration, e.g., var f = function(varname) { ... }
-	query1 = """
-	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'id'}]-(vd {Type: 'VariableDeclarator'})-[:AST_parentOf {RelationType: 'init'}]->(n {Type:'FunctionExpression'})-[:AST_parentOf {RelationType: 'params'}]-(arg { Type:'Identifier', Code: '%s'}),
-	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable { Id:'%s', Type:'Identifier', Code: '%s'}) 
-	RETURN distinct(n) as top, fname
-	"""%(varname, varname_nid, varname)
-
-	# Case 2: Function Expression as Dictionary Key, e.g., f: function(varname) { ... }
-	query2 = """
-	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'key'}]-(vd {Type: 'Property'})-[:AST_parentOf {RelationType: 'value'}]->(n {Type:'FunctionExpression'})-[:AST_parentOf {RelationType: 'params'}]-(arg { Type:'Identifier', Code: '%s'}),
-	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable { Id:'%s', Type:'Identifier', Code: '%s'}) 
-	RETURN distinct(n) as top, fname
-	"""%(varname, varname_nid, varname)
-
-	# Case 3: Function Declaration, e.g., function f(varname) { ...}
-	query3 = """
-	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'id'}]-(n {Type:'FunctionDeclaration'})-[:AST_parentOf {RelationType: 'params'}]-(arg { Type:'Identifier', Code: '%s'}),
-	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable { Id:'%s', Type:'Identifier', Code: '%s'}) 
-	RETURN distinct(n) as top, fname
-	"""%(varname, varname_nid, varname)
-
-
-	res = tx.run(query1)   # queries should only find one function!
+	res = QC.run_query(tx, 'function_param_in_variable_declarator', id=varname_nid, varname=varname)   # queries should only find one function!
 	for item in res:
 		fn1 = item['top']
 		func_name_node = item['fname']
 		return [True, fn1, func_name_node]
 
-	res = tx.run(query2)
+	# Case 2: Function Expression as Dictionary Key, e.g., f: function(varname) { ... }
+	res = QC.run_query(tx, 'function_param_in_property', id=varname_nid, varname=varname)
 	for item in res:
 		fn2 = item['top']
 		func_name_node = item['fname']
 		return [True, fn2, func_name_node]
 
-	res = tx.run(query3)
+	# Case 3: Function Declaration, e.g., function f(varname) { ...}
+	res = QC.run_query(tx, 'function_param_in_function_declaration', id=varname_nid, varname=varname)
 	for item in res:
 		fn3 = item['top']
 		func_name_node = item['fname']
@@ -1502,12 +1222,7 @@ def getFunctionCallValuesOfFunctionDefinitions(tx, functionDefNode):
 	@return {dictionary} { call_line: {p1: val1, p2:val2}, call_line: {p1: val1, p2: val2}, ... }
 	"""
 	out = {}
-	query = """
-	MATCH (param)<-[:AST_parentOf {RelationType: 'params'}]-(functionDef { Id: '%s' })<-[:CG_parentOf]-(caller {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'arguments'}]-> (arg) RETURN collect(distinct param) as params, caller, collect(distinct arg) AS args
-	"""%(functionDefNode['Id'])
-
-
-	results = tx.run(query)
+	results = QC.run_query(tx, 'function_call_values', id=functionDefNode['Id'])
 	for each_binding in results:
 		call_expression = each_binding['caller']
 		args = each_binding['args']
@@ -1573,11 +1288,7 @@ def getThisPointerResolution(tx, this_node):
 	out = {'events':[], 'methods': []}
 
 	###  STEP 1: inspect if pointer-analysis is already done and is in DB
-	pointer_query="""
-	MATCH (this_node { Id: '%s'})-[:pointsTo {RelationType: 'top', Arguments: 'pointsTo=window'}]->(top_node)
-	return top_node as top
-	"""%(this_expression_node_id)
-	results = tx.run(pointer_query)
+	results = QC.run_query(tx, 'this_points_to_window', id=this_expression_node_id)
 
 	shouldTerminate = False
 	for item in results:
@@ -1588,12 +1299,7 @@ def getThisPointerResolution(tx, this_node):
 	if shouldTerminate:
 		return out
 
-	pointer_query="""
-	MATCH (this_node { Id: '%s'})-[:pointsTo {RelationType: 'top'}]->(top_node),
-	(this_node { Id: '%s'})-[:pointsTo {RelationType: 'owner'}]->(owner_node)
-	return top_node as top, owner_node as owner
-	"""%(this_expression_node_id, this_expression_node_id)
-	results = tx.run(pointer_query)
+	results = QC.run_query(tx, 'this_points_to_owner_object', id=this_expression_node_id)
 	for item in results:
 		top = item['top']
 		owner = item['owner']
@@ -1602,11 +1308,7 @@ def getThisPointerResolution(tx, this_node):
 	if shouldTerminate:
 		return out
 
-	pointer_query="""
-	MATCH (this_node { Id: '%s'})-[:pointsTo {RelationType: 'owner', Arguments: 'pointsTo=eventSelector'}]->(owner_node)
-	return owner_node as owner
-	"""%(this_expression_node_id)
-	results = tx.run(pointer_query)
+	results = QC.run_query(tx, 'this_points_to_event_selector', id=this_expression_node_id)
 	for item in results:
 		owner = item['owner']
 		out['events'].append({'owner': owner})
@@ -1619,11 +1321,7 @@ def getThisPointerResolution(tx, this_node):
 	### STEP 2: do the pointer-analysis 
 
 	# handle ThisStatement in events
-	query="""
-	MATCH (this_st {Id: '%s'})<-[:AST_parentOf*1..10]-(n {Type: 'FunctionExpression'})<-[r:ERDG]-(top_node)
-	RETURN r
-	"""%this_expression_node_id
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_event_handler', id=this_expression_node_id)
 	for item in results:
 		relation = item['r']
 		out['events'].append({'relation': relation}) # r['args'].split('___')[1] = id of the node that `this` refers to it
@@ -1631,22 +1329,9 @@ def getThisPointerResolution(tx, this_node):
 
 	# handle ThisStatement in functions (may resolve to global object, i.e., window, or to the owner object, if they are lator assigned to a member expression)
 	# assignment expr, or var declaration:    										   (right/init)		assign_expr/declarator
-	query="""
-		MATCH (this_st { Id: '%s'})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf]-(expr)-[r:AST_parentOf]->(function_name), (expr)<-[:AST_parentOf]-(top)
-		WHERE r.Type= 'left' OR r.Type= 'id'
-		OPTIONAL MATCH (p1 {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'right'}]->(c1 {Type: 'Identifier', Value: function_name.Code}), 
-		(p1)-[:AST_parentOf {RelationType: 'left'}]->(c2 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(owner {Type: 'Identifier'})
-		OPTIONAL MATCH (function_name)-[:AST_parentOf {RelationTYpe: 'object'}]->(true_owner {Type: 'Identifier'})
-		RETURN
-		CASE function_name.Type
-		WHEN 'Identifier' THEN [top, function_name, owner]
-		WHEN 'MemberExpression' THEN [top, true_owner]
-		ELSE 'xx'
-		END
-	"""%this_expression_node_id
 	# if owner is null,  then `this` refers to global object: the window
 	# if owner is not null, `this` referes to the owner
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_assigned_function', id=this_expression_node_id)
 	for item in results:
 		if 'true_owner' in item:
 			owner = item['true_owner']
@@ -1663,16 +1348,7 @@ def getThisPointerResolution(tx, this_node):
 				out['methods'].append({'top': top, 'owner': owner})
 
 	## handle the object expression case
-	query="""
-	MATCH (this_st {Id: '%s'})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'value'}]-(prop {Type: 'Property'})<-[:AST_parentOf {RelationType: 'properties'}]-(expr {Type: 'ObjectExpression'})<-[r:AST_parentOf]-(t)<-[:AST_parentOf]-(tt)
-	WHERE (r.RelationType= 'right' OR r.RelationType= 'init' OR r.RelationType = 'arguments')
-	AND (t.Type = 'AssignmentExpression' OR t.Type='VariableDeclarator' OR t.Type= 'CallExpression')
-	AND (tt.Type = 'ExpressionStatement' OR tt.Type='VariableDeclaration')
-	OPTIONAL MATCH (t)-[r2:AST_parentOf]->(c1 {Type: 'Identifier'}) WHERE r2.RelationType = 'left' OR r2.RelationType = 'id'
-	OPTIONAL MATCH (t)-[:AST_parentOf]->(c3)-[AST_parentOf {RelationType: 'object'}]->(c2 {Type: 'Identifier'})
-	RETURN tt, c2, c1
-	"""%this_expression_node_id
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_object_expression', id=this_expression_node_id)
 	for item in results:
 		owner = item['c2']
 		top = item['tt']
@@ -1682,12 +1358,7 @@ def getThisPointerResolution(tx, this_node):
 			out['methods'].append({'top': top, 'owner': owner})
 
 
-	query="""
-	MATCH (this_st { Id: '%s'})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'arguments'}]-(top_call_expression)-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(the_event_target_top),
-	(member_expr)-[:AST_parentOf {RelationType: 'property'}]->(prop {Type: 'Identifier', Code: 'on'}), (top_call_expression)<-[:AST_parentOf]-(top)
-	RETURN the_event_target_top, top
-	"""%this_expression_node_id
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_event_target_callback', id=this_expression_node_id)
 	for item in results:
 		owner = item['the_event_target_top']
 		top = item['top']
@@ -1701,28 +1372,16 @@ def getThisPointerResolution(tx, this_node):
 			owner_node = element['owner']
 			if owner_node == constantsModule.WINDOW_GLOBAL_OBJECT:
 				top_node_id= top_node['Id']
-				build_relationship_query="""
-				MATCH (this_node { Id: '%s'}), (top_node { Id: '%s'}))
-				CREATE (this_node)-[:pointsTo {RelationType: 'top', Arguments: 'pointsTo=window'}]->(top_node)
-				"""%(this_expression_node_id)
+				QC.run_query(tx, 'create_this_points_to_window', id=this_expression_node_id, top_id=top_node_id)
 			else:
 				top_node_id = top_node['Id']
 				owner_node_id = owner_node['Id']
-				build_relationship_query="""
-				MATCH (this_node { Id: '%s'}), (top_node { Id: '%s'}), (owner_node { Id: '%s'})
-				CREATE (this_node)-[:pointsTo {RelationType: 'top'}]->(top_node)
-				CREATE (this_node)-[:pointsTo {RelationType: 'owner'}]->(owner_node)
-				"""%(this_expression_node_id, top_node_id, owner_node_id)
-			tx.run(build_relationship_query)
+				QC.run_query(tx, 'create_this_points_to_owner_object', id=this_expression_node_id, top_id=top_node_id, owner_id=owner_node_id)
 
 	if len(out['events']) > 0:
 		for element in out['events']:
 			owner_node_id = item['Arguments'].split('___')[1]
-			build_relationship_query="""
-			MATCH (this_node { Id: '%s'}), (owner_node { Id: '%s'})
-			CREATE (this_node)-[:pointsTo {RelationType: 'owner', Arguments: 'pointsTo=eventSelector'}]->(owner_node)
-			"""%(this_expression_node_id, owner_node_id)
-			tx.run(build_relationship_query)
+			QC.run_query(tx, 'create_this_points_to_event_selector', id=this_expression_node_id, owner_id=owner_node_id)
 
 	### ---- END STEP 2 ---- ###
 
@@ -1757,10 +1416,7 @@ def getValueOfWithLocationChain(tx, varname, rootContextNode, recurse_counter=0,
 		@param {node} call_expr
 		@return VariableDeclaration or ExpressionStatemnet node
 		"""
-		query = """
-		MATCH (n)-[:AST_parentOf]->(callExpr { Id: '%s', Type: 'CallExpression'}) RETURN n
-		"""%(call_expr['Id'])
-		results = tx.run(query)
+		results = QC.run_query(tx, 'call_expression_parent', id=call_expr['Id'])
 		for item in results:
 			top_level = item['n']
 			return top_level
@@ -1770,10 +1426,7 @@ def getValueOfWithLocationChain(tx, varname, rootContextNode, recurse_counter=0,
 		"""
 		gets the function definition of a block statement node
 		"""
-		query = """
-		MATCH (funcDef)-[:AST_parentOf]->(blockSt { Id: '%s', Type: 'BlockStatement'}) RETURN funcDef
-		"""%(block_stmt_node['Id'])
-		results = tx.run(query)
+		results = QC.run_query(tx, 'block_statement_function', id=block_stmt_node['Id'])
 		for record in results:
 			funcDef = record['funcDef']
 			return funcDef
@@ -1797,10 +1450,7 @@ def getValueOfWithLocationChain(tx, varname, rootContextNode, recurse_counter=0,
 
 	def _check_if_function_has_param(varname, func_def_node):
 
-		query="""
-		MATCH (n { Id: '%s'})-[:AST_parentOf {RelationType: 'params'}]-(arg) RETURN collect(distinct arg) as args
-		"""%(func_def_node['Id'])
-		results = tx.run(query)
+		results = QC.run_query(tx, 'function_params', id=func_def_node['Id'])
 		for item in results:
 			args = item['args']
 			arg_values = [_get_value_of_identifer_or_literal(node)[0] for node in args]
@@ -1814,16 +1464,11 @@ def getValueOfWithLocationChain(tx, varname, rootContextNode, recurse_counter=0,
 
 	if PDG_on_variable_declarations_only:
 		# for VariableDeclaration PDG relations
-		query = """
-		MATCH (n_s { Id: '%s' })<-[:PDG_parentOf { Arguments: '%s' }]-(n_t {Type: 'VariableDeclaration'}) RETURN collect(distinct n_t) AS resultset
-		"""%(nodeId, varname)
+		results = QC.run_query(tx, 'pdg_parents_variable_declarations', id=nodeId, varname=varname)
 	else:
 		# for all PDG relations
-		query = """
-		MATCH (n_s { Id: '%s' })<-[:PDG_parentOf { Arguments: '%s' }]-(n_t) RETURN collect(distinct n_t) AS resultset
-		"""%(nodeId, varname)
+		results = QC.run_query(tx, 'pdg_parents', id=nodeId, varname=varname)
 
-	results = tx.run(query)
 	for item in results: 
 		currentNodes = item['resultset'] 
 		for iteratorNode in currentNodes:
@@ -2106,11 +1751,7 @@ def getValueOfWithLocationChain(tx, varname, rootContextNode, recurse_counter=0,
 				# check if new_varname is a function call
 				# i.e., it has a `callee` relation to a parent of type `CallExpression`
 				new_varname_id = idents[new_varname]
-				check_function_call_query="""
-				MATCH (n { Id: '%s' })<-[:AST_parentOf {RelationType: 'callee'}]-(fn_call {Type: 'CallExpression'})-[:CG_parentOf]->(call_definition)
-				RETURN call_definition
-				"""%(new_varname_id)
-				call_definition_result = tx.run(check_function_call_query)
+				call_definition_result = QC.run_query(tx, 'callee_call_definitions', id=new_varname_id)
 				is_func_call = False
 				for definition in call_definition_result:
 					item = definition['call_definition']
@@ -2165,15 +1806,7 @@ def do_reachability_analysis(tx, node, input_is_top=False):
 	else:
 		top_expression = neo4jQueryUtilityModule.get_ast_topmost(tx, {'Id': node_id})
 	
-	query = """
-	MATCH (n { Id: '%s'})<-[:CFG_parentOf*]-(block_node)
-	WHERE block_node.Type = 'Program' OR block_node.Type = 'BlockStatement'
-	OPTIONAL MATCH (block_node)<-[:AST_parentOf {RelationType: 'body'}]-(function_expr {Type: 'FunctionExpression'})
-	OPTIONAL MATCH (function_expr)-[:AST_parentOf {RelationType: 'id'}]->(function_def_id {Type: 'Identifier'})
-	RETURN block_node, function_expr, function_def_id
-	"""%(top_expression['Id'])
-	
-	results = tx.run(query)
+	results = QC.run_query(tx, 'enclosing_block_statement', id=top_expression['Id'])
 	for element in results:
 		block_node = element['block_node']
 		function_expr = element['function_expr']
@@ -2183,11 +1816,7 @@ def do_reachability_analysis(tx, node, input_is_top=False):
 		else:
 			if function_def_id is not None:
 				# search for all locations where this `FunctionDefiniton` is called
-				query1="""
-				MATCH (call_expr {Type: 'CallExpression'})-[:AST_parentOf]->(callee { Type: 'Identifier', Code: '%s'})
-				RETURN call_expr
-				"""%(function_def_id['Code'])
-				results1 = tx.run(query1)
+				results1 = QC.run_query(tx, 'call_expressions_of_callee_name', name=function_def_id['Code'])
 				for element1 in results1:
 					call_expr = element1['call_expr']
 					tag = do_reachability_analysis(tx, call_expr)
@@ -2195,11 +1824,7 @@ def do_reachability_analysis(tx, node, input_is_top=False):
 						return tag
 
 				 # case 2: func name is used later in an event handler, e.g, YAHOO.util.Event.onContentReady('ajaxUI-history-field', SUGAR.ajaxUI.firstLoad);
-				query2="""
-				MATCH (callee { Type: 'Identifier', Code: '%s'})<-[:AST_parentOf*1..6]-(call_expr {Type: 'CallExpression'})
-				RETURN call_expr
-				"""%(function_def_id['Code'])
-				results2 = tx.run(query2)
+				results2 = QC.run_query(tx, 'call_expressions_enclosing_identifier', name=function_def_id['Code'])
 				output_event_registrators = []
 				for element2 in results2:
 					call_expr = element2['call_expr']
@@ -2216,11 +1841,7 @@ def do_reachability_analysis(tx, node, input_is_top=False):
 					return UNREACHABLE
 
 				# 1) function expression is an argument of an event handler registrator
-				query3="""
-				MATCH (callee { Id: '%s'})<-[:AST_parentOf*1..6]-(call_expr {Type: 'CallExpression'})
-				RETURN call_expr
-				"""%(function_expr['Id'])
-				results3 = tx.run(query3)
+				results3 = QC.run_query(tx, 'call_expressions_enclosing_node', id=function_expr['Id'])
 				output_event_registrators = []
 				for element3 in results3:
 					call_expr = element3['call_expr']
@@ -2232,15 +1853,7 @@ def do_reachability_analysis(tx, node, input_is_top=False):
 
 				# 2) function expression is in an object expression
 				# @Note: for member expressions, we find all objects with the same pointer name in call expressions (consider all potential cases, but may end in false positive)
-				query4="""
-				MATCH (func_expr { Id: '%s'})<-[:AST_parentOf {RelationType: 'value'}]-(prop {Type: 'Property'})<-[:AST_parentOf {RelationType: 'properties'}]-(obj_expr {Type: 'ObjectExpression'})<-[:AST_parentOf]-(t)<-[:AST_parentOf]-(tt)
-				OPTIONAL MATCH (t)-[r:AST_parentOf]->(c1_name {Type: 'Identifier'}) 
-				WHERE r.RelationType='left' or r.RelationType='id'
-				OPTIONAL MATCH (t)-[r:AST_parentOf]->(c2_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(c2_name {Type: 'Identifier'}) 
-				WHERE r.RelationType='left' or r.RelationType='id'
-				RETURN tt, c1_name, c2_name
-				"""
-				results4 = tx.run(query4)
+				results4 = QC.run_query(tx, 'object_property_function_owner', id=function_expr['Id'])
 				for element4 in results4:
 					top_expr = element4 ['tt']
 					function_name = element4['c1_name']
@@ -2249,11 +1862,7 @@ def do_reachability_analysis(tx, node, input_is_top=False):
 					if function_name is None:
 						continue
 
-					query5="""
-					MATCH (callee { Type: 'Identifier', Code: '%s'})<-[:AST_parentOf*1..8]-(call_expr {Type: 'CallExpression'})
-					RETURN call_expr
-					"""%(function_name['Code'])
-					results5= tx.run(query5)
+					results5= QC.run_query(tx, 'call_expressions_enclosing_identifier_deep', name=function_name['Code'])
 					for element5 in results5:
 						call_expr = element5['call_expr']
 						tag = do_reachability_analysis(tx, call_expr)
@@ -2374,11 +1983,11 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 	#		*source* = ExpressionStatement or Variable Declaration that contains ajax-request sending keywords
 	if AD_HOC_QUERY_1_ACTIVE:
 		query="""
-		MATCH (w {Code: 'window'})<-[:AST_parentOf{RelationType: 'object'}]-(p {Type: 'MemberExpression'})-[:AST_parentOf{RelationType: 'property'}]->(l {Code: 'location'}), 
+		MATCH (w:ASTNode {Code: 'window'%s})<-[:AST_parentOf{RelationType: 'object'}]-(p {Type: 'MemberExpression'})-[:AST_parentOf{RelationType: 'property'}]->(l {Code: 'location'}), 
 		(p)<-[:AST_parentOf{RelationType: 'object'}]-(gp {Type: 'MemberExpression'})-[:AST_parentOf{RelationType: 'property'}]->(h {Code: 'hash'}), 
 		(gp)<-[:AST_parentOf {RelationType: 'left'}]-(t {Type: 'AssignmentExpression'})-[:AST_parentOf{RelationType: 'right'}]->(v),
 		(t)<-[:AST_parentOf {RelationType: 'expression'}]-(topsource {Type: 'ExpressionStatement'}),
-		(n {Type: 'Identifier'})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
+		(n:ASTNode {Type: 'Identifier'%s})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
 		WHERE v.Type = 'Identifier' OR v.Type = 'Literal'	 
 		AND n.Code =~ '.*(ajax|open|fetch|XMLHttpRequest|send).*' AND (topsink.Type = 'ExpressionStatement' OR topsink.Type = 'VariableDeclaration')
 		WITH  v AS val, topsink AS si, topsource AS sc 
@@ -2393,7 +2002,7 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 			 END
 		WHEN False Then null
 		END AS res
-		"""
+		"""%(neo4jQueryUtilityModule.get_partition_scope(), neo4jQueryUtilityModule.get_partition_scope())
 		results = tx.run(query)
 		for record in results: 
 			nodes = record['res']
@@ -2411,11 +2020,11 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 	#		*source* = ExpressionStatement or Variable Declaration that contains ajax-request sending keywords
 	if AD_HOC_QUERY_2_ACTIVE:
 		query="""
-		MATCH (w {Code: 'window'})<-[:AST_parentOf{RelationType: 'object'}]-(p {Type: 'MemberExpression'})-[:AST_parentOf{RelationType: 'property'}]->(l {Code: 'location'}), 
+		MATCH (w:ASTNode {Code: 'window'%s})<-[:AST_parentOf{RelationType: 'object'}]-(p {Type: 'MemberExpression'})-[:AST_parentOf{RelationType: 'property'}]->(l {Code: 'location'}), 
 		(p)<-[:AST_parentOf{RelationType: 'object'}]-(gp {Type: 'MemberExpression'})-[:AST_parentOf{RelationType: 'property'}]->(h {Code: 'hash'}), 
 		(gp)<-[:AST_parentOf {RelationType: 'left'}]-(t {Type: 'AssignmentExpression'})-[:AST_parentOf{RelationType: 'right'}]->(v),
 		(t)<-[:AST_parentOf {RelationType: 'expression'}]-(topsource {Type: 'ExpressionStatement'}),
-		(n {Type: 'Identifier'})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
+		(n:ASTNode {Type: 'Identifier'%s})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
 		WHERE v.Type = 'Identifier' OR v.Type = 'Literal' OR v.Type = 'CallExpression'
 		AND n.Code =~ '.*(ajax|open|fetch|XMLHttpRequest|send).*' AND (topsink.Type = 'ExpressionStatement' OR topsink.Type = 'VariableDeclaration')
 		WITH  v AS val, topsink AS si, topsource AS sc 
@@ -2424,7 +2033,7 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 		WHEN True Then [val, sc]
 		WHEN False Then null
 		END AS res
-		"""
+		"""%(neo4jQueryUtilityModule.get_partition_scope(), neo4jQueryUtilityModule.get_partition_scope())
 		results = tx.run(query)
 		visited = []
 		for record in results: 
@@ -2466,11 +2075,11 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 	# window.location.hash (2 member expression) and wl.hash (1 member expression)
 	if AD_HOC_QUERY_3_ACTIVE:
 		query="""
-		MATCH (obj)<-[:AST_parentOf {RelationType: 'object'}]-(wl {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(wlh {Type: 'Identifier', Code: 'hash'}), 
+		MATCH (obj)<-[:AST_parentOf {RelationType: 'object'}]-(wl:ASTNode {Type: 'MemberExpression'%s})-[:AST_parentOf {RelationType: 'property'}]->(wlh {Type: 'Identifier', Code: 'hash'}), 
 		(wl)<-[r1:AST_parentOf]-(p)-[r2:AST_parentOf]->(tIdent {Type: 'Identifier'}),
-		(targetIdent {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'left'}]-(t {Type: 'AssignmentExpression'})-[:AST_parentOf{RelationType: 'right'}]->(v),
+		(targetIdent:ASTNode {Type: 'Identifier'%s})<-[:AST_parentOf {RelationType: 'left'}]-(t {Type: 'AssignmentExpression'})-[:AST_parentOf{RelationType: 'right'}]->(v),
 		(t)<-[:AST_parentOf {RelationType: 'expression'}]-(topsource {Type: 'ExpressionStatement'}),
-		(n {Type: 'Identifier'})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
+		(n:ASTNode {Type: 'Identifier'%s})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
 		WHERE (p.Type = 'AssignmentExpression' OR p.Type = 'VariableDeclarator') AND 
 			  (r1.RelationType = 'init' or r1.RelationType = 'right') AND
 			  (r2.RelationType = 'left' OR r2.RelationType = 'id') AND
@@ -2484,7 +2093,7 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 		WHEN True Then [val, sc]
 		WHEN False Then null
 		END AS res
-		"""
+		"""%(neo4jQueryUtilityModule.get_partition_scope(), neo4jQueryUtilityModule.get_partition_scope(), neo4jQueryUtilityModule.get_partition_scope())
 		results = tx.run(query)
 		visited = []
 		for record in results: 
@@ -2523,10 +2132,10 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 	#		** This query only addresses CASE 2 ** 
 	if AD_HOC_QUERY_4_ACTIVE:
 		query="""
-		MATCH (obj)<-[:AST_parentOf {RelationType: 'object'}]-(wl {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(wlh {Type: 'Identifier', Code: 'hash'}), 
+		MATCH (obj)<-[:AST_parentOf {RelationType: 'object'}]-(wl:ASTNode {Type: 'MemberExpression'%s})-[:AST_parentOf {RelationType: 'property'}]->(wlh {Type: 'Identifier', Code: 'hash'}), 
 		(wl)<-[:AST_parentOf {RelationType: 'left'}]-(p {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'right'}]->(v),
 		(p)<-[:AST_parentOf {RelationType: 'expression'}]-(topsource {Type: 'ExpressionStatement'}),
-		(n {Type: 'Identifier'})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
+		(n:ASTNode {Type: 'Identifier'%s})<-[:AST_parentOf  {RelationType: 'property'}]-(parent)<-[:AST_parentOf*1..3]-(topsink)
 		WHERE
 			(v.Type = 'Literal' or v.Type = 'Identifier' or v.Type = 'CallExpression') AND
 			(n.Code =~ '.*(ajax|open|fetch|XMLHttpRequest|send).*') AND
@@ -2537,7 +2146,7 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 		WHEN True Then [val, sc]
 		WHEN False Then null
 		END AS res
-		"""
+		"""%(neo4jQueryUtilityModule.get_partition_scope(), neo4jQueryUtilityModule.get_partition_scope())
 		results = tx.run(query)
 		visited = []
 		for record in results: 
@@ -2573,15 +2182,17 @@ def run_traversals(tx, navigation_url, webpage_directory, folder_name_of_url='xx
 	#	Finds asynchronous HTTP requests (sinks) and associates a semantic type to them
 	#	i.e., is any sink value traces back to the defined semantic types
 	if MAIN_QUERY_ACTIVE:
-		r1 = getXhrOpenCallExpressions(tx)
-		r2 = getFetchCallExpressions(tx)
-		r3 = getAjaxCallExpressions(tx)
-		r4 = getAsyncRequestCallExpressions(tx)
-		r5 = getSetFormCallExpressions(tx)
-		r6 = getPageSpeedExpressions(tx)
-		r7 = getWindowOpenCallExpressions(tx)
-		r8 = xhrPostCallExpressions(tx)
-		r9 = getAjaxSettingObjectExpressions(tx)
+		# all request sinks in one query, instead of one query per kind of sink
+		sink_expressions = HttpRequestSinkExpressions.getRequestSinkExpressions(tx)
+		r1 = sink_expressions['xhr_open_calls']
+		r2 = sink_expressions['fetch_calls']
+		r3 = sink_expressions['ajax_calls']
+		r4 = sink_expressions['async_request_calls']
+		r5 = sink_expressions['set_form_calls']
+		r6 = sink_expressions['pagespeed_calls']
+		r7 = sink_expressions['window_open_calls']
+		r8 = sink_expressions['xhr_post_calls']
+		r9 = sink_expressions['ajax_setting_objects']
 
 
 		request_storage = {}   # key: call_expression_id, value: structure of request url for that call expression
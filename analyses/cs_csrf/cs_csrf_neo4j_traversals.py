@@ -39,6 +39,7 @@ import analyses.cs_csrf.cs_csrf_cypher_queries as CSRFTraversalsModule
 # import hpg_neo4j.query_utility as neo4jQueryUtilityModule
 import hpg_neo4j.db_utility as DU
 import hpg_neo4j.query_utility as QU
+import hpg_neo4j.partitioned_import as PartitionedImportModule
 import docker.neo4j.manage_container as dockerModule
  
 
@@ -128,6 +129,7 @@ def build_and_analyze_hpg_docker(seed_url, conn_timeout=None):
 			if build_container: 
 
 				# remove the old container & database if it exists 
+				DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 				dockerModule.stop_neo4j_container(container_name)
 				dockerModule.remove_neo4j_container(container_name)
 				dockerModule.remove_neo4j_database(database_name, container_name)
@@ -140,13 +142,13 @@ def build_and_analyze_hpg_docker(seed_url, conn_timeout=None):
 			logger.info('importing data inside container.')
 			dockerModule.import_data_inside_container(container_name, database_name, relative_import_path, 'CSV')
 			logger.info('waiting for the tcp port 7474 of the neo4j container to be ready...')
-			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150)
+			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				sys.exit(1)
 		else:
 			dockerModule.start_neo4j_container(container_name)
 			logger.info('waiting for the tcp port 7474 of the neo4j container to be ready...')
-			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150)
+			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				sys.exit(1)
 
@@ -156,16 +158,21 @@ def build_and_analyze_hpg_docker(seed_url, conn_timeout=None):
 		# step3: run the vulnerability detection queries
 		if query:
 			navigation_url = get_url_for_webpage(webpage)
-			DU.exec_fn_within_transaction(CSRFTraversalsModule.run_traversals, navigation_url, webpage, each_webpage, conn_timeout=conn_timeout)
+			DU.exec_fn_within_transaction(CSRFTraversalsModule.run_traversals, navigation_url, webpage, each_webpage, conn=constantsModule.NEO4J_CONN_STRING, conn_timeout=conn_timeout)
 
 
 		# stop the neo4j docker container
 		if stop_container:
+			DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 			dockerModule.stop_neo4j_container(container_name)
 
 
 def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, compress_hpg=True):
 
+	if str(constantsModule.NEO4J_USE_PARTITIONED_IMPORT).lower() == 'true':
+		# import all webpages of the site into a single database
+		return build_and_analyze_hpg_local_partitioned(seed_url, overwrite=overwrite, conn_timeout=conn_timeout, compress_hpg=compress_hpg)
+
 	webapp_folder_name = get_name_from_url(seed_url)
 	webapp_data_directory = os.path.join(constantsModule.DATA_DIR, webapp_folder_name)
 	if not os.path.exists(webapp_data_directory):
@@ -254,6 +261,7 @@ def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, co
 			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				try:
+					DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 					logger.info('[TR] stopping neo4j for %s'%str(database_name))
 					DU.ineo_stop_db_instance(database_name)
 
@@ -263,6 +271,9 @@ def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, co
 					logger.info('[TR] ran into exception while prematurely stopping neo4j for %s'%str(database_name))
 				continue
 
+			logger.info('[TR] creating the schema indexes of the hpg.')
+			DU.bootstrap_hpg_schema(conn=constantsModule.NEO4J_CONN_STRING)
+
 			logger.info('[TR] starting to run the queries.')
 			webpage_url = get_url_for_webpage(webpage_folder)
 			try:
@@ -276,9 +287,27 @@ def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, co
 						error_json = {"error": str(e)}
 						json.dump(error_json, fd, ensure_ascii=False, indent=4)
 
+			DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 			logger.info('[TR] stopping neo4j for %s'%str(database_name))
 			DU.ineo_stop_db_instance(database_name)
 
 			## remove db after analysis
 			logger.info('[TR] removing neo4j for %s'%str(database_name))
 			DU.ineo_remove_db_instance(database_name)
+
+
+def build_and_analyze_hpg_local_partitioned(seed_urls, overwrite=False, conn_timeout=None, compress_hpg=True):
+	"""
+	@param {string|list} seed_urls: a site, or a batch of sites, whose webpages are imported into a single neo4j database
+	@description: same as `build_and_analyze_hpg_local()`, but with one neo4j-admin import and one server start 
+		for all webpages, where the traversals of each webpage are scoped to its own partition of the database
+	"""
+
+	if isinstance(seed_urls, str):
+		seed_urls = [seed_urls]
+
+	partitions = PartitionedImportModule.collect_webpage_partitions(seed_urls, overwrite=overwrite, load_dynamic_rels=False)
+	database_name = PartitionedImportModule.get_partitioned_database_name(seed_urls)
+	logger.info('[TR] analyzing %d webpages in the partitioned database %s'%(len(partitions), database_name))
+	PartitionedImportModule.analyze_hpg_partitions(database_name, partitions, CSRFTraversalsModule.run_traversals, conn_timeout=conn_timeout, compress_hpg=compress_hpg)
+
@@ -24,6 +24,9 @@
 
 """
 
+from utils.pattern_matcher import MultiPatternMatcher
+
+
 
 
 # source semantic types 
@@ -38,3 +41,59 @@ SEM_TYPE_PM_READ = 'PM-READ'				 # read from postMessages
 
 
 
+# sources: a program slice reads from a source if its code contains any pattern of the source
+# (the identifiers of a slice are matched against the sources of SOURCE_IDENTIFIER_PATTERNS only)
+WIN_LOC_PATTERNS = [
+	'window.location',
+	'location.href',
+	'location.hash',
+	'History.getBookmarkedState',
+]
+WIN_NAME_PATTERNS = ['window.name']
+DOM_READ_PATTERNS = [
+	'document.getElement',
+	'.getElementBy',
+	'.getElementsBy',
+	'$(',
+	'jQuery(',
+	'.attr(',
+	'.getAttribute(',
+	'.readAttribute(',
+]
+LOCAL_STORAGE_PATTERNS = ['localStorage', 'sessionStorage']
+COOKIE_PATTERNS = ['document.cookie']
+DOC_REF_PATTERNS = ['document.referrer']
+PM_PATTERNS = ['event.data', 'evt.data']
+
+SOURCE_PATTERNS = [
+	(SEM_TYPE_WIN_LOC_READ, WIN_LOC_PATTERNS),
+	(SEM_TYPE_DOM_READ, DOM_READ_PATTERNS),
+	(SEM_TYPE_LOCAL_STORAGE_READ, LOCAL_STORAGE_PATTERNS),
+	(SEM_TYPE_COOKIE_READ, COOKIE_PATTERNS),
+	(SEM_TYPE_WIN_NAME_READ, WIN_NAME_PATTERNS),
+	(SEM_TYPE_DOC_REF_READ, DOC_REF_PATTERNS),
+	(SEM_TYPE_PM_READ, PM_PATTERNS),
+]
+
+SOURCE_IDENTIFIER_PATTERNS = [
+	(SEM_TYPE_LOCAL_STORAGE_READ, LOCAL_STORAGE_PATTERNS),
+	(SEM_TYPE_COOKIE_READ, COOKIE_PATTERNS),
+	(SEM_TYPE_WIN_NAME_READ, WIN_NAME_PATTERNS),
+	(SEM_TYPE_DOC_REF_READ, DOC_REF_PATTERNS),
+	(SEM_TYPE_PM_READ, PM_PATTERNS),
+]
+
+# order of the endpoint tag sources, see `cs_csrf_cypher_queries._get_semantic_type()`
+SOURCE_ENDPOINT_TAG_PATTERNS = [
+	(SEM_TYPE_LOCAL_STORAGE_READ, LOCAL_STORAGE_PATTERNS),
+	(SEM_TYPE_WIN_LOC_READ, WIN_LOC_PATTERNS),
+	(SEM_TYPE_WIN_NAME_READ, WIN_NAME_PATTERNS),
+	(SEM_TYPE_DOC_REF_READ, DOC_REF_PATTERNS),
+	(SEM_TYPE_COOKIE_READ, COOKIE_PATTERNS),
+	(SEM_TYPE_DOM_READ, DOM_READ_PATTERNS),
+	(SEM_TYPE_PM_READ, PM_PATTERNS),
+]
+
+SOURCE_PATTERN_MATCHER = MultiPatternMatcher(SOURCE_PATTERNS)
+SOURCE_IDENTIFIER_PATTERN_MATCHER = MultiPatternMatcher(SOURCE_IDENTIFIER_PATTERNS)
+SOURCE_ENDPOINT_TAG_PATTERN_MATCHER = MultiPatternMatcher(SOURCE_ENDPOINT_TAG_PATTERNS)
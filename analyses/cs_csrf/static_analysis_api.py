@@ -37,6 +37,10 @@ from utils.logging import logger as LOGGER
 
 def start_model_construction(website_url, iterative_output='false', memory=None, timeout=None, compress_hpg='true', overwrite_hpg='false', specific_webpage=None):
 
+	"""
+	@return {list} the `ProcessResult` of the HPG construction of each webpage
+	"""
+
 	# setup defaults
 	if memory is None:
 		static_analysis_memory = '32000'
@@ -63,11 +67,12 @@ def start_model_construction(website_url, iterative_output='false', memory=None,
 	urls_file = os.path.join(website_folder, 'urls.out')
 
 
+	results = []
 	if specific_webpage is not None:
 		webpage_folder = os.path.join(constantsModule.DATA_DIR, specific_webpage)
 		if os.path.exists(webpage_folder):
 			node_command= cs_csrf_static_analysis_command.replace('SINGLE_FOLDER', webpage_folder)
-			IOModule.run_os_command(node_command, cwd=cs_csrf_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True)
+			results.append(IOModule.run_os_command(node_command, cwd=cs_csrf_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True, return_result=True))
 
 	elif os.path.exists(webpages_json_file):
 
@@ -80,7 +85,7 @@ def start_model_construction(website_url, iterative_output='false', memory=None,
 			if os.path.exists(webpage_folder):
 				
 				node_command= cs_csrf_static_analysis_command.replace('SINGLE_FOLDER', webpage_folder)
-				IOModule.run_os_command(node_command, cwd=cs_csrf_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True)
+				results.append(IOModule.run_os_command(node_command, cwd=cs_csrf_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True, return_result=True))
 
 
 
@@ -104,9 +109,11 @@ def start_model_construction(website_url, iterative_output='false', memory=None,
 			webpage_folder = os.path.join(website_folder, webpage_folder_name)
 			if os.path.exists(webpage_folder):
 				node_command= cs_csrf_static_analysis_command.replace('SINGLE_FOLDER', webpage_folder)
-				IOModule.run_os_command(node_command, cwd=cs_csrf_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True)
+				results.append(IOModule.run_os_command(node_command, cwd=cs_csrf_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True, return_result=True))
 
 	else:
 		message = 'no webpages.json or urls.out file exists in the webapp directory; skipping analysis...'
 		LOGGER.warning(message)
 
+	return results
+
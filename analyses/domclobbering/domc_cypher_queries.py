@@ -34,6 +34,7 @@ import constants as constantsModule
 from utils.logging import logger as LOGGER
 from datetime import datetime
 import hpg_neo4j.query_utility as QU
+import hpg_neo4j.query_catalog as QC
 import analyses.general.data_flow as DF
 import analyses.vulnerability_types as enumVulnerabilityTypes
 import analyses.request_hijacking.semantic_types as SemTypeDefinitions
@@ -90,12 +91,7 @@ def get_ast_parent(tx, node):
 	@return immediate parent of an AST node
 	"""
 
-	query = """
-	MATCH (parent)-[:AST_parentOf]->(child {Id: '%s'})
-	RETURN parent
-	"""%(node['Id'])
-
-	results = tx.run(query)
+	results = QC.run_query(tx, 'ast_parent', id=node['Id'])
 	for record in results:
 		child = record['parent']
 		return child
@@ -111,12 +107,7 @@ def get_node_by_id(tx, node_id):
 	@return node
 	"""
 
-	query = """
-	MATCH (n {Id: '%s'})
-	RETURN n
-	"""%(node_id)
-
-	results = tx.run(query)
+	results = QC.run_query(tx, 'node_by_id', id=str(node_id))
 	for record in results:
 		n = record['n']
 		return n
@@ -605,6 +596,8 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 	sinks_list = sinks_json['sinks']
 
 	storage = {}
+	# program slices of this webpage, shared by all sinks
+	slicing_cache = DF.SlicingCache()
 
 
 	for sink_node in sinks_list:
@@ -639,7 +632,7 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 
 
 		for varname in sink_identifiers:
-			slice_values = DF._get_varname_value_from_context(tx, varname, sink_cfg_node)
+			slice_values = DF._get_varname_value_from_context(tx, varname, sink_cfg_node, slicing_cache=slicing_cache)
 
 			if DEBUG: print(varname, slice_values)
 
@@ -766,6 +759,7 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 		json.dump(json_buffer, fd, ensure_ascii=False, indent=4)
 
 
+	LOGGER.info('[TR] slicing cache: %s'%slicing_cache)
 	LOGGER.info('[TR] finished running the queries.')
 
 
@@ -122,6 +122,7 @@ def build_and_analyze_hpg(seed_url):
 			if build_container: 
 
 				# remove the old container & database if it exists 
+				DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 				dockerModule.stop_neo4j_container(container_name)
 				dockerModule.remove_neo4j_container(container_name)
 				dockerModule.remove_neo4j_database(database_name, container_name)
@@ -134,13 +135,13 @@ def build_and_analyze_hpg(seed_url):
 			logger.info('importing data inside container.')
 			dockerModule.import_data_inside_container(container_name, database_name, relative_import_path, 'CSV')
 			logger.info('waiting for the tcp port 7474 of the neo4j container to be ready...')
-			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150)
+			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				sys.exit(1)
 		else:
 			dockerModule.start_neo4j_container(container_name)
 			logger.info('waiting for the tcp port 7474 of the neo4j container to be ready...')
-			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150)
+			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				sys.exit(1)
 
@@ -151,11 +152,12 @@ def build_and_analyze_hpg(seed_url):
 
 		# step3: run the vulnerability detection queries
 		if query:
-			DU.exec_fn_within_transaction(DOMCTraversalsModule.run_traversals, webpage)
+			DU.exec_fn_within_transaction(DOMCTraversalsModule.run_traversals, webpage, conn=constantsModule.NEO4J_CONN_STRING)
 
 
 		# stop the neo4j docker container
 		if stop_container:
+			DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 			dockerModule.stop_neo4j_container(container_name)
 
 
@@ -251,6 +253,7 @@ def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, co
 			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				try:
+					DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 					logger.info('[TR] stopping neo4j for %s'%str(database_name))
 					DU.ineo_stop_db_instance(database_name)
 
@@ -273,6 +276,7 @@ def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, co
 						error_json = {"error": str(e)}
 						json.dump(error_json, fd, ensure_ascii=False, indent=4)
 
+			DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 			logger.info('[TR] stopping neo4j for %s'%str(database_name))
 			DU.ineo_stop_db_instance(database_name)
 
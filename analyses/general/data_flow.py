@@ -29,10 +29,11 @@
 """
 
 import hpg_neo4j.query_utility as QU
+import hpg_neo4j.query_catalog as QC
 import hpg_neo4j.db_utility as DU
 import constants as constantsModule
 import jsbeautifier
-import functools
+from collections import OrderedDict
 import json
 
 ## ------------------------------------------------------------------------------- ## 
@@ -132,16 +133,100 @@ def _get_node_id_part(nid_string):
 	end_index = nid_string.index('__Loc=')
 	return nid_string[start_index:end_index]
 
-param_stack = list()
+class BoundedCache(object):
+
+	"""
+	dict-like cache that drops its least recently used entries beyond `maxsize` entries
+	"""
+
+	def __init__(self, maxsize):
+		self.maxsize = maxsize
+		self.evictions = 0
+		self._entries = OrderedDict()
+
+	def __contains__(self, key):
+		return key in self._entries
+
+	def __getitem__(self, key):
+		value = self._entries[key]
+		self._entries.move_to_end(key)
+		return value
+
+	def get(self, key, default=None):
+		if key in self._entries:
+			return self[key]
+		return default
+
+	def __setitem__(self, key, value):
+		self._entries[key] = value
+		self._entries.move_to_end(key)
+		if len(self._entries) > self.maxsize:
+			self._entries.popitem(last=False)
+			self.evictions += 1
+
+	def clear(self):
+		self._entries.clear()
+
+	def __len__(self):
+		return len(self._entries)
+
 
-def param_stack_has(varname):
-	return varname in param_stack
 
-def param_stack_push(varname):
-	param_stack.append(varname)
+class SlicingCache(object):
 
-def param_stack_pop():
-	param_stack.pop()
+	"""
+	per-page cache of the program slices of `_get_varname_value_from_context()`,
+	keyed by (context node id, varname, PDG_on_variable_declarations_only, context_scope).
+	it also holds the varnames currently being sliced, which guard the slices against cycles,
+	and the call values of the function definitions of the page.
+	the PDG parents and statement subtrees are bounded as well; an evicted entry is queried again when needed.
+	"""
+
+	def __init__(self, maxsize=512, max_pdg_parents=20000, max_statement_trees=20000):
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		# number of slices cut short by the recursion guard, the visited frames, or the budgets
+		self.cutoffs = 0
+		# number of slices cut short by the budgets only
+		self.truncated_slices = 0
+		self.param_stack = []
+		# funcDef id -->> get_function_call_values_of_function_definitions(funcDef)
+		self.call_values = {}
+		# (statement id, varname) -->> PDG parents, and statement id -->> AST subtree, see `compute_backward_closure()`
+		self.pdg_parents = BoundedCache(max_pdg_parents)
+		self.statement_trees = BoundedCache(max_statement_trees)
+		self._entries = OrderedDict()
+
+	def get(self, key):
+		if key in self._entries:
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return list(self._entries[key])
+		self.misses += 1
+		return None
+
+	def put(self, key, values):
+		self._entries[key] = list(values)
+		self._entries.move_to_end(key)
+		if len(self._entries) > self.maxsize:
+			self._entries.popitem(last=False)
+			self.evictions += 1
+
+	def clear(self):
+		self._entries.clear()
+		self.param_stack = []
+		self.call_values = {}
+		self.pdg_parents.clear()
+		self.statement_trees.clear()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __str__(self):
+		return 'entries=%d, hits=%d, misses=%d, evictions=%d, truncated=%d, pdg_parents=%d (evicted %d), statement_trees=%d (evicted %d)'%(len(self._entries), self.hits, self.misses, self.evictions, self.truncated_slices,
+			len(self.pdg_parents), self.pdg_parents.evictions, len(self.statement_trees), self.statement_trees.evictions)
 
 	
 ## ------------------------------------------------------------------------------- ## 
@@ -187,11 +272,7 @@ def get_this_pointer_resolution(tx, this_node):
 	out = {'events':[], 'methods': []}
 
 	###  STEP 1: inspect if pointer-analysis is already done and is in DB
-	pointer_query="""
-	MATCH (this_node { Id: '%s'})-[:pointsTo {RelationType: 'top', Arguments: 'pointsTo=window'}]->(top_node)
-	return top_node as top
-	"""%(this_expression_node_id)
-	results = tx.run(pointer_query)
+	results = QC.run_query(tx, 'this_points_to_window', id=this_expression_node_id)
 
 	shouldTerminate = False
 	for item in results:
@@ -202,12 +283,7 @@ def get_this_pointer_resolution(tx, this_node):
 	if shouldTerminate:
 		return out
 
-	pointer_query="""
-	MATCH (this_node { Id: '%s'})-[:pointsTo {RelationType: 'top'}]->(top_node),
-	(this_node { Id: '%s'})-[:pointsTo {RelationType: 'owner'}]->(owner_node)
-	return top_node as top, owner_node as owner
-	"""%(this_expression_node_id, this_expression_node_id)
-	results = tx.run(pointer_query)
+	results = QC.run_query(tx, 'this_points_to_owner_object', id=this_expression_node_id)
 	for item in results:
 		top = item['top']
 		owner = item['owner']
@@ -216,11 +292,7 @@ def get_this_pointer_resolution(tx, this_node):
 	if shouldTerminate:
 		return out
 
-	pointer_query="""
-	MATCH (this_node { Id: '%s'})-[:pointsTo {RelationType: 'owner', Arguments: 'pointsTo=eventSelector'}]->(owner_node)
-	return owner_node as owner
-	"""%(this_expression_node_id)
-	results = tx.run(pointer_query)
+	results = QC.run_query(tx, 'this_points_to_event_selector', id=this_expression_node_id)
 	for item in results:
 		owner = item['owner']
 		out['events'].append({'owner': owner})
@@ -233,11 +305,7 @@ def get_this_pointer_resolution(tx, this_node):
 	### STEP 2: do the pointer-analysis 
 
 	# handle ThisStatement in events
-	query="""
-	MATCH (this_st {Id: '%s'})<-[:AST_parentOf*1..10]-(n {Type: 'FunctionExpression'})<-[r:ERDG]-(top_node)
-	RETURN r
-	"""%this_expression_node_id
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_event_handler', id=this_expression_node_id)
 	for item in results:
 		relation = item['r']
 		out['events'].append({'relation': relation}) # r['args'].split('___')[1] = id of the node that `this` refers to it
@@ -245,22 +313,9 @@ def get_this_pointer_resolution(tx, this_node):
 
 	# handle ThisStatement in functions (may resolve to global object, i.e., window, or to the owner object, if they are lator assigned to a member expression)
 	# assignment expr, or var declaration:    										   (right/init)		assign_expr/declarator
-	query="""
-		MATCH (this_st { Id: '%s'})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf]-(expr)-[r:AST_parentOf]->(function_name), (expr)<-[:AST_parentOf]-(top)
-		WHERE r.Type= 'left' OR r.Type= 'id'
-		OPTIONAL MATCH (p1 {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'right'}]->(c1 {Type: 'Identifier', Value: function_name.Code}), 
-		(p1)-[:AST_parentOf {RelationType: 'left'}]->(c2 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(owner {Type: 'Identifier'})
-		OPTIONAL MATCH (function_name)-[:AST_parentOf {RelationTYpe: 'object'}]->(true_owner {Type: 'Identifier'})
-		RETURN
-		CASE function_name.Type
-		WHEN 'Identifier' THEN [top, function_name, owner]
-		WHEN 'MemberExpression' THEN [top, true_owner]
-		ELSE 'xx'
-		END
-	"""%this_expression_node_id
 	# if owner is null,  then `this` refers to global object: the window
 	# if owner is not null, `this` referes to the owner
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_assigned_function', id=this_expression_node_id)
 	for item in results:
 		if 'true_owner' in item:
 			owner = item['true_owner']
@@ -277,16 +332,7 @@ def get_this_pointer_resolution(tx, this_node):
 				out['methods'].append({'top': top, 'owner': owner})
 
 	## handle the object expression case
-	query="""
-	MATCH (this_st {Id: '%s'})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'value'}]-(prop {Type: 'Property'})<-[:AST_parentOf {RelationType: 'properties'}]-(expr {Type: 'ObjectExpression'})<-[r:AST_parentOf]-(t)<-[:AST_parentOf]-(tt)
-	WHERE (r.RelationType= 'right' OR r.RelationType= 'init' OR r.RelationType = 'arguments')
-	AND (t.Type = 'AssignmentExpression' OR t.Type='VariableDeclarator' OR t.Type= 'CallExpression')
-	AND (tt.Type = 'ExpressionStatement' OR tt.Type='VariableDeclaration')
-	OPTIONAL MATCH (t)-[r2:AST_parentOf]->(c1 {Type: 'Identifier'}) WHERE r2.RelationType = 'left' OR r2.RelationType = 'id'
-	OPTIONAL MATCH (t)-[:AST_parentOf]->(c3)-[AST_parentOf {RelationType: 'object'}]->(c2 {Type: 'Identifier'})
-	RETURN tt, c2, c1
-	"""%this_expression_node_id
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_object_expression', id=this_expression_node_id)
 	for item in results:
 		owner = item['c2']
 		top = item['tt']
@@ -296,12 +342,7 @@ def get_this_pointer_resolution(tx, this_node):
 			out['methods'].append({'top': top, 'owner': owner})
 
 
-	query="""
-	MATCH (this_st { Id: '%s'})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'arguments'}]-(top_call_expression)-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(the_event_target_top),
-	(member_expr)-[:AST_parentOf {RelationType: 'property'}]->(prop {Type: 'Identifier', Code: 'on'}), (top_call_expression)<-[:AST_parentOf]-(top)
-	RETURN the_event_target_top, top
-	"""%this_expression_node_id
-	results = tx.run(query)
+	results = QC.run_query(tx, 'this_in_event_target_callback', id=this_expression_node_id)
 	for item in results:
 		owner = item['the_event_target_top']
 		top = item['top']
@@ -315,28 +356,16 @@ def get_this_pointer_resolution(tx, this_node):
 			owner_node = element['owner']
 			if owner_node == constantsModule.WINDOW_GLOBAL_OBJECT:
 				top_node_id= top_node['Id']
-				build_relationship_query="""
-				MATCH (this_node { Id: '%s'}), (top_node { Id: '%s'}))
-				CREATE (this_node)-[:pointsTo {RelationType: 'top', Arguments: 'pointsTo=window'}]->(top_node)
-				"""%(this_expression_node_id)
+				QC.run_query(tx, 'create_this_points_to_window', id=this_expression_node_id, top_id=top_node_id)
 			else:
 				top_node_id = top_node['Id']
 				owner_node_id = owner_node['Id']
-				build_relationship_query="""
-				MATCH (this_node { Id: '%s'}), (top_node { Id: '%s'}), (owner_node { Id: '%s'})
-				CREATE (this_node)-[:pointsTo {RelationType: 'top'}]->(top_node)
-				CREATE (this_node)-[:pointsTo {RelationType: 'owner'}]->(owner_node)
-				"""%(this_expression_node_id, top_node_id, owner_node_id)
-			tx.run(build_relationship_query)
+				QC.run_query(tx, 'create_this_points_to_owner_object', id=this_expression_node_id, top_id=top_node_id, owner_id=owner_node_id)
 
 	if len(out['events']) > 0:
 		for element in out['events']:
 			owner_node_id = item['Arguments'].split('___')[1]
-			build_relationship_query="""
-			MATCH (this_node { Id: '%s'}), (owner_node { Id: '%s'})
-			CREATE (this_node)-[:pointsTo {RelationType: 'owner', Arguments: 'pointsTo=eventSelector'}]->(owner_node)
-			"""%(this_expression_node_id, owner_node_id)
-			tx.run(build_relationship_query)
+			QC.run_query(tx, 'create_this_points_to_event_selector', id=this_expression_node_id, owner_id=owner_node_id)
 
 	### ---- END STEP 2 ---- ###
 
@@ -353,40 +382,21 @@ def is_variable_a_function_argument_in_current_scope(tx, varname, varname_nid):
 	"""
 
 	# Case 1: Function Expression as Variable Decleration, e.g., var f = function(varname) { ... }
-	query1 = """
-	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'id'}]-(vd {Type: 'VariableDeclarator'})-[:AST_parentOf {RelationType: 'init'}]->(n {Type:'FunctionExpression'})-[:AST_parentOf {RelationType: 'params'}]-(arg { Type:'Identifier', Code: '%s'}),
-	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable { Id:'%s', Type:'Identifier', Code: '%s'}) 
-	RETURN distinct(n) as top, fname
-	"""%(varname, varname_nid, varname)
-
-	# Case 2: Function Expression as Dictionary Key, e.g., f: function(varname) { ... }
-	query2 = """
-	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'key'}]-(vd {Type: 'Property'})-[:AST_parentOf {RelationType: 'value'}]->(n {Type:'FunctionExpression'})-[:AST_parentOf {RelationType: 'params'}]-(arg { Type:'Identifier', Code: '%s'}),
-	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable { Id:'%s', Type:'Identifier', Code: '%s'}) 
-	RETURN distinct(n) as top, fname
-	"""%(varname, varname_nid, varname)
-
-	# Case 3: Function Declaration, e.g., function f(varname) { ...}
-	query3 = """
-	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'id'}]-(n {Type:'FunctionDeclaration'})-[:AST_parentOf {RelationType: 'params'}]-(arg { Type:'Identifier', Code: '%s'}),
-	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable { Id:'%s', Type:'Identifier', Code: '%s'}) 
-	RETURN distinct(n) as top, fname
-	"""%(varname, varname_nid, varname)
-
-
-	res = tx.run(query1)   # queries should only find one function!
+	res = QC.run_query(tx, 'function_param_in_variable_declarator', id=varname_nid, varname=varname)   # queries should only find one function!
 	for item in res:
 		fn1 = item['top']
 		func_name_node = item['fname']
 		return [True, fn1, func_name_node]
 
-	res = tx.run(query2)
+	# Case 2: Function Expression as Dictionary Key, e.g., f: function(varname) { ... }
+	res = QC.run_query(tx, 'function_param_in_property', id=varname_nid, varname=varname)
 	for item in res:
 		fn2 = item['top']
 		func_name_node = item['fname']
 		return [True, fn2, func_name_node]
 
-	res = tx.run(query3)
+	# Case 3: Function Declaration, e.g., function f(varname) { ...}
+	res = QC.run_query(tx, 'function_param_in_function_declaration', id=varname_nid, varname=varname)
 	for item in res:
 		fn3 = item['top']
 		func_name_node = item['fname']
@@ -434,12 +444,7 @@ def get_function_call_values_of_function_definitions(tx, function_def_node):
 	"""
 
 	out = {}
-	query = """
-	MATCH (param)<-[:AST_parentOf {RelationType: 'params'}]-(functionDef { Id: '%s' })<-[r:CG_parentOf]-(caller {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'arguments'}]-> (arg) RETURN collect(distinct param) as params, caller, collect(distinct arg) AS args, collect(distinct r.Arguments) as arguments
-	"""%(function_def_node['Id'])
-
-
-	results = tx.run(query)
+	results = QC.run_query(tx, 'function_call_values', id=function_def_node['Id'])
 	for each_binding in results:
 		call_expression = each_binding['caller']
 		args = each_binding['args']
@@ -510,10 +515,7 @@ def get_function_call_values_of_function_definitions(tx, function_def_node):
 
 def check_if_function_has_param(tx, varname, func_def_node):
 
-	query="""
-	MATCH (n { Id: '%s'})-[:AST_parentOf {RelationType: 'params'}]-(arg) RETURN collect(distinct arg) as args
-	"""%(func_def_node['Id'])
-	results = tx.run(query)
+	results = QC.run_query(tx, 'function_params', id=func_def_node['Id'])
 	for item in results:
 		args = item['args']
 		arg_values = [get_value_of_identifer_or_literal(node)[0] for node in args]
@@ -531,10 +533,7 @@ def get_non_anonymous_call_expr_top_node(tx, call_expr):
 	@param {node} call_expr
 	@return VariableDeclaration or ExpressionStatemnet node
 	"""
-	query = """
-	MATCH (n)-[:AST_parentOf]->(callExpr { Id: '%s', Type: 'CallExpression'}) RETURN n
-	"""%(call_expr['Id'])
-	results = tx.run(query)
+	results = QC.run_query(tx, 'call_expression_parent', id=call_expr['Id'])
 	for item in results:
 		top_level = item['n']
 		return top_level
@@ -544,10 +543,7 @@ def get_function_def_of_block_stmt(tx, block_stmt_node):
 	"""
 	gets the function definition of a block statement node
 	"""
-	query = """
-	MATCH (funcDef)-[:AST_parentOf {RelationType: 'body'}]->(blockSt { Id: '%s', Type: 'BlockStatement'}) RETURN funcDef
-	"""%(block_stmt_node['Id'])
-	results = tx.run(query)
+	results = QC.run_query(tx, 'block_statement_function_body', id=block_stmt_node['Id'])
 	for record in results:
 		funcDef = record['funcDef']
 		return funcDef
@@ -556,264 +552,493 @@ def get_function_def_of_block_stmt(tx, block_stmt_node):
 
 
 
+def compute_backward_closure(tx, seeds, slicing_cache):
+	"""
+	Description:
+	------------
+	computes the backward PDG closure of many (statement, varname) pairs together, e.g., of all sinks of a page,
+	with one query per PDG level for the whole frontier, and stores the PDG parents and statement subtrees in the
+	slicing cache; the slices of the seeds with `_get_varname_value_from_context()` are then answered from it.
+
+	@param tx {pointer} neo4j transaction pointer
+	@param {list} seeds: pairs of (CFG-level statement node, varname)
+	@param {SlicingCache} slicing_cache: cache of the page under analysis
+	@return {int} number of (statement, varname) pairs in the closure
+	"""
+
+	max_nodes = int(constantsModule.MAX_SLICE_NODES)
+	visited = set()
+	frontier = []
+	for node, varname in seeds:
+		key = (node['Id'], varname)
+		if key not in visited and key not in slicing_cache.pdg_parents:
+			visited.add(key)
+			frontier.append(key)
+
+	while len(frontier):
+		results = QC.run_query(tx, 'pdg_parents_batch', pairs=[{'id': node_id, 'varname': varname} for node_id, varname in frontier])
+		parents = {}
+		for record in results:
+			parents[(record['id'], record['varname'])] = record['resultset']
+
+		statement_nodes = []
+		for key in frontier:
+			slicing_cache.pdg_parents[key] = parents.get(key, [])
+			statement_nodes.extend(n for n in parents.get(key, []) if n['Type'] not in ['Program', 'BlockStatement'])
+		statement_trees = _get_statement_trees(tx, statement_nodes, slicing_cache)
+
+		next_frontier = []
+		for node_id, varname in frontier:
+			for n in parents.get((node_id, varname), []):
+				if n['Id'] not in statement_trees:
+					continue
+				idents = QU.get_code_expression(statement_trees[n['Id']])[2]
+				for new_varname in idents:
+					if new_varname == varname or new_varname in constantsModule.JS_DEFINED_VARS:
+						continue
+					key = (n['Id'], new_varname)
+					if key in visited or key in slicing_cache.pdg_parents or len(visited) >= max_nodes:
+						continue
+					visited.add(key)
+					next_frontier.append(key)
+		frontier = next_frontier
+
+	return len(visited)
+
+
+
+def is_script_local_slice(tx, varname, context_node, slice_values, slicing_cache):
+	"""
+	Description:
+	------------
+	checks whether the slice of `varname` at the context node, as just computed with `_get_varname_value_from_context()`,
+	depends on the script of the context node only, i.e., whether it holds on any webpage that loads the same script.
+	this is the case when every variable of the slice resolves to at least one definition, all definitions lie in the
+	script of the context node, and the slice has no function arguments, `this` pointers or function definitions,
+	whose values may come from other scripts; the check is conservative and walks the PDG parents of the slicing cache
+	without any further query.
+
+	@param tx {pointer} neo4j transaction pointer
+	@param {string} varname
+	@param {dict} context_node: CFG-level statement of the slice
+	@param {list} slice_values: the slice of `varname` at the context node
+	@param {SlicingCache} slicing_cache: cache of the page under analysis, used for the slice
+	@return {bool}
+	"""
+
+	for line in slice_values:
+		code = line[0]
+		if 'scope-id=' in code or 'this-nid:' in code or constantsModule.FUNCTION_CALL_DEFINITION_BODY in code:
+			return False
+
+	program_index = QU.get_ast_program_index(tx)
+	program_id = program_index.get(context_node['Id'])
+	if program_id is None:
+		return False
+
+	visited = set()
+	stack = [(context_node['Id'], varname)]
+	while len(stack):
+		key = stack.pop()
+		if key in visited:
+			continue
+		visited.add(key)
+
+		# not expanded by the slice (e.g., cut short by the budgets), or an unresolved (possibly cross-script) variable
+		nodes = slicing_cache.pdg_parents.get(key)
+		if not nodes:
+			return False
+
+		for n in nodes:
+			if n['Type'] in ['Program', 'BlockStatement'] or program_index.get(n['Id']) != program_id:
+				return False
+			statement_tree = slicing_cache.statement_trees.get(n['Id'])
+			if statement_tree is None:
+				return False
+			idents = QU.get_code_expression(statement_tree)[2]
+			for new_varname in idents:
+				if new_varname == 'ThisExpression':
+					return False
+				if new_varname == key[1] or new_varname in constantsModule.JS_DEFINED_VARS:
+					continue
+				stack.append((n['Id'], new_varname))
+
+	return True
+
+
+
+def is_script_local_finding(tx, varname, context_node, finding, slicing_cache):
+	"""
+	Description:
+	------------
+	checks that a slice of the script cache, stored by another webpage that loads the same script, holds on the
+	webpage under analysis too: the other scripts of this webpage may define some of its (global) variables.
+	the PDG of the slice is fetched with `compute_backward_closure()`, and checked with `is_script_local_slice()`;
+	if all definitions lie in the (identical) script of the context node, the slice is the same as on the other webpage.
+
+	@param tx {pointer} neo4j transaction pointer
+	@param {string} varname
+	@param {dict} context_node: CFG-level statement of the slice
+	@param {dict} finding: the finding of the script cache, with the `slices` of `varname` at the context node
+	@param {SlicingCache} slicing_cache: cache of the page under analysis
+	@return {bool}
+	"""
+
+	compute_backward_closure(tx, [(context_node, varname)], slicing_cache)
+	return is_script_local_slice(tx, varname, context_node, finding["slices"], slicing_cache)
+
+
+
 ## ------------------------------------------------------------------------------- ## 
 ## Internal Functions
 ## ------------------------------------------------------------------------------- ## 
 
-@functools.lru_cache(maxsize=512)
-def _get_varname_value_from_context(tx, varname, context_node, PDG_on_variable_declarations_only=False, context_scope=''):
+def _get_varname_value_from_context(tx, varname, context_node, PDG_on_variable_declarations_only=False, context_scope='', slicing_cache=None):
 	"""
 	Description:
 	-------------
-	function for the data flow analysis
+	function for the data flow analysis; the backward slice is explored with an explicit stack of
+	`_slice_steps()` frames, where each (context node, varname, PDG_on_variable_declarations_only, context_scope)
+	is expanded at most once per slice, and the expansion stops at `constantsModule.MAX_RECURSE` nested frames
+	or `constantsModule.MAX_SLICE_NODES` expanded frames.
 	
 	@param tx {pointer} neo4j transaction pointer
 	@param {string} varname
 	@param {dict} context_node: node specifying the CFG-level statement where varname is defined
-	@param {bool} PDG_on_variable_declarations_only: internal val to keep state in recursions
-	@param {string} context_scope: internal val to keep context scope in recursions
+	@param {bool} PDG_on_variable_declarations_only: slice over the PDG relations of `VariableDeclaration` nodes only
+	@param {string} context_scope: context scope prefix of the slice lines
+	@param {SlicingCache} slicing_cache: cache of the page under analysis (a new one is used if not given)
 	@return {list}: a 2d list where each entry is of the following format
 		[program_slice, literals, dict of identifer mapped to identifer node is, location dict]
 	"""
 
+	if slicing_cache is None:
+		slicing_cache = SlicingCache()
 
-	## ------------------------------------------------------------------------------- ## 
-	## Globals and utility functions
-	## ------------------------------------------------------------------------------- ## 
+	max_depth = int(constantsModule.MAX_RECURSE)
+	max_nodes = int(constantsModule.MAX_SLICE_NODES)
+	# frame keys expanded in this slice
+	visited = set()
+	stack = []
 
-	# output
-	out_values = [] 
-	# stores a map: funcDef id -->> get_function_call_values_of_function_definitions(funcDef)
-	knowledge_database = {} 
-	# context node identifer
-	node_id = context_node['Id']
+	def _open_frame(varname, context_node, PDG_on_variable_declarations_only, context_scope):
+		"""
+		@return {list|dict}: the slice values, if known without expanding the frame, or a new frame
+		"""
+		if varname in slicing_cache.param_stack:
+			slicing_cache.cutoffs += 1
+			return []
+
+		key = (context_node['Id'], varname, PDG_on_variable_declarations_only, context_scope)
+		if key in visited:
+			slicing_cache.cutoffs += 1
+			return []
+
+		cached_values = slicing_cache.get(key)
+		if cached_values is not None:
+			visited.add(key)
+			return cached_values
+
+		if len(stack) >= max_depth or len(visited) >= max_nodes:
+			slicing_cache.cutoffs += 1
+			slicing_cache.truncated_slices += 1
+			return []
+
+		visited.add(key)
+		slicing_cache.param_stack.append(varname)
+		frame = {
+			'key': key,
+			'out_values': [],
+			# slices cut short by the recursion guard or the budgets depend on the call stack, and are not cached
+			'cutoffs': slicing_cache.cutoffs,
+		}
+		frame['steps'] = _slice_steps(tx, varname, context_node, PDG_on_variable_declarations_only, context_scope, frame['out_values'], slicing_cache)
+		return frame
+
+	param_stack_size = len(slicing_cache.param_stack)
+	root = _open_frame(varname, context_node, PDG_on_variable_declarations_only, context_scope)
+	if isinstance(root, list):
+		return root
+
+	stack.append(root)
+	try:
+		while len(stack):
+			frame = stack[-1]
+			try:
+				request = next(frame['steps'])
+			except StopIteration:
+				stack.pop()
+				slicing_cache.param_stack.pop()
+				if slicing_cache.cutoffs == frame['cutoffs']:
+					slicing_cache.put(frame['key'], frame['out_values'])
+				if len(stack):
+					stack[-1]['out_values'].extend(frame['out_values'])
+				continue
 
-	if param_stack_has(varname):
-		return []
+			child = _open_frame(*request)
+			if isinstance(child, list):
+				frame['out_values'].extend(child)
+			else:
+				stack.append(child)
+	finally:
+		# unwind the recursion guard if a query failed midway
+		del slicing_cache.param_stack[param_stack_size:]
 
-	param_stack_push(varname)
+	return root['out_values']
 
-	def _get_all_call_values_of(varname, func_def_node):
-		
-		key = func_def_node['Id']
-		if key in knowledge_database:
-			knowledge = knowledge_database[key]
-		else:
-			knowledge = get_function_call_values_of_function_definitions(tx, func_def_node)	
-			knowledge_database[key] = knowledge
 
-		ret = {}
-		for nid, values in knowledge.items():
-			if varname in values:
-				ret[nid] = values[varname]
 
-		return ret
+def _get_all_call_values_of(tx, varname, func_def_node, slicing_cache):
+	"""
+	@return {dict} the values of the parameter `varname` in the call expressions of the function definition
+	"""
+	
+	key = func_def_node['Id']
+	if key in slicing_cache.call_values:
+		knowledge = slicing_cache.call_values[key]
+	else:
+		knowledge = get_function_call_values_of_function_definitions(tx, func_def_node)	
+		slicing_cache.call_values[key] = knowledge
+
+	ret = {}
+	for nid, values in knowledge.items():
+		if varname in values:
+			ret[nid] = values[varname]
+
+	return ret
 
 
 
-	## ------------------------------------------------------------------------------- ## 
-	## Main logic 
-	## ------------------------------------------------------------------------------- ## 
+def _get_pdg_parents(tx, node_id, varname, PDG_on_variable_declarations_only, slicing_cache):
+	"""
+	@return {list} the nodes with a PDG relation on `varname` to the given node, from the backward closure if computed
+	"""
+
+	key = (node_id, varname)
+	if key in slicing_cache.pdg_parents:
+		nodes = slicing_cache.pdg_parents[key]
+		if PDG_on_variable_declarations_only:
+			return [n for n in nodes if n['Type'] == 'VariableDeclaration']
+		return nodes
 
 	if PDG_on_variable_declarations_only:
 		# for VariableDeclaration PDG relations
-		query = """
-		MATCH (n_s { Id: '%s' })<-[:PDG_parentOf { Arguments: '%s' }]-(n_t {Type: 'VariableDeclaration'}) RETURN collect(distinct n_t) AS resultset
-		"""%(node_id, varname)
+		results = QC.run_query(tx, 'pdg_parents_variable_declarations', id=node_id, varname=varname)
 	else:
 		# for all PDG relations
-		query = """
-		MATCH (n_s { Id: '%s' })<-[:PDG_parentOf { Arguments: '%s' }]-(n_t) RETURN collect(distinct n_t) AS resultset
-		"""%(node_id, varname)
-
-	results = tx.run(query)
-	for item in results: 
-		currentNodes = item['resultset'] 
-		
-		for iteratorNode in currentNodes:
-			if iteratorNode['Type'] == 'Program': continue
-
-			if iteratorNode['Type'] == 'BlockStatement': 
-				# the parameter 'varname' is a function argument
-
-				func_def_node = get_function_def_of_block_stmt(tx, iteratorNode) # check if func def has a varname parameter 
-				if func_def_node['Type'] in ['FunctionExpression', 'FunctionDeclaration', 'ArrowFunctionExpression']:
-
-					match_signature = check_if_function_has_param(tx, varname, func_def_node)
-					if match_signature:
-						if context_scope == '':
-							out = ['%s = %s'%(varname, constantsModule.LOCAL_ARGUMENT_TAG_FOR_FUNC),
-								  [],
-								  [varname],
-								  iteratorNode['Location']]
-						else:
-							out = ['%s %s = %s'%(context_scope, varname, constantsModule.LOCAL_ARGUMENT_TAG_FOR_FUNC),
-								  [],
-								  [varname],
-								  iteratorNode['Location']]					
-						out_values.append(out)
-						
-						varname_values_within_call_expressions = _get_all_call_values_of(varname, func_def_node)
-						for nid in varname_values_within_call_expressions:
-							each_argument = varname_values_within_call_expressions[nid]
-
-							location_line = _get_location_part(nid)
-
-							if each_argument['Type'] == 'Literal':
-								if context_scope == '':
-									out = ['%s <--(invocation-value)-- \"%s\"'%(varname, each_argument['Value']),
-										  [each_argument['Value']],
-										  [varname],
-										  location_line]
-								else:
-									out = ['%s %s <--(invocation-value)-- \"%s\"'%(context_scope, varname, each_argument['Value']),
-										  [each_argument['Value']],
-										  [varname],
-										  location_line]
+		results = QC.run_query(tx, 'pdg_parents', id=node_id, varname=varname)
 
-								out_values.append(out)
+	nodes = []
+	for item in results:
+		nodes = item['resultset']
+	if not PDG_on_variable_declarations_only:
+		slicing_cache.pdg_parents[key] = nodes
+	return nodes
 
-							elif each_argument['Type'] == 'Identifier':
 
-								call_expr_id = _get_node_id_part(nid)
-								# use this as an id to mark variables in this scope when doing def-use analsis
-								context_id_of_call_scope = '[scope-id=%s]'%call_expr_id  
 
-								if context_scope == '':
-									out = ['%s <--(invocation-value)-- [def-scope-id=%s] %s'%(varname, call_expr_id, each_argument['Value']),
-										  [],
-										  [varname, each_argument['Value']],
-										  location_line]
-								else:
-									out = ['%s %s <--(invocation-value)-- [def-scope-id=%s] %s'%(context_scope, varname, call_expr_id, each_argument['Value']),
-											  [],
-											  [varname, each_argument['Value']],
-											  location_line]
+def _get_statement_trees(tx, statement_nodes, slicing_cache):
+	"""
+	@return {dict} statement id -->> AST subtree of the statement (see `QU.getChildsOf()`), fetched once per page
+	"""
 
-								out_values.append(out)
+	statement_trees = {}
+	missing_nodes = []
+	for n in statement_nodes:
+		if n['Id'] in slicing_cache.statement_trees:
+			statement_trees[n['Id']] = slicing_cache.statement_trees[n['Id']]
+		else:
+			missing_nodes.append(n)
 
-								
-								# top_level_of_call_expr = get_non_anonymous_call_expr_top_node(tx, {'Id': call_expr_id})
-								top_level_of_call_expr = QU.get_ast_topmost(tx, {'Id': call_expr_id})
-								recurse= _get_varname_value_from_context(tx, each_argument['Value'], top_level_of_call_expr, context_scope=context_id_of_call_scope)
-								out_values.extend(recurse)
+	# kept in the returned dict too, as the bounded cache may already have evicted them
+	for statement_tree in QU.getChildsOfMany(tx, missing_nodes):
+		statement_trees[statement_tree['node']['Id']] = statement_tree
+		slicing_cache.statement_trees[statement_tree['node']['Id']] = statement_tree
 
-							elif each_argument['Type'] == 'MemberExpression':
+	return statement_trees
 
-								call_expr_id = _get_node_id_part(nid)
-								context_id_of_call_scope = '[scope-id=%s]'%call_expr_id  
 
-								if context_scope == '':
-									out = ['%s <--(invocation-value)-- [def-scope-id=%s] %s'%(varname, call_expr_id, each_argument['Value']),
-										  [],
-										  [varname, each_argument['Value']],
-										  location_line]
-								else:
-									out = ['%s %s <--(invocation-value)-- [def-scope-id=%s] %s'%(context_scope, varname, call_expr_id, each_argument['Value']),
-											  [],
-											  [varname, each_argument['Value']],
-											  location_line]						
-								out_values.append(out)	
-
-								# PDG on member expressions-> do PDG on the top most parent of it!
-								top_most = each_argument['Value'].split('.')[0]
-								call_expr_id = _get_node_id_part(nid)
-								# top_level_of_call_expr = get_non_anonymous_call_expr_top_node(tx, {'Id': call_expr_id})
-								top_level_of_call_expr = QU.get_ast_topmost(tx, {'Id': call_expr_id})
-								recurse= _get_varname_value_from_context(tx, top_most, top_level_of_call_expr, context_scope=context_id_of_call_scope)
-								out_values.extend(recurse)
-
-							elif each_argument['Type'] == 'ObjectExpression':
-								
-								call_expr_id = _get_node_id_part(nid)
-								context_id_of_call_scope = '[scope-id=%s]'%call_expr_id  
 
-								if context_scope == '':
-									out = ['%s <--(invocation-value)-- [def-scope-id=%s] %s'%(varname, call_expr_id, each_argument['Value']),
+def _slice_steps(tx, varname, context_node, PDG_on_variable_declarations_only, context_scope, out_values, slicing_cache):
+	"""
+	Description:
+	-------------
+	a frame of `_get_varname_value_from_context()`: appends the slice lines of `varname` at the context node to 
+	`out_values`, and yields the arguments of each sub-slice, i.e., (varname, context node, PDG_on_variable_declarations_only, context_scope),
+	whose lines are appended to `out_values` before the frame is resumed
+	"""
+
+	# context node identifer
+	node_id = context_node['Id']
+
+	currentNodes = _get_pdg_parents(tx, node_id, varname, PDG_on_variable_declarations_only, slicing_cache)
+
+	# fetch the AST subtrees of all PDG predecessor statements at once
+	statement_trees = _get_statement_trees(tx, [n for n in currentNodes if n['Type'] not in ['Program', 'BlockStatement']], slicing_cache)
+
+	for iteratorNode in currentNodes:
+		if iteratorNode['Type'] == 'Program': continue
+
+		if iteratorNode['Type'] == 'BlockStatement': 
+			# the parameter 'varname' is a function argument
+
+			func_def_node = get_function_def_of_block_stmt(tx, iteratorNode) # check if func def has a varname parameter 
+			if func_def_node['Type'] in ['FunctionExpression', 'FunctionDeclaration', 'ArrowFunctionExpression']:
+
+				match_signature = check_if_function_has_param(tx, varname, func_def_node)
+				if match_signature:
+					if context_scope == '':
+						out = ['%s = %s'%(varname, constantsModule.LOCAL_ARGUMENT_TAG_FOR_FUNC),
+							  [],
+							  [varname],
+							  iteratorNode['Location']]
+					else:
+						out = ['%s %s = %s'%(context_scope, varname, constantsModule.LOCAL_ARGUMENT_TAG_FOR_FUNC),
+							  [],
+							  [varname],
+							  iteratorNode['Location']]					
+					out_values.append(out)
+					
+					varname_values_within_call_expressions = _get_all_call_values_of(tx, varname, func_def_node, slicing_cache)
+					for nid in varname_values_within_call_expressions:
+						each_argument = varname_values_within_call_expressions[nid]
+
+						location_line = _get_location_part(nid)
+
+						if each_argument['Type'] == 'Literal':
+							if context_scope == '':
+								out = ['%s <--(invocation-value)-- \"%s\"'%(varname, each_argument['Value']),
+									  [each_argument['Value']],
+									  [varname],
+									  location_line]
+							else:
+								out = ['%s %s <--(invocation-value)-- \"%s\"'%(context_scope, varname, each_argument['Value']),
+									  [each_argument['Value']],
+									  [varname],
+									  location_line]
+
+							out_values.append(out)
+
+						elif each_argument['Type'] == 'Identifier':
+
+							call_expr_id = _get_node_id_part(nid)
+							# use this as an id to mark variables in this scope when doing def-use analsis
+							context_id_of_call_scope = '[scope-id=%s]'%call_expr_id  
+
+							if context_scope == '':
+								out = ['%s <--(invocation-value)-- [def-scope-id=%s] %s'%(varname, call_expr_id, each_argument['Value']),
+									  [],
+									  [varname, each_argument['Value']],
+									  location_line]
+							else:
+								out = ['%s %s <--(invocation-value)-- [def-scope-id=%s] %s'%(context_scope, varname, call_expr_id, each_argument['Value']),
 										  [],
 										  [varname, each_argument['Value']],
 										  location_line]
-								else:
-									out = ['%s %s <--(invocation-value)-- [def-scope-id=%s] %s'%(context_scope, varname, call_expr_id, each_argument['Value']),
-											  [],
-											  [varname, each_argument['Value']],
-											  location_line]
 
-								out_values.append(out)	
-
-								additional_identifiers = each_argument['ResolveIdentifiers']
-								if additional_identifiers is not None:
-									for each_additional_identifier in additional_identifiers:
-										# top_level_of_call_expr = get_non_anonymous_call_expr_top_node(tx, {'Id': call_expr_id})
-										top_level_of_call_expr = QU.get_ast_topmost(tx, {'Id': call_expr_id})
-										recurse= _get_varname_value_from_context(tx, each_additional_identifier, top_level_of_call_expr, context_scope=context_id_of_call_scope)
-										out_values.extend(recurse)	
-							else: 
-								# expression statements, call expressions (window.location.replace(), etc)
-								if context_scope == '':
-									out = ['%s <--(invocation-value)-- %s'%(varname, each_argument['Value']),
+							out_values.append(out)
+
+							
+							# top_level_of_call_expr = get_non_anonymous_call_expr_top_node(tx, {'Id': call_expr_id})
+							top_level_of_call_expr = QU.get_ast_topmost(tx, {'Id': call_expr_id})
+							yield (each_argument['Value'], top_level_of_call_expr, False, context_id_of_call_scope)
+						elif each_argument['Type'] == 'MemberExpression':
+
+							call_expr_id = _get_node_id_part(nid)
+							context_id_of_call_scope = '[scope-id=%s]'%call_expr_id  
+
+							if context_scope == '':
+								out = ['%s <--(invocation-value)-- [def-scope-id=%s] %s'%(varname, call_expr_id, each_argument['Value']),
+									  [],
+									  [varname, each_argument['Value']],
+									  location_line]
+							else:
+								out = ['%s %s <--(invocation-value)-- [def-scope-id=%s] %s'%(context_scope, varname, call_expr_id, each_argument['Value']),
 										  [],
 										  [varname, each_argument['Value']],
-										  location_line]
-									
-								else:
-									out = ['%s %s <--(invocation-value)-- %s'%(context_scope, varname, each_argument['Value']),
+										  location_line]						
+							out_values.append(out)	
+
+							# PDG on member expressions-> do PDG on the top most parent of it!
+							top_most = each_argument['Value'].split('.')[0]
+							call_expr_id = _get_node_id_part(nid)
+							# top_level_of_call_expr = get_non_anonymous_call_expr_top_node(tx, {'Id': call_expr_id})
+							top_level_of_call_expr = QU.get_ast_topmost(tx, {'Id': call_expr_id})
+							yield (top_most, top_level_of_call_expr, False, context_id_of_call_scope)
+						elif each_argument['Type'] == 'ObjectExpression':
+							
+							call_expr_id = _get_node_id_part(nid)
+							context_id_of_call_scope = '[scope-id=%s]'%call_expr_id  
+
+							if context_scope == '':
+								out = ['%s <--(invocation-value)-- [def-scope-id=%s] %s'%(varname, call_expr_id, each_argument['Value']),
+									  [],
+									  [varname, each_argument['Value']],
+									  location_line]
+							else:
+								out = ['%s %s <--(invocation-value)-- [def-scope-id=%s] %s'%(context_scope, varname, call_expr_id, each_argument['Value']),
 										  [],
 										  [varname, each_argument['Value']],
 										  location_line]
 
-								out_values.append(out)				
+							out_values.append(out)	
 
-
-
-							## ThisExpression Pointer Analysis
-							## NOTE: this code block must be executed for ALL branches, so we have to place it outside of all conditional branches
 							additional_identifiers = each_argument['ResolveIdentifiers']
 							if additional_identifiers is not None:
-								if 'ThisExpression' in additional_identifiers:
-									this_expression_node_id = additional_identifiers['ThisExpression']
-									pointer_resolutions = get_this_pointer_resolution(tx, {'Id': this_expression_node_id })
-									for item in pointer_resolutions['methods']:
-										owner_item = item['owner']
-										owner_top = item['top']
-										tree_owner = QU.getChildsOf(tx, owner_item)
-										tree_owner_exp = QU.get_code_expression(tree_owner)[0]
-										location_line = owner_item['Location']
-										out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope,tree_owner_exp, this_expression_node_id)
-										out = [out_line.lstrip(),
-											  [],
-											  [tree_owner_exp[0]],
-											  location_line]
-										out_values.append(out)
-
-										# def-use analysis over resolved `this` pointer
-										if owner_item != '' and owner_item is not None and owner_item!= constantsModule.WINDOW_GLOBAL_OBJECT and owner_item['Type'] == 'Identifier':
-											recurse_values = _get_varname_value_from_context(tx, tree_owner_exp, owner_top, PDG_on_variable_declarations_only=True)
-											out_values.extend(recurse_values)
-
-
-									# handle `this` that resolves to DOM elements in events 
-									for element in pointer_resolutions['events']:
-										if 'relation' in element:
-											# fetched via analysis
-											item = element['relation']
-											target_node_id = item['Arguments'].split('___')[1]
-											if target_node_id == 'xx': 
-												continue
-											else:
-												tree_owner = QU.getChildsOf({'Id': target_node_id})
-												tree_owner_exp = QU.get_code_expression(tree_owner)
-												location_line = tree_owner['Location']
-												out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope, tree_owner_exp, this_expression_node_id)
-												out = [out_line.lstrip(),
-													  [],
-													  [tree_owner_exp],
-													  location_line]
-												out_values.append(out) 
+								for each_additional_identifier in additional_identifiers:
+									# top_level_of_call_expr = get_non_anonymous_call_expr_top_node(tx, {'Id': call_expr_id})
+									top_level_of_call_expr = QU.get_ast_topmost(tx, {'Id': call_expr_id})
+									yield (each_additional_identifier, top_level_of_call_expr, False, context_id_of_call_scope)
+						else: 
+							# expression statements, call expressions (window.location.replace(), etc)
+							if context_scope == '':
+								out = ['%s <--(invocation-value)-- %s'%(varname, each_argument['Value']),
+									  [],
+									  [varname, each_argument['Value']],
+									  location_line]
+								
+							else:
+								out = ['%s %s <--(invocation-value)-- %s'%(context_scope, varname, each_argument['Value']),
+									  [],
+									  [varname, each_argument['Value']],
+									  location_line]
+
+							out_values.append(out)				
+
+
+
+						## ThisExpression Pointer Analysis
+						## NOTE: this code block must be executed for ALL branches, so we have to place it outside of all conditional branches
+						additional_identifiers = each_argument['ResolveIdentifiers']
+						if additional_identifiers is not None:
+							if 'ThisExpression' in additional_identifiers:
+								this_expression_node_id = additional_identifiers['ThisExpression']
+								pointer_resolutions = get_this_pointer_resolution(tx, {'Id': this_expression_node_id })
+								for item in pointer_resolutions['methods']:
+									owner_item = item['owner']
+									owner_top = item['top']
+									tree_owner = QU.getChildsOf(tx, owner_item)
+									tree_owner_exp = QU.get_code_expression(tree_owner)[0]
+									location_line = owner_item['Location']
+									out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope,tree_owner_exp, this_expression_node_id)
+									out = [out_line.lstrip(),
+										  [],
+										  [tree_owner_exp[0]],
+										  location_line]
+									out_values.append(out)
+
+									# def-use analysis over resolved `this` pointer
+									if owner_item != '' and owner_item is not None and owner_item!= constantsModule.WINDOW_GLOBAL_OBJECT and owner_item['Type'] == 'Identifier':
+										yield (tree_owner_exp, owner_top, True, '')
+								# handle `this` that resolves to DOM elements in events 
+								for element in pointer_resolutions['events']:
+									if 'relation' in element:
+										# fetched via analysis
+										item = element['relation']
+										target_node_id = item['Arguments'].split('___')[1]
+										if target_node_id == 'xx': 
+											continue
 										else:
-											# fetched from DB
-											item = element['owner']
-											target_node_id = item['Id']		
 											tree_owner = QU.getChildsOf({'Id': target_node_id})
 											tree_owner_exp = QU.get_code_expression(tree_owner)
 											location_line = tree_owner['Location']
@@ -822,73 +1047,70 @@ def _get_varname_value_from_context(tx, varname, context_node, PDG_on_variable_d
 												  [],
 												  [tree_owner_exp],
 												  location_line]
-											out_values.append(out) 				
-
-
-				continue
-
-
-			tree = QU.getChildsOf(tx, iteratorNode)
-			contextNode = tree['node']
-			if contextNode['Id'] == constantsModule.PROGRAM_NODE_INDEX: 
-				continue
-
-			if contextNode['Type'] == "Program":
-				continue
-
-			ex = QU.get_code_expression(tree)
-			loc = iteratorNode['Location']
-			[code_expr, literals, idents] = ex
-			if context_scope != '':
-				code_expr = context_scope + '  ' + code_expr 
-			out_values.append([code_expr, literals, idents, loc])
-			new_varnames = list(set((list(idents)))) # get unique vars
-
-			# handle `this` expressions
-			if 'ThisExpression' in new_varnames:
-				this_expression_node_id = idents['ThisExpression']
-				pointer_resolutions = get_this_pointer_resolution(tx, {'Id': this_expression_node_id })
-				for item in pointer_resolutions['methods']:
-					owner_item = item['owner']
-					owner_top = item['top']
-					tree_owner = QU.getChildsOf(tx, owner_item)
-					tree_owner_exp = QU.get_code_expression(tree_owner)[0]
-					location_line = owner_item['Location']
-					out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope, tree_owner_exp, this_expression_node_id)
-					out = [out_line.lstrip(),
-						  [],
-						  [tree_owner_exp[0]],
-						  location_line]
-					out_values.append(out)
-
-					# def-use analysis over resolved `this` pointer
-					if owner_item != '' and owner_item is not None and owner_item!= constantsModule.WINDOW_GLOBAL_OBJECT and owner_item['Type'] == 'Identifier':
-						recurse_values = _get_varname_value_from_context(tx, tree_owner_exp, owner_top, PDG_on_variable_declarations_only=True)
-						out_values.extend(recurse_values)
-
-
-				# handle `this` that resolves to DOM elements in events 
-				for element in pointer_resolutions['events']:
-					if 'relation' in element:
-						# fetched via analysis
-						item = element['relation']
-						target_node_id = item['Arguments'].split('___')[1]
-						if target_node_id == 'xx': 
-							continue
-						else:
-							tree_owner = QU.getChildsOf({'Id': target_node_id})
-							tree_owner_exp = QU.get_code_expression(tree_owner)
-							location_line = tree_owner['Location']
-							out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope, tree_owner_exp, this_expression_node_id)
-							out = [out_line.lstrip(),
-								  [],
-								  [tree_owner_exp],
-								  location_line]
-							out_values.append(out) 
+											out_values.append(out) 
+									else:
+										# fetched from DB
+										item = element['owner']
+										target_node_id = item['Id']		
+										tree_owner = QU.getChildsOf({'Id': target_node_id})
+										tree_owner_exp = QU.get_code_expression(tree_owner)
+										location_line = tree_owner['Location']
+										out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope, tree_owner_exp, this_expression_node_id)
+										out = [out_line.lstrip(),
+											  [],
+											  [tree_owner_exp],
+											  location_line]
+										out_values.append(out) 				
+
+
+			continue
+
+
+		tree = statement_trees[iteratorNode['Id']]
+		contextNode = tree['node']
+		if contextNode['Id'] == constantsModule.PROGRAM_NODE_INDEX: 
+			continue
+
+		if contextNode['Type'] == "Program":
+			continue
+
+		ex = QU.get_code_expression(tree)
+		loc = iteratorNode['Location']
+		[code_expr, literals, idents] = ex
+		if context_scope != '':
+			code_expr = context_scope + '  ' + code_expr 
+		out_values.append([code_expr, literals, idents, loc])
+		new_varnames = list(set((list(idents)))) # get unique vars
+
+		# handle `this` expressions
+		if 'ThisExpression' in new_varnames:
+			this_expression_node_id = idents['ThisExpression']
+			pointer_resolutions = get_this_pointer_resolution(tx, {'Id': this_expression_node_id })
+			for item in pointer_resolutions['methods']:
+				owner_item = item['owner']
+				owner_top = item['top']
+				tree_owner = QU.getChildsOf(tx, owner_item)
+				tree_owner_exp = QU.get_code_expression(tree_owner)[0]
+				location_line = owner_item['Location']
+				out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope, tree_owner_exp, this_expression_node_id)
+				out = [out_line.lstrip(),
+					  [],
+					  [tree_owner_exp[0]],
+					  location_line]
+				out_values.append(out)
+
+				# def-use analysis over resolved `this` pointer
+				if owner_item != '' and owner_item is not None and owner_item!= constantsModule.WINDOW_GLOBAL_OBJECT and owner_item['Type'] == 'Identifier':
+					yield (tree_owner_exp, owner_top, True, '')
+			# handle `this` that resolves to DOM elements in events 
+			for element in pointer_resolutions['events']:
+				if 'relation' in element:
+					# fetched via analysis
+					item = element['relation']
+					target_node_id = item['Arguments'].split('___')[1]
+					if target_node_id == 'xx': 
+						continue
 					else:
-						# fetched from DB
-						item = element['owner']
-						target_node_id = item['Id']		
 						tree_owner = QU.getChildsOf({'Id': target_node_id})
 						tree_owner_exp = QU.get_code_expression(tree_owner)
 						location_line = tree_owner['Location']
@@ -898,48 +1120,52 @@ def _get_varname_value_from_context(tx, varname, context_node, PDG_on_variable_d
 							  [tree_owner_exp],
 							  location_line]
 						out_values.append(out) 
+				else:
+					# fetched from DB
+					item = element['owner']
+					target_node_id = item['Id']		
+					tree_owner = QU.getChildsOf({'Id': target_node_id})
+					tree_owner_exp = QU.get_code_expression(tree_owner)
+					location_line = tree_owner['Location']
+					out_line = '%s this --(points-to)--> %s [this-nid: %s]'%(context_scope, tree_owner_exp, this_expression_node_id)
+					out = [out_line.lstrip(),
+						  [],
+						  [tree_owner_exp],
+						  location_line]
+					out_values.append(out) 
+
+
+		# main recursion flow
+		for new_varname in new_varnames:
+			if new_varname == varname or new_varname in constantsModule.JS_DEFINED_VARS: continue
+
+			# check if new_varname is a function call
+			# i.e., it has a `callee` relation to a parent of type `CallExpression`
+			new_varname_id = idents[new_varname]
+			call_definition_result = QC.run_query(tx, 'callee_call_definitions', id=new_varname_id)
+			is_func_call = False
+			for definition in call_definition_result:
+				item = definition['call_definition']
+				if item is not None:
+					is_func_call = True
+					wrapper_node_function_definition = QU.getChildsOf(tx, item)
+					ce_function_definition = QU.get_code_expression(wrapper_node_function_definition)
+					location_function_definition = item['Location']
+					body = ce_function_definition[0]
+					body = jsbeautifier.beautify(body)
+					out_line = """%s `%s` is %s\n\t\t\t %s"""%(context_scope, new_varname, constantsModule.FUNCTION_CALL_DEFINITION_BODY, body)
+					out = [out_line.strip(),
+						  [],
+						  [],
+						  location_function_definition]
+					if out not in out_values:
+						# avoid returning/printing twice
+						out_values.append(out)
 
+			if is_func_call:
+				continue
 
-			# main recursion flow
-			for new_varname in new_varnames:
-				if new_varname == varname or new_varname in constantsModule.JS_DEFINED_VARS: continue
-
-				# check if new_varname is a function call
-				# i.e., it has a `callee` relation to a parent of type `CallExpression`
-				new_varname_id = idents[new_varname]
-				check_function_call_query="""
-				MATCH (n { Id: '%s' })<-[:AST_parentOf {RelationType: 'callee'}]-(fn_call {Type: 'CallExpression'})-[:CG_parentOf]->(call_definition)
-				RETURN call_definition
-				"""%(new_varname_id)
-				call_definition_result = tx.run(check_function_call_query)
-				is_func_call = False
-				for definition in call_definition_result:
-					item = definition['call_definition']
-					if item is not None:
-						is_func_call = True
-						wrapper_node_function_definition = QU.getChildsOf(tx, item)
-						ce_function_definition = QU.get_code_expression(wrapper_node_function_definition)
-						location_function_definition = item['Location']
-						body = ce_function_definition[0]
-						body = jsbeautifier.beautify(body)
-						out_line = """%s `%s` is %s\n\t\t\t %s"""%(context_scope, new_varname, constantsModule.FUNCTION_CALL_DEFINITION_BODY, body)
-						out = [out_line.strip(),
-							  [],
-							  [],
-							  location_function_definition]
-						if out not in out_values:
-							# avoid returning/printing twice
-							out_values.append(out)
-
-				if is_func_call:
-					continue
-
-				v = _get_varname_value_from_context(tx, new_varname, contextNode, context_scope = context_scope)
-				out_values.extend(v)	
-
-
-	param_stack_pop()
-	return out_values
+			yield (new_varname, contextNode, False, context_scope)
 
 
 
@@ -20,6 +20,8 @@
 	
 """
 
+import hpg_neo4j.query_catalog as QC
+
 class HttpRequestSinkExpressions:
 
 	@staticmethod
@@ -30,14 +32,7 @@ class HttpRequestSinkExpressions:
 		@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the xhr.open() function
 		"""
 
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
-		(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-		WHERE callee.Code= 'window'
-		RETURN t, n, a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'window_open_calls')
 		return results
 
 	@staticmethod
@@ -48,14 +43,7 @@ class HttpRequestSinkExpressions:
 		@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the xhr.open() function
 		"""
 
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
-		(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		WHERE callee.Code <> 'window'
-		RETURN t, n, a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'xhr_open_calls')
 		return results
 
 
@@ -67,12 +55,7 @@ class HttpRequestSinkExpressions:
 		@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the fetch() function
 		"""
 
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}), 
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-		RETURN t, n, a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'fetch_calls')
 		return results
 
 
@@ -85,7 +68,7 @@ class HttpRequestSinkExpressions:
 		"""
 
 		# query1="""
-		# MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
+		# MATCH (t:ASTNode {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
 		# (n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier' }),
 		# (n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(n3 {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
 		# (n4)-[:AST_parentOf {RelationType: 'value'}]->(a)
@@ -96,15 +79,7 @@ class HttpRequestSinkExpressions:
 
 		# argument a can be ObjectExpression, Identifier, or MemberExpression
 		# variable relation length will capture function chains, e.g., $.ajax({}).done().success().failure() etc.
-		query2="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf*1..10]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
-		(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier' }),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-		OPTIONAL MATCH (a)-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
-		(n4)-[:AST_parentOf {RelationType: 'value'}]->(aa)
-		RETURN t, n, a, aa
-		"""
-		results2 = tx.run(query2)
+		results2 = QC.run_query(tx, 'ajax_calls')
 
 		return results2
 
@@ -117,12 +92,7 @@ class HttpRequestSinkExpressions:
 
 		@Note: xhrPost is used e.g., in tinytinyrss
 		"""
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'xhrPost'}), 
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		RETURN t, n, a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'xhr_post_calls')
 		return results
 
 
@@ -135,13 +105,7 @@ class HttpRequestSinkExpressions:
 		@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the asyncRequest() function
 		"""
 
-		query="""
-		MATCH (t)-[:AST_parentOf]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
-		RETURN  tt, t, n, a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'async_request_calls')
 		return results
 
 
@@ -153,13 +117,7 @@ class HttpRequestSinkExpressions:
 		@return 
 		"""
 
-		query = """
-		MATCH (call_expression {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-(member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(set_form {Code:'setForm', Type: 'Identifier'}),
-		(call_expression)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(arg), (t)-[:AST_parentOf]->(call_expression)
-		OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
-		RETURN tt, t, call_expression as n, arg as a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'set_form_calls')
 		return results
 
 	@staticmethod
@@ -169,13 +127,7 @@ class HttpRequestSinkExpressions:
 		@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the asyncRequest() function
 		"""
 
-		query = """
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(run {Type: 'Identifier', Code: 'Run'}),
-		(member_expr)-[:AST_parentOf {RelationType: 'object'}]->(inner_member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(ci {Type: 'Identifier', Code: 'CriticalImages'}), (inner_member_expression)-[:AST_parentOf {RelationType: 'object'}]->(ps {Type: 'Identifier', Code: 'pagespeed'}),
-		(call_expr)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		RETURN t, call_expr AS n, a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'pagespeed_calls')
 		return results
 
 
@@ -186,16 +138,24 @@ class HttpRequestSinkExpressions:
 		@return bolt result (t, n, a): where t= top level exp statement, n = ObjectExpression, a=URL argument of the ajaxSettings{} 
 		"""
 
-		query = """
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf*1..5]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'arguments'}]->(obj_expr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(ajaxSettingsProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(ajaxSettingsIdentifier {Type: 'Identifier', Code: 'ajaxSettings'}),
-		(ajaxSettingsProperty)-[:AST_parentOf {RelationType: 'value'}]->(ajaxSettingsObjExpr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(urlProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(url {Type: 'Identifier', Code: 'url'}),
-		(urlProperty)-[:AST_parentOf {RelationType: 'value'}]->(a)
-		RETURN t, ajaxSettingsProperty AS n, a
-		"""
-		results = tx.run(query)
+		results = QC.run_query(tx, 'ajax_setting_objects')
 		return results
 
 
+	@staticmethod
+	def getRequestSinkExpressions(tx):
+		"""
+		@param {pointer} tx
+		@return {dict} the records (kind, tt, t, n, a, aa) of all the request sinks above, found with one query and grouped
+			by kind, i.e., by the name of the catalog query of each sink; `tt` and `aa` are None for the kinds without them
+		"""
+
+		sink_expressions = dict((kind, []) for kind in QC.REQUEST_SINK_QUERIES)
+		for record in QC.run_query(tx, 'request_sink_calls'):
+			sink_expressions[record['kind']].append(record)
+		return sink_expressions
+
+
 	@staticmethod
 	def getHttpRequestCallExpressionUrlArgument(tx, node, function_type):
 		
@@ -208,35 +168,8 @@ class HttpRequestSinkExpressions:
 
 		nodeId = node['Id']
 		out = []
-		query = ''
-		if function_type == 'fetch':
-			query="""
-			MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}), 
-			(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-			RETURN t, n, a
-			"""%(nodeId)
-		elif function_type == 'open':
-			query="""
-			MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}), 
-			(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-			RETURN t, n, a
-			"""%(nodeId)
-		elif function_type == 'ajax':
-			query="""
-			MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
-			(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier', Code: '$'}),
-			(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(n3 {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
-			(n4)-[:AST_parentOf {RelationType: 'value'}]->(a)
-			RETURN t, n, a
-			"""%(nodeId)
-		elif function_type == 'asyncRequest':
-			query="""
-			MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
-			(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-			RETURN t, n, a
-			"""%(nodeId)
-		if len(query):
-			out = tx.run(query)
+		if function_type in ['fetch', 'open', 'ajax', 'asyncRequest']:
+			out = QC.run_query(tx, '%s_call_url_argument'%function_type, id=nodeId)
 		return out
 
 
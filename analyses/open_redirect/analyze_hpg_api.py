@@ -135,16 +135,15 @@ def main():
 	LOGGER.info('[TR] importing the database with neo4j-admin.')
 	DU.neoadmin_import_db_instance(database_name, neo4j_database_name, nodes_file, rels_file, rels_dynamic_file)
 
-	LOGGER.info('[TR] changing the default neo4j password to enable programmatic access.')
-	DU.ineo_set_initial_password_and_restart(database_name, password=constantsModule.NEO4J_PASS)
+	LOGGER.info('[TR] setting the neo4j password and starting neo4j.')
+	log_offset = DU.ineo_set_initial_password_and_start(database_name, password=constantsModule.NEO4J_PASS)
 
 	# compress the hpg after the model import
 	IOModule.compress_graph(webpage_folder)
 
 	LOGGER.info('[TR] waiting for the neo4j connection to be ready...')
-	time.sleep(10)
-	LOGGER.info('[TR] connection: %s'%constantsModule.NEO4J_CONN_HTTP_STRING)
-	connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
+	LOGGER.info('[TR] connection: %s'%constantsModule.NEO4J_CONN_STRING)
+	connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, bolt_conn=constantsModule.NEO4J_CONN_STRING, log_file=DU.get_ineo_instance_log_file(database_name), log_offset=log_offset)
 	if not connection_success:
 		try:
 			LOGGER.info('[TR] stopping neo4j for %s'%str(database_name))
@@ -156,10 +155,13 @@ def main():
 			LOGGER.info('[TR] ran into exception while prematurely stopping neo4j for %s'%str(database_name))
 		return connection_success
 
+	LOGGER.info('[TR] creating the schema indexes of the hpg.')
+	DU.bootstrap_hpg_schema(conn=constantsModule.NEO4J_CONN_STRING)
+
 	LOGGER.info('[TR] starting to run the queries.')
 	webpage_url = get_url_for_webpage(webpage_folder)
 	try:
-		DU.exec_fn_within_transaction(traversals_cypher.run_traversals, webpage_url, webpage_folder, webpage, conn=constantsModule.NEO4J_CONN_STRING)
+		DU.exec_fn_within_transaction(traversals_cypher.run_traversals, webpage_url, webpage_folder, webpage, conn=constantsModule.NEO4J_CONN_STRING, split_transactions=True)
 	except Exception as e:
 		LOGGER.error(e)
 		LOGGER.error('[TR] neo4j connection error.')
@@ -172,6 +174,7 @@ def main():
 
 
 	## note: these steps are done in the top level module, as timeout may occur here
+	DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 	LOGGER.info('[TR] stopping neo4j for %s'%str(database_name))
 	DU.ineo_stop_db_instance(database_name)
 
@@ -32,9 +32,15 @@ import time
 import json
 import constants as constantsModule
 import utils.io as IOModule
+import utils.job_ledger as JobLedgerModule
+import utils.page_dedup as PageDedupModule
 import docker.neo4j.manage_container as dockerModule
 import hpg_neo4j.db_utility as DU
 import hpg_neo4j.query_utility as QU
+import hpg_neo4j.partitioned_import as PartitionedImportModule
+import hpg_neo4j.in_memory_graph as InMemoryGraphModule
+import hpg_neo4j.hpg_pruning as HPGPruningModule
+import hpg_neo4j.hpg_enclosing as HPGEnclosingModule
 import analyses.open_redirect.traversals_cypher as open_redirect_py_traversals
 from utils.logging import logger as LOGGER
  
@@ -114,7 +120,14 @@ def build_and_analyze_hpg_local_with_timeout(seed_url, timeout=None, overwrite=F
 		webapp_pages = [item for item in webapp_pages if len(item) == 64]
 
 
+	ledger = JobLedgerModule.get_job_ledger()
+
 	for webpage in webapp_pages:
+		# do NOT re-analyze webpages that the job ledger has finished (or given up)
+		if ledger is not None and str(overwrite).lower() == 'false' and not ledger.should_run(seed_url, webpage, 'or_traversals'):
+			LOGGER.info('[TR] skipping webpage %s as per the job ledger'%webpage)
+			continue
+
 		webpage_folder = os.path.join(webapp_data_directory, webpage)
 		if os.path.exists(webpage_folder):
 
@@ -127,14 +140,19 @@ def build_and_analyze_hpg_local_with_timeout(seed_url, timeout=None, overwrite=F
 					LOGGER.info('[TR] analyis results already exists for webpage: %s'%webpage_folder)
 					continue
 
+			if ledger is not None:
+				ledger.start(seed_url, webpage, 'or_traversals')
+
 			# note: the neo4j ports as in the config.yaml must be passed to the new process
 			command = "python3 -m analyses.open_redirect.analyze_hpg_api --seedurl={0} --webpage={1} --httpport={2} --boltport={3}".format(seed_url, webpage, constantsModule.NEO4J_HTTP_PORT, constantsModule.NEO4J_BOLT_PORT)
 			cwd = constantsModule.BASE_DIR
-			ret = IOModule.run_os_command(command, cwd= cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True)
+			ret = IOModule.run_os_command(command, cwd= cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True,
+				memory_limit=constantsModule.PROCESS_MEMORY_LIMIT, cpu_limit=constantsModule.PROCESS_CPU_LIMIT)
 
 			if ret < 0:
 				## safely finish the analysis, even when timeout occurs
 				database_name = '{0}_{1}'.format(webapp_folder_name, webpage) 
+				DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 				LOGGER.info('[TR] stopping neo4j for %s'%str(database_name))
 				DU.ineo_stop_db_instance(database_name)
 
@@ -142,11 +160,23 @@ def build_and_analyze_hpg_local_with_timeout(seed_url, timeout=None, overwrite=F
 				LOGGER.info('[TR] removing neo4j for %s'%str(database_name))
 				DU.ineo_remove_db_instance(database_name)
 
+			if ledger is not None:
+				if ret < 0:
+					ledger.fail(seed_url, webpage, 'or_traversals', exit_code=ret, timed_out=True)
+				elif os.path.exists(os.path.join(webpage_folder, "sinks.flows.out")):
+					ledger.finish(seed_url, webpage, 'or_traversals', exit_code=ret)
+				else:
+					ledger.fail(seed_url, webpage, 'or_traversals', exit_code=ret, error='no sinks.flows.out')
+
 			LOGGER.info('[TR] finished HPG analyis for: %s'%(webpage_folder))
 
 
 def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, compress_hpg=True):
 
+	if str(constantsModule.NEO4J_USE_PARTITIONED_IMPORT).lower() == 'true':
+		# import all webpages of the site into a single database
+		return build_and_analyze_hpg_local_partitioned(seed_url, overwrite=overwrite, conn_timeout=conn_timeout, compress_hpg=compress_hpg)
+
 	webapp_folder_name = get_name_from_url(seed_url)
 	webapp_data_directory = os.path.join(constantsModule.DATA_DIR, webapp_folder_name)
 	if not os.path.exists(webapp_data_directory):
@@ -169,102 +199,191 @@ def build_and_analyze_hpg_local(seed_url, overwrite=False, conn_timeout=None, co
 		webapp_pages = [item for item in webapp_pages if len(item) == 64]
 
 
-	for webpage in webapp_pages:
-		webpage_folder = os.path.join(webapp_data_directory, webpage)
-		if os.path.exists(webpage_folder):
-
-			LOGGER.warning('[TR] HPG analyis for: %s'%(webpage_folder))
-			
-			if str(overwrite).lower() == 'false':
-				# do NOT re-analyze webpages
-				OUTPUT_FILE = os.path.join(webpage_folder, "sinks.flows.out")
-				if os.path.exists(OUTPUT_FILE):
-					LOGGER.info('[TR] analyis results already exists for webpage: %s'%webpage_folder)
-					continue
+	duplicates = {}
+	if str(constantsModule.WEBPAGE_DEDUP_ENABLED).lower() == 'true':
+		# only analyze one webpage per cluster of near-duplicate webpages
+		webapp_pages, duplicates = PageDedupModule.get_representative_webpages(webapp_data_directory, webapp_pages)
 
-			# requirement: the database name must have a length between 3 and 63 characters
-			# must always import into the default neo4j database
-			neo4j_database_name = 'neo4j' 
+	ledger = JobLedgerModule.get_job_ledger()
 
-			database_name = '{0}_{1}'.format(webapp_folder_name, webpage) 
+	for webpage in webapp_pages:
+		if ledger is None:
+			build_and_analyze_webpage_hpg_local(seed_url, webapp_folder_name, webapp_data_directory, webpage, overwrite=overwrite, conn_timeout=conn_timeout, compress_hpg=compress_hpg)
+			continue
+
+		# do NOT re-analyze webpages that the job ledger has finished (or given up)
+		if str(overwrite).lower() == 'false' and not ledger.should_run(seed_url, webpage, 'or_traversals'):
+			LOGGER.info('[TR] skipping webpage %s as per the job ledger'%webpage)
+			continue
+
+		ledger.start(seed_url, webpage, 'or_traversals')
+		try:
+			build_and_analyze_webpage_hpg_local(seed_url, webapp_folder_name, webapp_data_directory, webpage, overwrite=overwrite, conn_timeout=conn_timeout, compress_hpg=compress_hpg)
+		except Exception as e:
+			ledger.fail(seed_url, webpage, 'or_traversals', error=e)
+			raise
+
+		if os.path.exists(os.path.join(webapp_data_directory, webpage, "sinks.flows.out")):
+			ledger.finish(seed_url, webpage, 'or_traversals')
+		else:
+			ledger.fail(seed_url, webpage, 'or_traversals', error='no sinks.flows.out')
 
-			nodes_file = os.path.join(webpage_folder, constantsModule.NODE_INPUT_FILE_NAME)
-			rels_file =  os.path.join(webpage_folder, constantsModule.RELS_INPUT_FILE_NAME)
-			rels_dynamic_file = os.path.join(webpage_folder, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME)
+	if len(duplicates):
+		PageDedupModule.link_duplicate_results(webapp_data_directory, duplicates, ["sinks.flows.out", "sinks.flows.out.json"])
 
-			nodes_file_gz = os.path.join(webpage_folder, constantsModule.NODE_INPUT_FILE_NAME +'.gz')
-			rels_file_gz =  os.path.join(webpage_folder, constantsModule.RELS_INPUT_FILE_NAME  +'.gz')
-			rels_dynamic_file_gz = os.path.join(webpage_folder, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME  +'.gz')
 
-			if os.path.exists(nodes_file) and os.path.exists(rels_file) and os.path.exists(rels_dynamic_file):
-				LOGGER.info('[TR] hpg files exist in decompressed format, skipping de-compression.')
+def build_and_analyze_webpage_hpg_local(seed_url, webapp_folder_name, webapp_data_directory, webpage, overwrite=False, conn_timeout=None, compress_hpg=True):
 
-			elif os.path.exists(nodes_file_gz) and os.path.exists(rels_file_gz) and os.path.exists(rels_dynamic_file_gz):
-				LOGGER.info('[TR] de-compressing hpg.')
-				# de-compress the hpg 
-				IOModule.decompress_graph(webpage_folder)
-			else:
-				LOGGER.error('[TR] The nodes/rels.csv files do not exist in %s, skipping.'%webpage_folder)
-				continue
-
-			neo4j_http_port = constantsModule.NEO4J_HTTP_PORT
-			neo4j_bolt_port = constantsModule.NEO4J_BOLT_PORT
+	"""
+	@param {string} seed_url
+	@param {string} webapp_folder_name: name of the data directory of the site
+	@param {string} webapp_data_directory: data directory of the site
+	@param {string} webpage: name of the webpage folder (i.e., hash of the webpage url)
+	@description: imports the HPG of one webpage inside a neo4j graph database and runs traversals over it.
+	"""
 
-			LOGGER.warning('[TR] removing any previous neo4j instance for %s'%str(database_name))
-			DU.ineo_remove_db_instance(database_name)
+	webpage_folder = os.path.join(webapp_data_directory, webpage)
+	if os.path.exists(webpage_folder):
 
-			LOGGER.info('[TR] creating db %s with http port %s'%(database_name, neo4j_http_port))
-			DU.ineo_create_db_instance(database_name, neo4j_http_port)
+		LOGGER.warning('[TR] HPG analyis for: %s'%(webpage_folder))
+		
+		if str(overwrite).lower() == 'false':
+			# do NOT re-analyze webpages
+			OUTPUT_FILE = os.path.join(webpage_folder, "sinks.flows.out")
+			if os.path.exists(OUTPUT_FILE):
+				LOGGER.info('[TR] analyis results already exists for webpage: %s'%webpage_folder)
+				return
 
-			# check if the bolt port requested by the config.yaml is not the default one
-			if not ( int(neo4j_http_port) + 2 == int(neo4j_bolt_port) ):
-				LOGGER.info('[TR] setting the requested bolt port %s for db %s'%(neo4j_bolt_port, database_name))
-				DU.ineo_set_bolt_port_for_db_instance(database_name, neo4j_bolt_port)
+		# requirement: the database name must have a length between 3 and 63 characters
+		# must always import into the default neo4j database
+		neo4j_database_name = 'neo4j' 
 
-			LOGGER.info('[TR] importing the database with neo4j-admin.')
-			DU.neoadmin_import_db_instance(database_name, neo4j_database_name, nodes_file, rels_file, rels_dynamic_file)
+		database_name = '{0}_{1}'.format(webapp_folder_name, webpage) 
 
-			LOGGER.info('[TR] changing the default neo4j password to enable programmatic access.')
-			DU.ineo_set_initial_password_and_restart(database_name, password=constantsModule.NEO4J_PASS)
+		nodes_file = os.path.join(webpage_folder, constantsModule.NODE_INPUT_FILE_NAME)
+		rels_file =  os.path.join(webpage_folder, constantsModule.RELS_INPUT_FILE_NAME)
+		rels_dynamic_file = os.path.join(webpage_folder, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME)
 
+		if str(constantsModule.HPG_STREAM_COMPRESSED).lower() == 'true':
 			if str(compress_hpg).lower() == 'true':
-				# compress the hpg after the model import
+				# compress a freshly constructed hpg once; the import and the analysis then stream the compressed files
 				IOModule.compress_graph(webpage_folder)
+			nodes_file = IOModule.get_graph_file(nodes_file)
+			rels_file = IOModule.get_graph_file(rels_file)
+			rels_dynamic_file = IOModule.get_graph_file(rels_dynamic_file)
+			if nodes_file is None or rels_file is None or rels_dynamic_file is None:
+				LOGGER.error('[TR] The nodes/rels.csv files do not exist in %s, skipping.'%webpage_folder)
+				return
 
-			LOGGER.info('[TR] waiting for the neo4j connection to be ready...')
-			time.sleep(10)
-			LOGGER.info('[TR] connection: %s'%constantsModule.NEO4J_CONN_HTTP_STRING)
-			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
-			if not connection_success:
-				try:
-					LOGGER.info('[TR] stopping neo4j for %s'%str(database_name))
-					DU.ineo_stop_db_instance(database_name)
-
-					## remove db after analysis
-					DU.ineo_remove_db_instance(database_name)
-				except:
-					LOGGER.info('[TR] ran into exception while prematurely stopping neo4j for %s'%str(database_name))
-				continue
+		elif os.path.exists(nodes_file) and os.path.exists(rels_file) and os.path.exists(rels_dynamic_file):
+			LOGGER.info('[TR] hpg files exist in decompressed format, skipping de-compression.')
 
-			LOGGER.info('[TR] starting to run the queries.')
-			webpage_url = get_url_for_webpage(webpage_folder)
+		elif IOModule.get_graph_file(nodes_file) and IOModule.get_graph_file(rels_file) and IOModule.get_graph_file(rels_dynamic_file):
+			LOGGER.info('[TR] de-compressing hpg.')
+			# de-compress the hpg 
+			IOModule.decompress_graph(webpage_folder)
+		else:
+			LOGGER.error('[TR] The nodes/rels.csv files do not exist in %s, skipping.'%webpage_folder)
+			return
+
+		pruned_files = None
+		if str(constantsModule.HPG_PRUNE_LIBRARIES).lower() == 'true':
+			# import the hpg without the library scripts that are not connected to the sinks
+			pruned_files = HPGPruningModule.prune_webpage_hpg(webpage_folder)
+			if pruned_files is not None:
+				nodes_file, rels_file, rels_dynamic_file = pruned_files
+
+		traversals_fn = open_redirect_py_traversals.run_traversals
+		if str(constantsModule.HPG_USE_IN_MEMORY_ENGINE).lower() == 'true':
+			# answer the AST and PDG navigation queries from the HPG files in memory, and the other queries with neo4j
+			LOGGER.info('[TR] loading the hpg in memory.')
+			traversals_fn = InMemoryGraphModule.wrap_webpage_traversals(webpage_folder, [nodes_file, rels_file, rels_dynamic_file], traversals_fn, load_parquet=pruned_files is None)
+
+		if str(constantsModule.HPG_ENCLOSING_PROPERTIES).lower() == 'true':
+			enclosing_files = HPGEnclosingModule.add_webpage_enclosing_properties(webpage_folder, graph_files=[nodes_file, rels_file, rels_dynamic_file])
+			if enclosing_files is not None:
+				nodes_file = enclosing_files[0]
+
+		neo4j_http_port = constantsModule.NEO4J_HTTP_PORT
+		neo4j_bolt_port = constantsModule.NEO4J_BOLT_PORT
+
+		LOGGER.warning('[TR] removing any previous neo4j instance for %s'%str(database_name))
+		DU.ineo_remove_db_instance(database_name)
+
+		LOGGER.info('[TR] creating db %s with http port %s'%(database_name, neo4j_http_port))
+		DU.ineo_create_db_instance(database_name, neo4j_http_port)
+
+		# check if the bolt port requested by the config.yaml is not the default one
+		if not ( int(neo4j_http_port) + 2 == int(neo4j_bolt_port) ):
+			LOGGER.info('[TR] setting the requested bolt port %s for db %s'%(neo4j_bolt_port, database_name))
+			DU.ineo_set_bolt_port_for_db_instance(database_name, neo4j_bolt_port)
+
+		LOGGER.info('[TR] importing the database with neo4j-admin.')
+		DU.neoadmin_import_db_instance(database_name, neo4j_database_name, nodes_file, rels_file, rels_dynamic_file)
+		HPGPruningModule.remove_pruned_hpg(webpage_folder)
+		HPGEnclosingModule.remove_enclosing_properties(webpage_folder)
+
+		LOGGER.info('[TR] setting the neo4j password and starting neo4j.')
+		log_offset = DU.ineo_set_initial_password_and_start(database_name, password=constantsModule.NEO4J_PASS)
+
+		if str(compress_hpg).lower() == 'true':
+			# compress the hpg after the model import
+			IOModule.compress_graph(webpage_folder)
+
+		LOGGER.info('[TR] waiting for the neo4j connection to be ready...')
+		LOGGER.info('[TR] connection: %s'%constantsModule.NEO4J_CONN_STRING)
+		connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, bolt_conn=constantsModule.NEO4J_CONN_STRING, log_file=DU.get_ineo_instance_log_file(database_name), log_offset=log_offset)
+		if not connection_success:
 			try:
-				DU.exec_fn_within_transaction(open_redirect_py_traversals.run_traversals, webpage_url, webpage_folder, webpage, conn=constantsModule.NEO4J_CONN_STRING, conn_timeout=conn_timeout)
-			except Exception as e:
-				LOGGER.error(e)
-				LOGGER.error('[TR] neo4j connection error.')
-				outfile =  os.path.join(webpage_folder, "sinks.flows.out")
-				if not os.path.exists(outfile):
-					with open(outfile, 'w+') as fd:
-						error_json = {"error": str(e)}
-						json.dump(error_json, fd, ensure_ascii=False, indent=4)
+				DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
+				LOGGER.info('[TR] stopping neo4j for %s'%str(database_name))
+				DU.ineo_stop_db_instance(database_name)
 
-			LOGGER.info('[TR] stopping neo4j for %s'%str(database_name))
-			DU.ineo_stop_db_instance(database_name)
+				## remove db after analysis
+				DU.ineo_remove_db_instance(database_name)
+			except:
+				LOGGER.info('[TR] ran into exception while prematurely stopping neo4j for %s'%str(database_name))
+			return
+
+		LOGGER.info('[TR] creating the schema indexes of the hpg.')
+		DU.bootstrap_hpg_schema(conn=constantsModule.NEO4J_CONN_STRING)
+
+		LOGGER.info('[TR] starting to run the queries.')
+		webpage_url = get_url_for_webpage(webpage_folder)
+		try:
+			DU.exec_fn_within_transaction(traversals_fn, webpage_url, webpage_folder, webpage, conn=constantsModule.NEO4J_CONN_STRING, conn_timeout=conn_timeout, split_transactions=True)
+		except Exception as e:
+			LOGGER.error(e)
+			LOGGER.error('[TR] neo4j connection error.')
+			outfile =  os.path.join(webpage_folder, "sinks.flows.out")
+			if not os.path.exists(outfile):
+				with open(outfile, 'w+') as fd:
+					error_json = {"error": str(e)}
+					json.dump(error_json, fd, ensure_ascii=False, indent=4)
+
+		DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
+		LOGGER.info('[TR] stopping neo4j for %s'%str(database_name))
+		DU.ineo_stop_db_instance(database_name)
+
+		## remove db after analysis
+		LOGGER.info('[TR] removing neo4j for %s'%str(database_name))
+		DU.ineo_remove_db_instance(database_name)
+
+
+def build_and_analyze_hpg_local_partitioned(seed_urls, overwrite=False, conn_timeout=None, compress_hpg=True):
+	"""
+	@param {string|list} seed_urls: a site, or a batch of sites, whose webpages are imported into a single neo4j database
+	@description: same as `build_and_analyze_hpg_local()`, but with one neo4j-admin import and one server start 
+		for all webpages, where the traversals of each webpage are scoped to its own partition of the database
+	"""
+
+	if isinstance(seed_urls, str):
+		seed_urls = [seed_urls]
 
-			## remove db after analysis
-			LOGGER.info('[TR] removing neo4j for %s'%str(database_name))
-			DU.ineo_remove_db_instance(database_name)
+	partitions = PartitionedImportModule.collect_webpage_partitions(seed_urls, overwrite=overwrite, ledger_stage='or_traversals', deduplicate=True)
+	database_name = PartitionedImportModule.get_partitioned_database_name(seed_urls)
+	LOGGER.info('[TR] analyzing %d webpages in the partitioned database %s'%(len(partitions), database_name))
+	PartitionedImportModule.analyze_hpg_partitions(database_name, partitions, open_redirect_py_traversals.run_traversals, conn_timeout=conn_timeout, compress_hpg=compress_hpg, ledger_stage='or_traversals')
 
 
 def build_and_analyze_hpg_docker(seed_url, conn_timeout=None):
@@ -317,6 +436,7 @@ def build_and_analyze_hpg_docker(seed_url, conn_timeout=None):
 			if build_container: 
 
 				# remove the old container & database if it exists 
+				DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 				dockerModule.stop_neo4j_container(container_name)
 				dockerModule.remove_neo4j_container(container_name)
 				dockerModule.remove_neo4j_database(database_name, container_name)
@@ -329,13 +449,13 @@ def build_and_analyze_hpg_docker(seed_url, conn_timeout=None):
 			LOGGER.info('importing data inside container.')
 			dockerModule.import_data_inside_container(container_name, database_name, relative_import_path, 'CSV')
 			LOGGER.info('waiting for the tcp port 7474 of the neo4j container to be ready...')
-			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150)
+			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				sys.exit(1)
 		else:
 			dockerModule.start_neo4j_container(container_name)
 			LOGGER.info('waiting for the tcp port 7474 of the neo4j container to be ready...')
-			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150)
+			connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, conn=constantsModule.NEO4J_CONN_HTTP_STRING)
 			if not connection_success:
 				sys.exit(1)
 
@@ -345,9 +465,10 @@ def build_and_analyze_hpg_docker(seed_url, conn_timeout=None):
 		# step3: run the vulnerability detection queries
 		if query:
 			webpage_url = get_url_for_webpage(webpage)
-			DU.exec_fn_within_transaction(open_redirect_py_traversals.run_traversals, webpage_url, webpage, each_webpage, conn_timeout=conn_timeout)
+			DU.exec_fn_within_transaction(open_redirect_py_traversals.run_traversals, webpage_url, webpage, each_webpage, conn=constantsModule.NEO4J_CONN_STRING, conn_timeout=conn_timeout, split_transactions=True)
 
 
 		# stop the neo4j docker container
 		if stop_container:
+			DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
 			dockerModule.stop_neo4j_container(container_name)
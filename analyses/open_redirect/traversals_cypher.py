@@ -39,6 +39,7 @@ import utils.utility as utilityModule
 import hpg_neo4j.db_utility as DU
 import hpg_neo4j.query_utility as QU
 import analyses.general.data_flow as DF
+import utils.script_cache as ScriptCacheModule
 import analyses.open_redirect.semantic_types as SemTypeDefinitions
 from utils.logging import logger as LOGGER
 from neo4j import GraphDatabase
@@ -187,166 +188,20 @@ def _get_semantic_types(program_slices, num_slices):
 	@param {list} program_slices: slices of JS program
 	@param {int} num_slices: length of program_slices list
 	@return {list} the semantic types associated with the given program slices.
+	@description the source patterns are declared in `SemTypeDefinitions.SOURCE_PATTERNS`, and the code
+	and identifiers of each slice are scanned once for all of them
 	"""
 
-
-	semantic_type = SemTypeDefinitions.NON_REACHABLE
-	semantic_types = []
-
-
-	# sources
-	WEB_STORAGE_STRINGS = [
-		'localStorage',
-		'sessionStorage'
-	]
-
-	WIN_LOC_STRINGS = [
-		'window.location',
-		'win.location',
-		'w.location',
-		'location.href',
-		'location.hash',
-		'loc.href',
-		'loc.hash',
-		'History.getBookmarkedState',
-	]
-
-	WIN_NAME_STRINGS = [
-		'window.name',
-		'win.name'
-	]
-
-	DOM_READ_STRINGS = [
-		'document.getElement',
-		'document.querySelector',
-		'doc.getElement',
-		'doc.querySelector',
-		'.getElementBy',
-		'.getElementsBy',
-		'.querySelector',
-		'$(',
-		'jQuery(',
-		'.attr(',
-		'.getAttribute(',
-		'.readAttribute('
-	]
-
-	DOM_READ_COOKIE_STRINGS = [
-		'document.cookie',
-		'doc.cookie',
-	]
-
-	PM_STRINGS = [
-		'event.data', 
-		'evt.data'
-	]
-
-	DOC_REF_STRINGS = [
-		'document.referrer',
-		'doc.referrer',
-		'd.referrer',
-	]
-
-
+	matcher = SemTypeDefinitions.SOURCE_PATTERN_MATCHER
+	found = 0
 	for i in range(num_slices):
 		program_slice = program_slices[i]
-		code = program_slice[0]
-		idents = program_slice[2]
-
-		for item in WIN_LOC_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_WIN_LOC
-				semantic_types.append(semantic_type)
-				
-
-		for item in WIN_NAME_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_WIN_NAME
-				semantic_types.append(semantic_type)
-				
-
-		for item in DOC_REF_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_DOC_REF
-				semantic_types.append(semantic_type)
-
-
-
-		for item in PM_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_PM
-				semantic_types.append(semantic_type)
-				
-
-
-		for item in DOM_READ_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_DOM_TREE
-				semantic_types.append(semantic_type)
-				
-
-		for item in WEB_STORAGE_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_WEB_STORAGE
-				semantic_types.append(semantic_type)
-				
-
-		for item in DOM_READ_COOKIE_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_COOKIE
-				semantic_types.append(semantic_type)
-				
-
-
-		for identifier in idents:
-
-			for item in WIN_LOC_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_WIN_LOC
-					semantic_types.append(semantic_type)
-					
-
-			for item in WIN_NAME_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_WIN_NAME
-					semantic_types.append(semantic_type)
-					
-
-			for item in DOC_REF_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_DOC_REF
-					semantic_types.append(semantic_type)
-
-
-
-			for item in PM_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_PM
-					semantic_types.append(semantic_type)
-					
-
-
-			for item in DOM_READ_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_DOM_TREE
-					semantic_types.append(semantic_type)
-					
-
-			for item in WEB_STORAGE_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_WEB_STORAGE
-					semantic_types.append(semantic_type)
-					
-
-			for item in DOM_READ_COOKIE_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_COOKIE
-					semantic_types.append(semantic_type)
-		
-
+		found |= matcher.match_mask(program_slice[0])
+		for identifier in program_slice[2]:
+			found |= matcher.match_mask(identifier)
 
-	if len(semantic_types):
-		return list(set(semantic_types))
+	if found:
+		return matcher.labels_of_mask(found)
 
 	return [SemTypeDefinitions.NON_REACHABLE]
 
@@ -398,6 +253,12 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 	sinks_list = sinks_json['sinks']
 
 	storage = {}
+	# program slices of this webpage, shared by all sinks
+	slicing_cache = DF.SlicingCache()
+
+	# script-local slices of the sinks computed on other webpages that load the same scripts
+	script_cache = ScriptCacheModule.get_script_cache()
+	script_hashes = script_cache.get_script_hashes(webpage_directory) if script_cache is not None else {}
 
 
 	for sink_node in sinks_list:
@@ -430,10 +291,20 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 			"variables": {}
 		}
 
-		
+		script_hash = script_hashes.get(sink_node["script"].split('/')[-1])
+		sink_ast_node = QU.get_node_by_id(tx, sink_id) if script_hash is not None else None
 
 		for varname in taintable_sink_identifiers:
-			slice_values = DF._get_varname_value_from_context(tx, varname, sink_cfg_node)
+			finding_key = ScriptCacheModule.get_sink_finding_key(sink_node, sink_ast_node, varname) if script_hash is not None else None
+			if finding_key is not None:
+				finding = script_cache.get_finding('or', script_hash, finding_key)
+				if finding is not None and DF.is_script_local_finding(tx, varname, sink_cfg_node, finding, slicing_cache):
+					storage[nid]["variables"][varname] = finding
+					storage[nid]["sink"]["taintable_semantic_types"].extend(finding["semantic_types"])
+					continue
+
+			truncated_slices = slicing_cache.truncated_slices
+			slice_values = DF._get_varname_value_from_context(tx, varname, sink_cfg_node, slicing_cache=slicing_cache)
 
 			if DEBUG: print(varname, slice_values)
 
@@ -443,6 +314,9 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 				"semantic_types": semantic_types
 			}
 
+			if finding_key is not None and slicing_cache.truncated_slices == truncated_slices and DF.is_script_local_slice(tx, varname, sink_cfg_node, slice_values, slicing_cache):
+				script_cache.add_finding('or', script_hash, finding_key, storage[nid]["variables"][varname])
+
 			lst = storage[nid]["sink"]["taintable_semantic_types"]
 			lst.extend(semantic_types)
 			storage[nid]["sink"]["taintable_semantic_types"] = lst
@@ -560,6 +434,10 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 		json.dump(json_buffer, fd, ensure_ascii=False, indent=4)
 
 
+	LOGGER.info('[TR] slicing cache: %s'%slicing_cache)
+	if script_cache is not None:
+		script_cache.flush()
+		LOGGER.info('[TR] script cache: %s'%script_cache)
 	LOGGER.info('[TR] finished running the queries.')
 
 
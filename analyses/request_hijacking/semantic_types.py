@@ -24,6 +24,9 @@
 
 """
 
+from utils.pattern_matcher import MultiPatternMatcher
+
+
 
 ## --- semantic of instructions --- ## 
 
@@ -55,3 +58,62 @@ RD_WEB_STORAGE = "RD_WEB_STORAGE"
 RD_DOM_TREE = "RD_DOM"
 RD_COOKIE = "RD_COOKIE"
 
+
+## --- sources --- ##
+
+# a program slice reads from a source if its code or identifiers contain any pattern of the source
+SOURCE_PATTERNS = [
+	(RD_WIN_LOC, [
+		'window.location',
+		'win.location',
+		'w.location',
+		'location.href',
+		'location.hash',
+		'loc.href',
+		'loc.hash',
+		'History.getBookmarkedState',
+	]),
+	(RD_WIN_NAME, [
+		'window.name',
+		'win.name',
+	]),
+	(RD_DOC_REF, [
+		'document.referrer',
+		'doc.referrer',
+		'd.referrer',
+	]),
+	(RD_PM, [
+		'event.data',
+		'evt.data',
+	]),
+	(RD_DOM_TREE, [
+		'document.getElement',
+		'document.querySelector',
+		'doc.getElement',
+		'doc.querySelector',
+		'.getElementBy',
+		'.getElementsBy',
+		'.querySelector',
+		'$(',
+		'jQuery(',
+		'.attr(',
+		'.getAttribute(',
+		'.readAttribute(',
+	]),
+	(RD_WEB_STORAGE, [
+		'localStorage',
+		'sessionStorage',
+	]),
+	(RD_COOKIE, [
+		'document.cookie',
+		'doc.cookie',
+	]),
+	# push subscription
+	(REQ_PUSH_SUB, [
+		'pushManager.getSubscription',
+		'pushManager.subscribe',
+		'pushManager',
+	]),
+]
+
+SOURCE_PATTERN_MATCHER = MultiPatternMatcher(SOURCE_PATTERNS)
@@ -31,12 +31,17 @@ import os, sys, json
 import utils.io as IOModule
 import constants as constantsModule
 import utils.utility as utilityModule
+import utils.page_dedup as PageDedupModule
 from utils.logging import logger as LOGGER
 
 
 
 def start_model_construction(website_url, iterative_output='false', memory=None, timeout=None, compress_hpg='true', overwrite_hpg='false', specific_webpage=None):
 
+	"""
+	@return {list} the `ProcessResult` of the HPG construction of each webpage
+	"""
+
 	# setup defaults
 	if memory is None:
 		static_analysis_memory = '32000'
@@ -63,11 +68,12 @@ def start_model_construction(website_url, iterative_output='false', memory=None,
 	urls_file = os.path.join(website_folder, 'urls.out')
 
 
+	results = []
 	if specific_webpage is not None:
 		webpage_folder = os.path.join(constantsModule.DATA_DIR, specific_webpage)
 		if os.path.exists(webpage_folder):
 			node_command= request_hijacking_static_analysis_command.replace('SINGLE_FOLDER', webpage_folder)
-			IOModule.run_os_command(node_command, cwd=request_hijacking_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True)
+			results.append(IOModule.run_os_command(node_command, cwd=request_hijacking_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True, return_result=True))
 
 	elif os.path.exists(webpages_json_file):
 
@@ -75,12 +81,16 @@ def start_model_construction(website_url, iterative_output='false', memory=None,
 		webpages = json.load(fd)
 		fd.close()
 
+		if str(constantsModule.WEBPAGE_DEDUP_ENABLED).lower() == 'true':
+			# only construct the HPG of one webpage per cluster of near-duplicate webpages
+			webpages, _ = PageDedupModule.get_representative_webpages(website_folder, webpages)
+
 		for webpage in webpages:
 			webpage_folder = os.path.join(website_folder, webpage)
 			if os.path.exists(webpage_folder):
 				
 				node_command= request_hijacking_static_analysis_command.replace('SINGLE_FOLDER', webpage_folder)
-				IOModule.run_os_command(node_command, cwd=request_hijacking_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True)
+				results.append(IOModule.run_os_command(node_command, cwd=request_hijacking_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True, return_result=True))
 
 
 
@@ -97,16 +107,21 @@ def start_model_construction(website_url, iterative_output='false', memory=None,
 		# this would eliminate the cases where the crawler is executed multiple times for the same site
 		# without deleting the data of the old crawl and thus adds duplicate urls to urls.out file.
 		urls = list(set(urls))
+		webpages = [utilityModule.sha256(url.strip().rstrip('\n').strip()) for url in urls]
 
-		for url in urls:
-			url = url.strip().rstrip('\n').strip()
-			webpage_folder_name = utilityModule.sha256(url)
+		if str(constantsModule.WEBPAGE_DEDUP_ENABLED).lower() == 'true':
+			# only construct the HPG of one webpage per cluster of near-duplicate webpages
+			webpages, _ = PageDedupModule.get_representative_webpages(website_folder, webpages)
+
+		for webpage_folder_name in webpages:
 			webpage_folder = os.path.join(website_folder, webpage_folder_name)
 			if os.path.exists(webpage_folder):
 				node_command= request_hijacking_static_analysis_command.replace('SINGLE_FOLDER', webpage_folder)
-				IOModule.run_os_command(node_command, cwd=request_hijacking_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True)
+				results.append(IOModule.run_os_command(node_command, cwd=request_hijacking_analyses_command_cwd, timeout=static_analysis_per_webpage_timeout, print_stdout=True, log_command=True, return_result=True))
 
 	else:
 		message = 'no webpages.json or urls.out file exists in the webapp directory; skipping analysis...'
 		LOGGER.warning(message)
 
+	return results
+
@@ -38,7 +38,9 @@ import constants as constantsModule
 import utils.utility as utilityModule
 import hpg_neo4j.db_utility as DU
 import hpg_neo4j.query_utility as QU
+import hpg_neo4j.query_catalog as QC
 import analyses.general.data_flow as DF
+import utils.script_cache as ScriptCacheModule
 import analyses.request_hijacking.semantic_types as SemTypeDefinitions
 
 # import analyses.request_hijacking.semantic_types as SemanticTypesModule
@@ -190,181 +192,20 @@ def _get_semantic_types(program_slices, num_slices):
 	@param {list} program_slices: slices of JS program
 	@param {int} num_slices: length of program_slices list
 	@return {list} the semantic types associated with the given program slices.
+	@description the source patterns are declared in `SemTypeDefinitions.SOURCE_PATTERNS`, and the code
+	and identifiers of each slice are scanned once for all of them
 	"""
 
-
-	semantic_type = SemTypeDefinitions.NON_REACHABLE
-	semantic_types = []
-
-
-	# sources
-	WEB_STORAGE_STRINGS = [
-		'localStorage',
-		'sessionStorage'
-	]
-
-	WIN_LOC_STRINGS = [
-		'window.location',
-		'win.location',
-		'w.location',
-		'location.href',
-		'location.hash',
-		'loc.href',
-		'loc.hash',
-		'History.getBookmarkedState',
-	]
-
-	WIN_NAME_STRINGS = [
-		'window.name',
-		'win.name'
-	]
-
-	DOM_READ_STRINGS = [
-		'document.getElement',
-		'document.querySelector',
-		'doc.getElement',
-		'doc.querySelector',
-		'.getElementBy',
-		'.getElementsBy',
-		'.querySelector',
-		'$(',
-		'jQuery(',
-		'.attr(',
-		'.getAttribute(',
-		'.readAttribute('
-	]
-
-	DOM_READ_COOKIE_STRINGS = [
-		'document.cookie',
-		'doc.cookie',
-	]
-
-	PM_STRINGS = [
-		'event.data', 
-		'evt.data'
-	]
-
-	DOC_REF_STRINGS = [
-		'document.referrer',
-		'doc.referrer',
-		'd.referrer',
-	]
-
-	# push subscription
-	PUSH_SUBSCRIPTION_API = [
-		'pushManager.getSubscription', 
-		'pushManager.subscribe',
-		'pushManager',
-	]
-
+	matcher = SemTypeDefinitions.SOURCE_PATTERN_MATCHER
+	found = 0
 	for i in range(num_slices):
 		program_slice = program_slices[i]
-		code = program_slice[0]
-		idents = program_slice[2]
-
-		for item in WIN_LOC_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_WIN_LOC
-				semantic_types.append(semantic_type)
-				
-
-		for item in WIN_NAME_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_WIN_NAME
-				semantic_types.append(semantic_type)
-				
-
-		for item in DOC_REF_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_DOC_REF
-				semantic_types.append(semantic_type)
-
-
-
-		for item in PM_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_PM
-				semantic_types.append(semantic_type)
-				
-
-
-		for item in DOM_READ_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_DOM_TREE
-				semantic_types.append(semantic_type)
-				
-
-		for item in WEB_STORAGE_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_WEB_STORAGE
-				semantic_types.append(semantic_type)
-				
-
-		for item in DOM_READ_COOKIE_STRINGS:
-			if item in code:
-				semantic_type = SemTypeDefinitions.RD_COOKIE
-				semantic_types.append(semantic_type)
-				
-
-		for item in PUSH_SUBSCRIPTION_API:
-			if item in code:
-				semantic_type = SemTypeDefinitions.REQ_PUSH_SUB
-				semantic_types.append(semantic_type)
-
-
-		for identifier in idents:
-
-			for item in WIN_LOC_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_WIN_LOC
-					semantic_types.append(semantic_type)
-					
-
-			for item in WIN_NAME_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_WIN_NAME
-					semantic_types.append(semantic_type)
-					
-
-			for item in DOC_REF_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_DOC_REF
-					semantic_types.append(semantic_type)
-
-
-
-			for item in PM_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_PM
-					semantic_types.append(semantic_type)
-					
-
-
-			for item in DOM_READ_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_DOM_TREE
-					semantic_types.append(semantic_type)
-					
-
-			for item in WEB_STORAGE_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_WEB_STORAGE
-					semantic_types.append(semantic_type)
-					
-
-			for item in DOM_READ_COOKIE_STRINGS:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.RD_COOKIE
-					semantic_types.append(semantic_type)
-		
-			for item in PUSH_SUBSCRIPTION_API:
-				if item in identifier:
-					semantic_type = SemTypeDefinitions.REQ_PUSH_SUB
-					semantic_types.append(semantic_type)
+		found |= matcher.match_mask(program_slice[0])
+		for identifier in program_slice[2]:
+			found |= matcher.match_mask(identifier)
 
-
-	if len(semantic_types):
-		return list(set(semantic_types))
+	if found:
+		return matcher.labels_of_mask(found)
 
 	return [SemTypeDefinitions.NON_REACHABLE]
 
@@ -401,14 +242,7 @@ def getWindowOpenCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the xhr.open() function
 	"""
 
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
-	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-	WHERE callee.Code= 'window'
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'window_open_calls')
 	return results
 
 
@@ -419,14 +253,7 @@ def getXhrOpenCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the xhr.open() function
 	"""
 
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
-	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	WHERE callee.Code <> 'window'
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'xhr_open_calls')
 	return results
 
 
@@ -438,12 +265,7 @@ def getFetchCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the fetch() function
 	"""
 
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}), 
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'fetch_calls')
 	return results
 
 
@@ -457,15 +279,7 @@ def getAjaxCallExpressions(tx):
 
 	# argument a can be ObjectExpression, Identifier, or MemberExpression
 	# variable relation length will capture function chains, e.g., $.ajax({}).done().success().failure() etc.
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf*1..10]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
-	(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier' }),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-	OPTIONAL MATCH (a)-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
-	(n4)-[:AST_parentOf {RelationType: 'value'}]->(aa)
-	RETURN t, n, a, aa
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'ajax_calls')
 
 	return results
 
@@ -477,12 +291,7 @@ def xhrPostCallExpressions(tx):
 
 	@Note: xhrPost is used e.g., in tinytinyrss
 	"""
-	query="""
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'xhrPost'}), 
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	RETURN t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'xhr_post_calls')
 	return results
 
 
@@ -495,13 +304,7 @@ def getAsyncRequestCallExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the asyncRequest() function
 	"""
 
-	query="""
-	MATCH (t)-[:AST_parentOf]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
-	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
-	RETURN  tt, t, n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'async_request_calls')
 	return results
 
 
@@ -513,13 +316,7 @@ def getSetFormCallExpressions(tx):
 	@return 
 	"""
 
-	query = """
-	MATCH (call_expression {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-(member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(set_form {Code:'setForm', Type: 'Identifier'}),
-	(call_expression)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(arg), (t)-[:AST_parentOf]->(call_expression)
-	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
-	RETURN tt, t, call_expression as n, arg as a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'set_form_calls')
 	return results
 
 
@@ -529,13 +326,7 @@ def getPageSpeedExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = callExpression, a=URL argument of the asyncRequest() function
 	"""
 
-	query = """
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(run {Type: 'Identifier', Code: 'Run'}),
-	(member_expr)-[:AST_parentOf {RelationType: 'object'}]->(inner_member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(ci {Type: 'Identifier', Code: 'CriticalImages'}), (inner_member_expression)-[:AST_parentOf {RelationType: 'object'}]->(ps {Type: 'Identifier', Code: 'pagespeed'}),
-	(call_expr)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-	RETURN t, call_expr AS n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'pagespeed_calls')
 	return results
 
 
@@ -545,17 +336,10 @@ def getAjaxSettingObjectExpressions(tx):
 	@return bolt result (t, n, a): where t= top level exp statement, n = ObjectExpression, a=URL argument of the ajaxSettings{} 
 	"""
 
-	query = """
-	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf*1..5]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'arguments'}]->(obj_expr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(ajaxSettingsProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(ajaxSettingsIdentifier {Type: 'Identifier', Code: 'ajaxSettings'}),
-	(ajaxSettingsProperty)-[:AST_parentOf {RelationType: 'value'}]->(ajaxSettingsObjExpr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(urlProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(url {Type: 'Identifier', Code: 'url'}),
-	(urlProperty)-[:AST_parentOf {RelationType: 'value'}]->(a)
-	RETURN t, ajaxSettingsProperty AS n, a
-	"""
-	results = tx.run(query)
+	results = QC.run_query(tx, 'ajax_setting_objects')
 	return results
 
 
-
 def getHttpRequestCallExpressionUrlArgument(tx, node, function_type):
 	
 	"""
@@ -567,35 +351,8 @@ def getHttpRequestCallExpressionUrlArgument(tx, node, function_type):
 
 	nodeId = node['Id']
 	out = []
-	query = ''
-	if function_type == 'fetch':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}), 
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	elif function_type == 'open':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}), 
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	elif function_type == 'ajax':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
-		(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier', Code: '$'}),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(n3 {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
-		(n4)-[:AST_parentOf {RelationType: 'value'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	elif function_type == 'asyncRequest':
-		query="""
-		MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n { Id: '%s', Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
-		(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
-		RETURN t, n, a
-		"""%(nodeId)
-	if len(query):
-		out = tx.run(query)
+	if function_type in ['fetch', 'open', 'ajax', 'asyncRequest']:
+		out = QC.run_query(tx, '%s_call_url_argument'%function_type, id=nodeId)
 	return out
 
 
@@ -609,12 +366,7 @@ def getIdentifierLocalAndGlobalValues(tx, varname):
 	"""
 
 	stack = []
-	query = """
-		MATCH (n { Type:'Identifier', Code: '%s'})<-[:AST_parentOf {RelationType: 'id'}]-(vdtor {Type: 'VariableDeclarator'})<-[:AST_parentOf {RelationType:'declarations'}]-(vdtion),
-		(vdtor)-[:AST_parentOf {RelationType: 'init'}]->(value)
-		RETURN vdtion, value
-	"""%(varname)
-	results = tx.run(query)
+	results = QC.run_query(tx, 'identifier_declarations', varname=varname)
 
 	for pair in results:
 		# must at most one pair exist, otherwise, there are 2 or more potential values defined for a single variable at different scopes!
@@ -674,6 +426,14 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 	sinks_list = sinks_json['sinks']
 
 	storage = {}
+	# program slices of this webpage, shared by all sinks
+	slicing_cache = DF.SlicingCache()
+	# (sink nid, sink cfg node, taintable identifiers) of each sink
+	sink_slicing_tasks = []
+
+	# script-local slices of the sinks computed on other webpages that load the same scripts
+	script_cache = ScriptCacheModule.get_script_cache()
+	script_hashes = script_cache.get_script_hashes(webpage_directory) if script_cache is not None else {}
 
 
 	for sink_node in sinks_list:
@@ -714,10 +474,39 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 			"variables": {}
 		}
 
-		
+		script_hash = script_hashes.get(sink_node["script"].split('/')[-1])
+		if script_hash is not None:
+			sink_ast_node = QU.get_node_by_id(tx, sink_id)
+			uncached_sink_identifiers = []
+			for varname in taintable_sink_identifiers:
+				finding_key = ScriptCacheModule.get_sink_finding_key(sink_node, sink_ast_node, varname)
+				finding = script_cache.get_finding('rh', script_hash, finding_key) if finding_key is not None else None
+				if finding is None or not DF.is_script_local_finding(tx, varname, sink_cfg_node, finding, slicing_cache):
+					uncached_sink_identifiers.append(varname)
+				else:
+					storage[nid]["variables"][varname] = finding
+					sink_node["taintable_semantic_types"].extend(finding["semantic_types"])
+			taintable_sink_identifiers = uncached_sink_identifiers
+
+		sink_slicing_tasks.append((nid, sink_cfg_node, taintable_sink_identifiers))
+
+
+	if str(constantsModule.SLICE_ALL_SINKS_TOGETHER).lower() == 'true':
+		# one backward PDG traversal for all sinks of the page; the slices below are answered from it
+		seeds = [(sink_cfg_node, varname) for _, sink_cfg_node, taintable_sink_identifiers in sink_slicing_tasks for varname in taintable_sink_identifiers]
+		closure_size = DF.compute_backward_closure(tx, seeds, slicing_cache)
+		LOGGER.info('[TR] backward PDG closure of %d sinks: %d statement variables'%(len(sink_slicing_tasks), closure_size))
+
+
+	for nid, sink_cfg_node, taintable_sink_identifiers in sink_slicing_tasks:
+
+		sink_node = storage[nid]["sink"]
+		script_hash = script_hashes.get(sink_node["script"].split('/')[-1])
+		sink_ast_node = QU.get_node_by_id(tx, str(sink_node["id"])) if script_hash is not None else None
 
 		for varname in taintable_sink_identifiers:
-			slice_values = DF._get_varname_value_from_context(tx, varname, sink_cfg_node)
+			truncated_slices = slicing_cache.truncated_slices
+			slice_values = DF._get_varname_value_from_context(tx, varname, sink_cfg_node, slicing_cache=slicing_cache)
 
 			if DEBUG: print(varname, slice_values)
 
@@ -727,6 +516,10 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 				"semantic_types": semantic_types
 			}
 
+			finding_key = ScriptCacheModule.get_sink_finding_key(sink_node, sink_ast_node, varname) if script_hash is not None else None
+			if finding_key is not None and slicing_cache.truncated_slices == truncated_slices and DF.is_script_local_slice(tx, varname, sink_cfg_node, slice_values, slicing_cache):
+				script_cache.add_finding('rh', script_hash, finding_key, storage[nid]["variables"][varname])
+
 			lst = storage[nid]["sink"]["taintable_semantic_types"]
 			lst.extend(semantic_types)
 			storage[nid]["sink"]["taintable_semantic_types"] = lst
@@ -844,6 +637,10 @@ def run_traversals(tx, webpage_url, webpage_directory, webpage_directory_hash='x
 		json.dump(json_buffer, fd, ensure_ascii=False, indent=4)
 
 
+	LOGGER.info('[TR] slicing cache: %s'%slicing_cache)
+	if script_cache is not None:
+		script_cache.flush()
+		LOGGER.info('[TR] script cache: %s'%script_cache)
 	LOGGER.info('[TR] finished running the queries.')
 
 
@@ -32,6 +32,7 @@ import time
 import json
 import constants as constantsModule
 import utils.io as IOModule
+import utils.job_ledger as JobLedgerModule
 from utils.logging import logger as LOGGER
 
 
@@ -69,7 +70,14 @@ def start_verification_for_site(cmd, website_url, cwd, timeout=10800, overwrite=
 		webapp_pages = [item for item in webapp_pages if len(item) == 64]
 
 
+	ledger = JobLedgerModule.get_job_ledger()
+
 	for webpage in webapp_pages:
+		# do NOT re-analyze webpages that the job ledger has finished (or given up)
+		if ledger is not None and str(overwrite).lower() == 'false' and not ledger.should_run(website_url, webpage, 'rh_verification'):
+			LOGGER.info('[verification] skipping webpage %s as per the job ledger'%webpage)
+			continue
+
 		webpage_folder = os.path.join(webapp_data_directory, webpage)
 		if os.path.exists(webpage_folder):
 
@@ -82,8 +90,22 @@ def start_verification_for_site(cmd, website_url, cwd, timeout=10800, overwrite=
 					LOGGER.info('[verification] taintflow verification results already exists for webpage: %s'%webpage_folder)
 					continue
 
+			if ledger is not None:
+				ledger.start(website_url, webpage, 'rh_verification')
+
 			command = cmd.replace("PAGE_URL_HASH", webpage).replace("PAGE_URL_DIR", webpage_folder).replace("DYNAMIC_OR_STATIC", "dynamic")
-			ret = IOModule.run_os_command(command, cwd= cwd, timeout=timeout, print_stdout=True, log_command=True)
+			ret = IOModule.run_os_command(command, cwd= cwd, timeout=timeout, print_stdout=True, log_command=True,
+				memory_limit=constantsModule.PROCESS_MEMORY_LIMIT, cpu_limit=constantsModule.PROCESS_CPU_LIMIT)
+
+			if ledger is not None:
+				if ret < 0:
+					ledger.fail(website_url, webpage, 'rh_verification', exit_code=ret, timed_out=True)
+				elif ret != 0:
+					# e.g., the verifier crashed; retried by the next run
+					ledger.fail(website_url, webpage, 'rh_verification', exit_code=ret)
+				else:
+					ledger.finish(website_url, webpage, 'rh_verification', exit_code=ret)
+
 			LOGGER.info('[verification] finished analyis for: %s'%(webpage_folder))
 
 
@@ -125,6 +147,7 @@ def start_verification_for_page(cmd, webpage_folder, cwd, timeout=10800, overwri
 					LOGGER.info('[verification] sink flow verification results already exists for webpage: %s'%webpage_folder_absolute)
 					return -1
 
-		ret = IOModule.run_os_command(command, cwd= cwd, timeout=timeout, print_stdout=True, log_command=True)
+		ret = IOModule.run_os_command(command, cwd= cwd, timeout=timeout, print_stdout=True, log_command=True,
+			memory_limit=constantsModule.PROCESS_MEMORY_LIMIT, cpu_limit=constantsModule.PROCESS_CPU_LIMIT)
 		LOGGER.info('[verification] finished analyis for: %s'%(webpage_folder))	
 
@@ -68,10 +68,88 @@ NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(NEO4J_USER, NEO4J_PASS
 # use docker for neo4j 
 NEO4J_USE_DOCKER = True
 
+# lease pre-created neo4j instances from a warm pool instead of creating one instance per webpage
+NEO4J_USE_INSTANCE_POOL = False
+NEO4J_INSTANCE_POOL_SIZE = 1
+# port offset between consecutive instances of the pool
+NEO4J_INSTANCE_POOL_PORT_STEP = 10
+
+# port offset between the neo4j instances of two consecutive workers of `run_pipeline --workers N`
+NEO4J_WORKER_PORT_STEP = 100
+
+# drivers are shared per bolt connection string (see `hpg_neo4j/driver_registry.py`):
+# max pooled connections per driver, and max seconds to wait for a free connection of the pool
+NEO4J_MAX_CONNECTION_POOL_SIZE = 8
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = 60
+# number of records fetched per bolt round trip
+NEO4J_FETCH_SIZE = 1000
+# commit the transaction of the traversals and begin a new one every N queries; 0 for a single transaction
+NEO4J_SPLIT_TRANSACTION_QUERIES = 0
+
+# resource caps of the crawler, static analysis and verifier processes (see `utils/process_runner.py`):
+# max total resident memory (MB) of each process group, and max CPU seconds of each process; None for no cap
+PROCESS_MEMORY_LIMIT = None
+PROCESS_CPU_LIMIT = None
+# a delegated cgroup v2 directory, under which each capped process group gets its own cgroup with `memory.max`;
+# if None, the memory of the process groups is polled instead
+PROCESS_CGROUP_ROOT = None
+
+# import the HPGs of all webpages of a site (or a batch of sites) into a single neo4j database,
+# where each node is tagged with the partition (i.e., webpage hash) it belongs to
+NEO4J_USE_PARTITIONED_IMPORT = False
+HPG_PARTITION_PROPERTY = 'PageId'
+
+# answer the AST and PDG navigation queries of the traversals from an in-memory HPG loaded from the csv files,
+# and the other queries with neo4j (request hijacking and open redirect, see `hpg_neo4j/in_memory_graph.py`)
+HPG_USE_IN_MEMORY_ENGINE = False
+
+# codec of the compressed HPG csv files: `gzip` (.gz) or `zstd` (.zst, needs the `zstandard` package)
+HPG_COMPRESSION_CODEC = 'gzip'
+# import and analyze the compressed HPG csv files as streams, instead of decompressing them to disk first
+HPG_STREAM_COMPRESSED = False
+
+# import the HPG without the library scripts that are not connected to the sinks of `sinks.out.json`
+# (see `hpg_neo4j/hpg_pruning.py`); libraries are identified by their script hash, by a library name at a word boundary
+# of the file name of their url (e.g., `jquery-3.6.0.min.js`, but not `/jquery-plugins/app.js`), or by the host of their url
+HPG_PRUNE_LIBRARIES = False
+HPG_LIBRARY_HASHES_FILE = None
+HPG_LIBRARY_KEYWORDS = ['jquery', 'jqueryui', 'bootstrap', 'analytics', 'gtag', 'gtm',
+	'react', 'react-dom', 'angular', 'vue', 'lodash', 'underscore', 'moment', 'modernizr', 'polyfill', 'swiper', 'slick']
+HPG_LIBRARY_HOSTS = ['google-analytics.com', 'googletagmanager.com', 'ajax.googleapis.com', 'cdnjs.cloudflare.com', 'code.jquery.com']
+
+# import only the part of the HPG that the request hijacking traversals can reach backwards from the sinks of
+# `sinks.out.json` (see `hpg_neo4j/hpg_sink_cone.py`)
+HPG_SINK_CONE_PRUNING = False
+
+# import the HPGs with the enclosing functions and blocks of their nodes (see `hpg_neo4j/hpg_enclosing.py`); the catalog
+# queries use them instead of the unbounded `AST_parentOf*` and `CFG_parentOf*` patterns on the HPGs that have them.
+# this loads the whole HPG in memory once more before each import, hence it is disabled by default
+HPG_ENCLOSING_PROPERTIES = False
+
+# construct and analyze the HPG of only one webpage per cluster of webpages with identical scripts,
+# and link its results to the other webpages of the cluster
+WEBPAGE_DEDUP_ENABLED = False
+
+# reuse the script-local sink slices of each script (keyed by the script hash of `scripts_mapping.json`) across webpages and sites
+SCRIPT_CACHE_ENABLED = False
+SCRIPT_CACHE_DIRECTORY = os.path.join(DATA_DIR, 'script_cache')
+
+# record the (site, page, stage) jobs of a site list run in an sqlite ledger, and skip finished jobs on restart
+JOB_LEDGER_ENABLED = False
+JOB_LEDGER_FILE = os.path.join(DATA_DIR, 'jobs.sqlite')
+# max number of attempts of a failed job, and seconds before its first retry (doubles with each attempt)
+JOB_LEDGER_MAX_ATTEMPTS = 3
+JOB_LEDGER_RETRY_BACKOFF = 60
+
 # neo4j graph csv file names
 NODE_INPUT_FILE_NAME = 'nodes.csv'
 RELS_INPUT_FILE_NAME = 'rels.csv'
 RELS_DYNAMIC_INPUT_FILE_NAME = 'rels_dynamic.csv'
+# columnar (parquet) copies of the hpg csv files, see `hpg_neo4j/hpg_columnar.py`
+NODE_PARQUET_FILE_NAME = 'nodes.parquet'
+RELS_PARQUET_FILE_NAME = 'rels.parquet'
+# hash of the csv files the parquet files were converted from
+HPG_PARQUET_SOURCE_FILE_NAME = 'hpg_parquet_source.json'
 
 # ineo neo4j manager bin
 INEO_BIN = os.path.join(os.path.join(os.path.join(BASE_DIR, "ineo"), "bin"), "ineo")
@@ -121,7 +199,12 @@ FUNCTION_CALL_DEFINITION_BODY = '<< FUNCTION_CALL_DEFINITION >>'
 # esprima program node
 PROGRAM_NODE_INDEX = '1'
 WINDOW_GLOBAL_OBJECT = 'window [GlobalWindowObject]'
+# max nested sub-slices, and max expanded sub-slices, of the backward slice of a variable
 MAX_RECURSE = 100
+MAX_SLICE_NODES = 5000
+# compute the backward PDG closure of all sinks of a webpage at once before slicing each sink; the closure is fetched
+# up front without the depth budget of each slice (`MAX_RECURSE`), hence it is disabled by default
+SLICE_ALL_SINKS_TOGETHER = False
 outputCSVDelimiter = '¿'
 
 
@@ -167,7 +167,7 @@ def import_data_inside_container(container_name, database_name, relative_import_
 		return 1
 
 	elif mode == 'graphML':
-		return DU.exec_fn_within_transaction(import_data_inside_container_with_cypher, database_name, relative_import_path)
+		return DU.exec_fn_within_transaction(import_data_inside_container_with_cypher, database_name, relative_import_path, conn=constants.NEO4J_CONN_STRING)
 
 
 
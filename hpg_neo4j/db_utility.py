@@ -31,15 +31,17 @@ import subprocess
 import os
 import sys
 import time
+import socket
 import requests
 import uuid
+from urllib.parse import urlparse
 
 
 import constants as constantsModule
 # import hpg_neo4j.orm as ORMModule
 from utils.utility import _hash
-from utils.io import run_os_command
-from neo4j import GraphDatabase
+from utils.io import run_os_command, graph_files_for_import
+import hpg_neo4j.driver_registry as DriverRegistryModule
 from utils.logging import logger
 
 
@@ -121,8 +123,8 @@ def API_neo4j_prepare(csv_absolute_path, nodes_name=constantsModule.NODE_INPUT_F
 	run_os_command(START_NEO4J_COMMAND)
 
 	
-	logger.info("Neo4J DB setup in progress. Waiting for 10 seconds.")
-	time.sleep(10)
+	logger.info("Neo4J DB setup in progress. Waiting for the bolt connection.")
+	wait_for_neo4j_bolt_connection(timeout=60, bolt_conn=constantsModule.NEO4J_CONN_STRING)
 
 	if load_dom_tree_if_exists:
 		dom_tree_nodes = ORMModule.DOMSnapshot.nodes.all()
@@ -172,7 +174,7 @@ def activate_existing_neo4j_db(database_name):
 		if constantsModule.DEBUG_PRINTS:
 			logger.info("Neo4J DB setup successful.")
 
-		time.sleep(3)
+		wait_for_neo4j_bolt_connection(timeout=60, bolt_conn=constantsModule.NEO4J_CONN_STRING)
 
 		return True
 
@@ -195,62 +197,161 @@ def does_neo4j_db_exists(database_name):
 # 	Current APIs
 # ------------------------------------------------------------------------------------ #
 
-def exec_fn_within_transaction(fn, *args, conn=constantsModule.NEO4J_CONN_STRING, conn_timeout=None, keep_alive=True):
+def exec_fn_within_transaction(fn, *args, conn=constantsModule.NEO4J_CONN_STRING, conn_timeout=None, keep_alive=True, split_transactions=False):
 	
 	"""
 	wraps a function within a neo4j transaction
 	@param {pointer} fn: function 
 	@param {param-list} *args: positional arguments
+	@param {string} conn: bolt connection string; the driver of the connection string is shared, see `hpg_neo4j.driver_registry`
+	@param {int} conn_timeout: seconds after which pooled connections are renewed (None for the driver default)
+	@param {bool} split_transactions: whether fn tolerates its queries being committed in chunks; if so, and
+		`NEO4J_SPLIT_TRANSACTION_QUERIES` is set, fn runs in a sequence of smaller transactions
 	@return fn output: execute fn with transaction and the list of passed args 
 	"""
 	logger.info('quering on connection: %s'%str(conn))
 	out = None
 
-	if conn_timeout is None:
-		neo_driver = GraphDatabase.driver(conn, auth=(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS))
-		with neo_driver.session() as session:
-			with session.begin_transaction() as tx:
-				out = fn(tx, *args)
-
-		return out
-	else:
+	max_connection_lifetime = None
+	if conn_timeout is not None:
 		max_connection_lifetime = int(conn_timeout) + 60 # in seconds
-		neo_driver = GraphDatabase.driver(conn, auth=(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS), max_connection_lifetime=max_connection_lifetime, keep_alive=keep_alive)
-		with neo_driver.session() as session:
+	neo_driver = DriverRegistryModule.get_driver_registry().get_driver(conn, max_connection_lifetime=max_connection_lifetime, keep_alive=keep_alive)
+
+	with neo_driver.session(fetch_size=int(constantsModule.NEO4J_FETCH_SIZE)) as session:
+		if split_transactions and constantsModule.NEO4J_SPLIT_TRANSACTION_QUERIES:
+			out = DriverRegistryModule.exec_fn_within_split_transaction(session, fn, *args)
+		else:
 			with session.begin_transaction() as tx:
 				out = fn(tx, *args)
 
-		return out
+	return out
+
+
+def close_driver(conn=constantsModule.NEO4J_CONN_STRING):
+	"""
+	closes the shared driver of the given connection string and its pooled connections;
+	call before the neo4j instance behind `conn` is stopped
+	"""
+	DriverRegistryModule.get_driver_registry().close_driver(conn)
+
 
 
+# bolt handshake: magic preamble followed by four proposed protocol versions (4.4, 4.3, 4.0, 3.0)
+BOLT_HANDSHAKE = b'\x60\x60\xb0\x17' + b'\x00\x00\x04\x04' + b'\x00\x00\x03\x04' + b'\x00\x00\x00\x04' + b'\x00\x00\x00\x03'
 
+# lines of `neo4j.log` marking the end of a successful or a failed start
+NEO4J_LOG_STARTED = 'Started.'
+NEO4J_LOG_FAILED = 'Failed to start'
 
 
-def wait_for_neo4j_bolt_connection(timeout=60, conn=constantsModule.NEO4J_CONN_HTTP_STRING):
+def probe_bolt_connection(bolt_conn=constantsModule.NEO4J_CONN_STRING, timeout=1):
 	"""
-	wait until neo4j access bolt/http connections
+	@param {string} bolt_conn: bolt connection string, e.g., bolt://127.0.0.1:7687
+	@param {float} timeout: socket timeout in seconds
+	@return {bool} whether a bolt server answers the handshake on the given address
 	"""
-	timer = 0
-	increment = 5
-	RET = False
+	address = urlparse(bolt_conn)
+	try:
+		with socket.create_connection((address.hostname or '127.0.0.1', address.port or 7687), timeout=timeout) as sock:
+			sock.sendall(BOLT_HANDSHAKE)
+			response = b''
+			while len(response) < 4:
+				chunk = sock.recv(4 - len(response))
+				if not chunk:
+					return False
+				response += chunk
+	except OSError:
+		return False
 
-	while True:
-		try:
-			r = requests.get(conn, verify=False, timeout=3) # 3 seconds timeout
-			s = str(r.status_code)
-			if s.startswith('2'):
-				logger.info('neo4j is now ready to accept bolt connections.')
-				RET = True
+	if response == b'\x00\x00\x00\x00':
+		logger.warning('bolt server at %s does not support the proposed protocol versions.'%bolt_conn)
+	return True
+
+
+def _probe_http_connection(conn):
+	try:
+		r = requests.get(conn, verify=False, timeout=3) # 3 seconds timeout
+		return str(r.status_code).startswith('2')
+	except Exception:
+		return False
+
+
+def _read_log_status(log_file, log_offset):
+	"""
+	@return {tuple} (status, offset): status is True if the log reports a successful start after
+		`log_offset`, False if it reports a failed start, and None otherwise
+	"""
+	if log_file is None or not os.path.exists(log_file):
+		return None, log_offset
+
+	if os.path.getsize(log_file) < log_offset:
+		# the log was rotated
+		log_offset = 0
+
+	status = None
+	with open(log_file, 'r', encoding='utf-8', errors='replace') as fd:
+		fd.seek(log_offset)
+		for line in fd:
+			if not line.endswith('\n'):
+				# partially written line, read it again in the next round
 				break
-		except:
-			time.sleep(increment)
-			timer+= increment
-			if timer >= timeout:
-				logger.error('neo4j is not accepting bolt connections.')
-				RET = False
+			log_offset += len(line.encode('utf-8', errors='replace'))
+			if NEO4J_LOG_FAILED in line:
+				status = False
 				break
+			if line.rstrip().endswith(NEO4J_LOG_STARTED):
+				status = True
+				break
+	return status, log_offset
+
+
+def get_log_offset(log_file):
+	"""
+	@return {int} current size of the given log file, i.e., where the lines of the next neo4j start begin
+	"""
+	if log_file is not None and os.path.exists(log_file):
+		return os.path.getsize(log_file)
+	return 0
 
-	return RET
+
+def wait_for_neo4j_bolt_connection(timeout=60, conn=constantsModule.NEO4J_CONN_HTTP_STRING, bolt_conn=None, log_file=None, log_offset=0):
+	"""
+	wait until neo4j access bolt/http connections
+	@param {int} timeout: max seconds to wait
+	@param {string} conn: http connection string, probed only if `bolt_conn` is not given
+	@param {string} bolt_conn: bolt connection string, probed with a bolt handshake
+	@param {string} log_file: `neo4j.log` of the instance; its `Started.` line ends the wait early,
+		and a failed start aborts it
+	@param {int} log_offset: size of `log_file` before the instance was started, see `get_log_offset()`
+	@return {bool} whether or not neo4j accepts connections
+	"""
+	deadline = time.monotonic() + timeout
+	increment = 0.05
+
+	while True:
+		log_status, log_offset = _read_log_status(log_file, log_offset)
+		if log_status is False:
+			logger.error('neo4j failed to start, see: %s'%log_file)
+			return False
+
+		if log_status is True:
+			# neo4j logs `Started.` once its connectors are up
+			ready = True
+		elif bolt_conn is not None:
+			ready = probe_bolt_connection(bolt_conn)
+		else:
+			ready = _probe_http_connection(conn)
+
+		if ready:
+			logger.info('neo4j is now ready to accept bolt connections.')
+			return True
+
+		if time.monotonic() >= deadline:
+			logger.error('neo4j is not accepting bolt connections.')
+			return False
+
+		time.sleep(increment)
+		increment = min(increment * 1.5, 1)
 
 
 def ineo_create_db_instance(db_name, port, neo4j_version='4.2.3'):
@@ -272,11 +373,16 @@ def ineo_create_db_instance(db_name, port, neo4j_version='4.2.3'):
 
 
 def ineo_start_db_instance(db_name):
+	"""
+	@return {int} offset of the instance log before the start, see `wait_for_neo4j_bolt_connection()`
+	"""
 
+	log_offset = get_log_offset(get_ineo_instance_log_file(db_name))
 	INEO_BIN = constantsModule.INEO_BIN
 	command = "INEO_BIN start {0}".format(db_name)
 	command = command.replace("INEO_BIN", INEO_BIN)
 	run_os_command(command)
+	return log_offset
 
 def ineo_stop_db_instance(db_name):
 
@@ -289,13 +395,33 @@ def neoadmin_import_db_instance(ineo_db_name, neo4j_db_name, nodes_file, rels_fi
 
 	# script: BASE_DIR/ineo/instances/DB_NAME/bin/neo4j-admin
 	NEO4j_ADMIN = os.path.join(os.path.join(os.path.join(os.path.join(os.path.join(constantsModule.BASE_DIR, "ineo"), "instances"), str(ineo_db_name)), "bin"), "neo4j-admin")
-	if rels_dynamic_file:
-		command = "NEO4j_ADMIN import --database={0} --nodes={1} --relationships={2},{3} --delimiter='¿' --skip-bad-relationships=true --skip-duplicate-nodes=true --bad-tolerance=100000 --ignore-extra-columns=true --skip-bad-entries-logging=true".format(neo4j_db_name, nodes_file, rels_file, rels_dynamic_file)
-	else:
-		command = "NEO4j_ADMIN import --database={0} --nodes={1} --relationships={2} --delimiter='¿' --skip-bad-relationships=true --skip-duplicate-nodes=true --bad-tolerance=100000 --ignore-extra-columns=true --skip-bad-entries-logging=true".format(neo4j_db_name, nodes_file, rels_file)
-	
-	command = command.replace("NEO4j_ADMIN", NEO4j_ADMIN)
-	run_os_command(command, print_stdout=True, log_command=True, prettify=True)
+
+	# the csv files may be compressed: neo4j-admin reads gzip files as they are, and other codecs through named pipes
+	with graph_files_for_import([nodes_file, rels_file] + ([rels_dynamic_file] if rels_dynamic_file else [])) as import_files:
+		if rels_dynamic_file:
+			command = "NEO4j_ADMIN import --database={0} --nodes={1} --relationships={2},{3} --delimiter='¿' --skip-bad-relationships=true --skip-duplicate-nodes=true --bad-tolerance=100000 --ignore-extra-columns=true --skip-bad-entries-logging=true".format(neo4j_db_name, *import_files)
+		else:
+			command = "NEO4j_ADMIN import --database={0} --nodes={1} --relationships={2} --delimiter='¿' --skip-bad-relationships=true --skip-duplicate-nodes=true --bad-tolerance=100000 --ignore-extra-columns=true --skip-bad-entries-logging=true".format(neo4j_db_name, *import_files)
+
+		command = command.replace("NEO4j_ADMIN", NEO4j_ADMIN)
+		run_os_command(command, print_stdout=True, log_command=True, prettify=True)
+
+
+def neoadmin_import_partitioned_db_instance(ineo_db_name, neo4j_db_name, partition_files):
+	"""
+	imports the HPGs of several webpages into the same database with a single neo4j-admin call
+	@param {list} partition_files: list of (nodes_file, rels_file) tuples, each with its own id space in the header
+	"""
+
+	# script: BASE_DIR/ineo/instances/DB_NAME/bin/neo4j-admin
+	NEO4j_ADMIN = os.path.join(get_ineo_instance_directory(ineo_db_name), "bin", "neo4j-admin")
+	with graph_files_for_import([file_path for files in partition_files for file_path in files]) as import_files:
+		nodes_args = ' '.join(["--nodes={0}".format(nodes_file) for nodes_file in import_files[0::2]])
+		rels_args = ' '.join(["--relationships={0}".format(rels_file) for rels_file in import_files[1::2]])
+		command = "NEO4j_ADMIN import --database={0} {1} {2} --delimiter='¿' --skip-bad-relationships=true --skip-duplicate-nodes=true --bad-tolerance=100000 --ignore-extra-columns=true --skip-bad-entries-logging=true".format(neo4j_db_name, nodes_args, rels_args)
+
+		command = command.replace("NEO4j_ADMIN", NEO4j_ADMIN)
+		run_os_command(command, print_stdout=True, log_command=True, prettify=True)
 
 
 def ineo_set_bolt_port_for_db_instance(db_name, port_string):
@@ -322,20 +448,133 @@ def ineo_remove_db_instance(db_name):
 	run_os_command(command)
 
 
-def ineo_set_initial_password_and_restart(db_name, password=constantsModule.NEO4J_PASS):
+def get_ineo_instance_directory(db_name):
+	"""
+	@param {string} db_name: name of the ineo instance
+	@return {string} the directory of the ineo instance, i.e., BASE_DIR/ineo/instances/DB_NAME
+	"""
+	return os.path.join(os.path.join(os.path.join(constantsModule.BASE_DIR, "ineo"), "instances"), str(db_name))
+
+
+def get_ineo_instance_log_file(db_name):
+	"""
+	@param {string} db_name: name of the ineo instance
+	@return {string} the `neo4j.log` file of the ineo instance
+	"""
+	return os.path.join(os.path.join(get_ineo_instance_directory(db_name), "logs"), "neo4j.log")
+
+
+def neoadmin_set_initial_password(db_name, password=constantsModule.NEO4J_PASS):
 
 	# script: BASE_DIR/ineo/instances/DB_NAME/bin/neo4j-admin
-	NEO4j_ADMIN = os.path.join(os.path.join(os.path.join(os.path.join(os.path.join(constantsModule.BASE_DIR, "ineo"), "instances"), str(db_name)), "bin"), "neo4j-admin")
+	NEO4j_ADMIN = os.path.join(os.path.join(get_ineo_instance_directory(db_name), "bin"), "neo4j-admin")
 	command = "NEO4j_ADMIN set-initial-password {0}".format(password)
 	command = command.replace("NEO4j_ADMIN", NEO4j_ADMIN)
 	run_os_command(command)
+
+
+def ineo_set_initial_password_and_start(db_name, password=constantsModule.NEO4J_PASS):
+	"""
+	sets the password of an instance that was never started, and starts it
+	@return {int} offset of the instance log before the start, see `wait_for_neo4j_bolt_connection()`
+	"""
+	neoadmin_set_initial_password(db_name, password=password)
+	return ineo_start_db_instance(db_name)
+
+
+def ineo_set_initial_password_and_restart(db_name, password=constantsModule.NEO4J_PASS):
+
+	neoadmin_set_initial_password(db_name, password=password)
 	time.sleep(2)
 	ineo_restart_neo4j(db_name)
 
 
 
+# -------------------------------------------------------------------------- #
+#		HPG Schema
+# -------------------------------------------------------------------------- #
+
+# common label of the HPG nodes; the query anchors use it to hit the schema indexes
+HPG_NODE_LABEL = 'ASTNode'
 
 
+def get_hpg_schema_statements(partitioned=False):
+	"""
+	@param {bool} partitioned: whether the database holds the HPGs of several webpages (node ids are then not unique)
+	@return {list} cypher statements creating the constraints and indexes of the HPG
+	"""
+	statements = []
+	if partitioned:
+		statements.append("CREATE INDEX hpg_node_id IF NOT EXISTS FOR (n:%s) ON (n.Id)"%HPG_NODE_LABEL)
+		statements.append("CREATE INDEX hpg_node_partition IF NOT EXISTS FOR (n:%s) ON (n.%s)"%(HPG_NODE_LABEL, constantsModule.HPG_PARTITION_PROPERTY))
+	else:
+		statements.append("CREATE CONSTRAINT hpg_node_id IF NOT EXISTS ON (n:%s) ASSERT n.Id IS UNIQUE"%HPG_NODE_LABEL)
+	statements.append("CREATE INDEX hpg_node_type IF NOT EXISTS FOR (n:%s) ON (n.Type)"%HPG_NODE_LABEL)
+	statements.append("CREATE INDEX hpg_node_code IF NOT EXISTS FOR (n:%s) ON (n.Code)"%HPG_NODE_LABEL)
+	return statements
 
 
+def _label_hpg_nodes(session, batch_size):
+	"""
+	puts the common label on the nodes of a legacy HPG in one pass over the nodes, committed in batches:
+	with `apoc.periodic.iterate` if the APOC plugin is installed, otherwise by batches of internal node ids
+	(`CALL { ... } IN TRANSACTIONS` needs neo4j 4.4, and the ineo instances run 4.2)
+	"""
+
+	try:
+		session.run("""
+		CALL apoc.periodic.iterate('MATCH (n) WHERE NOT n:%s RETURN n', 'SET n:%s', {batchSize: %d})
+		"""%(HPG_NODE_LABEL, HPG_NODE_LABEL, int(batch_size))).consume()
+		return
+	except Exception as e:
+		logger.debug('labeling the hpg nodes without apoc: %s'%str(e))
+
+	record = session.run("MATCH (n) RETURN max(id(n)) AS max_id").single()
+	max_id = record['max_id'] if record is not None else None
+	if max_id is None:
+		return
+	# each batch seeks its nodes by id, so the nodes are visited once in total
+	label_query = """
+	UNWIND range($start, $end) AS node_id
+	MATCH (n) WHERE id(n) = node_id AND NOT n:%s
+	SET n:%s
+	"""%(HPG_NODE_LABEL, HPG_NODE_LABEL)
+	for start in range(0, max_id + 1, batch_size):
+		session.run(label_query, start=start, end=min(start + batch_size, max_id + 1) - 1).consume()
+
+
+def bootstrap_hpg_schema(conn=constantsModule.NEO4J_CONN_STRING, partitioned=False, timeout=300, batch_size=50000):
+	"""
+	post-import step: puts the common label on all HPG nodes, creates the `Id` constraint and the
+	`Type` and `Code` indexes, and waits for the indexes to come online
+	@param {string} conn: bolt connection string of the running neo4j instance
+	@param {bool} partitioned: whether the database holds the HPGs of several webpages
+	@param {int} timeout: max seconds to wait for the indexes
+	@param {int} batch_size: number of nodes labeled per transaction
+	"""
+
+	neo_driver = DriverRegistryModule.get_driver_registry().get_driver(conn)
+	with neo_driver.session() as session:
+
+		# older HPG csv files do not have the `Label` column; the current ones label all nodes at import
+		unlabeled = session.run("MATCH (n) WHERE NOT n:%s RETURN n LIMIT 1"%HPG_NODE_LABEL).single()
+		if unlabeled is not None:
+			_label_hpg_nodes(session, batch_size)
+
+		for statement in get_hpg_schema_statements(partitioned=partitioned):
+			try:
+				session.run(statement).consume()
+			except Exception as e:
+				logger.warning('could not create schema: %s, %s'%(statement, str(e)))
+
+		try:
+			session.run("CALL db.awaitIndexes(%d)"%int(timeout)).consume()
+		except Exception as e:
+			logger.warning('schema indexes are not online: %s'%str(e))
+
+		# e.g., the `Code` index fails for property values larger than the index key size limit
+		failed_indexes = session.run("CALL db.indexes() YIELD name, state WHERE state = 'FAILED' RETURN name")
+		for record in list(failed_indexes):
+			logger.warning('dropping failed index: %s'%record['name'])
+			session.run("DROP INDEX %s IF EXISTS"%record['name']).consume()
 
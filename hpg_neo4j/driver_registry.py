@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+	Copyright (C) 2020  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	---------------
+	A process-wide registry of long-lived neo4j drivers, one per bolt connection string.
+	Each driver keeps a bounded pool of bolt connections that is reused by all the transactions
+	on that connection string, until the driver is closed explicitly (e.g., when its neo4j
+	instance is stopped) or the process exits.
+
+	Functions can also run in a `SplitTransaction`, which commits the current transaction and begins
+	a new one every `NEO4J_SPLIT_TRANSACTION_QUERIES` queries, so that a single transaction is not held
+	open during the analysis of a whole webpage. The traversals mostly read the graph, but may add
+	`pointsTo` relationships while slicing, which are then committed with their chunk.
+
+	Usage:
+	---------------
+	> import hpg_neo4j.driver_registry as DriverRegistryModule
+	> registry = DriverRegistryModule.get_driver_registry()
+	> with registry.get_driver(conn).session(fetch_size=constantsModule.NEO4J_FETCH_SIZE) as session:
+	> 	...
+	> registry.close_driver(conn)
+
+"""
+
+
+import time
+import atexit
+import threading
+
+import constants as constantsModule
+from neo4j import GraphDatabase
+from utils.logging import logger
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Driver Registry
+# ------------------------------------------------------------------------------------ #
+
+class Neo4jDriverRegistry(object):
+
+	"""
+	neo4j drivers keyed by connection string; a driver is created on first use and is
+	re-created only if the credentials, or the connection settings requested by a caller, change
+	"""
+
+	def __init__(self):
+		# conn -->> (driver, settings)
+		self._drivers = {}
+		self._lock = threading.Lock()
+
+
+	def get_driver(self, conn, max_connection_lifetime=None, keep_alive=True):
+		"""
+		@param {string} conn: bolt connection string
+		@param {int} max_connection_lifetime: max seconds a pooled connection is reused (None for the driver default)
+		@param {bool} keep_alive: whether to enable TCP keep-alive on the pooled connections
+		@return {neo4j.Driver} the shared driver of the connection string
+		"""
+
+		settings = (constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, max_connection_lifetime, keep_alive)
+		with self._lock:
+			if conn in self._drivers:
+				driver, driver_settings = self._drivers[conn]
+				# a caller without a connection lifetime accepts the one of the existing driver
+				if driver_settings[:2] == settings[:2] and max_connection_lifetime in (None, driver_settings[2]) and keep_alive == driver_settings[3]:
+					return driver
+				self._close(conn)
+
+			config = {
+				"max_connection_pool_size": int(constantsModule.NEO4J_MAX_CONNECTION_POOL_SIZE),
+				"connection_acquisition_timeout": int(constantsModule.NEO4J_CONNECTION_ACQUISITION_TIMEOUT),
+				"keep_alive": keep_alive
+			}
+			if max_connection_lifetime is not None:
+				config["max_connection_lifetime"] = int(max_connection_lifetime)
+
+			logger.debug('creating neo4j driver for %s'%conn)
+			driver = GraphDatabase.driver(conn, auth=(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS), **config)
+			self._drivers[conn] = (driver, settings)
+			return driver
+
+
+	def _close(self, conn):
+		driver, _ = self._drivers.pop(conn)
+		try:
+			driver.close()
+		except Exception as e:
+			logger.warning('error while closing the neo4j driver for %s: %s'%(conn, str(e)))
+
+
+	def close_driver(self, conn):
+		"""
+		closes the driver of the given connection string and its pooled connections, if any;
+		must be called before the neo4j instance behind `conn` is stopped or replaced
+		"""
+		with self._lock:
+			if conn in self._drivers:
+				logger.debug('closing neo4j driver for %s'%conn)
+				self._close(conn)
+
+
+	def close_all(self):
+		"""
+		closes all the drivers of the registry
+		"""
+		with self._lock:
+			for conn in list(self._drivers.keys()):
+				self._close(conn)
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Split Transactions
+# ------------------------------------------------------------------------------------ #
+
+class BufferedResult(list):
+
+	"""
+	the records of a query, fetched before the transaction that ran the query is committed;
+	supports the parts of the bolt result api used by the analyses
+	"""
+
+	def __init__(self, result):
+		super(BufferedResult, self).__init__(result)
+		self._keys = result.keys()
+		self._summary = result.consume()
+
+
+	def keys(self):
+		return self._keys
+
+	def single(self):
+		if len(self) > 1:
+			logger.warning('expected a single record, but found %d'%len(self))
+		return self[0] if len(self) else None
+
+	def peek(self):
+		return self[0] if len(self) else None
+
+	def value(self, key=0, default=None):
+		return [record.value(key, default) for record in self]
+
+	def values(self, *keys):
+		return [record.values(*keys) for record in self]
+
+	def data(self, *keys):
+		return [record.data(*keys) for record in self]
+
+	def consume(self):
+		return self._summary
+
+
+
+class SplitTransaction(object):
+
+	"""
+	a transaction handle that is transparently renewed every `max_queries` queries,
+	and after `max_age` seconds; the results are buffered, since they become invalid once
+	their transaction is committed
+	"""
+
+	def __init__(self, session, max_queries, max_age=None):
+		"""
+		@param {neo4j.Session} session
+		@param {int} max_queries: max number of queries per transaction
+		@param {int} max_age: max seconds per transaction (None for no limit)
+		"""
+		self.session = session
+		self.max_queries = max(1, int(max_queries))
+		self.max_age = max_age
+		self.transactions = 0
+		self._tx = None
+		self._queries = 0
+		self._started = 0
+
+
+	def _renew(self):
+		self.commit()
+		self._tx = self.session.begin_transaction()
+		self._queries = 0
+		self._started = time.time()
+		self.transactions += 1
+
+
+	def run(self, query, parameters=None, **kwparameters):
+		"""
+		same as `Transaction.run()`, but returns a `BufferedResult`
+		"""
+		if self._tx is None or self._queries >= self.max_queries or (self.max_age is not None and time.time() - self._started >= self.max_age):
+			self._renew()
+		self._queries += 1
+		return BufferedResult(self._tx.run(query, parameters, **kwparameters))
+
+
+	def commit(self):
+		if self._tx is not None:
+			tx = self._tx
+			self._tx = None
+			tx.commit()
+
+
+	def rollback(self):
+		if self._tx is not None:
+			tx = self._tx
+			self._tx = None
+			tx.rollback()
+
+
+
+def exec_fn_within_split_transaction(session, fn, *args, max_queries=None, max_age=None):
+	"""
+	runs the function `fn` with a `SplitTransaction` of the given session
+	@param {neo4j.Session} session
+	@param {pointer} fn: function whose first argument is the transaction
+	@return fn output
+	"""
+
+	if max_queries is None:
+		max_queries = constantsModule.NEO4J_SPLIT_TRANSACTION_QUERIES
+	tx = SplitTransaction(session, max_queries, max_age=max_age)
+	try:
+		out = fn(tx, *args)
+		tx.commit()
+	except Exception:
+		tx.rollback()
+		raise
+	logger.debug('queries ran in %d transactions'%tx.transactions)
+	return out
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Process-wide Registry
+# ------------------------------------------------------------------------------------ #
+
+_DRIVER_REGISTRY = None
+
+def get_driver_registry():
+	"""
+	@return {Neo4jDriverRegistry} the registry of the current process; its drivers are closed at process exit
+	"""
+	global _DRIVER_REGISTRY
+	if _DRIVER_REGISTRY is None:
+		_DRIVER_REGISTRY = Neo4jDriverRegistry()
+		atexit.register(_DRIVER_REGISTRY.close_all)
+	return _DRIVER_REGISTRY
+
+
+def close_driver_registry():
+	"""
+	closes the drivers of the registry of the current process, if any; see `instance_pool.destroy_instance_pool()`
+	"""
+	if _DRIVER_REGISTRY is not None:
+		_DRIVER_REGISTRY.close_all()
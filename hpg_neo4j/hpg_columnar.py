@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Columnar (Parquet) storage of the HPG of a webpage, next to its `¿`-delimited csv files:
+	`nodes.parquet` and `rels.parquet` with typed columns, i.e., integer node ids, dictionary-encoded
+	`Type`, `Kind`, labels and relationship types, and the start/end line and column of the esprima
+	`Location` of each node parsed into integer columns. The files can be memory-mapped by the
+	offline scripts and loaded into the in-memory HPG engine without parsing any text.
+	The sha256 of the uncompressed csv content is stored next to them, so that parquet files
+	of an HPG that was rebuilt (or pruned) since are not loaded; compressing the csv files keeps them fresh.
+	Needs the `pyarrow` package (pip install pyarrow).
+
+
+	Usage:
+	------------
+	> import hpg_neo4j.hpg_columnar as HPGColumnarModule
+	> HPGColumnarModule.convert_webpage_hpg(webpage_folder)
+	> nodes, rels = HPGColumnarModule.read_hpg_tables(webpage_folder)
+
+	$ python3 -m hpg_neo4j.hpg_columnar --input=data/test_program
+	$ python3 -m hpg_neo4j.hpg_columnar --input=data/www.example.com --overwrite
+
+"""
+
+import os
+import re
+import json
+import hashlib
+import argparse
+import constants as constantsModule
+import utils.io as IOModule
+import hpg_neo4j.hpg_csv as HPGCSVModule
+from utils.logging import logger
+
+try:
+	import pyarrow
+	import pyarrow.parquet as pyarrow_parquet
+except ImportError:
+	pyarrow = None
+	pyarrow_parquet = None
+
+
+HPG_CSV_DELIMITER = constantsModule.outputCSVDelimiter
+
+# header of the headerless `rels_dynamic.csv` file, if `rels.csv` is missing
+RELS_DEFAULT_HEADER = 'FromId:START_ID¿ToId:END_ID¿RelationLabel:TYPE¿RelationType¿Arguments'
+
+# node properties with few distinct values, stored dictionary-encoded
+DICTIONARY_NODE_PROPERTIES = ['Type', 'Kind', 'SemanticType']
+
+# integer columns parsed from the `Location` property
+LOCATION_COLUMNS = ['StartLine', 'StartColumn', 'EndLine', 'EndColumn']
+
+# rows per parquet row group
+ROW_GROUP_SIZE = 100000
+
+_LOCATION_PATTERN = re.compile(r'start:\{line:(\d+),column:(\d+)\},end:\{line:(\d+),column:(\d+)\}')
+
+
+
+def _require_pyarrow():
+	if pyarrow is None:
+		raise ImportError('the columnar hpg storage needs the `pyarrow` package: pip install pyarrow')
+
+
+def parse_location(location):
+	"""
+	@param {string} location: esprima location as stored in the HPG, e.g., `{start:{line:24,column:0},end:{line:27,column:24}}`
+	@return {tuple} (start line, start column, end line, end column), or None if the location cannot be parsed
+	"""
+
+	if not location:
+		return None
+	match = _LOCATION_PATTERN.search(location)
+	if match is None:
+		return None
+	return tuple(int(value) for value in match.groups())
+
+
+def _parse_header(line):
+	"""
+	@return {list} (name, type) of each column of a neo4j-admin csv header
+	"""
+	columns = []
+	for field in line.rstrip('\r\n').split(HPG_CSV_DELIMITER):
+		if ':' in field:
+			name, field_type = field.rsplit(':', 1)
+			columns.append((name, field_type))
+		else:
+			columns.append((field, None))
+	return columns
+
+
+def _to_int(value):
+	try:
+		return int(value)
+	except ValueError:
+		return None
+
+
+def _get_column_type(name, dictionary_names):
+	if name in dictionary_names:
+		return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+	return pyarrow.string()
+
+
+## ------------------------------------------------------------------ ##
+## conversion
+## ------------------------------------------------------------------ ##
+
+class _TableWriter(object):
+
+	"""
+	buffers rows column-wise and writes them to a parquet file in row groups
+	"""
+
+	def __init__(self, output_file, schema):
+		self.schema = schema
+		self.writer = pyarrow_parquet.ParquetWriter(output_file, schema, compression='zstd')
+		self.columns = {field.name: [] for field in schema}
+		self.rows = 0
+
+	def append(self, row):
+		for name, values in self.columns.items():
+			values.append(row.get(name))
+		self.rows += 1
+		if len(self.columns[self.schema[0].name]) >= ROW_GROUP_SIZE:
+			self.flush()
+
+	def flush(self):
+		if len(self.columns[self.schema[0].name]) == 0:
+			return
+		arrays = [pyarrow.array(self.columns[field.name], type=field.type) for field in self.schema]
+		self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+		for values in self.columns.values():
+			values.clear()
+
+	def close(self):
+		self.flush()
+		self.writer.close()
+
+
+def convert_nodes_csv(nodes_file, output_file):
+	"""
+	@param {string} nodes_file: path of the (possibly compressed) nodes.csv file
+	@param {string} output_file: path of the nodes.parquet file
+	@return {int} number of nodes; duplicate node ids are skipped (first one wins), as with neo4j-admin
+	"""
+
+	_require_pyarrow()
+	with IOModule.open_graph_file(nodes_file, 'r') as fd:
+		columns = _parse_header(fd.readline())
+
+		id_column = None
+		label_column = None
+		property_columns = []
+		for i, (name, field_type) in enumerate(columns):
+			if field_type == 'ID':
+				id_column = i
+			elif field_type == 'LABEL':
+				label_column = i
+			elif field_type is None:
+				property_columns.append((i, name))
+
+		fields = [pyarrow.field('Id', pyarrow.int64(), nullable=False), pyarrow.field('Label', pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))]
+		fields += [pyarrow.field(name, _get_column_type(name, DICTIONARY_NODE_PROPERTIES)) for _, name in property_columns]
+		fields += [pyarrow.field(name, pyarrow.int32()) for name in LOCATION_COLUMNS]
+		writer = _TableWriter(output_file, pyarrow.schema(fields))
+
+		seen = set()
+		skipped = 0
+		try:
+			for line in fd:
+				values = line.rstrip('\r\n').split(HPG_CSV_DELIMITER)
+				if len(values) <= id_column:
+					continue
+				node_id = _to_int(HPGCSVModule.unquote(values[id_column]))
+				if node_id is None:
+					skipped += 1
+					continue
+				if node_id in seen:
+					continue
+				seen.add(node_id)
+
+				row = {'Id': node_id}
+				if label_column is not None and label_column < len(values):
+					row['Label'] = HPGCSVModule.unquote(values[label_column])
+				for i, name in property_columns:
+					if i < len(values) and values[i] != '':
+						row[name] = HPGCSVModule.unquote(values[i])
+
+				location = parse_location(row.get('Location'))
+				if location is not None:
+					for name, value in zip(LOCATION_COLUMNS, location):
+						row[name] = value
+				writer.append(row)
+		finally:
+			writer.close()
+
+	if skipped:
+		logger.warning('[columnar] skipped %d nodes with a non-integer id in %s'%(skipped, nodes_file))
+	return writer.rows
+
+
+def convert_rels_csv(rels_files, output_file):
+	"""
+	@param {list} rels_files: paths of the (possibly compressed) rels csv files, e.g., rels.csv and the headerless rels_dynamic.csv
+	@param {string} output_file: path of the rels.parquet file
+	@return {int} number of relationships
+	"""
+
+	_require_pyarrow()
+	schema = pyarrow.schema([
+		pyarrow.field('FromId', pyarrow.int64(), nullable=False),
+		pyarrow.field('ToId', pyarrow.int64(), nullable=False),
+		pyarrow.field('RelationLabel', pyarrow.dictionary(pyarrow.int32(), pyarrow.string()), nullable=False),
+		pyarrow.field('RelationType', pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+		pyarrow.field('Arguments', pyarrow.string()),
+	])
+	writer = _TableWriter(output_file, schema)
+
+	header = RELS_DEFAULT_HEADER
+	try:
+		for rels_file in rels_files:
+			with IOModule.open_graph_file(rels_file, 'r') as fd:
+				# rels_dynamic.csv has no header and follows the header of rels.csv
+				if not os.path.basename(rels_file).startswith(constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME):
+					header = fd.readline()
+
+				source_column = target_column = type_column = None
+				relation_type_column = arguments_column = None
+				for i, (name, field_type) in enumerate(_parse_header(header)):
+					if field_type == 'START_ID':
+						source_column = i
+					elif field_type == 'END_ID':
+						target_column = i
+					elif field_type == 'TYPE':
+						type_column = i
+					elif name == 'RelationType':
+						relation_type_column = i
+					elif name == 'Arguments':
+						arguments_column = i
+
+				for line in fd:
+					values = line.rstrip('\r\n').split(HPG_CSV_DELIMITER)
+					if len(values) <= max(source_column, target_column, type_column):
+						continue
+					source = _to_int(HPGCSVModule.unquote(values[source_column]))
+					target = _to_int(HPGCSVModule.unquote(values[target_column]))
+					if source is None or target is None:
+						continue
+					row = {'FromId': source, 'ToId': target, 'RelationLabel': HPGCSVModule.unquote(values[type_column])}
+					if relation_type_column is not None and relation_type_column < len(values) and values[relation_type_column] != '':
+						row['RelationType'] = HPGCSVModule.unquote(values[relation_type_column])
+					if arguments_column is not None and arguments_column < len(values) and values[arguments_column] != '':
+						row['Arguments'] = HPGCSVModule.unquote(values[arguments_column])
+					writer.append(row)
+	finally:
+		writer.close()
+
+	return writer.rows
+
+
+def get_parquet_files(webpage_folder):
+	"""
+	@return {tuple} paths of the nodes and rels parquet files of a webpage folder
+	"""
+	return (os.path.join(webpage_folder, constantsModule.NODE_PARQUET_FILE_NAME), os.path.join(webpage_folder, constantsModule.RELS_PARQUET_FILE_NAME))
+
+
+def get_graph_files(webpage_folder):
+	"""
+	@return {list} paths of the (possibly compressed) nodes, rels and rels_dynamic csv files of a webpage folder, None for missing ones
+	"""
+	return [IOModule.get_graph_file(os.path.join(webpage_folder, file_name)) for file_name in [constantsModule.NODE_INPUT_FILE_NAME, constantsModule.RELS_INPUT_FILE_NAME, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME]]
+
+
+def _get_file_stats(graph_files):
+	return [None if file_path is None else [os.path.basename(file_path), os.path.getsize(file_path), os.stat(file_path).st_mtime_ns] for file_path in graph_files]
+
+
+def get_source_hash(graph_files):
+	"""
+	@param {list} graph_files: paths of (possibly compressed) csv files; None entries stand for missing files
+	@return {string} sha256 of the uncompressed content of the files, which does not change when they are compressed
+	"""
+
+	source_hash = hashlib.sha256()
+	for file_path in graph_files:
+		source_hash.update(b'\x00')
+		if file_path is None:
+			continue
+		with IOModule.open_graph_file(file_path, 'rb') as fd:
+			for chunk in iter(lambda: fd.read(1 << 20), b''):
+				source_hash.update(chunk)
+	return source_hash.hexdigest()
+
+
+def _write_source_file(webpage_folder, graph_files, source_hash):
+	with open(os.path.join(webpage_folder, constantsModule.HPG_PARQUET_SOURCE_FILE_NAME), 'w') as fd:
+		json.dump({'source_hash': source_hash, 'files': _get_file_stats(graph_files)}, fd)
+
+
+def has_parquet_hpg(webpage_folder, graph_files=None):
+	"""
+	@param {string} webpage_folder
+	@param {list} graph_files: the nodes, rels and rels_dynamic csv files the parquet files must match (default: those of the webpage folder)
+	@return {bool} whether the parquet files exist and were converted from the current content of the csv files
+	"""
+
+	nodes_parquet_file, rels_parquet_file = get_parquet_files(webpage_folder)
+	source_file = os.path.join(webpage_folder, constantsModule.HPG_PARQUET_SOURCE_FILE_NAME)
+	if not (os.path.exists(nodes_parquet_file) and os.path.exists(rels_parquet_file) and os.path.exists(source_file)):
+		return False
+
+	if graph_files is None:
+		graph_files = get_graph_files(webpage_folder)
+	graph_files = [file_path if file_path is not None and os.path.exists(file_path) else None for file_path in graph_files]
+	if graph_files[0] is None:
+		return False
+
+	with open(source_file, 'r') as fd:
+		source = json.load(fd)
+
+	# same names, sizes and modification times: no need to hash the content again
+	if source.get('files') == _get_file_stats(graph_files):
+		return True
+
+	source_hash = get_source_hash(graph_files)
+	if source_hash != source.get('source_hash'):
+		logger.info('[columnar] the parquet files of %s are stale.'%webpage_folder)
+		return False
+
+	# e.g., the csv files were compressed since
+	_write_source_file(webpage_folder, graph_files, source_hash)
+	return True
+
+
+def convert_webpage_hpg(webpage_folder, overwrite=False):
+	"""
+	writes the parquet files of the HPG csv files (compressed or not) of a webpage folder
+	@param {string} webpage_folder
+	@param {bool} overwrite: whether to convert again if the parquet files exist and are not stale
+	@return {bool} whether the parquet files were written
+	"""
+
+	if not overwrite and has_parquet_hpg(webpage_folder):
+		return False
+
+	nodes_file, rels_file, rels_dynamic_file = get_graph_files(webpage_folder)
+	if nodes_file is None or rels_file is None:
+		logger.error('[columnar] The nodes/rels.csv files do not exist in %s, skipping.'%webpage_folder)
+		return False
+
+	nodes_parquet_file, rels_parquet_file = get_parquet_files(webpage_folder)
+	node_count = convert_nodes_csv(nodes_file, nodes_parquet_file)
+	rels_files = [rels_file] + ([rels_dynamic_file] if rels_dynamic_file is not None else [])
+	relationship_count = convert_rels_csv(rels_files, rels_parquet_file)
+	_write_source_file(webpage_folder, [nodes_file, rels_file, rels_dynamic_file], get_source_hash([nodes_file, rels_file, rels_dynamic_file]))
+	logger.info('[columnar] converted %d nodes and %d relationships of %s'%(node_count, relationship_count, webpage_folder))
+	return True
+
+
+## ------------------------------------------------------------------ ##
+## loading
+## ------------------------------------------------------------------ ##
+
+def read_hpg_tables(webpage_folder, node_columns=None):
+	"""
+	@param {string} webpage_folder
+	@param {list} node_columns: node columns to read (default: all)
+	@return {tuple} (nodes, rels) `pyarrow.Table`s, memory-mapped from the parquet files
+	"""
+
+	_require_pyarrow()
+	nodes_parquet_file, rels_parquet_file = get_parquet_files(webpage_folder)
+	nodes = pyarrow_parquet.read_table(nodes_parquet_file, columns=node_columns, memory_map=True)
+	rels = pyarrow_parquet.read_table(rels_parquet_file, memory_map=True)
+	return nodes, rels
+
+
+def iterate_table_rows(table, columns):
+	"""
+	@param {pyarrow.Table} table
+	@param {list} columns: names of the columns to yield
+	@return {generator} tuples of the values of the given columns, one per row, decoded batch by batch
+	"""
+
+	for batch in table.select(columns).to_batches():
+		yield from zip(*[column.to_pylist() for column in batch.columns])
+
+
+## ------------------------------------------------------------------ ##
+## command line
+## ------------------------------------------------------------------ ##
+
+def _find_webpage_folders(folder):
+	for directory, _, files in os.walk(folder):
+		if any(file_name.startswith(constantsModule.NODE_INPUT_FILE_NAME) for file_name in files):
+			yield directory
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script converts the HPG csv files of webpages to parquet files.')
+	p.add_argument('--input', "-I",
+					help='a webpage folder, or a folder (e.g., of a site) whose webpage folders are converted',
+					required=True,
+					type=str)
+	p.add_argument('--overwrite', "-O",
+					action='store_true',
+					help='convert again the webpages that already have parquet files')
+
+	args = vars(p.parse_args())
+	converted = 0
+	for webpage_folder in _find_webpage_folders(args["input"]):
+		if convert_webpage_hpg(webpage_folder, overwrite=args["overwrite"]):
+			converted += 1
+	logger.info('[columnar] converted %d webpages.'%converted)
+
+
+if __name__ == "__main__":
+	main()
+
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Line-level helpers for the neo4j-admin csv files of the HPG (nodes.csv, rels.csv and rels_dynamic.csv),
+	shared by the offline passes over these files (e.g., `hpg_neo4j/hpg_pruning.py` and `hpg_neo4j/hpg_sink_cone.py`).
+	Fields are split on the `¿` delimiter, and quoted fields are unquoted as done by neo4j-admin.
+
+
+	Usage:
+	------------
+	> import hpg_neo4j.hpg_csv as HPGCSVModule
+	> id_index = HPGCSVModule.get_column_index(header, 'Id')
+	> node_id = HPGCSVModule.unquote(HPGCSVModule.split_line(line)[id_index])
+
+"""
+
+import constants as constantsModule
+import utils.io as IOModule
+
+
+HPG_CSV_DELIMITER = constantsModule.outputCSVDelimiter
+
+
+
+def split_line(line):
+	"""
+	@param {string} line: a line of a HPG csv file
+	@return {list} the fields of the line, without the line break
+	"""
+	return line.rstrip('\r\n').split(HPG_CSV_DELIMITER)
+
+
+def unquote(value):
+	"""
+	removes the quotes of a quoted csv field, as done by neo4j-admin
+	"""
+	if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+		return value[1:-1].replace('""', '"')
+	return value
+
+
+def get_column_index(header, name):
+	"""
+	@param {string} header: header line of a neo4j-admin csv file, e.g., `Id:ID¿Type¿Label:LABEL`
+	@param {string} name: property name
+	@return {int} index of the column of the property, or None
+	"""
+	for index, field in enumerate(split_line(header)):
+		if field.split(':')[0] == name:
+			return index
+	return None
+
+
+def is_header_line(line):
+	return line.startswith('Id:') or line.startswith('FromId:')
+
+
+def write_graph_file(input_file, output_file, keep_line):
+	"""
+	writes the csv header and the lines of the (possibly compressed) input file for which `keep_line(line)` holds, with the same codec
+	@return {tuple} (number of lines before, number of lines after), without the csv header
+	"""
+
+	before, after = 0, 0
+	with IOModule.open_graph_file(input_file, 'r', newline='') as fd_in, IOModule.open_graph_file(output_file, 'w', newline='') as fd_out:
+		for line in fd_in:
+			if is_header_line(line):
+				fd_out.write(line)
+				continue
+			before += 1
+			if keep_line(line):
+				fd_out.write(line)
+				after += 1
+	return before, after
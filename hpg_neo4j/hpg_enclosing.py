@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Pre-import pass that adds three array properties to the nodes of the (possibly compressed) nodes.csv file
+	of an HPG, so that the queries of the unbounded patterns `(n)<-[:AST_parentOf*]-(function)`,
+	`(n)<-[:CFG_parentOf*]-(block)` and `(function)-[:AST_parentOf*]->(return)` become index lookups in neo4j:
+		- `EnclosingFunctions`: ids of the function ancestors of the node (see `InMemoryGraphModule.FUNCTION_TYPES`), nearest first
+		- `EnclosingBlocks`: ids of the `Program` and `BlockStatement` CFG entries from which the node is reachable
+		- `ReturnStatements`: for the function nodes, ids of the `ReturnStatement` descendants, including the ones of nested functions
+	The `Program` nodes are also marked with `EnclosingProperties: true`.
+
+	The properties are computed on the in-memory HPG (`InMemoryHPG.build_enclosing_indexes()`), which computes
+	them on its own when the traversals run in memory. The nodes file with the properties is written into the
+	`hpg_enclosing` folder of the webpage, with the same codec, and the original file is left as is.
+	The catalog queries use the properties of an HPG only if its `Program` nodes are marked, i.e., per graph
+	(see `QC.has_enclosing_properties()`); `HPG_ENCLOSING_PROPERTIES` enables this pass before the imports.
+
+	Cost: the whole HPG of the webpage is loaded in memory once more before each neo4j import, i.e., the
+	memory and time of `InMemoryHPG.from_csv()` are paid on top of the import; hence the pass is disabled by default.
+	`scripts/benchmark_enclosing_properties.py` measures both sides on the library HPGs.
+
+
+	Usage:
+	------------
+	> import hpg_neo4j.hpg_enclosing as HPGEnclosingModule
+	> nodes_file, rels_file, rels_dynamic_file = HPGEnclosingModule.add_webpage_enclosing_properties(webpage_folder)
+
+	$ python3 -m hpg_neo4j.hpg_enclosing --input=data/www.example.com/<webpage>
+
+"""
+
+import os
+import shutil
+import argparse
+import constants as constantsModule
+import utils.io as IOModule
+import hpg_neo4j.in_memory_graph as InMemoryGraphModule
+import hpg_neo4j.hpg_csv as HPGCSVModule
+from utils.logging import logger
+
+
+HPG_CSV_DELIMITER = constantsModule.outputCSVDelimiter
+
+# neo4j-admin header fields of the properties; the default array delimiter of neo4j-admin is `;`
+ENCLOSING_FUNCTIONS_PROPERTY = 'EnclosingFunctions'
+ENCLOSING_BLOCKS_PROPERTY = 'EnclosingBlocks'
+RETURN_STATEMENTS_PROPERTY = 'ReturnStatements'
+ENCLOSING_MARKER_PROPERTY = 'EnclosingProperties'
+ENCLOSING_PROPERTY_FIELDS = ['%s:string[]'%name for name in [ENCLOSING_FUNCTIONS_PROPERTY, ENCLOSING_BLOCKS_PROPERTY, RETURN_STATEMENTS_PROPERTY]] + ['%s:boolean'%ENCLOSING_MARKER_PROPERTY]
+ARRAY_DELIMITER = ';'
+
+ENCLOSING_FOLDER_NAME = 'hpg_enclosing'
+HPG_FILE_NAMES = [constantsModule.NODE_INPUT_FILE_NAME, constantsModule.RELS_INPUT_FILE_NAME, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME]
+
+
+
+def _load_graph(nodes_file, rels_files):
+	"""
+	@return {InMemoryHPG} the HPG of the given files, with its enclosing indexes
+	"""
+	graph = InMemoryGraphModule.InMemoryHPG()
+	graph.load_nodes(nodes_file)
+	rels_header = None
+	for rels_file in rels_files:
+		rels_header = graph.load_relationships(rels_file, header=rels_header)
+	graph.build_indexes()
+	graph.build_enclosing_indexes()
+	return graph
+
+
+def get_return_statements_by_function(graph):
+	"""
+	@param {InMemoryHPG} graph: HPG with its enclosing indexes
+	@return {dict} function node -->> the `ReturnStatement` nodes of which it is an enclosing function, in node order
+	"""
+	returns_by_function = {}
+	for ret in sorted(graph.get_nodes_by_type('ReturnStatement')):
+		for function in graph.get_enclosing_functions(ret):
+			returns_by_function.setdefault(function, []).append(ret)
+	return returns_by_function
+
+
+def add_enclosing_properties(nodes_file, rels_files, output_file):
+	"""
+	writes the nodes file with the `EnclosingFunctions`, `EnclosingBlocks`, `ReturnStatements` and `EnclosingProperties` columns, see the module description
+	@param {string} nodes_file: path of the (possibly compressed) nodes.csv file
+	@param {list} rels_files: paths of the (possibly compressed) rels.csv file, and optionally of the headerless rels_dynamic.csv file
+	@param {string} output_file: path of the nodes file with the properties; its suffix gives the codec
+	@return {dict} number of nodes, and of nodes with enclosing functions and with enclosing blocks
+	"""
+
+	graph = _load_graph(nodes_file, rels_files)
+	node_ids = graph._node_ids
+	returns_by_function = get_return_statements_by_function(graph)
+	result = {"nodes": graph.get_node_count(), "nodes_in_functions": 0, "nodes_in_blocks": 0, "functions_with_returns": 0}
+
+	with IOModule.open_graph_file(nodes_file, 'r', newline='') as fd_in, IOModule.open_graph_file(output_file, 'w', newline='') as fd_out:
+		header = fd_in.readline().rstrip('\r\n')
+		# the columns are always the last ones, since they are appended by this pass
+		has_columns = header.split(HPG_CSV_DELIMITER)[-len(ENCLOSING_PROPERTY_FIELDS):] == ENCLOSING_PROPERTY_FIELDS
+		if has_columns:
+			header = header.rsplit(HPG_CSV_DELIMITER, len(ENCLOSING_PROPERTY_FIELDS))[0]
+		fd_out.write(HPG_CSV_DELIMITER.join([header] + ENCLOSING_PROPERTY_FIELDS) + '\n')
+
+		for line in fd_in:
+			line = line.rstrip('\r\n')
+			if HPG_CSV_DELIMITER not in line:
+				fd_out.write(line + '\n')
+				continue
+			if has_columns:
+				line = line.rsplit(HPG_CSV_DELIMITER, len(ENCLOSING_PROPERTY_FIELDS))[0]
+
+			node = graph._node_index.get(HPGCSVModule.unquote(line.split(HPG_CSV_DELIMITER, 1)[0]))
+			functions, blocks, returns, marker = [], [], [], ''
+			if node is not None:
+				functions = graph.get_enclosing_functions(node)
+				blocks = graph.get_enclosing_blocks(node)
+				returns = returns_by_function.get(node, [])
+				if graph.node_has_type(node, 'Program'):
+					marker = 'true'
+			functions = ARRAY_DELIMITER.join(node_ids[n] for n in functions)
+			blocks = ARRAY_DELIMITER.join(node_ids[n] for n in blocks)
+			returns = ARRAY_DELIMITER.join(node_ids[n] for n in returns)
+			fd_out.write(HPG_CSV_DELIMITER.join([line, functions, blocks, returns, marker]) + '\n')
+
+			if functions:
+				result["nodes_in_functions"] += 1
+			if blocks:
+				result["nodes_in_blocks"] += 1
+			if returns:
+				result["functions_with_returns"] += 1
+
+	return result
+
+
+def add_webpage_enclosing_properties(webpage_folder, graph_files=None):
+	"""
+	writes the nodes file of the HPG of a webpage with the enclosing properties into its `hpg_enclosing` folder
+	@param {string} webpage_folder: folder of the HPG csv files, e.g., of a webpage or a library
+	@param {list} graph_files: the (nodes.csv, rels.csv, rels_dynamic.csv) files, e.g., the ones of `hpg_neo4j.hpg_pruning`
+		(default: the ones of the webpage folder)
+	@return {tuple} the (nodes.csv, rels.csv, rels_dynamic.csv) files to import, where only the nodes file is a new one,
+		or None if the folder has no HPG
+	"""
+
+	if graph_files is None:
+		graph_files = [IOModule.get_graph_file(os.path.join(webpage_folder, name)) for name in HPG_FILE_NAMES]
+	graph_files = [item if item is not None and os.path.exists(item) else None for item in graph_files]
+	if graph_files[0] is None or graph_files[1] is None:
+		return None
+
+	output_folder = os.path.join(webpage_folder, ENCLOSING_FOLDER_NAME)
+	remove_enclosing_properties(webpage_folder)
+	os.makedirs(output_folder)
+
+	output_file = os.path.join(output_folder, os.path.basename(graph_files[0]))
+	result = add_enclosing_properties(graph_files[0], [item for item in graph_files[1:] if item is not None], output_file)
+	logger.info('[enclosing] %s: %s'%(webpage_folder, str(result)))
+	return (output_file, graph_files[1], graph_files[2])
+
+
+def remove_enclosing_properties(webpage_folder):
+	"""
+	removes the nodes file with the enclosing properties of a webpage, e.g., once it is imported
+	"""
+	shutil.rmtree(os.path.join(webpage_folder, ENCLOSING_FOLDER_NAME), ignore_errors=True)
+
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script adds the enclosing function and block properties to the nodes of an HPG.')
+	p.add_argument('--input', "-I",
+					help='folder of the HPG csv files',
+					type=str)
+
+	args = vars(p.parse_args())
+	add_webpage_enclosing_properties(args["input"])
+
+
+
+if __name__ == "__main__":
+	main()
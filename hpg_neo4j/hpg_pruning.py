@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Offline pre-import pass over the (possibly compressed) HPG csv files of a webpage that drops the
+	AST subtrees of known library scripts, and the relationships touching them, and writes the rest as
+	reduced nodes.csv, rels.csv and rels_dynamic.csv files into the `hpg_pruning` folder of the webpage,
+	with the same codec. The original files are left as is; the reduced files are the ones imported
+	into neo4j or loaded in memory, as for `hpg_neo4j/hpg_sink_cone.py`.
+
+	A script of `scripts_mapping.json` is a library script if its hash is listed in `HPG_LIBRARY_HASHES_FILE`,
+	if the file name of its `src` url starts with, or contains at a word boundary, one of the `HPG_LIBRARY_KEYWORDS`
+	(the library names of the crawler's library detector), or if the url is served by one of the `HPG_LIBRARY_HOSTS`. A library script is kept if it contains one of the sinks of `sinks.out.json`, or if
+	it is connected to a script that does, through non-AST relationships (e.g., data flow or call edges,
+	possibly via other scripts). Webpages without a `sinks.out.json` are not pruned.
+
+	The files are streamed three times (nodes, then the AST relationships, then all relationships)
+	to find the pruned scripts, and once more to write the reduced files. The outcome is stored in `hpg_pruning.json`.
+
+
+	Usage:
+	------------
+	> import hpg_neo4j.hpg_pruning as HPGPruningModule
+	> nodes_file, rels_file, rels_dynamic_file = HPGPruningModule.prune_webpage_hpg(webpage_folder)
+
+	$ python3 -m hpg_neo4j.hpg_pruning --input=data/www.example.com
+
+"""
+
+import os
+import re
+import json
+import shutil
+import argparse
+from urllib.parse import urlparse
+import constants as constantsModule
+import utils.io as IOModule
+import hpg_neo4j.hpg_csv as HPGCSVModule
+import hpg_neo4j.hpg_sink_cone as HPGSinkConeModule
+from utils.logging import logger
+
+
+HPG_CSV_DELIMITER = HPGCSVModule.HPG_CSV_DELIMITER
+
+PRUNING_FOLDER_NAME = 'hpg_pruning'
+PRUNING_RESULT_FILE_NAME = 'hpg_pruning.json'
+
+HPG_FILE_NAMES = [constantsModule.NODE_INPUT_FILE_NAME, constantsModule.RELS_INPUT_FILE_NAME, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME]
+
+
+
+def _read_library_hashes():
+	"""
+	@return {set} the script hashes of `HPG_LIBRARY_HASHES_FILE` (one per line, `#` for comments)
+	"""
+	hashes = set()
+	hashes_file = constantsModule.HPG_LIBRARY_HASHES_FILE
+	if hashes_file and os.path.exists(hashes_file):
+		with open(hashes_file, 'r') as fd:
+			for line in fd:
+				line = line.split('#')[0].strip()
+				if line:
+					hashes.add(line)
+	return hashes
+
+
+def get_library_scripts(webpage_folder, library_hashes=None):
+	"""
+	@param {string} webpage_folder
+	@param {set} library_hashes: known library script hashes (default: `HPG_LIBRARY_HASHES_FILE`)
+	@return {set} file names (e.g., `0.js`) of the library scripts of the webpage, as per its `scripts_mapping.json`
+	"""
+
+	script_mapping_file = os.path.join(webpage_folder, 'scripts_mapping.json')
+	if not os.path.exists(script_mapping_file):
+		return set()
+
+	with open(script_mapping_file, 'r', encoding='utf-8') as fd:
+		script_mapping_json = json.load(fd)
+
+	if library_hashes is None:
+		library_hashes = _read_library_hashes()
+	library_pattern = get_library_pattern()
+
+	library_scripts = set()
+	for script_name, item in script_mapping_json.items():
+		if item.get('hash') in library_hashes or is_library_url(item.get('src'), library_pattern):
+			library_scripts.add(script_name)
+	return library_scripts
+
+
+def get_library_pattern(keywords=None):
+	"""
+	@param {list} keywords: library names (default: `HPG_LIBRARY_KEYWORDS`)
+	@return {re.Pattern} matches a library name between word boundaries of a file name, e.g., `jquery` in `jquery-3.6.0.min.js`
+	or `jquery.slick.js`, but neither `vue` in `revue.js` nor `react` in `reactions.js`; version numbers may follow the name
+	"""
+	if keywords is None:
+		keywords = constantsModule.HPG_LIBRARY_KEYWORDS
+	names = '|'.join(re.escape(keyword.lower()) for keyword in sorted(keywords, key=len, reverse=True))
+	return re.compile(r'(?:^|[^a-z0-9])(?:%s)(?:[^a-z]|$)' % names)
+
+
+def is_library_url(src, library_pattern=None):
+	"""
+	@param {string} src: the `src` url of a script
+	@param {re.Pattern} library_pattern: see `get_library_pattern()`
+	@return {bool} whether the file name of the url names a library, or the url is served by one of the `HPG_LIBRARY_HOSTS`
+	"""
+	if not src:
+		return False
+	if library_pattern is None:
+		library_pattern = get_library_pattern()
+
+	parsed = urlparse(src.lower())
+	host = parsed.netloc.split('@')[-1].split(':')[0]
+	for library_host in constantsModule.HPG_LIBRARY_HOSTS:
+		if host == library_host or host.endswith('.' + library_host):
+			return True
+
+	file_name = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+	return bool(file_name) and library_pattern.search(file_name) is not None
+
+
+
+## ------------------------------------------------------------------ ##
+## script ownership of the nodes
+## ------------------------------------------------------------------ ##
+
+class _ScriptIndex(object):
+
+	"""
+	maps each node to the script of its `Program` root, from the `AST_parentOf` relationships
+	"""
+
+	def __init__(self, programs):
+		# program node id -->> script file name
+		self.programs = programs
+		# child node id -->> parent node id
+		self.parents = {}
+		# node id -->> script file name, or None for nodes outside the scripts (e.g., the DOM tree)
+		self._scripts = dict(programs)
+		# nodes without an AST parent (e.g., CFG entry and exit nodes) -->> script of a CFG neighbour
+		self.orphans = {}
+
+
+	def get_script(self, node_id):
+		if node_id in self.orphans:
+			return self.orphans[node_id]
+		if node_id in self._scripts:
+			return self._scripts[node_id]
+
+		# walk up to the first node with a known script, then memoize the path
+		path = []
+		current = node_id
+		while current not in self._scripts and current in self.parents:
+			path.append(current)
+			current = self.parents[current]
+		script = self._scripts.get(current)
+		for item in path:
+			self._scripts[item] = script
+		return script
+
+
+
+def _index_nodes(nodes_file):
+	"""
+	@return {tuple} (program node id -->> script file name, number of nodes)
+	"""
+
+	programs = {}
+	count = 0
+	with IOModule.open_graph_file(nodes_file, 'r', newline='') as fd:
+		header = fd.readline()
+		id_index = HPGCSVModule.get_column_index(header, 'Id')
+		type_index = HPGCSVModule.get_column_index(header, 'Type')
+		value_index = HPGCSVModule.get_column_index(header, 'Value')
+		for line in fd:
+			fields = HPGCSVModule.split_line(line)
+			if len(fields) <= max(id_index, type_index, value_index):
+				continue
+			count += 1
+			if fields[type_index] == 'Program':
+				programs[fields[id_index]] = os.path.basename(HPGCSVModule.unquote(fields[value_index]))
+	return programs, count
+
+
+def _iterate_relationships(rels_files):
+	"""
+	@return {generator} (from id, to id, relationship label) of the given rels files; `rels_dynamic.csv` has no header
+	"""
+
+	for rels_file in rels_files:
+		with IOModule.open_graph_file(rels_file, 'r', newline='') as fd:
+			for line in fd:
+				fields = HPGCSVModule.split_line(line)
+				if len(fields) < 3 or fields[0].startswith('FromId'):
+					continue
+				yield fields[0], fields[1], HPGCSVModule.unquote(fields[2])
+
+
+
+## ------------------------------------------------------------------ ##
+## pruning
+## ------------------------------------------------------------------ ##
+
+def get_pruned_scripts(nodes_file, rels_files, library_scripts, sink_ids):
+	"""
+	@param {string} nodes_file: path of the (possibly compressed) nodes.csv file
+	@param {list} rels_files: paths of the (possibly compressed) rels.csv and rels_dynamic.csv files
+	@param {set} library_scripts: file names of the library scripts
+	@param {list} sink_ids: node ids of the sinks of `sinks.out.json`
+	@return {tuple} (pruned library scripts, kept library scripts, `_ScriptIndex`, number of nodes)
+	"""
+
+	programs, node_count = _index_nodes(nodes_file)
+	index = _ScriptIndex(programs)
+
+	for from_id, to_id, label in _iterate_relationships(rels_files):
+		if label == 'AST_parentOf':
+			index.parents[to_id] = from_id
+
+	# script-level graph of the non-AST relationships
+	neighbours = {}
+	for from_id, to_id, label in _iterate_relationships(rels_files):
+		if label == 'AST_parentOf':
+			continue
+		from_script = index.get_script(from_id) if (from_id in index.parents or from_id in programs) else None
+		to_script = index.get_script(to_id) if (to_id in index.parents or to_id in programs) else None
+		if label == 'CFG_parentOf':
+			# CFG entry and exit nodes have no AST parent
+			if from_script is None and to_script is not None:
+				index.orphans.setdefault(from_id, to_script)
+			elif to_script is None and from_script is not None:
+				index.orphans.setdefault(to_id, from_script)
+		if from_script is not None and to_script is not None and from_script != to_script:
+			neighbours.setdefault(from_script, set()).add(to_script)
+			neighbours.setdefault(to_script, set()).add(from_script)
+
+	present_libraries = set(programs.values()) & library_scripts
+	if not present_libraries:
+		return set(), set(), index, node_count
+
+	# scripts reachable from the scripts of the sinks
+	seeds = set()
+	for node_id in sink_ids:
+		script = index.get_script(node_id) if (node_id in index.parents or node_id in programs) else None
+		if script is not None:
+			seeds.add(script)
+	connected = set(seeds)
+	stack = list(seeds)
+	while stack:
+		script = stack.pop()
+		for neighbour in neighbours.get(script, []):
+			if neighbour not in connected:
+				connected.add(neighbour)
+				stack.append(neighbour)
+
+	kept = present_libraries & connected
+	return present_libraries - kept, kept, index, node_count
+
+
+def prune_hpg_files(nodes_file, rels_files, library_scripts, sink_ids, output_folder):
+	"""
+	writes the HPG without the nodes of the library scripts that are not connected to the sinks, and without their relationships,
+	into `output_folder`; nothing is written if no script is pruned
+	@param {string} nodes_file: path of the (possibly compressed) nodes.csv file
+	@param {list} rels_files: paths of the (possibly compressed) rels.csv and rels_dynamic.csv files
+	@param {set} library_scripts: file names of the library scripts
+	@param {list} sink_ids: node ids of the sinks of `sinks.out.json`
+	@param {string} output_folder: folder of the reduced files
+	@return {dict} summary of the pruning
+	"""
+
+	pruned_scripts, kept_scripts, index, node_count = get_pruned_scripts(nodes_file, rels_files, library_scripts, sink_ids)
+	result = {
+		"pruned_scripts": sorted(pruned_scripts),
+		"kept_library_scripts": sorted(kept_scripts),
+		"nodes_before": node_count,
+		"nodes_after": node_count,
+		"rels_before": 0,
+		"rels_after": 0,
+	}
+	if not pruned_scripts:
+		return result
+
+	def is_pruned(node_id):
+		return index.get_script(node_id) in pruned_scripts
+
+	def keep_node(line):
+		return not is_pruned(line.split(HPG_CSV_DELIMITER, 1)[0])
+
+	def keep_relationship(line):
+		fields = line.split(HPG_CSV_DELIMITER, 2)
+		if len(fields) < 3:
+			return True
+		return not (is_pruned(fields[0]) or is_pruned(fields[1]))
+
+	_, result["nodes_after"] = HPGCSVModule.write_graph_file(nodes_file, os.path.join(output_folder, os.path.basename(nodes_file)), keep_node)
+	for rels_file in rels_files:
+		before, after = HPGCSVModule.write_graph_file(rels_file, os.path.join(output_folder, os.path.basename(rels_file)), keep_relationship)
+		result["rels_before"] += before
+		result["rels_after"] += after
+	return result
+
+
+def prune_webpage_hpg(webpage_folder, graph_files=None):
+	"""
+	writes the HPG of a webpage without its unused library scripts into its `hpg_pruning` folder, see the module description
+	@param {string} webpage_folder
+	@param {list} graph_files: the (nodes.csv, rels.csv, rels_dynamic.csv) files to prune (default: the ones of the webpage folder)
+	@return {tuple} the (nodes.csv, rels.csv, rels_dynamic.csv) files of the pruned HPG, or None if no script was pruned,
+		or the webpage has no `sinks.out.json` or no HPG files
+	"""
+
+	sink_ids = HPGSinkConeModule.get_sink_ids(webpage_folder)
+	if sink_ids is None:
+		return None
+
+	if graph_files is None:
+		graph_files = [IOModule.get_graph_file(os.path.join(webpage_folder, name)) for name in HPG_FILE_NAMES]
+	graph_files = [item if item is not None and os.path.exists(item) else None for item in graph_files]
+	if graph_files[0] is None or graph_files[1] is None:
+		return None
+	nodes_file = graph_files[0]
+	rels_files = [item for item in graph_files[1:] if item is not None]
+
+	output_folder = os.path.join(webpage_folder, PRUNING_FOLDER_NAME)
+	remove_pruned_hpg(webpage_folder)
+
+	library_scripts = get_library_scripts(webpage_folder)
+	if library_scripts:
+		os.makedirs(output_folder)
+		result = prune_hpg_files(nodes_file, rels_files, library_scripts, sink_ids, output_folder)
+	else:
+		result = {"pruned_scripts": [], "kept_library_scripts": []}
+	result["sinks"] = len(sink_ids)
+
+	with open(os.path.join(webpage_folder, PRUNING_RESULT_FILE_NAME), 'w', encoding='utf-8') as fd:
+		json.dump(result, fd, ensure_ascii=False, indent=4)
+
+	if not result["pruned_scripts"]:
+		remove_pruned_hpg(webpage_folder)
+		return None
+
+	logger.info('[pruning] removed %d library scripts (%d of %d nodes kept) of %s'%(len(result["pruned_scripts"]), result["nodes_after"], result["nodes_before"], webpage_folder))
+	pruned_files = [os.path.join(output_folder, os.path.basename(item)) if item is not None else None for item in graph_files]
+	if pruned_files[2] is None:
+		# the headerless rels_dynamic.csv file is imported even if it is empty
+		pruned_files[2] = os.path.join(output_folder, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME)
+		open(pruned_files[2], 'w').close()
+	return tuple(pruned_files)
+
+
+def remove_pruned_hpg(webpage_folder):
+	"""
+	removes the pruned HPG files of a webpage, e.g., once they are imported or analyzed
+	"""
+	shutil.rmtree(os.path.join(webpage_folder, PRUNING_FOLDER_NAME), ignore_errors=True)
+
+
+
+def _find_webpage_folders(folder):
+	if os.path.exists(os.path.join(folder, 'scripts_mapping.json')):
+		return [folder]
+	return [os.path.join(folder, item) for item in os.listdir(folder) if os.path.isdir(os.path.join(folder, item))]
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script writes the HPG csv files of webpages without their unused library scripts.')
+	p.add_argument('--input', "-I",
+					help='webpage folder, or site folder whose webpages are pruned',
+					type=str)
+
+	args = vars(p.parse_args())
+	for webpage_folder in _find_webpage_folders(args["input"]):
+		pruned_files = prune_webpage_hpg(webpage_folder)
+		if pruned_files is not None:
+			logger.info('[pruning] %s: %s'%(webpage_folder, ', '.join(item for item in pruned_files)))
+
+
+
+if __name__ == "__main__":
+	main()
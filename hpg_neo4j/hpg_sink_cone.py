@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Offline pre-import pass over the (possibly compressed) HPG csv files of a webpage that keeps only the
+	part of the HPG that the request hijacking traversals can reach from the sinks of `sinks.out.json`,
+	and writes it as reduced nodes.csv, rels.csv and rels_dynamic.csv files into the `hpg_sink_cone` folder
+	of the webpage, with the same codec. The original files are left as is.
+
+	The cone starts from the CFG-level statement of each sink, and is closed under
+		- the incoming `PDG_parentOf` relationships of its statements (the backward slices),
+		- the incoming `CG_parentOf` relationships of the functions whose parameters are sliced (the call sites),
+		- the `pointsTo` and `ERDG` relationships of its nodes (`this` pointers and event handlers).
+	For each statement of the cone, its whole AST subtree is kept, as well as its AST ancestors up to the
+	`Program` node, the signature and the enclosing statement of each enclosing function (without
+	the function bodies), and the definitions called by the statement. This over-approximates the
+	AST lookups of `analyses.general.data_flow`, and the `--check` mode compares the flows found on
+	the reduced HPG against the ones found on the whole HPG, both imported into a scratch neo4j instance.
+
+	The files are streamed twice: once to build the adjacency of the HPG, and once to write the cone.
+
+
+	Usage:
+	------------
+	> import hpg_neo4j.hpg_sink_cone as HPGSinkConeModule
+	> nodes_file, rels_file, rels_dynamic_file = HPGSinkConeModule.build_webpage_sink_cone(webpage_folder)
+
+	$ python3 -m hpg_neo4j.hpg_sink_cone --input=data/www.example.com/<webpage> --check
+
+"""
+
+import os
+import json
+import shutil
+import argparse
+import constants as constantsModule
+import utils.io as IOModule
+import hpg_neo4j.hpg_csv as HPGCSVModule
+import hpg_neo4j.query_utility as QU
+from utils.logging import logger
+
+
+HPG_CSV_DELIMITER = HPGCSVModule.HPG_CSV_DELIMITER
+
+SINK_CONE_FOLDER_NAME = 'hpg_sink_cone'
+SINK_CONE_RESULT_FILE_NAME = 'hpg_sink_cone.json'
+SINK_CONE_CHECK_FILE_NAME = 'hpg_sink_cone_check.json'
+
+HPG_FILE_NAMES = [constantsModule.NODE_INPUT_FILE_NAME, constantsModule.RELS_INPUT_FILE_NAME, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME]
+FLOWS_FILE_NAMES = ['sinks.flows.out', 'sinks.flows.out.json']
+
+CFG_LEVEL_STATEMENTS = set(QU.get_cfg_level_nodes_for_statements())
+
+FUNCTION_TYPES = set(['FunctionExpression', 'FunctionDeclaration', 'ArrowFunctionExpression'])
+
+# relationships followed in both directions from the nodes of the cone
+LINK_RELATIONS = set(['pointsTo', 'ERDG'])
+
+
+
+def get_sink_ids(webpage_folder):
+	"""
+	@param {string} webpage_folder
+	@return {list} the node ids of the sinks of `sinks.out.json`, or None if the file does not exist
+	"""
+
+	sinks_file = os.path.join(webpage_folder, 'sinks.out.json')
+	if not os.path.exists(sinks_file):
+		return None
+	with open(sinks_file, 'r') as fd:
+		sinks_json = json.load(fd)
+	return [str(sink_node["id"]) for sink_node in sinks_json.get('sinks', [])]
+
+
+
+## ------------------------------------------------------------------ ##
+## adjacency of the HPG
+## ------------------------------------------------------------------ ##
+
+class _HPGIndex(object):
+
+	"""
+	the node types and the relationships of the HPG that the cone follows, keyed by node id
+	"""
+
+	def __init__(self):
+		self.types = {}
+		# identifier id -->> name, and name -->> ids of the identifiers
+		self.names = {}
+		self.identifiers = {}
+		# child node id -->> (parent node id, relation type)
+		self.parents = {}
+		# parent node id -->> ids of the children
+		self.children = {}
+		# node id -->> ids of the sources of its incoming `PDG_parentOf` relationships
+		self.pdg_parents = {}
+		# function definition id -->> ids of its call sites, and vice-versa
+		self.callers = {}
+		self.callees = {}
+		# node id -->> ids of its `pointsTo` and `ERDG` neighbours
+		self.links = {}
+
+
+	def load_nodes(self, nodes_file):
+		with IOModule.open_graph_file(nodes_file, 'r', newline='') as fd:
+			header = fd.readline()
+			id_index = HPGCSVModule.get_column_index(header, 'Id')
+			type_index = HPGCSVModule.get_column_index(header, 'Type')
+			code_index = HPGCSVModule.get_column_index(header, 'Code')
+			for line in fd:
+				fields = HPGCSVModule.split_line(line)
+				if len(fields) <= max(id_index, type_index, code_index):
+					continue
+				node_type = fields[type_index]
+				self.types[fields[id_index]] = node_type
+				if node_type == 'Identifier':
+					code = HPGCSVModule.unquote(fields[code_index])
+					self.names[fields[id_index]] = code
+					self.identifiers.setdefault(code, []).append(fields[id_index])
+
+
+	def load_relationships(self, rels_file):
+		with IOModule.open_graph_file(rels_file, 'r', newline='') as fd:
+			for line in fd:
+				fields = HPGCSVModule.split_line(line)
+				if len(fields) < 3 or fields[0].startswith('FromId'):
+					continue
+				from_id, to_id, label = fields[0], fields[1], HPGCSVModule.unquote(fields[2])
+				if label == 'AST_parentOf':
+					relation_type = HPGCSVModule.unquote(fields[3]) if len(fields) > 3 else ''
+					self.parents[to_id] = (from_id, relation_type)
+					self.children.setdefault(from_id, []).append(to_id)
+				elif label == 'PDG_parentOf':
+					self.pdg_parents.setdefault(to_id, []).append(from_id)
+				elif label == 'CG_parentOf':
+					self.callers.setdefault(to_id, []).append(from_id)
+					self.callees.setdefault(from_id, []).append(to_id)
+				elif label in LINK_RELATIONS:
+					self.links.setdefault(from_id, []).append(to_id)
+					self.links.setdefault(to_id, []).append(from_id)
+
+
+	def get_parent(self, node_id):
+		item = self.parents.get(node_id)
+		return item[0] if item is not None else None
+
+
+	def get_child(self, node_id, relation_type):
+		for child in self.children.get(node_id, []):
+			if self.parents[child][1] == relation_type:
+				return child
+		return None
+
+
+	def get_topmost(self, node_id):
+		"""
+		@return {string} the CFG-level statement of a node, as `QU.get_ast_topmost()`
+		"""
+		iterator = node_id
+		while self.types.get(iterator) not in CFG_LEVEL_STATEMENTS:
+			parent = self.get_parent(iterator)
+			if parent is None:
+				break
+			iterator = parent
+		return iterator
+
+
+
+## ------------------------------------------------------------------ ##
+## sink cone
+## ------------------------------------------------------------------ ##
+
+class _SinkCone(object):
+
+	"""
+	the ids of the nodes that the traversals may visit when slicing backwards from the given sinks
+	"""
+
+	def __init__(self, index):
+		self.index = index
+		self.nodes = set()
+		self.statements = set()
+		# roots whose whole AST subtree is in the cone
+		self._subtrees = set()
+		self._functions = set()
+		self._called_functions = set()
+		self._pending = []
+
+
+	def add_sinks(self, sink_ids):
+		for sink_id in sink_ids:
+			if sink_id in self.index.types:
+				self._add_statement(sink_id)
+		while self._pending:
+			self._expand_statement(self._pending.pop())
+		return self
+
+
+	def _add_statement(self, node_id):
+		statement = self.index.get_topmost(node_id)
+		if statement not in self.statements:
+			self.statements.add(statement)
+			self._pending.append(statement)
+
+
+	def _keep_subtree(self, root, skip_function_bodies=False):
+		"""
+		@return {list} the nodes of the subtree, without the subtrees that were already in the cone
+		"""
+		added = []
+		stack = [root]
+		while stack:
+			node_id = stack.pop()
+			if node_id in self._subtrees:
+				continue
+			self.nodes.add(node_id)
+			added.append(node_id)
+			is_function = self.index.types.get(node_id) in FUNCTION_TYPES
+			for child in self.index.children.get(node_id, []):
+				if skip_function_bodies and is_function and self.index.parents[child][1] == 'body':
+					continue
+				stack.append(child)
+		if not skip_function_bodies:
+			self._subtrees.add(root)
+		return added
+
+
+	def _keep_ancestors(self, node_id):
+		parent = self.index.get_parent(node_id)
+		while parent is not None and parent not in self.nodes:
+			self.nodes.add(parent)
+			if self.index.types.get(parent) in FUNCTION_TYPES:
+				self._add_function_context(parent)
+			parent = self.index.get_parent(parent)
+		# the ancestors above were added by an earlier call
+		if parent is not None and self.index.types.get(parent) in FUNCTION_TYPES:
+			self._add_function_context(parent)
+
+
+	def _keep_node(self, node_id):
+		if node_id in self.index.parents:
+			self._add_statement(node_id)
+		else:
+			# e.g., DOM nodes, or `Program` nodes
+			self.nodes.add(node_id)
+
+
+	def _expand_statement(self, statement):
+		for node_id in self._keep_subtree(statement):
+			for neighbour in self.index.links.get(node_id, []):
+				self._keep_node(neighbour)
+			# function definitions called by the statement, e.g., as printed by the slices
+			for definition in self.index.callees.get(node_id, []):
+				self._keep_subtree(definition)
+				self._keep_ancestors(definition)
+		self._keep_ancestors(statement)
+
+		for source in self.index.pdg_parents.get(statement, []):
+			source_type = self.index.types.get(source)
+			if source_type == 'BlockStatement' or source_type == 'Program':
+				# data flows from the parameters of a function into its body
+				self.nodes.add(source)
+				self._keep_ancestors(source)
+				function = self.index.get_parent(source)
+				if function is not None and self.index.types.get(function) in FUNCTION_TYPES:
+					self._add_function_callers(function)
+			else:
+				self._add_statement(source)
+
+
+	def _add_function_context(self, function):
+		"""
+		keeps the AST around a function that the `this` pointer and the parameter queries inspect
+		"""
+		if function in self._functions:
+			return
+		self._functions.add(function)
+		self.nodes.add(function)
+
+		for neighbour in self.index.links.get(function, []):
+			self._keep_node(neighbour)
+
+		parent = self.index.get_parent(function)
+		if self.index.types.get(function) == 'FunctionDeclaration' or parent is None:
+			# i.e., its name and its parameters
+			self._keep_subtree(function, skip_function_bodies=True)
+		else:
+			# e.g., the left side of an assignment, the key of a property, or the call expression of a callback
+			context = self.index.get_topmost(parent)
+			if self.index.types.get(context) not in CFG_LEVEL_STATEMENTS:
+				context = parent
+			self._keep_subtree(context, skip_function_bodies=True)
+			self._keep_ancestors(context)
+
+			# assignments of the function name to the member of an owner object elsewhere, as per `this_in_assigned_function`
+			name = self.index.get_child(parent, 'left') or self.index.get_child(parent, 'id')
+			if name is not None and self.index.types.get(name) == 'Identifier':
+				for identifier in self.index.identifiers.get(self.index.names.get(name), []):
+					assignment, relation_type = self.index.parents.get(identifier, (None, None))
+					if relation_type == 'right' and self.index.types.get(assignment) == 'AssignmentExpression':
+						self._keep_subtree(assignment)
+						self._keep_ancestors(assignment)
+
+		self._keep_ancestors(function)
+
+
+	def _add_function_callers(self, function):
+		if function in self._called_functions:
+			return
+		self._called_functions.add(function)
+		self._add_function_context(function)
+		for caller in self.index.callers.get(function, []):
+			self._add_statement(caller)
+
+
+
+
+## ------------------------------------------------------------------ ##
+## reduced hpg files
+## ------------------------------------------------------------------ ##
+
+def build_sink_cone(nodes_file, rels_files, sink_ids):
+	"""
+	@param {string} nodes_file: path of the (possibly compressed) nodes.csv file
+	@param {list} rels_files: paths of the (possibly compressed) rels.csv and rels_dynamic.csv files
+	@param {list} sink_ids: node ids of the sinks
+	@return {set} the ids of the nodes of the cone
+	"""
+
+	index = _HPGIndex()
+	index.load_nodes(nodes_file)
+	for rels_file in rels_files:
+		index.load_relationships(rels_file)
+	return _SinkCone(index).add_sinks(sink_ids).nodes
+
+
+def write_sink_cone(cone, nodes_file, rels_files, output_folder):
+	"""
+	writes the nodes of the cone, and the relationships between them, into `output_folder`
+	@return {dict} summary of the reduction
+	"""
+
+	def keep_node(line):
+		return line.split(HPG_CSV_DELIMITER, 1)[0] in cone
+
+	def keep_relationship(line):
+		fields = line.split(HPG_CSV_DELIMITER, 2)
+		return len(fields) == 3 and fields[0] in cone and fields[1] in cone
+
+	result = {"rels_before": 0, "rels_after": 0}
+	result["nodes_before"], result["nodes_after"] = HPGCSVModule.write_graph_file(nodes_file, os.path.join(output_folder, os.path.basename(nodes_file)), keep_node)
+	for rels_file in rels_files:
+		before, after = HPGCSVModule.write_graph_file(rels_file, os.path.join(output_folder, os.path.basename(rels_file)), keep_relationship)
+		result["rels_before"] += before
+		result["rels_after"] += after
+	return result
+
+
+def build_webpage_sink_cone(webpage_folder, graph_files=None):
+	"""
+	writes the sink cone of the HPG of a webpage into its `hpg_sink_cone` folder, see the module description
+	@param {string} webpage_folder
+	@param {list} graph_files: the (nodes.csv, rels.csv, rels_dynamic.csv) files to reduce, e.g., the ones of
+		`hpg_neo4j.hpg_pruning` (default: the ones of the webpage folder)
+	@return {tuple} the (nodes.csv, rels.csv, rels_dynamic.csv) files of the cone, or None if the webpage has
+		no `sinks.out.json` or no HPG files
+	"""
+
+	sink_ids = get_sink_ids(webpage_folder)
+	if sink_ids is None:
+		return None
+
+	if graph_files is None:
+		graph_files = [IOModule.get_graph_file(os.path.join(webpage_folder, name)) for name in HPG_FILE_NAMES]
+	graph_files = [item if item is not None and os.path.exists(item) else None for item in graph_files]
+	if graph_files[0] is None or graph_files[1] is None:
+		return None
+	nodes_file = graph_files[0]
+	rels_files = [item for item in graph_files[1:] if item is not None]
+
+	output_folder = os.path.join(webpage_folder, SINK_CONE_FOLDER_NAME)
+	if os.path.exists(output_folder):
+		shutil.rmtree(output_folder)
+	os.makedirs(output_folder)
+
+	cone = build_sink_cone(nodes_file, rels_files, sink_ids)
+	result = write_sink_cone(cone, nodes_file, rels_files, output_folder)
+	result["sinks"] = len(sink_ids)
+	logger.info('[sink cone] kept %d of %d nodes and %d of %d relationships for %d sinks of %s'%(result["nodes_after"], result["nodes_before"], result["rels_after"], result["rels_before"], len(sink_ids), webpage_folder))
+
+	with open(os.path.join(webpage_folder, SINK_CONE_RESULT_FILE_NAME), 'w', encoding='utf-8') as fd:
+		json.dump(result, fd, ensure_ascii=False, indent=4)
+
+	cone_files = [os.path.join(output_folder, os.path.basename(item)) if item is not None else None for item in graph_files]
+	if cone_files[2] is None:
+		# the headerless rels_dynamic.csv file is imported even if it is empty
+		cone_files[2] = os.path.join(output_folder, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME)
+		open(cone_files[2], 'w').close()
+	return tuple(cone_files)
+
+
+def remove_sink_cone(webpage_folder):
+	"""
+	removes the reduced HPG files of a webpage, e.g., once they are imported or analyzed
+	"""
+	shutil.rmtree(os.path.join(webpage_folder, SINK_CONE_FOLDER_NAME), ignore_errors=True)
+
+
+
+## ------------------------------------------------------------------ ##
+## correctness check
+## ------------------------------------------------------------------ ##
+
+# name of the scratch ineo instance of the check, and the partitions of the whole HPG and of the cone in it
+SINK_CONE_CHECK_DATABASE_NAME = 'sink_cone_check'
+FULL_PARTITION_ID = 'full'
+CONE_PARTITION_ID = 'cone'
+
+
+def _run_traversals_on_partition(webpage_folder, webpage_url, partition_id, traversals_fn):
+	"""
+	@return {dict} the flows of `sinks.flows.out.json` found by `traversals_fn` on the given partition, keyed by sink
+	"""
+
+	import hpg_neo4j.db_utility as DU
+
+	QU.set_active_partition(partition_id)
+	try:
+		DU.exec_fn_within_transaction(traversals_fn, webpage_url, webpage_folder, os.path.basename(webpage_folder), conn=constantsModule.NEO4J_CONN_STRING)
+	finally:
+		QU.set_active_partition(None)
+		QU.invalidate_ast_topmost_index()
+
+	with open(os.path.join(webpage_folder, 'sinks.flows.out.json'), 'r', encoding='utf-8') as fd:
+		flows = json.load(fd)["flows"]
+	return dict(('%s__nid=%s__Loc=%s'%(flow["sink_type"], flow["node_id"], flow["loc"]), flow) for flow in flows)
+
+
+def check_webpage_sink_cone(webpage_folder, traversals_fn):
+	"""
+	imports the whole HPG and the sink cone of a webpage as two partitions of a scratch neo4j instance,
+	runs `traversals_fn` on each, and compares the flows of `sinks.flows.out.json`; the previous outputs
+	of the webpage are restored
+	@param {string} webpage_folder
+	@param {pointer} traversals_fn: e.g., `run_traversals()` of the request hijacking traversals
+	@return {dict} summary of the comparison, or None if the webpage has no sinks or HPG files, or neo4j did not start
+	"""
+
+	# `partitioned_import` imports the pre-import passes, which import this module
+	import hpg_neo4j.db_utility as DU
+	import hpg_neo4j.partitioned_import as PartitionedImportModule
+
+	graph_files = [IOModule.get_graph_file(os.path.join(webpage_folder, name)) for name in HPG_FILE_NAMES]
+	cone_files = build_webpage_sink_cone(webpage_folder)
+	if cone_files is None:
+		return None
+
+	url_file = os.path.join(webpage_folder, 'url.out')
+	webpage_url = ''
+	if os.path.exists(url_file):
+		with open(url_file, 'r') as fd:
+			webpage_url = fd.read()
+
+	partitions = []
+	for partition_id, (nodes_file, rels_file, rels_dynamic_file) in ((FULL_PARTITION_ID, graph_files), (CONE_PARTITION_ID, cone_files)):
+		partitions.append({
+			"partition_id": partition_id,
+			"webpage": os.path.basename(webpage_folder),
+			"webpage_folder": webpage_folder,
+			"webpage_url": webpage_url,
+			"nodes_file": nodes_file,
+			"rels_file": rels_file,
+			"rels_dynamic_file": rels_dynamic_file,
+		})
+
+	previous_outputs = {}
+	for file_name in FLOWS_FILE_NAMES:
+		file_path = os.path.join(webpage_folder, file_name)
+		if os.path.exists(file_path):
+			with open(file_path, 'rb') as fd:
+				previous_outputs[file_path] = fd.read()
+
+	# cached slices would hide the differences
+	script_cache_enabled = constantsModule.SCRIPT_CACHE_ENABLED
+	constantsModule.SCRIPT_CACHE_ENABLED = False
+	try:
+		if not PartitionedImportModule.import_hpg_partitions(SINK_CONE_CHECK_DATABASE_NAME, partitions):
+			logger.error('[sink cone] neo4j did not accept connections, skipping the check of %s'%webpage_folder)
+			return None
+		full_flows = _run_traversals_on_partition(webpage_folder, webpage_url, FULL_PARTITION_ID, traversals_fn)
+		cone_flows = _run_traversals_on_partition(webpage_folder, webpage_url, CONE_PARTITION_ID, traversals_fn)
+	finally:
+		constantsModule.SCRIPT_CACHE_ENABLED = script_cache_enabled
+		remove_sink_cone(webpage_folder)
+		for file_name in FLOWS_FILE_NAMES:
+			file_path = os.path.join(webpage_folder, file_name)
+			if file_path in previous_outputs:
+				with open(file_path, 'wb') as fd:
+					fd.write(previous_outputs[file_path])
+			elif os.path.exists(file_path):
+				os.remove(file_path)
+		DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
+		DU.ineo_stop_db_instance(SINK_CONE_CHECK_DATABASE_NAME)
+		DU.ineo_remove_db_instance(SINK_CONE_CHECK_DATABASE_NAME)
+
+	result = {
+		"flows_full": len(full_flows),
+		"flows_cone": len(cone_flows),
+		"missing": sorted(set(full_flows) - set(cone_flows)),
+		"extra": sorted(set(cone_flows) - set(full_flows)),
+		"different": sorted(key for key in set(full_flows) & set(cone_flows) if full_flows[key] != cone_flows[key]),
+	}
+	result["equal"] = not (result["missing"] or result["extra"] or result["different"])
+
+	with open(os.path.join(webpage_folder, SINK_CONE_CHECK_FILE_NAME), 'w', encoding='utf-8') as fd:
+		json.dump(result, fd, ensure_ascii=False, indent=4)
+	return result
+
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script reduces the HPG csv files of a webpage to the backward cone of its sinks.')
+	p.add_argument('--input', "-I",
+					help='webpage folder with the sinks.out.json and the (possibly compressed) HPG csv files',
+					type=str)
+	p.add_argument('--check', "-C",
+					default=False,
+					action='store_true',
+					help='compare the request hijacking flows on the whole HPG and on the cone, in a scratch neo4j instance (default: %(default)s)')
+
+	args = vars(p.parse_args())
+	webpage_folder = args["input"]
+	if args["check"]:
+		import analyses.request_hijacking.traversals_cypher as request_hijacking_py_traversals
+		result = check_webpage_sink_cone(webpage_folder, request_hijacking_py_traversals.run_traversals)
+		if result is not None:
+			logger.info('[sink cone] %s: %s'%(webpage_folder, json.dumps(result)))
+	else:
+		build_webpage_sink_cone(webpage_folder)
+
+
+
+if __name__ == "__main__":
+	main()
+
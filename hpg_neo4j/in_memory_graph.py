@@ -0,0 +1,1075 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+	Copyright (C) 2020  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	---------------
+	In-process HPG store that loads the `nodes.csv`, `rels.csv` and `rels_dynamic.csv`
+	files of a webpage directly, and answers the AST and PDG navigation queries of the
+	query catalog (`IN_MEMORY_QUERIES`) without a round trip to neo4j.
+
+	Nodes are kept as integer indices with interned string properties, and the
+	relationships as one CSR adjacency per relationship type and direction.
+	Relationships are returned newest-first, like neo4j does for the relationships
+	of a node, which e.g., `QU.get_code_expression()` relies on for the order of
+	the AST children.
+
+	The in-memory transaction wraps the neo4j transaction of the same HPG: the other catalog
+	queries (e.g., the `this` pointer analysis, the sinks, and the writes) and ad-hoc cypher
+	are passed to neo4j, so that only a small, declared subset of the catalog is duplicated.
+
+	The parity check (`main()`) runs the `IN_MEMORY_QUERIES` on the in-memory HPG of `--input`
+	and with cypher on the neo4j database at `--conn`, which must hold the same HPG, e.g.,
+	`data/test_program` or the HPG of a library of `data/libraries`. The query parameters are
+	sampled from the HPG (node ids per node type, PDG and AST relationships), the nodes of the
+	records are compared by their ids, and the script fails if any query returns different
+	records. The cypher results can be recorded with `--record`, and compared offline with
+	`--recorded` (see `tests/unit-tests/python/test_in_memory_graph.py`).
+
+	Usage:
+	---------------
+	> import hpg_neo4j.in_memory_graph as InMemoryGraphModule
+	> graph = InMemoryGraphModule.InMemoryHPG.from_csv(nodes_file, rels_file, rels_dynamic_file)
+	> out = DU.exec_fn_within_transaction(graph.wrap_traversals(run_traversals), webpage_url, webpage_folder, webpage, conn=conn)
+
+	$ python3 -m hpg_neo4j.in_memory_graph --input=data/test_program --conn=bolt://127.0.0.1:7687 --record=test_program.json
+	$ python3 -m hpg_neo4j.in_memory_graph --input=data/test_program --recorded=test_program.json
+
+"""
+
+
+import os
+import sys
+import json
+import inspect
+import argparse
+import collections
+from array import array
+
+import constants as constantsModule
+import utils.io as IOModule
+import hpg_neo4j.hpg_columnar as HPGColumnarModule
+import hpg_neo4j.hpg_csv as HPGCSVModule
+import hpg_neo4j.query_catalog as QC
+from utils.logging import logger
+
+
+# label and relationship types of the HPG
+AST_RELATION = 'AST_parentOf'
+CFG_RELATION = 'CFG_parentOf'
+PDG_RELATION = 'PDG_parentOf'
+CG_RELATION = 'CG_parentOf'
+ERDG_RELATION = 'ERDG'
+POINTS_TO_RELATION = 'pointsTo'
+
+HPG_CSV_DELIMITER = HPGCSVModule.HPG_CSV_DELIMITER
+
+# header of the headerless `rels_dynamic.csv` file
+DEFAULT_RELS_HEADER = 'FromId:START_ID¿ToId:END_ID¿RelationLabel:TYPE¿RelationType¿Arguments'
+
+OUTGOING = 'out'
+INCOMING = 'in'
+
+# AST ancestors that are recorded as the enclosing functions of a node
+FUNCTION_TYPES = ['FunctionExpression', 'FunctionDeclaration', 'ArrowFunctionExpression']
+# CFG entries that are recorded as the enclosing blocks of a node
+ENCLOSING_BLOCK_TYPES = ['Program', 'BlockStatement']
+
+# the catalog queries that are answered in memory: the AST and PDG navigation of `query_utility` and `data_flow`,
+# i.e., the bulk of the queries of the traversals; every other query falls back to neo4j
+IN_MEMORY_QUERIES = [
+	'node_by_id',
+	'ast_parent',
+	'ast_children',
+	'ast_children_by_relation_type',
+	'ast_subtrees',
+	'ast_program_roots',
+	'ast_program_edges',
+	'pdg_parents',
+	'pdg_parents_batch',
+	'pdg_parents_variable_declarations',
+]
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Graph Elements
+# ------------------------------------------------------------------------------------ #
+
+class HPGNode(object):
+
+	"""
+	a node of the in-memory HPG; behaves like a read-only neo4j node, i.e., `node['Type']`,
+	`'Code' in node`, and is hashable (equal nodes have the same index in the same graph)
+	"""
+
+	__slots__ = ('graph', 'index')
+
+	def __init__(self, graph, index):
+		self.graph = graph
+		self.index = index
+
+	def __getitem__(self, key):
+		return self.graph.get_node_property(self.index, key)
+
+	def get(self, key, default=None):
+		value = self.graph.get_node_property(self.index, key)
+		if value is None:
+			return default
+		return value
+
+	def __contains__(self, key):
+		return self.graph.get_node_property(self.index, key) is not None
+
+	def keys(self):
+		return [key for key in self.graph.get_node_property_names() if key in self]
+
+	def values(self):
+		return [self[key] for key in self.keys()]
+
+	def items(self):
+		return [(key, self[key]) for key in self.keys()]
+
+	@property
+	def id(self):
+		return self.index
+
+	@property
+	def labels(self):
+		return self.graph.get_node_labels(self.index)
+
+	def __eq__(self, other):
+		return isinstance(other, HPGNode) and other.graph is self.graph and other.index == self.index
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash((id(self.graph), self.index))
+
+	def __repr__(self):
+		return '<HPGNode Id=%s Type=%s>'%(self['Id'], self['Type'])
+
+
+
+class HPGRecord(tuple):
+
+	"""
+	a result row; like neo4j records, values are accessed by key (`record['n']`) or position
+	"""
+
+	def __new__(cls, keys, values):
+		record = tuple.__new__(cls, values)
+		record._keys = tuple(keys)
+		return record
+
+	def __getitem__(self, key):
+		if isinstance(key, str):
+			try:
+				return tuple.__getitem__(self, self._keys.index(key))
+			except ValueError:
+				raise KeyError(key)
+		return tuple.__getitem__(self, key)
+
+	def get(self, key, default=None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def keys(self):
+		return list(self._keys)
+
+	def values(self):
+		return list(self)
+
+	def data(self):
+		return dict(zip(self._keys, self))
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Graph Store
+# ------------------------------------------------------------------------------------ #
+
+def _parse_header(line):
+	"""
+	@param {string} line: header line of a neo4j-admin csv file, e.g., `Id:ID¿Type¿Label:LABEL`
+	@return {list} pairs of (property name, neo4j-admin field type or None)
+	"""
+	columns = []
+	for field in line.rstrip('\r\n').split(HPG_CSV_DELIMITER):
+		if ':' in field:
+			name, field_type = field.split(':', 1)
+			# strip the id group, e.g., `ID(pid)`
+			field_type = field_type.split('(', 1)[0]
+			columns.append((name, field_type))
+		else:
+			columns.append((field, None))
+	return columns
+
+
+
+class InMemoryHPG(object):
+
+	"""
+	the HPG of a single webpage, held in memory
+	"""
+
+	def __init__(self):
+
+		# interned strings; index 0 stands for a missing property
+		self._strings = [None]
+		self._string_index = {}
+
+		# nodes
+		self._node_ids = []
+		self._node_index = {}
+		self._node_labels = array('i')
+		self._property_names = []
+		self._node_properties = {}
+
+		# relationships
+		self._edge_source = array('i')
+		self._edge_target = array('i')
+		self._edge_type = array('i')
+		self._edge_relation_type = array('i')
+		self._edge_arguments = array('i')
+
+		# CSR adjacency: {direction: {relationship type: (offsets, edge indices)}}
+		self._adjacency = {OUTGOING: {}, INCOMING: {}}
+
+		# node indices per `Type`
+		self._type_index = {}
+
+		# nearest function ancestor of each node (-1 for none), and the CFG entries that reach each node;
+		# built on first use, see `build_enclosing_indexes()`
+		self._enclosing_function = None
+		self._enclosing_blocks = None
+
+
+	@classmethod
+	def from_csv(cls, nodes_file, rels_file, rels_dynamic_file=None):
+		"""
+		@param {string} nodes_file: path of the nodes.csv file, possibly compressed (see `IOModule.open_graph_file()`)
+		@param {string} rels_file: path of the rels.csv file, possibly compressed
+		@param {string} rels_dynamic_file: path of the (headerless) rels_dynamic.csv file, possibly compressed (optional)
+		@return {InMemoryHPG} the loaded graph
+		"""
+		graph = cls()
+		graph.load_nodes(nodes_file)
+		rels_header = graph.load_relationships(rels_file)
+		if rels_dynamic_file is not None:
+			graph.load_relationships(rels_dynamic_file, header=rels_header)
+		graph.build_indexes()
+		logger.info('[InMemoryHPG] loaded %d nodes and %d relationships'%(graph.get_node_count(), graph.get_relationship_count()))
+		return graph
+
+
+	@classmethod
+	def from_parquet(cls, webpage_folder):
+		"""
+		@param {string} webpage_folder: folder with the nodes.parquet and rels.parquet files (see `hpg_neo4j/hpg_columnar.py`)
+		@return {InMemoryHPG} the loaded graph, identical to the one loaded from the csv files the parquet files were converted from
+		"""
+		graph = cls()
+		nodes, rels = HPGColumnarModule.read_hpg_tables(webpage_folder)
+		graph.load_node_table(nodes)
+		graph.load_relationship_table(rels)
+		graph.build_indexes()
+		logger.info('[InMemoryHPG] loaded %d nodes and %d relationships'%(graph.get_node_count(), graph.get_relationship_count()))
+		return graph
+
+
+	## ------------------------------------------------------------------ ##
+	## loading
+	## ------------------------------------------------------------------ ##
+
+	def _intern(self, value):
+		if value is None or value == '':
+			return 0
+		index = self._string_index.get(value)
+		if index is None:
+			index = len(self._strings)
+			self._strings.append(value)
+			self._string_index[value] = index
+		return index
+
+
+	def load_nodes(self, nodes_file):
+		"""
+		streams the nodes of a nodes.csv file; duplicate node ids are skipped (first one wins),
+		as with `--skip-duplicate-nodes` of neo4j-admin
+		"""
+		with IOModule.open_graph_file(nodes_file, 'r') as fd:
+			columns = _parse_header(fd.readline())
+			id_column = None
+			label_column = None
+			property_columns = []
+			for i, (name, field_type) in enumerate(columns):
+				if field_type == 'ID':
+					id_column = i
+				elif field_type == 'LABEL':
+					label_column = i
+				elif field_type is None:
+					property_columns.append((i, name))
+					if name not in self._node_properties:
+						self._property_names.append(name)
+						self._node_properties[name] = array('i', [0]) * len(self._node_ids)
+
+			for line in fd:
+				fields = line.rstrip('\r\n').split(HPG_CSV_DELIMITER)
+				if len(fields) <= id_column:
+					continue
+				node_id = HPGCSVModule.unquote(fields[id_column])
+				if node_id == '' or node_id in self._node_index:
+					continue
+
+				self._node_index[node_id] = len(self._node_ids)
+				self._node_ids.append(node_id)
+
+				label = ''
+				if label_column is not None and label_column < len(fields):
+					label = HPGCSVModule.unquote(fields[label_column])
+				self._node_labels.append(self._intern(label))
+
+				for name in self._property_names:
+					self._node_properties[name].append(0)
+				row = len(self._node_ids) - 1
+				for i, name in property_columns:
+					if i < len(fields):
+						self._node_properties[name][row] = self._intern(HPGCSVModule.unquote(fields[i]))
+
+
+	def load_node_table(self, table):
+		"""
+		loads the nodes of a `pyarrow.Table` as written by `HPGColumnarModule.convert_nodes_csv()`;
+		the parsed location columns are not node properties of the HPG, and are skipped
+		"""
+		property_columns = [name for name in table.column_names if name not in ['Id', 'Label'] + HPGColumnarModule.LOCATION_COLUMNS]
+		for name in property_columns:
+			if name not in self._node_properties:
+				self._property_names.append(name)
+				self._node_properties[name] = array('i', [0]) * len(self._node_ids)
+
+		for values in HPGColumnarModule.iterate_table_rows(table, ['Id', 'Label'] + property_columns):
+			node_id = str(values[0])
+			if node_id in self._node_index:
+				continue
+
+			self._node_index[node_id] = len(self._node_ids)
+			self._node_ids.append(node_id)
+			self._node_labels.append(self._intern(values[1]))
+
+			for name in self._property_names:
+				self._node_properties[name].append(0)
+			row = len(self._node_ids) - 1
+			for name, value in zip(property_columns, values[2:]):
+				self._node_properties[name][row] = self._intern(value)
+
+
+	def load_relationship_table(self, table):
+		"""
+		loads the relationships of a `pyarrow.Table` as written by `HPGColumnarModule.convert_rels_csv()`
+		"""
+		for source, target, edge_type, relation_type, arguments in HPGColumnarModule.iterate_table_rows(table, ['FromId', 'ToId', 'RelationLabel', 'RelationType', 'Arguments']):
+			source = self._node_index.get(str(source))
+			target = self._node_index.get(str(target))
+			if source is None or target is None:
+				continue
+			self._add_edge(source, target, edge_type, relation_type or '', arguments or '')
+
+
+	def load_relationships(self, rels_file, header=None):
+		"""
+		streams the relationships of a rels csv file; relationships whose end nodes
+		do not exist are skipped, as with `--skip-bad-relationships` of neo4j-admin
+		@param {string} header: header of the file, if the file itself has none
+		@return {string} the header of the file
+		"""
+		with IOModule.open_graph_file(rels_file, 'r') as fd:
+			if header is None:
+				header = fd.readline()
+			columns = _parse_header(header)
+			source_column = target_column = type_column = None
+			relation_type_column = arguments_column = None
+			for i, (name, field_type) in enumerate(columns):
+				if field_type == 'START_ID':
+					source_column = i
+				elif field_type == 'END_ID':
+					target_column = i
+				elif field_type == 'TYPE':
+					type_column = i
+				elif name == 'RelationType':
+					relation_type_column = i
+				elif name == 'Arguments':
+					arguments_column = i
+
+			for line in fd:
+				fields = line.rstrip('\r\n').split(HPG_CSV_DELIMITER)
+				if len(fields) <= max(source_column, target_column, type_column):
+					continue
+				source = self._node_index.get(HPGCSVModule.unquote(fields[source_column]))
+				target = self._node_index.get(HPGCSVModule.unquote(fields[target_column]))
+				if source is None or target is None:
+					continue
+				relation_type = ''
+				if relation_type_column is not None and relation_type_column < len(fields):
+					relation_type = HPGCSVModule.unquote(fields[relation_type_column])
+				arguments = ''
+				if arguments_column is not None and arguments_column < len(fields):
+					arguments = HPGCSVModule.unquote(fields[arguments_column])
+				self._add_edge(source, target, HPGCSVModule.unquote(fields[type_column]), relation_type, arguments)
+
+		return header
+
+
+	def _add_edge(self, source, target, edge_type, relation_type='', arguments=''):
+		self._edge_source.append(source)
+		self._edge_target.append(target)
+		self._edge_type.append(self._intern(edge_type))
+		self._edge_relation_type.append(self._intern(relation_type))
+		self._edge_arguments.append(self._intern(arguments))
+		return len(self._edge_source) - 1
+
+
+	def build_indexes(self):
+		"""
+		builds the CSR adjacency of each relationship type, and the node indexes
+		"""
+		node_count = len(self._node_ids)
+
+		edges_per_type = {}
+		for edge, edge_type in enumerate(self._edge_type):
+			edges_per_type.setdefault(edge_type, []).append(edge)
+
+		for direction, endpoints in ((OUTGOING, self._edge_source), (INCOMING, self._edge_target)):
+			adjacency = {}
+			for edge_type, edges in edges_per_type.items():
+				offsets = array('i', [0]) * (node_count + 1)
+				for edge in edges:
+					offsets[endpoints[edge] + 1] += 1
+				for i in range(node_count):
+					offsets[i + 1] += offsets[i]
+				positions = array('i', offsets)
+				ordered_edges = array('i', [0]) * len(edges)
+				# stable: keeps the file order of the relationships of each node
+				for edge in edges:
+					node = endpoints[edge]
+					ordered_edges[positions[node]] = edge
+					positions[node] += 1
+				adjacency[edge_type] = (offsets, ordered_edges)
+			self._adjacency[direction] = adjacency
+
+		self._type_index = {}
+		types = self._node_properties.get('Type', array('i'))
+		for node in range(node_count):
+			node_type = types[node] if node < len(types) else 0
+			self._type_index.setdefault(node_type, []).append(node)
+
+
+	def build_enclosing_indexes(self):
+		"""
+		precomputes the enclosing functions and the enclosing blocks of the nodes, i.e., the end nodes of the
+		unbounded `(n)<-[:AST_parentOf*]-(function)` and `(n)<-[:CFG_parentOf*]-(block)` patterns;
+		the AST is a tree and the CFGs are per function, so both are computed in one pass over the graph
+		"""
+		node_count = len(self._node_ids)
+		function_types = set(self._string_index.get(name, -1) for name in FUNCTION_TYPES)
+		types = self._node_properties.get('Type', array('i'))
+
+		# top-down over the AST, from the nodes without an AST parent
+		self._enclosing_function = array('i', [-1]) * node_count
+		visited = bytearray(node_count)
+		for root in range(node_count):
+			if self.get_edges(root, AST_RELATION, INCOMING):
+				continue
+			visited[root] = 1
+			stack = [root]
+			while stack:
+				parent = stack.pop()
+				enclosing = parent if parent < len(types) and types[parent] in function_types else self._enclosing_function[parent]
+				for _, child in self.get_neighbours(parent, AST_RELATION, OUTGOING):
+					if not visited[child]:
+						visited[child] = 1
+						self._enclosing_function[child] = enclosing
+						stack.append(child)
+
+		# forward over the CFG, from each `Program` or `BlockStatement` entry
+		self._enclosing_blocks = {}
+		for block_type in ENCLOSING_BLOCK_TYPES:
+			for block in self.get_nodes_by_type(block_type):
+				visited = set()
+				stack = [block]
+				while stack:
+					current = stack.pop()
+					for _, successor in self.get_neighbours(current, CFG_RELATION, OUTGOING):
+						if successor in visited:
+							continue
+						visited.add(successor)
+						self._enclosing_blocks.setdefault(successor, []).append(block)
+						stack.append(successor)
+
+
+	def get_enclosing_functions(self, node):
+		"""
+		@param {int} node: node index
+		@return {list} the function nodes (see `FUNCTION_TYPES`) that are AST ancestors of the node, nearest first
+		"""
+		if self._enclosing_function is None:
+			self.build_enclosing_indexes()
+		out = []
+		current = self._enclosing_function[node]
+		while current != -1:
+			out.append(current)
+			current = self._enclosing_function[current]
+		return out
+
+
+	def get_enclosing_blocks(self, node):
+		"""
+		@param {int} node: node index
+		@return {list} the `Program` and `BlockStatement` nodes from which the node is reachable with `CFG_parentOf*`
+		"""
+		if self._enclosing_blocks is None:
+			self.build_enclosing_indexes()
+		return self._enclosing_blocks.get(node, [])
+
+
+	## ------------------------------------------------------------------ ##
+	## accessors
+	## ------------------------------------------------------------------ ##
+
+	def get_node_count(self):
+		return len(self._node_ids)
+
+	def get_relationship_count(self):
+		return len(self._edge_source)
+
+	def get_node_property_names(self):
+		return ['Id'] + self._property_names
+
+	def get_node_property(self, node, key):
+		if key == 'Id':
+			return self._node_ids[node]
+		column = self._node_properties.get(key)
+		if column is None:
+			return None
+		return self._strings[column[node]]
+
+	def get_node_labels(self, node):
+		label = self._strings[self._node_labels[node]]
+		if label is None:
+			return frozenset()
+		return frozenset(label.split(';'))
+
+	def get_edge_property(self, edge, key):
+		if key == 'RelationType':
+			return self._strings[self._edge_relation_type[edge]]
+		if key == 'Arguments':
+			return self._strings[self._edge_arguments[edge]]
+		return None
+
+	def get_edge_type(self, edge):
+		return self._strings[self._edge_type[edge]]
+
+	def get_edge_source(self, edge):
+		return self._edge_source[edge]
+
+	def get_edge_target(self, edge):
+		return self._edge_target[edge]
+
+	def get_node(self, node_id):
+		"""
+		@param {string} node_id: value of the `Id` property
+		@return {HPGNode} the node, or None
+		"""
+		index = self._node_index.get(str(node_id))
+		if index is None:
+			return None
+		return HPGNode(self, index)
+
+	def get_nodes_by_type(self, node_type):
+		return self._type_index.get(self._string_index.get(node_type, -1), [])
+
+	def node_has_type(self, node, node_type):
+		column = self._node_properties.get('Type')
+		return column is not None and self._strings[column[node]] == node_type
+
+
+	def get_edges(self, node, edge_type, direction=OUTGOING):
+		"""
+		@param {int} node: node index
+		@param {string} edge_type: relationship type, e.g., AST_parentOf
+		@param {string} direction: OUTGOING or INCOMING
+		@return {list} the relationship indices of the node, newest first
+		"""
+		type_index = self._string_index.get(edge_type)
+		if type_index is None:
+			return []
+		csr = self._adjacency[direction].get(type_index)
+		if csr is None:
+			return []
+		offsets, ordered_edges = csr
+		return list(reversed(ordered_edges[offsets[node]:offsets[node+1]]))
+
+
+	def get_neighbours(self, node, edge_type, direction=OUTGOING, relation_type=None):
+		"""
+		@return {list} pairs of (relationship index, neighbour node index), newest first
+		"""
+		endpoints = self._edge_target if direction == OUTGOING else self._edge_source
+		out = []
+		for edge in self.get_edges(node, edge_type, direction):
+			if relation_type is not None and self._strings[self._edge_relation_type[edge]] != relation_type:
+				continue
+			out.append((edge, endpoints[edge]))
+		return out
+
+
+	## ------------------------------------------------------------------ ##
+	## transactions
+	## ------------------------------------------------------------------ ##
+
+	def begin_transaction(self, fallback_tx=None):
+		return InMemoryHPGTransaction(self, fallback_tx)
+
+
+	def wrap_traversals(self, fn):
+		"""
+		@param {pointer} fn: the traversals, e.g., `run_traversals()` of the request hijacking traversals
+		@return {pointer} `fn` for `DU.exec_fn_within_transaction()`, that runs on an in-memory transaction
+			backed by the neo4j transaction it is called with
+		"""
+		def traversals_fn(tx, *args):
+			return fn(self.begin_transaction(fallback_tx=tx), *args)
+		return traversals_fn
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Transaction & Catalog Queries
+# ------------------------------------------------------------------------------------ #
+
+class InMemoryHPGTransaction(object):
+
+	"""
+	answers the queries of `IN_MEMORY_QUERIES` on an in-memory HPG, and passes every other query
+	(and ad-hoc cypher) to the neo4j transaction `fallback_tx`, which must hold the same HPG.
+	each `_query_<name>` method implements the catalog query `<name>` with the same result columns.
+	"""
+
+	def __init__(self, graph, fallback_tx=None):
+		self.graph = graph
+		self.fallback_tx = fallback_tx
+
+
+	def run(self, query, parameters=None, **kwparameters):
+		if self.fallback_tx is None:
+			raise NotImplementedError('the in-memory HPG only runs the queries of IN_MEMORY_QUERIES, not ad-hoc cypher')
+		return self.fallback_tx.run(query, parameters, **kwparameters)
+
+
+	def run_catalog_query(self, name, parameters):
+		"""
+		@param {string} name: name of the query in the catalog
+		@param {dict} parameters: the query parameters
+		@return {list|neo4j-pointer} the result records
+		"""
+		if name in IN_MEMORY_QUERIES:
+			return getattr(self, '_query_%s'%name)(**parameters)
+		if self.fallback_tx is None:
+			raise NotImplementedError('the query %s is not in IN_MEMORY_QUERIES and there is no neo4j transaction to fall back to'%name)
+		return QC.run_query(self.fallback_tx, name, **parameters)
+
+
+	## ------------------------------------------------------------------ ##
+	## helpers
+	## ------------------------------------------------------------------ ##
+
+	def _node(self, index):
+		if index is None:
+			return None
+		return HPGNode(self.graph, index)
+
+	def _anchor(self, node_id, node_type=None):
+		node = self.graph._node_index.get(str(node_id))
+		if node is None:
+			return None
+		if node_type is not None and not self.graph.node_has_type(node, node_type):
+			return None
+		return node
+
+	def _children(self, node, relation_type=None):
+		return [child for _, child in self.graph.get_neighbours(node, AST_RELATION, OUTGOING, relation_type)]
+
+	def _parents(self, node, relation_type=None):
+		return [parent for _, parent in self.graph.get_neighbours(node, AST_RELATION, INCOMING, relation_type)]
+
+	def _ancestors(self, node, max_depth=None):
+		"""
+		@return {list} the nodes at the end of every `<-[:AST_parentOf*1..max_depth]-` path from the node
+		"""
+		out = []
+		stack = [(node, 0, frozenset())]
+		while stack:
+			current, depth, used_edges = stack.pop()
+			if max_depth is not None and depth >= max_depth:
+				continue
+			for edge, parent in reversed(self.graph.get_neighbours(current, AST_RELATION, INCOMING)):
+				if edge in used_edges:
+					continue
+				out.append(parent)
+				stack.append((parent, depth + 1, used_edges | {edge}))
+		return out
+
+	@staticmethod
+	def _distinct(nodes):
+		seen = set()
+		out = []
+		for node in nodes:
+			if node not in seen:
+				seen.add(node)
+				out.append(node)
+		return out
+
+	def _collect(self, key, nodes):
+		return [HPGRecord([key], [[self._node(n) for n in self._distinct(nodes)]])]
+
+
+	## ------------------------------------------------------------------ ##
+	## AST navigation
+	## ------------------------------------------------------------------ ##
+
+	def _query_node_by_id(self, id, partition=None):
+		node = self._anchor(id)
+		if node is None:
+			return []
+		return [HPGRecord(['n'], [self._node(node)])]
+
+	def _query_ast_parent(self, id, partition=None):
+		node = self._anchor(id)
+		if node is None:
+			return []
+		return [HPGRecord(['parent'], [self._node(parent)]) for parent in self._parents(node)]
+
+	def _query_ast_children(self, id, partition=None):
+		node = self._anchor(id)
+		children = self._children(node) if node is not None else []
+		return self._collect('resultset', children)
+
+	def _query_ast_children_by_relation_type(self, id, relation_type, partition=None):
+		node = self._anchor(id)
+		children = self._children(node, relation_type) if node is not None else []
+		return self._collect('resultset', children)
+
+
+	def _query_ast_subtrees(self, ids, relation_type=None, partition=None):
+		graph = self.graph
+		out = []
+		for root_id in ids:
+			root = self._anchor(root_id)
+			if root is None:
+				continue
+			worklist = [(root, True)]
+			while worklist:
+				node, is_root = worklist.pop()
+				for edge, child in graph.get_neighbours(node, AST_RELATION, OUTGOING):
+					if is_root and relation_type is not None and graph.get_edge_property(edge, 'RelationType') != relation_type:
+						continue
+					out.append(HPGRecord(['root_id', 'parent_id', 'rel_id', 'child'], [root_id, graph._node_ids[node], edge, self._node(child)]))
+					worklist.append((child, False))
+		return out
+
+
+	def _query_ast_program_roots(self, partition=None):
+		return [HPGRecord(['root'], [self._node(root)]) for root in self.graph.get_nodes_by_type('Program')]
+
+	def _query_ast_program_edges(self, partition=None):
+		graph = self.graph
+		out = []
+		visited = set()
+		worklist = list(graph.get_nodes_by_type('Program'))
+		while worklist:
+			node = worklist.pop()
+			if node in visited:
+				continue
+			visited.add(node)
+			for _, child in graph.get_neighbours(node, AST_RELATION, OUTGOING):
+				out.append(HPGRecord(['parent_id', 'child'], [graph._node_ids[node], self._node(child)]))
+				worklist.append(child)
+		return out
+
+
+	## ------------------------------------------------------------------ ##
+	## data flow
+	## ------------------------------------------------------------------ ##
+
+	def _pdg_parents(self, id, varname, node_type=None):
+		node = self._anchor(id)
+		if node is None:
+			return []
+		graph = self.graph
+		out = []
+		for edge, n_t in graph.get_neighbours(node, PDG_RELATION, INCOMING):
+			if graph.get_edge_property(edge, 'Arguments') != varname:
+				continue
+			if node_type is not None and not graph.node_has_type(n_t, node_type):
+				continue
+			out.append(n_t)
+		return out
+
+	def _query_pdg_parents(self, id, varname, partition=None):
+		return self._collect('resultset', self._pdg_parents(id, varname))
+
+	def _query_pdg_parents_batch(self, pairs, partition=None):
+		out = []
+		# one row per distinct pair, like the grouping keys of the cypher aggregation
+		for item, varname in self._distinct((pair['id'], pair['varname']) for pair in pairs):
+			nodes = self._distinct(self._pdg_parents(item, varname))
+			if nodes:
+				out.append(HPGRecord(['id', 'varname', 'resultset'], [item, varname, [self._node(n) for n in nodes]]))
+		return out
+
+	def _query_pdg_parents_variable_declarations(self, id, varname, partition=None):
+		return self._collect('resultset', self._pdg_parents(id, varname, 'VariableDeclaration'))
+
+
+
+def wrap_webpage_traversals(webpage_folder, graph_files, traversals_fn, load_parquet=True):
+	"""
+	@param {string} webpage_folder: absolute path of the webpage folder
+	@param {list} graph_files: the nodes, rels and rels_dynamic files that are imported into neo4j
+	@param {pointer} traversals_fn: function with the signature `fn(tx, webpage_url, webpage_folder, webpage)`
+	@param {bool} load_parquet: load the columnar copy of the HPG instead of the csv files, if any and if not stale
+	@return {pointer} `traversals_fn` on the HPG of the webpage loaded in memory, with neo4j as the fallback
+		of the queries that are not in `IN_MEMORY_QUERIES`; `traversals_fn` itself if the HPG could not be loaded
+	"""
+	nodes_file, rels_file, rels_dynamic_file = graph_files
+	if rels_dynamic_file is not None and not os.path.exists(rels_dynamic_file):
+		rels_dynamic_file = None
+	try:
+		if load_parquet and HPGColumnarModule.pyarrow is not None and HPGColumnarModule.has_parquet_hpg(webpage_folder, graph_files=[nodes_file, rels_file, rels_dynamic_file]):
+			# typed columns, memory-mapped instead of parsed from text; only if converted from the very csv files to import
+			graph = InMemoryHPG.from_parquet(webpage_folder)
+		else:
+			graph = InMemoryHPG.from_csv(nodes_file, rels_file, rels_dynamic_file)
+	except Exception as e:
+		logger.error(e)
+		logger.error('[InMemoryHPG] could not load the hpg of %s, running all queries with neo4j'%webpage_folder)
+		return traversals_fn
+	return graph.wrap_traversals(traversals_fn)
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Parity Check
+# ------------------------------------------------------------------------------------ #
+
+# queries whose collected nodes are ordered, i.e., the child order of `QU.get_code_expression()`
+ORDERED_RESULT_QUERIES = ['ast_children', 'ast_children_by_relation_type']
+
+
+def _sample(items, sample_size):
+	"""
+	@return {list} at most `sample_size` items, evenly spread over the given ones
+	"""
+	items = list(items)
+	if len(items) <= sample_size:
+		return items
+	step = len(items) / float(sample_size)
+	return [items[int(i * step)] for i in range(sample_size)]
+
+
+def get_check_parameters(graph, sample_size):
+	"""
+	@param {InMemoryHPG} graph
+	@param {int} sample_size: number of values per node type, or per kind of parameter
+	@return {dict} tuple of parameter names -->> list of parameter dicts for the queries with these parameters
+	"""
+
+	node_ids = graph._node_ids
+	nodes_by_type = {}
+	for node in range(graph.get_node_count()):
+		nodes_by_type.setdefault(graph.get_node_property(node, 'Type'), []).append(node)
+	ids = [node_ids[node] for nodes in nodes_by_type.values() for node in _sample(nodes, sample_size)]
+
+	# the variables of the PDG relationships, and the names of the identifiers;
+	# empty csv fields are not imported as properties by neo4j-admin, and are left out
+	id_varnames = []
+	for node in range(graph.get_node_count()):
+		for edge, _ in graph.get_neighbours(node, PDG_RELATION, INCOMING):
+			id_varnames.append((node_ids[node], graph.get_edge_property(edge, 'Arguments')))
+	id_varnames = _sample(sorted(item for item in set(id_varnames) if item[1]), sample_size * 5)
+	identifiers = [node for node in graph.get_nodes_by_type('Identifier') if graph.get_node_property(node, 'Code')]
+	id_varnames += [(node_ids[node], graph.get_node_property(node, 'Code')) for node in _sample(identifiers, sample_size * 5)]
+
+	id_relation_types = set()
+	for node in range(graph.get_node_count()):
+		for edge, _ in graph.get_neighbours(node, AST_RELATION, OUTGOING):
+			id_relation_types.add((node_ids[node], graph.get_edge_property(edge, 'RelationType')))
+	id_relation_types = _sample(sorted(item for item in id_relation_types if item[1]), sample_size * 5)
+
+	return {
+		(): [{}],
+		('id',): [{"id": item} for item in ids],
+		('id', 'varname'): [{"id": item, "varname": varname} for item, varname in id_varnames],
+		('id', 'relation_type'): [{"id": item, "relation_type": relation_type} for item, relation_type in id_relation_types],
+		('ids', 'relation_type'): [{"ids": ids, "relation_type": None}] + [{"ids": [item], "relation_type": relation_type} for item, relation_type in id_relation_types],
+		('pairs',): [{"pairs": [{"id": item, "varname": varname} for item, varname in id_varnames]}],
+	}
+
+
+def _normalize_value(value, ordered):
+	"""
+	@return the value with the nodes replaced by their ids
+	"""
+	if isinstance(value, (list, tuple)):
+		items = [_normalize_value(item, ordered) for item in value]
+		return tuple(items) if ordered else tuple(sorted(items, key=repr))
+	if hasattr(value, 'labels'):
+		return value.get('Id')
+	return value
+
+
+def _normalize_records(name, records):
+	"""
+	@return {Counter} the normalized records; the `rel_id` of `ast_subtrees` is replaced by its rank among the
+		relationships of the same parent, since the relationship ids of neo4j and of the in-memory HPG differ
+	"""
+	ordered = name in ORDERED_RESULT_QUERIES
+	rows = [dict((key, _normalize_value(value, ordered)) for key, value in zip(record.keys(), record.values())) for record in records]
+	rel_ids = {}
+	for row in rows:
+		if 'rel_id' in row:
+			rel_ids.setdefault((row["root_id"], row["parent_id"]), []).append(row["rel_id"])
+	for row in rows:
+		if 'rel_id' in row:
+			row["rel_id"] = sorted(rel_ids[(row["root_id"], row["parent_id"])]).index(row["rel_id"])
+	return collections.Counter(tuple(sorted(row.items())) for row in rows)
+
+
+def _serialize_records(name, records):
+	"""
+	@return {list} the normalized records (see `_normalize_records()`) as json objects, in a canonical order
+	"""
+	rows = json.loads(json.dumps([dict(row) for row in _normalize_records(name, records).elements()]))
+	return sorted(rows, key=lambda row: json.dumps(row, sort_keys=True))
+
+
+def record_catalog_queries(tx, graph, sample_size):
+	"""
+	runs the `IN_MEMORY_QUERIES` with cypher on `tx`, with parameters sampled from `graph`
+	@param {neo4j-pointer} tx: transaction of a neo4j database that holds the same HPG as `graph`
+	@param {InMemoryHPG} graph
+	@param {int} sample_size: see `get_check_parameters()`
+	@return {dict} query name -->> list of {"parameters", "records"}
+	"""
+
+	parameters = get_check_parameters(graph, sample_size)
+	in_memory_tx = graph.begin_transaction()
+
+	result = {}
+	for name in IN_MEMORY_QUERIES:
+		handler = getattr(in_memory_tx, '_query_%s'%name)
+		parameter_names = tuple(item for item in inspect.signature(handler).parameters if item != 'partition')
+		result[name] = []
+		for params in parameters[parameter_names]:
+			records = tx.run(QC.get_query(name, partitioned=False), params)
+			result[name].append({"parameters": params, "records": _serialize_records(name, records)})
+	return result
+
+
+def compare_catalog_queries(graph, recorded):
+	"""
+	runs the `IN_MEMORY_QUERIES` on the in-memory HPG, and compares the records with the recorded cypher ones
+	@param {InMemoryHPG} graph
+	@param {dict} recorded: output of `record_catalog_queries()` for the same HPG
+	@return {dict} query name -->> (number of parameter sets, number of mismatches)
+	"""
+
+	in_memory_tx = graph.begin_transaction()
+
+	result = {}
+	for name in IN_MEMORY_QUERIES:
+		if name not in recorded:
+			logger.warning('[parity] no recorded cypher results for the query %s, skipping'%name)
+			continue
+		mismatches = 0
+		for item in recorded[name]:
+			expected = item["records"]
+			actual = _serialize_records(name, in_memory_tx.run_catalog_query(name, dict(item["parameters"])))
+			if expected != actual:
+				mismatches += 1
+				logger.warning('[parity] %s(%s): with cypher: %s, in memory: %s'%(name, str(item["parameters"])[:200], str(expected)[:500], str(actual)[:500]))
+		result[name] = (len(recorded[name]), mismatches)
+	return result
+
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script compares the catalog queries of the in-memory HPG with their cypher on neo4j.')
+	p.add_argument('--input', "-I",
+					help='folder of the (possibly compressed) HPG csv files, e.g., data/test_program',
+					type=str)
+	p.add_argument('--conn', "-C",
+					default=constantsModule.NEO4J_CONN_STRING,
+					help='bolt connection string of the neo4j database that holds the HPG of --input (default: %(default)s)',
+					type=str)
+	p.add_argument('--sample', "-S",
+					default=20,
+					help='number of parameter values per node type, or per kind of parameter (default: %(default)s)',
+					type=int)
+	p.add_argument('--record', "-R",
+					default=None,
+					help='json file where the cypher results are recorded, for a later comparison with --recorded',
+					type=str)
+	p.add_argument('--recorded', "-O",
+					default=None,
+					help='compare with the cypher results recorded in this json file, instead of with neo4j',
+					type=str)
+
+	args = vars(p.parse_args())
+	graph_files = [IOModule.get_graph_file(os.path.join(args["input"], name)) for name in [constantsModule.NODE_INPUT_FILE_NAME, constantsModule.RELS_INPUT_FILE_NAME, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME]]
+	if graph_files[0] is None or graph_files[1] is None:
+		logger.error('[parity] the nodes/rels.csv files do not exist in %s'%args["input"])
+		sys.exit(1)
+	graph = InMemoryHPG.from_csv(*graph_files)
+
+	if args["recorded"] is not None:
+		with open(args["recorded"], 'r', encoding='utf-8') as fd:
+			recorded = json.load(fd)
+	else:
+		import hpg_neo4j.db_utility as DU
+		DU.bootstrap_hpg_schema(conn=args["conn"])
+		recorded = DU.exec_fn_within_transaction(record_catalog_queries, graph, args["sample"], conn=args["conn"])
+		DU.close_driver(conn=args["conn"])
+		if args["record"] is not None:
+			with open(args["record"], 'w', encoding='utf-8') as fd:
+				json.dump(recorded, fd, ensure_ascii=False, indent=1, sort_keys=True)
+
+	result = compare_catalog_queries(graph, recorded)
+	for name, (count, mismatches) in sorted(result.items()):
+		logger.info('[parity] %-40s %6d parameter sets, %d mismatches'%(name, count, mismatches))
+	if any(mismatches for _, mismatches in result.values()):
+		logger.error('[parity] the in-memory HPG and neo4j return different records')
+		sys.exit(1)
+
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+	Copyright (C) 2020  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	---------------
+	A pool of warm ineo neo4j instances that are created and authenticated once,
+	and then leased per webpage: the store of a leased instance is reset, the HPG of
+	the webpage is imported, and the instance is handed back after the analysis.
+	This avoids the `ineo create/destroy` + `set-initial-password` churn per webpage.
+
+	Usage:
+	---------------
+	> import hpg_neo4j.instance_pool as InstancePoolModule
+	> pool = InstancePoolModule.get_instance_pool()
+	> instance = pool.lease()
+	> if instance.load_hpg(nodes_file, rels_file, rels_dynamic_file):
+	> 	DU.exec_fn_within_transaction(fn, conn=instance.bolt_connection_string)
+	> pool.release(instance)
+
+"""
+
+
+import os
+import time
+import queue
+import atexit
+import threading
+
+import constants as constantsModule
+import hpg_neo4j.db_utility as DU
+from utils.io import run_os_command
+from utils.logging import logger
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Pooled Instance
+# ------------------------------------------------------------------------------------ #
+
+class PooledNeo4jInstance(object):
+
+	"""
+	a single ineo neo4j instance of the pool, bound to its own http/bolt port pair
+	"""
+
+	def __init__(self, name, http_port, bolt_port):
+		self.name = name
+		self.http_port = str(http_port)
+		self.bolt_port = str(bolt_port)
+		self.http_connection_string = "http://127.0.0.1:%s"%self.http_port
+		self.bolt_connection_string = "bolt://127.0.0.1:%s"%self.bolt_port
+		self.created = False
+		self.running = False
+
+
+	def create(self, password=constantsModule.NEO4J_PASS):
+		"""
+		creates the ineo instance and sets its initial password.
+		the password is kept in the `system` database, which survives the store resets of `load_hpg()`
+		"""
+		DU.ineo_remove_db_instance(self.name)
+		DU.ineo_create_db_instance(self.name, self.http_port)
+
+		# check if the requested bolt port is not the default one of ineo
+		if not ( int(self.http_port) + 2 == int(self.bolt_port) ):
+			DU.ineo_set_bolt_port_for_db_instance(self.name, self.bolt_port)
+
+		DU.neoadmin_set_initial_password(self.name, password=password)
+		self.created = True
+
+
+	def reset_store(self, neo4j_database_name='neo4j'):
+		"""
+		stops the instance and removes the store and transaction logs of the given database
+		"""
+		if self.running:
+			DU.close_driver(conn=self.bolt_connection_string)
+			DU.ineo_stop_db_instance(self.name)
+			self.running = False
+
+		instance_data_directory = os.path.join(DU.get_ineo_instance_directory(self.name), "data")
+		for folder in ["databases", "transactions"]:
+			store_path = os.path.join(os.path.join(instance_data_directory, folder), neo4j_database_name)
+			if os.path.exists(store_path):
+				run_os_command("rm -rf %s"%store_path)
+
+
+	def load_hpg(self, nodes_file, rels_file, rels_dynamic_file=None, neo4j_database_name='neo4j', timeout=150):
+		"""
+		resets the instance to an empty store, imports the given HPG and starts the instance
+		@param {string} nodes_file: path of the nodes.csv file
+		@param {string} rels_file: path of the rels.csv file
+		@param {string} rels_dynamic_file: path of the rels_dynamic.csv file (optional)
+		@param {string} neo4j_database_name: name of the database to import into
+		@param {int} timeout: max seconds to wait for the neo4j connection
+		@return {bool} whether or not the instance is ready to accept connections
+		"""
+		self.reset_store(neo4j_database_name=neo4j_database_name)
+
+		DU.neoadmin_import_db_instance(self.name, neo4j_database_name, nodes_file, rels_file, rels_dynamic_file)
+
+		log_offset = DU.ineo_start_db_instance(self.name)
+		self.running = True
+
+		connection_success = DU.wait_for_neo4j_bolt_connection(timeout=timeout, bolt_conn=self.bolt_connection_string, log_file=DU.get_ineo_instance_log_file(self.name), log_offset=log_offset)
+		if connection_success:
+			DU.bootstrap_hpg_schema(conn=self.bolt_connection_string)
+		return connection_success
+
+
+	def destroy(self):
+		"""
+		stops and removes the ineo instance
+		"""
+		if self.running:
+			DU.close_driver(conn=self.bolt_connection_string)
+			DU.ineo_stop_db_instance(self.name)
+			self.running = False
+		if self.created:
+			DU.ineo_remove_db_instance(self.name)
+			self.created = False
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Instance Pool
+# ------------------------------------------------------------------------------------ #
+
+class Neo4jInstancePool(object):
+
+	"""
+	a fixed-size pool of warm neo4j instances.
+	instance `i` listens on the http/bolt ports `http_port + i*port_step` and `bolt_port + i*port_step`
+	"""
+
+	def __init__(self, size=1, http_port=None, bolt_port=None, port_step=None, password=None):
+
+		if http_port is None:
+			http_port = constantsModule.NEO4J_HTTP_PORT
+		if bolt_port is None:
+			bolt_port = constantsModule.NEO4J_BOLT_PORT
+		if port_step is None:
+			port_step = constantsModule.NEO4J_INSTANCE_POOL_PORT_STEP
+		if password is None:
+			password = constantsModule.NEO4J_PASS
+
+		self.size = max(1, int(size))
+		self.password = password
+		self.instances = []
+		self._available = queue.Queue()
+		self._lock = threading.Lock()
+		self._created = False
+
+		for i in range(self.size):
+			instance_http_port = int(http_port) + i * int(port_step)
+			instance_bolt_port = int(bolt_port) + i * int(port_step)
+			# the name includes the base port to avoid collisions between concurrent pools
+			instance_name = 'jaw_pool_{0}_{1}'.format(http_port, i)
+			self.instances.append(PooledNeo4jInstance(instance_name, instance_http_port, instance_bolt_port))
+
+
+	def create(self):
+		"""
+		creates all the instances of the pool (only once)
+		"""
+		with self._lock:
+			if self._created:
+				return
+			for instance in self.instances:
+				logger.info('[Pool] creating neo4j instance %s on http port %s and bolt port %s'%(instance.name, instance.http_port, instance.bolt_port))
+				instance.create(password=self.password)
+				self._available.put(instance)
+			self._created = True
+
+
+	def lease(self, timeout=None):
+		"""
+		@param {int} timeout: max seconds to block waiting for a free instance (None blocks forever)
+		@return {PooledNeo4jInstance} a free instance of the pool
+		"""
+		self.create()
+		return self._available.get(block=True, timeout=timeout)
+
+
+	def release(self, instance):
+		"""
+		stops the given instance and hands it back to the pool
+		"""
+		if instance.running:
+			DU.close_driver(conn=instance.bolt_connection_string)
+			DU.ineo_stop_db_instance(instance.name)
+			instance.running = False
+		self._available.put(instance)
+
+
+	def destroy(self):
+		"""
+		removes all the instances of the pool
+		"""
+		with self._lock:
+			if not self._created:
+				return
+			for instance in self.instances:
+				logger.info('[Pool] removing neo4j instance %s'%instance.name)
+				instance.destroy()
+			self._available = queue.Queue()
+			self._created = False
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Process-wide Pool
+# ------------------------------------------------------------------------------------ #
+
+_INSTANCE_POOL = None
+
+def get_instance_pool():
+	"""
+	@return {Neo4jInstancePool} the pool of the current process; created lazily with the
+		neo4j ports configured in the constants module, and destroyed at process exit
+	"""
+	global _INSTANCE_POOL
+	if _INSTANCE_POOL is None:
+		_INSTANCE_POOL = Neo4jInstancePool(size=constantsModule.NEO4J_INSTANCE_POOL_SIZE)
+		atexit.register(_INSTANCE_POOL.destroy)
+	return _INSTANCE_POOL
+
+
+def destroy_instance_pool():
+	"""
+	removes the instances of the pool of the current process, if any;
+	to be called by worker processes, whose `atexit` handlers do not run when `multiprocessing` ends them
+	"""
+	global _INSTANCE_POOL
+	if _INSTANCE_POOL is not None:
+		_INSTANCE_POOL.destroy()
+		_INSTANCE_POOL = None
+
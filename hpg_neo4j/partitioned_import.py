@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+	Copyright (C) 2020  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	---------------
+	Imports the HPGs of all webpages of a site (or of a batch of sites) into a single neo4j
+	database with one `neo4j-admin import` call and one server start.
+
+	Each webpage is a partition of the database: its node ids are imported into a separate
+	neo4j id space (i.e., `Id:ID(<partition>)`), so node ids of different webpages do not clash,
+	and each of its nodes carries the `constantsModule.HPG_PARTITION_PROPERTY` property.
+	The traversals are then scoped to one partition at a time via `QU.set_active_partition()`.
+
+	Usage:
+	---------------
+	> import hpg_neo4j.partitioned_import as PartitionedImportModule
+	> partitions = PartitionedImportModule.collect_webpage_partitions([seed_url])
+	> PartitionedImportModule.analyze_hpg_partitions(database_name, partitions, run_traversals)
+
+"""
+
+
+import os
+import json
+import time
+import shutil
+
+import constants as constantsModule
+import utils.io as IOModule
+import utils.utility as utilityModule
+import utils.job_ledger as JobLedgerModule
+import utils.page_dedup as PageDedupModule
+import hpg_neo4j.db_utility as DU
+import hpg_neo4j.query_utility as QU
+import hpg_neo4j.hpg_pruning as HPGPruningModule
+import hpg_neo4j.hpg_enclosing as HPGEnclosingModule
+from utils.logging import logger
+
+
+# CSV delimiter of the HPG files
+HPG_CSV_DELIMITER = '¿'
+
+# name of the directory (in `DATA_DIR`) where the partitioned CSV files are staged for the import
+STAGING_DIRECTORY_NAME = 'hpg_partitions'
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Staging
+# ------------------------------------------------------------------------------------ #
+
+def _get_partitioned_header(header_line, partition_id, add_partition_column=False):
+	"""
+	@param {string} header_line: header line of a nodes or rels csv file
+	@param {string} partition_id
+	@param {bool} add_partition_column: whether to add the partition property column (for nodes)
+	@return {string} the header with all id columns moved to the id space of the given partition
+	"""
+	fields = header_line.rstrip('\r\n').split(HPG_CSV_DELIMITER)
+	out = []
+	for field in fields:
+		for id_type in [':ID', ':START_ID', ':END_ID']:
+			if field.endswith(id_type):
+				field = '%s(%s)'%(field, partition_id)
+				break
+		out.append(field)
+
+	if add_partition_column:
+		out.append(constantsModule.HPG_PARTITION_PROPERTY)
+
+	return HPG_CSV_DELIMITER.join(out) + '\n'
+
+
+def _copy_lines(fd_in, fd_out, suffix=''):
+	"""
+	streams the non-empty lines of `fd_in` to `fd_out`, optionally appending `suffix` to each line
+	"""
+	for line in fd_in:
+		line = line.rstrip('\r\n')
+		if not line:
+			continue
+		fd_out.write(line + suffix + '\n')
+
+
+def stage_partition(partition_id, nodes_file, rels_file, rels_dynamic_file, staging_directory):
+	"""
+	rewrites the HPG csv files of a webpage for the partitioned import
+	@param {string} partition_id: partition of the webpage in the database
+	@param {string} nodes_file: path of the nodes.csv file (possibly compressed, see `IOModule.get_graph_file()`)
+	@param {string} rels_file: path of the rels.csv file (possibly compressed)
+	@param {string} rels_dynamic_file: path of the headerless rels_dynamic.csv file (possibly compressed), or None
+	@param {string} staging_directory: output directory
+	@return {tuple} paths of the staged nodes and rels files
+	"""
+
+	# keep the staged files compressed too when streaming the compressed HPGs; neo4j-admin reads gzip files natively
+	suffix = ''
+	if str(constantsModule.HPG_STREAM_COMPRESSED).lower() == 'true':
+		suffix = IOModule.HPG_CODEC_SUFFIXES['gzip']
+
+	staged_nodes_file = os.path.join(staging_directory, '%s_%s%s'%(partition_id, constantsModule.NODE_INPUT_FILE_NAME, suffix))
+	staged_rels_file = os.path.join(staging_directory, '%s_%s%s'%(partition_id, constantsModule.RELS_INPUT_FILE_NAME, suffix))
+
+	with IOModule.open_graph_file(nodes_file, 'r', newline='') as fd_in, IOModule.open_graph_file(staged_nodes_file, 'w', newline='') as fd_out:
+		fd_out.write(_get_partitioned_header(fd_in.readline(), partition_id, add_partition_column=True))
+		_copy_lines(fd_in, fd_out, suffix=HPG_CSV_DELIMITER + partition_id)
+
+	with IOModule.open_graph_file(staged_rels_file, 'w', newline='') as fd_out:
+		with IOModule.open_graph_file(rels_file, 'r', newline='') as fd_in:
+			fd_out.write(_get_partitioned_header(fd_in.readline(), partition_id))
+			_copy_lines(fd_in, fd_out)
+
+		# rels_dynamic.csv has no header and follows the header of rels.csv
+		if rels_dynamic_file and os.path.exists(rels_dynamic_file):
+			with IOModule.open_graph_file(rels_dynamic_file, 'r', newline='') as fd_in:
+				_copy_lines(fd_in, fd_out)
+
+	return staged_nodes_file, staged_rels_file
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Webpages
+# ------------------------------------------------------------------------------------ #
+
+def _get_url_for_webpage(webpage_directory):
+	fd = open(os.path.join(webpage_directory, "url.out"), "r")
+	content = fd.read()
+	fd.close()
+	return content
+
+
+def collect_webpage_partitions(seed_urls, overwrite=False, output_file_name='sinks.flows.out', load_dynamic_rels=True, ledger_stage=None, deduplicate=False):
+	"""
+	@param {list} seed_urls: sites whose webpages should be imported into the same database
+	@param {bool} overwrite: whether to re-analyze webpages that already have an output file
+	@param {string} output_file_name: name of the analysis output file of each webpage
+	@param {bool} load_dynamic_rels: whether to import rels_dynamic.csv as well
+	@param {string} ledger_stage: stage of the job ledger whose finished (or given up) webpages are skipped
+	@param {bool} deduplicate: whether to import only one webpage per cluster of near-duplicate webpages (if `WEBPAGE_DEDUP_ENABLED`)
+	@return {list} a list of partitions, i.e., dicts with the webpage folder, url and HPG files
+	"""
+
+	ledger = JobLedgerModule.get_job_ledger() if ledger_stage is not None else None
+
+	partitions = []
+	for seed_url in seed_urls:
+
+		webapp_folder_name = utilityModule.getDirectoryNameFromURL(seed_url)
+		webapp_data_directory = os.path.join(constantsModule.DATA_DIR, webapp_folder_name)
+		if not os.path.exists(webapp_data_directory):
+			logger.error("[TR] did not found the directory for HPG analysis: "+str(webapp_data_directory))
+			continue
+
+		webpages_json_file = os.path.join(webapp_data_directory, "webpages.json")
+		if os.path.exists(webpages_json_file):
+			fd = open(webpages_json_file, 'r')
+			webapp_pages = json.load(fd)
+			fd.close()
+		else:
+			# the name of each webpage folder is a hex digest of a SHA256 hash (as stored by the crawler)
+			webapp_pages = [item for item in os.listdir(webapp_data_directory) if len(item) == 64]
+
+		duplicates_of = {}
+		if deduplicate and str(constantsModule.WEBPAGE_DEDUP_ENABLED).lower() == 'true':
+			webapp_pages, duplicates = PageDedupModule.get_representative_webpages(webapp_data_directory, webapp_pages)
+			for duplicate, representative in duplicates.items():
+				duplicates_of.setdefault(representative, []).append(duplicate)
+
+		for webpage in webapp_pages:
+			webpage_folder = os.path.join(webapp_data_directory, webpage)
+			if not os.path.exists(webpage_folder):
+				continue
+
+			# do NOT re-analyze webpages that the job ledger has finished (or given up)
+			if ledger is not None and str(overwrite).lower() == 'false' and not ledger.should_run(seed_url, webpage, ledger_stage):
+				logger.info('[TR] skipping webpage %s as per the job ledger'%webpage)
+				continue
+
+			if str(overwrite).lower() == 'false' and os.path.exists(os.path.join(webpage_folder, output_file_name)):
+				logger.info('[TR] analyis results already exists for webpage: %s'%webpage_folder)
+				continue
+
+			nodes_file = os.path.join(webpage_folder, constantsModule.NODE_INPUT_FILE_NAME)
+			rels_file =  os.path.join(webpage_folder, constantsModule.RELS_INPUT_FILE_NAME)
+			rels_dynamic_file = os.path.join(webpage_folder, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME)
+
+			if str(constantsModule.HPG_STREAM_COMPRESSED).lower() == 'true':
+				# the staging reads the csv files in whatever format they are stored
+				nodes_file = IOModule.get_graph_file(nodes_file)
+				rels_file = IOModule.get_graph_file(rels_file)
+				rels_dynamic_file = IOModule.get_graph_file(rels_dynamic_file)
+				if nodes_file is None or rels_file is None:
+					logger.error('[TR] The nodes/rels.csv files do not exist in %s, skipping.'%webpage_folder)
+					continue
+
+			elif not (os.path.exists(nodes_file) and os.path.exists(rels_file)):
+				if os.path.exists(nodes_file + '.gz') and os.path.exists(rels_file + '.gz'):
+					logger.info('[TR] de-compressing hpg of %s.'%webpage_folder)
+					IOModule.decompress_graph(webpage_folder)
+				else:
+					logger.error('[TR] The nodes/rels.csv files do not exist in %s, skipping.'%webpage_folder)
+					continue
+
+			if str(constantsModule.HPG_PRUNE_LIBRARIES).lower() == 'true':
+				# the partition is staged from the hpg without the library scripts that are not connected to the sinks
+				pruned_files = HPGPruningModule.prune_webpage_hpg(webpage_folder, graph_files=[nodes_file, rels_file, rels_dynamic_file])
+				if pruned_files is not None:
+					nodes_file, rels_file, rels_dynamic_file = pruned_files
+
+			if str(constantsModule.HPG_ENCLOSING_PROPERTIES).lower() == 'true':
+				enclosing_files = HPGEnclosingModule.add_webpage_enclosing_properties(webpage_folder, graph_files=[nodes_file, rels_file, rels_dynamic_file])
+				if enclosing_files is not None:
+					nodes_file = enclosing_files[0]
+
+			partitions.append({
+				# webpage folder names are SHA256 hashes of the webpage urls, and thus unique across sites
+				"partition_id": webpage,
+				"seed_url": seed_url,
+				"website_folder": webapp_data_directory,
+				# near-duplicate webpages that get the results of this webpage
+				"duplicates": duplicates_of.get(webpage, []),
+				"webpage": webpage,
+				"webpage_folder": webpage_folder,
+				"webpage_url": _get_url_for_webpage(webpage_folder),
+				"nodes_file": nodes_file,
+				"rels_file": rels_file,
+				"rels_dynamic_file": rels_dynamic_file if load_dynamic_rels else None,
+			})
+
+	return partitions
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Import and Analysis
+# ------------------------------------------------------------------------------------ #
+
+def get_partitioned_database_name(seed_urls):
+	"""
+	@param {list} seed_urls: sites imported into the same database
+	@return {string} name of the ineo instance for the given sites
+	"""
+	if len(seed_urls) == 1:
+		return '{0}_partitioned'.format(utilityModule.getDirectoryNameFromURL(seed_urls[0]))
+	# requirement: the database name must have a length between 3 and 63 characters
+	return 'batch_{0}'.format(utilityModule.sha256('_'.join(sorted(seed_urls)))[:16])
+
+
+def import_hpg_partitions(database_name, partitions, neo4j_database_name='neo4j'):
+	"""
+	creates the ineo instance `database_name` and imports all given partitions into it with a single neo4j-admin call
+	@param {string} database_name: name of the ineo instance
+	@param {list} partitions: output of `collect_webpage_partitions()`
+	@return {bool} whether or not the instance is ready to accept connections
+	"""
+
+	staging_directory = os.path.join(os.path.join(constantsModule.DATA_DIR, STAGING_DIRECTORY_NAME), database_name)
+	if os.path.exists(staging_directory):
+		shutil.rmtree(staging_directory)
+	os.makedirs(staging_directory)
+
+	logger.info('[TR] staging %d hpg partitions in %s'%(len(partitions), staging_directory))
+	staged_files = []
+	for partition in partitions:
+		staged_files.append(stage_partition(partition["partition_id"], partition["nodes_file"], partition["rels_file"], partition["rels_dynamic_file"], staging_directory))
+
+	neo4j_http_port = constantsModule.NEO4J_HTTP_PORT
+	neo4j_bolt_port = constantsModule.NEO4J_BOLT_PORT
+
+	logger.warning('[TR] removing any previous neo4j instance for %s'%str(database_name))
+	DU.ineo_remove_db_instance(database_name)
+
+	logger.info('[TR] creating db %s with http port %s'%(database_name, neo4j_http_port))
+	DU.ineo_create_db_instance(database_name, neo4j_http_port)
+
+	# check if the bolt port requested by the config.yaml is not the default one
+	if not ( int(neo4j_http_port) + 2 == int(neo4j_bolt_port) ):
+		logger.info('[TR] setting the requested bolt port %s for db %s'%(neo4j_bolt_port, database_name))
+		DU.ineo_set_bolt_port_for_db_instance(database_name, neo4j_bolt_port)
+
+	logger.info('[TR] importing %d partitions with neo4j-admin.'%len(staged_files))
+	DU.neoadmin_import_partitioned_db_instance(database_name, neo4j_database_name, staged_files)
+	shutil.rmtree(staging_directory)
+	for partition in partitions:
+		HPGPruningModule.remove_pruned_hpg(partition["webpage_folder"])
+		HPGEnclosingModule.remove_enclosing_properties(partition["webpage_folder"])
+
+	logger.info('[TR] setting the neo4j password and starting neo4j.')
+	log_offset = DU.ineo_set_initial_password_and_start(database_name, password=constantsModule.NEO4J_PASS)
+
+	logger.info('[TR] waiting for the neo4j connection to be ready...')
+	connection_success = DU.wait_for_neo4j_bolt_connection(timeout=150, bolt_conn=constantsModule.NEO4J_CONN_STRING, log_file=DU.get_ineo_instance_log_file(database_name), log_offset=log_offset)
+	if connection_success:
+		logger.info('[TR] creating the schema indexes of the hpg partitions.')
+		DU.bootstrap_hpg_schema(conn=constantsModule.NEO4J_CONN_STRING, partitioned=True)
+	return connection_success
+
+
+def _finish_partition_job(ledger, ledger_stage, partition, output_file_name, error=None):
+	if ledger is None:
+		return
+	if error is not None:
+		ledger.fail(partition["seed_url"], partition["webpage"], ledger_stage, error=error)
+	elif os.path.exists(os.path.join(partition["webpage_folder"], output_file_name)):
+		ledger.finish(partition["seed_url"], partition["webpage"], ledger_stage)
+	else:
+		ledger.fail(partition["seed_url"], partition["webpage"], ledger_stage, error='no %s'%output_file_name)
+
+
+def analyze_hpg_partitions(database_name, partitions, traversals_fn, conn_timeout=None, compress_hpg=True, output_file_name='sinks.flows.out', ledger_stage=None):
+	"""
+	imports the given partitions into one database and runs the traversals once per partition
+	@param {string} database_name: name of the ineo instance
+	@param {list} partitions: output of `collect_webpage_partitions()`
+	@param {function} traversals_fn: function with the signature `fn(tx, webpage_url, webpage_folder, webpage)`
+	@param {int} conn_timeout: timeout of the traversals of each partition
+	@param {bool} compress_hpg: whether to compress the HPG files after the import
+	@param {string} output_file_name: name of the analysis output file, where errors are reported
+	@param {string} ledger_stage: stage of the job ledger under which the traversals of each partition are recorded
+	"""
+
+	if len(partitions) == 0:
+		logger.info('[TR] no webpages to analyze for %s'%database_name)
+		return
+
+	ledger = JobLedgerModule.get_job_ledger() if ledger_stage is not None else None
+	if ledger is not None:
+		for partition in partitions:
+			ledger.start(partition["seed_url"], partition["webpage"], ledger_stage)
+
+	connection_success = import_hpg_partitions(database_name, partitions)
+
+	if str(compress_hpg).lower() == 'true':
+		# compress the hpg after the model import
+		for partition in partitions:
+			IOModule.compress_graph(partition["webpage_folder"])
+
+	if connection_success:
+		for partition in partitions:
+			webpage_folder = partition["webpage_folder"]
+			logger.warning('[TR] HPG analyis for: %s'%(webpage_folder))
+
+			QU.set_active_partition(partition["partition_id"])
+			try:
+				DU.exec_fn_within_transaction(traversals_fn, partition["webpage_url"], webpage_folder, partition["webpage"], conn=constantsModule.NEO4J_CONN_STRING, conn_timeout=conn_timeout, split_transactions=True)
+				_finish_partition_job(ledger, ledger_stage, partition, output_file_name)
+			except Exception as e:
+				logger.error(e)
+				logger.error('[TR] neo4j connection error.')
+				outfile =  os.path.join(webpage_folder, output_file_name)
+				if not os.path.exists(outfile):
+					with open(outfile, 'w+') as fd:
+						error_json = {"error": str(e)}
+						json.dump(error_json, fd, ensure_ascii=False, indent=4)
+				_finish_partition_job(ledger, ledger_stage, partition, output_file_name, error=e)
+			finally:
+				QU.set_active_partition(None)
+
+			if len(partition["duplicates"]):
+				PageDedupModule.link_duplicate_results(partition["website_folder"], {duplicate: partition["webpage"] for duplicate in partition["duplicates"]}, [output_file_name, output_file_name + '.json'])
+	else:
+		for partition in partitions:
+			_finish_partition_job(ledger, ledger_stage, partition, output_file_name, error='neo4j connection failed for %s'%database_name)
+
+	try:
+		DU.close_driver(conn=constantsModule.NEO4J_CONN_STRING)
+		logger.info('[TR] stopping neo4j for %s'%str(database_name))
+		DU.ineo_stop_db_instance(database_name)
+
+		## remove db after analysis
+		logger.info('[TR] removing neo4j for %s'%str(database_name))
+		DU.ineo_remove_db_instance(database_name)
+	except:
+		logger.info('[TR] ran into exception while stopping neo4j for %s'%str(database_name))
+
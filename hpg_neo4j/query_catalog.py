@@ -0,0 +1,738 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+	Copyright (C) 2020  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	---------------
+	Catalog of the named, parameterized cypher queries shared by the analyses.
+
+	Node ids, identifier names and the partition of the webpage under analysis
+	are passed as query parameters (e.g., `$id`, `$varname`) instead of being
+	formatted into the query text. Thus, values containing quotes no longer break
+	the queries, and neo4j compiles each query once and reuses its cached plan
+	for every node of the HPG.
+
+	Every query is compiled at import time into two variants: one for databases
+	holding a single HPG, and one whose anchor nodes are restricted to the active
+	partition (see `set_active_partition()`) for databases holding several HPGs.
+	The queries with unbounded `AST_parentOf*` and `CFG_parentOf*` patterns have
+	variants that look up the precomputed enclosing functions and blocks of the
+	nodes instead, which `run_query()` uses for the HPGs that have them (see
+	`has_enclosing_properties()`).
+
+	Usage:
+	---------------
+	> import hpg_neo4j.query_catalog as QC
+	> results = QC.run_query(tx, 'node_by_id', id=node_id)
+
+"""
+
+import weakref
+import contextvars
+import constants as constantsModule
+
+
+# -------------------------------------------------------------------------- #
+#		HPG Partitions
+# -------------------------------------------------------------------------- #
+
+# when the HPGs of several webpages are imported into the same neo4j database,
+# each node carries the partition (i.e., webpage) it belongs to, and the anchor
+# nodes of the queries must be restricted to the partition under analysis.
+# `None` means that the database holds a single HPG, i.e., no scoping.
+# the partition is a context variable, so that the threads of the stage scheduler
+# (see `utils/stage_scheduler.py`) each analyze their own partition; a new thread starts unscoped.
+_ACTIVE_PARTITION = contextvars.ContextVar('active_partition', default=None)
+
+
+def set_active_partition(partition_id):
+	"""
+	@param {string} partition_id: the partition that subsequent queries of the current thread (or asyncio task) are scoped to, or None to disable scoping
+	"""
+	_ACTIVE_PARTITION.set(partition_id)
+
+
+def get_active_partition():
+	"""
+	@return {string} the partition that the queries of the current thread (or asyncio task) are scoped to, or None
+	"""
+	return _ACTIVE_PARTITION.get()
+
+
+
+# -------------------------------------------------------------------------- #
+#		Query Templates
+# -------------------------------------------------------------------------- #
+
+# `%(scope)s` marks the property maps of the anchor nodes; it is replaced by the
+# partition constraint in the partitioned variant of the query, and removed otherwise.
+_QUERY_TEMPLATES = {
+
+	## ------------------------------------------------------------------ ##
+	## AST navigation
+	## ------------------------------------------------------------------ ##
+
+	'node_by_id': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})
+	RETURN n
+	""",
+
+	# the `Program` nodes of the HPGs with the enclosing properties are marked, see `hpg_neo4j/hpg_enclosing.py`
+	'enclosing_properties_marker': """
+	MATCH (n:ASTNode {Type: 'Program'%(scope)s})
+	RETURN n.EnclosingProperties AS marker
+	LIMIT 1
+	""",
+
+	'ast_parent': """
+	MATCH (parent)-[:AST_parentOf]->(child:ASTNode {Id: $id%(scope)s})
+	RETURN parent
+	""",
+
+	'ast_children': """
+	MATCH (root:ASTNode {Id: $id%(scope)s})-[:AST_parentOf]->(child) RETURN collect(distinct child) AS resultset
+	""",
+
+	'ast_children_by_relation_type': """
+	MATCH (root:ASTNode {Id: $id%(scope)s})-[:AST_parentOf {RelationType: $relation_type}]->(child) RETURN collect(distinct child) AS resultset
+	""",
+
+	# all AST edges below each of the given roots in one round trip; if `$relation_type` is not null,
+	# only the subtrees of the root children with that relation type are included.
+	# relationship ids increase with the import order, and give the child order of `ast_children`
+	'ast_subtrees': """
+	UNWIND $ids AS root_id
+	MATCH path = (root:ASTNode {Id: root_id%(scope)s})-[:AST_parentOf*1..]->(child)
+	WHERE $relation_type IS NULL OR relationships(path)[0].RelationType = $relation_type
+	WITH root_id, last(relationships(path)) AS r, child
+	RETURN root_id, startNode(r).Id AS parent_id, id(r) AS rel_id, child
+	""",
+
+	'ast_program_roots': """
+	MATCH (root:ASTNode {Type: 'Program'%(scope)s})
+	RETURN root
+	""",
+
+	'ast_program_edges': """
+	MATCH (root:ASTNode {Type: 'Program'%(scope)s})-[:AST_parentOf*0..]->(parent)-[:AST_parentOf]->(child)
+	RETURN parent.Id AS parent_id, child
+	""",
+
+	## ------------------------------------------------------------------ ##
+	## `this` pointer analysis
+	## ------------------------------------------------------------------ ##
+
+	'this_points_to_window': """
+	MATCH (this_node:ASTNode {Id: $id%(scope)s})-[:pointsTo {RelationType: 'top', Arguments: 'pointsTo=window'}]->(top_node)
+	RETURN top_node as top
+	""",
+
+	'this_points_to_owner_object': """
+	MATCH (this_node:ASTNode {Id: $id%(scope)s})-[:pointsTo {RelationType: 'top'}]->(top_node),
+	(this_node)-[:pointsTo {RelationType: 'owner'}]->(owner_node)
+	RETURN top_node as top, owner_node as owner
+	""",
+
+	'this_points_to_event_selector': """
+	MATCH (this_node:ASTNode {Id: $id%(scope)s})-[:pointsTo {RelationType: 'owner', Arguments: 'pointsTo=eventSelector'}]->(owner_node)
+	RETURN owner_node as owner
+	""",
+
+	'this_in_event_handler': """
+	MATCH (this_st:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf*1..10]-(n {Type: 'FunctionExpression'})<-[r:ERDG]-(top_node)
+	RETURN r
+	""",
+
+	# assignment expr, or var declaration: (right/init) assign_expr/declarator
+	'this_in_assigned_function': """
+	MATCH (this_st:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf]-(expr)-[r:AST_parentOf]->(function_name), (expr)<-[:AST_parentOf]-(top)
+	WHERE r.Type= 'left' OR r.Type= 'id'
+	OPTIONAL MATCH (p1:ASTNode {Type: 'AssignmentExpression'%(scope)s})-[:AST_parentOf {RelationType: 'right'}]->(c1 {Type: 'Identifier', Value: function_name.Code}),
+	(p1)-[:AST_parentOf {RelationType: 'left'}]->(c2 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(owner {Type: 'Identifier'})
+	OPTIONAL MATCH (function_name)-[:AST_parentOf {RelationTYpe: 'object'}]->(true_owner {Type: 'Identifier'})
+	RETURN
+	CASE function_name.Type
+	WHEN 'Identifier' THEN [top, function_name, owner]
+	WHEN 'MemberExpression' THEN [top, true_owner]
+	ELSE 'xx'
+	END
+	""",
+
+	'this_in_object_expression': """
+	MATCH (this_st:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'value'}]-(prop {Type: 'Property'})<-[:AST_parentOf {RelationType: 'properties'}]-(expr {Type: 'ObjectExpression'})<-[r:AST_parentOf]-(t)<-[:AST_parentOf]-(tt)
+	WHERE (r.RelationType= 'right' OR r.RelationType= 'init' OR r.RelationType = 'arguments')
+	AND (t.Type = 'AssignmentExpression' OR t.Type='VariableDeclarator' OR t.Type= 'CallExpression')
+	AND (tt.Type = 'ExpressionStatement' OR tt.Type='VariableDeclaration')
+	OPTIONAL MATCH (t)-[r2:AST_parentOf]->(c1 {Type: 'Identifier'}) WHERE r2.RelationType = 'left' OR r2.RelationType = 'id'
+	OPTIONAL MATCH (t)-[:AST_parentOf]->(c3)-[AST_parentOf {RelationType: 'object'}]->(c2 {Type: 'Identifier'})
+	RETURN tt, c2, c1
+	""",
+
+	'this_in_event_target_callback': """
+	MATCH (this_st:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf*]-(n {Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'arguments'}]-(top_call_expression)-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(the_event_target_top),
+	(member_expr)-[:AST_parentOf {RelationType: 'property'}]->(prop {Type: 'Identifier', Code: 'on'}), (top_call_expression)<-[:AST_parentOf]-(top)
+	RETURN the_event_target_top, top
+	""",
+
+	'create_this_points_to_window': """
+	MATCH (this_node:ASTNode {Id: $id%(scope)s}), (top_node:ASTNode {Id: $top_id%(scope)s})
+	CREATE (this_node)-[:pointsTo {RelationType: 'top', Arguments: 'pointsTo=window'}]->(top_node)
+	""",
+
+	'create_this_points_to_owner_object': """
+	MATCH (this_node:ASTNode {Id: $id%(scope)s}), (top_node:ASTNode {Id: $top_id%(scope)s}), (owner_node:ASTNode {Id: $owner_id%(scope)s})
+	CREATE (this_node)-[:pointsTo {RelationType: 'top'}]->(top_node)
+	CREATE (this_node)-[:pointsTo {RelationType: 'owner'}]->(owner_node)
+	""",
+
+	'create_this_points_to_event_selector': """
+	MATCH (this_node:ASTNode {Id: $id%(scope)s}), (owner_node:ASTNode {Id: $owner_id%(scope)s})
+	CREATE (this_node)-[:pointsTo {RelationType: 'owner', Arguments: 'pointsTo=eventSelector'}]->(owner_node)
+	""",
+
+	## ------------------------------------------------------------------ ##
+	## functions, params and call sites
+	## ------------------------------------------------------------------ ##
+
+	# m is a child of the return statement, since the parent relationship is taken by the path,
+	# i.e., returns without arguments like `return;` are left out
+	'function_return_statements': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})-[:AST_parentOf*]->(ret {Type: 'ReturnStatement'})-[:AST_parentOf]-(m)
+	RETURN ret
+	""",
+
+	# e.g., var f = function(varname) { ... }
+	'function_param_in_variable_declarator': """
+	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'id'}]-(vd {Type: 'VariableDeclarator'})-[:AST_parentOf {RelationType: 'init'}]->(n {Type:'FunctionExpression'})-[:AST_parentOf {RelationType: 'params'}]-(arg {Type:'Identifier', Code: $varname}),
+	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable:ASTNode {Id: $id%(scope)s, Type:'Identifier', Code: $varname})
+	RETURN distinct(n) as top, fname
+	""",
+
+	# e.g., f: function(varname) { ... }
+	'function_param_in_property': """
+	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'key'}]-(vd {Type: 'Property'})-[:AST_parentOf {RelationType: 'value'}]->(n {Type:'FunctionExpression'})-[:AST_parentOf {RelationType: 'params'}]-(arg {Type:'Identifier', Code: $varname}),
+	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable:ASTNode {Id: $id%(scope)s, Type:'Identifier', Code: $varname})
+	RETURN distinct(n) as top, fname
+	""",
+
+	# e.g., function f(varname) { ...}
+	'function_param_in_function_declaration': """
+	MATCH (fname {Type: 'Identifier'})<-[:AST_parentOf {RelationType: 'id'}]-(n {Type:'FunctionDeclaration'})-[:AST_parentOf {RelationType: 'params'}]-(arg {Type:'Identifier', Code: $varname}),
+	(n)-[:AST_parentOf {RelationType: 'body'}]->(block {Type: 'BlockStatement'})-[:AST_parentOf|:CFG_parentOf*]->(variable:ASTNode {Id: $id%(scope)s, Type:'Identifier', Code: $varname})
+	RETURN distinct(n) as top, fname
+	""",
+
+	'function_call_values': """
+	MATCH (param)<-[:AST_parentOf {RelationType: 'params'}]-(functionDef:ASTNode {Id: $id%(scope)s})<-[r:CG_parentOf]-(caller {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'arguments'}]-> (arg)
+	RETURN collect(distinct param) as params, caller, collect(distinct arg) AS args, collect(distinct r.Arguments) as arguments
+	""",
+
+	'function_params': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})-[:AST_parentOf {RelationType: 'params'}]-(arg) RETURN collect(distinct arg) as args
+	""",
+
+	'call_expression_parent': """
+	MATCH (n)-[:AST_parentOf]->(callExpr:ASTNode {Id: $id%(scope)s, Type: 'CallExpression'}) RETURN n
+	""",
+
+	'block_statement_function': """
+	MATCH (funcDef)-[:AST_parentOf]->(blockSt:ASTNode {Id: $id%(scope)s, Type: 'BlockStatement'}) RETURN funcDef
+	""",
+
+	'block_statement_function_body': """
+	MATCH (funcDef)-[:AST_parentOf {RelationType: 'body'}]->(blockSt:ASTNode {Id: $id%(scope)s, Type: 'BlockStatement'}) RETURN funcDef
+	""",
+
+	'callee_call_definitions': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf {RelationType: 'callee'}]-(fn_call {Type: 'CallExpression'})-[:CG_parentOf]->(call_definition)
+	RETURN call_definition
+	""",
+
+	## ------------------------------------------------------------------ ##
+	## data flow
+	## ------------------------------------------------------------------ ##
+
+	'pdg_parents': """
+	MATCH (n_s:ASTNode {Id: $id%(scope)s})<-[:PDG_parentOf {Arguments: $varname}]-(n_t) RETURN collect(distinct n_t) AS resultset
+	""",
+
+	# `pdg_parents` of many (id, varname) pairs, e.g., the frontier of a backward slice
+	'pdg_parents_batch': """
+	UNWIND $pairs AS pair
+	MATCH (n_s:ASTNode {Id: pair.id%(scope)s})<-[:PDG_parentOf {Arguments: pair.varname}]-(n_t)
+	RETURN pair.id AS id, pair.varname AS varname, collect(distinct n_t) AS resultset
+	""",
+
+	'pdg_parents_variable_declarations': """
+	MATCH (n_s:ASTNode {Id: $id%(scope)s})<-[:PDG_parentOf {Arguments: $varname}]-(n_t {Type: 'VariableDeclaration'}) RETURN collect(distinct n_t) AS resultset
+	""",
+
+	'identifier_declarations': """
+	MATCH (n:ASTNode {Type:'Identifier', Code: $varname%(scope)s})<-[:AST_parentOf {RelationType: 'id'}]-(vdtor {Type: 'VariableDeclarator'})<-[:AST_parentOf {RelationType:'declarations'}]-(vdtion),
+	(vdtor)-[:AST_parentOf {RelationType: 'init'}]->(value)
+	RETURN vdtion, value
+	""",
+
+	## ------------------------------------------------------------------ ##
+	## reachability
+	## ------------------------------------------------------------------ ##
+
+	'enclosing_block_statement': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})<-[:CFG_parentOf*]-(block_node)
+	WHERE block_node.Type = 'Program' OR block_node.Type = 'BlockStatement'
+	OPTIONAL MATCH (block_node)<-[:AST_parentOf {RelationType: 'body'}]-(function_expr {Type: 'FunctionExpression'})
+	OPTIONAL MATCH (function_expr)-[:AST_parentOf {RelationType: 'id'}]->(function_def_id {Type: 'Identifier'})
+	RETURN block_node, function_expr, function_def_id
+	""",
+
+	'call_expressions_of_callee_name': """
+	MATCH (call_expr:ASTNode {Type: 'CallExpression'%(scope)s})-[:AST_parentOf]->(callee {Type: 'Identifier', Code: $name})
+	RETURN call_expr
+	""",
+
+	'call_expressions_enclosing_identifier': """
+	MATCH (callee:ASTNode {Type: 'Identifier', Code: $name%(scope)s})<-[:AST_parentOf*1..6]-(call_expr {Type: 'CallExpression'})
+	RETURN call_expr
+	""",
+
+	'call_expressions_enclosing_identifier_deep': """
+	MATCH (callee:ASTNode {Type: 'Identifier', Code: $name%(scope)s})<-[:AST_parentOf*1..8]-(call_expr {Type: 'CallExpression'})
+	RETURN call_expr
+	""",
+
+	'call_expressions_enclosing_node': """
+	MATCH (callee:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf*1..6]-(call_expr {Type: 'CallExpression'})
+	RETURN call_expr
+	""",
+
+	'object_property_function_owner': """
+	MATCH (func_expr:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf {RelationType: 'value'}]-(prop {Type: 'Property'})<-[:AST_parentOf {RelationType: 'properties'}]-(obj_expr {Type: 'ObjectExpression'})<-[:AST_parentOf]-(t)<-[:AST_parentOf]-(tt)
+	OPTIONAL MATCH (t)-[r:AST_parentOf]->(c1_name {Type: 'Identifier'})
+	WHERE r.RelationType='left' or r.RelationType='id'
+	OPTIONAL MATCH (t)-[r:AST_parentOf]->(c2_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(c2_name {Type: 'Identifier'})
+	WHERE r.RelationType='left' or r.RelationType='id'
+	RETURN tt, c1_name, c2_name
+	""",
+
+	## ------------------------------------------------------------------ ##
+	## HTTP request sinks
+	## ------------------------------------------------------------------ ##
+
+	'window_open_calls': """
+	MATCH (t:ASTNode {Type: 'ExpressionStatement'%(scope)s})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
+	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
+	WHERE callee.Code= 'window'
+	RETURN t, n, a
+	""",
+
+	'xhr_open_calls': """
+	MATCH (t:ASTNode {Type: 'ExpressionStatement'%(scope)s})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
+	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	WHERE callee.Code <> 'window'
+	RETURN t, n, a
+	""",
+
+	'fetch_calls': """
+	MATCH (t:ASTNode {Type: 'ExpressionStatement'%(scope)s})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
+	RETURN t, n, a
+	""",
+
+	# argument a can be ObjectExpression, Identifier, or MemberExpression
+	# variable relation length will capture function chains, e.g., $.ajax({}).done().success().failure() etc.
+	'ajax_calls': """
+	MATCH (t:ASTNode {Type: 'ExpressionStatement'%(scope)s})-[:AST_parentOf*1..10]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
+	(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier' }),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
+	OPTIONAL MATCH (a)-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
+	(n4)-[:AST_parentOf {RelationType: 'value'}]->(aa)
+	RETURN t, n, a, aa
+	""",
+
+	'xhr_post_calls': """
+	MATCH (t:ASTNode {Type: 'ExpressionStatement'%(scope)s})-[:AST_parentOf {RelationType: 'expression'}]->(n {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'xhrPost'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	RETURN t, n, a
+	""",
+
+	'async_request_calls': """
+	MATCH (t)-[:AST_parentOf]->(n:ASTNode {Type: 'CallExpression'%(scope)s})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
+	RETURN  tt, t, n, a
+	""",
+
+	'set_form_calls': """
+	MATCH (call_expression:ASTNode {Type: 'CallExpression'%(scope)s})-[:AST_parentOf {RelationType: 'callee'}]-(member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(set_form {Code:'setForm', Type: 'Identifier'}),
+	(call_expression)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(arg), (t)-[:AST_parentOf]->(call_expression)
+	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
+	RETURN tt, t, call_expression as n, arg as a
+	""",
+
+	'pagespeed_calls': """
+	MATCH (t:ASTNode {Type: 'ExpressionStatement'%(scope)s})-[:AST_parentOf {RelationType: 'expression'}]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(run {Type: 'Identifier', Code: 'Run'}),
+	(member_expr)-[:AST_parentOf {RelationType: 'object'}]->(inner_member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(ci {Type: 'Identifier', Code: 'CriticalImages'}), (inner_member_expression)-[:AST_parentOf {RelationType: 'object'}]->(ps {Type: 'Identifier', Code: 'pagespeed'}),
+	(call_expr)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	RETURN t, call_expr AS n, a
+	""",
+
+	'ajax_setting_objects': """
+	MATCH (t:ASTNode {Type: 'ExpressionStatement'%(scope)s})-[:AST_parentOf*1..5]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'arguments'}]->(obj_expr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(ajaxSettingsProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(ajaxSettingsIdentifier {Type: 'Identifier', Code: 'ajaxSettings'}),
+	(ajaxSettingsProperty)-[:AST_parentOf {RelationType: 'value'}]->(ajaxSettingsObjExpr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(urlProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(url {Type: 'Identifier', Code: 'url'}),
+	(urlProperty)-[:AST_parentOf {RelationType: 'value'}]->(a)
+	RETURN t, ajaxSettingsProperty AS n, a
+	""",
+
+	# all the request sinks above in one round trip, anchored on the (indexed) identifiers of the sinks
+	# instead of on all the expression statements; `kind` is the name of the query of the sink (see
+	# `REQUEST_SINK_QUERIES`), and `tt` and `aa` are null for the kinds that do not return them
+	'request_sink_calls': """
+	MATCH (req:ASTNode {Type: 'Identifier', Code: 'open'%(scope)s})<-[:AST_parentOf {RelationType: 'property'}]-(n1 {Type: 'MemberExpression'})<-[:AST_parentOf {RelationType: 'callee'}]-(n {Type: 'CallExpression'})<-[:AST_parentOf {RelationType: 'expression'}]-(t {Type: 'ExpressionStatement'}),
+	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
+	WHERE callee.Code = 'window'
+	RETURN 'window_open_calls' AS kind, null AS tt, t, n, a, null AS aa
+	UNION ALL
+	MATCH (req:ASTNode {Type: 'Identifier', Code: 'open'%(scope)s})<-[:AST_parentOf {RelationType: 'property'}]-(n1 {Type: 'MemberExpression'})<-[:AST_parentOf {RelationType: 'callee'}]-(n {Type: 'CallExpression'})<-[:AST_parentOf {RelationType: 'expression'}]-(t {Type: 'ExpressionStatement'}),
+	(n1)-[:AST_parentOf {RelationType: 'object'}]->(callee),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	WHERE callee.Code <> 'window'
+	RETURN 'xhr_open_calls' AS kind, null AS tt, t, n, a, null AS aa
+	UNION ALL
+	MATCH (req:ASTNode {Type: 'Identifier', Code: 'fetch'%(scope)s})<-[:AST_parentOf {RelationType: 'callee'}]-(n {Type: 'CallExpression'})<-[:AST_parentOf {RelationType: 'expression'}]-(t {Type: 'ExpressionStatement'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
+	RETURN 'fetch_calls' AS kind, null AS tt, t, n, a, null AS aa
+	UNION ALL
+	MATCH (req:ASTNode {Type: 'Identifier', Code: 'ajax'%(scope)s})<-[:AST_parentOf {RelationType: 'property'}]-(n1 {Type: 'MemberExpression'})<-[:AST_parentOf {RelationType: 'callee'}]-(n {Type: 'CallExpression'})<-[:AST_parentOf*1..10]-(t {Type: 'ExpressionStatement'}),
+	(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier' }),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
+	OPTIONAL MATCH (a)-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
+	(n4)-[:AST_parentOf {RelationType: 'value'}]->(aa)
+	RETURN 'ajax_calls' AS kind, null AS tt, t, n, a, aa
+	UNION ALL
+	MATCH (req:ASTNode {Type: 'Identifier', Code: 'xhrPost'%(scope)s})<-[:AST_parentOf {RelationType: 'callee'}]-(n {Type: 'CallExpression'})<-[:AST_parentOf {RelationType: 'expression'}]-(t {Type: 'ExpressionStatement'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	RETURN 'xhr_post_calls' AS kind, null AS tt, t, n, a, null AS aa
+	UNION ALL
+	MATCH (req:ASTNode {Type: 'Identifier', Code: 'asyncRequest'%(scope)s})<-[:AST_parentOf {RelationType: 'property'}]-(n1 {Type: 'MemberExpression'})<-[:AST_parentOf {RelationType: 'callee'}]-(n {Type: 'CallExpression'})<-[:AST_parentOf]-(t),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
+	RETURN 'async_request_calls' AS kind, tt, t, n, a, null AS aa
+	UNION ALL
+	MATCH (set_form:ASTNode {Type: 'Identifier', Code: 'setForm'%(scope)s})<-[:AST_parentOf {RelationType: 'property'}]-(member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'callee'}]-(call_expression {Type: 'CallExpression'}),
+	(call_expression)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(arg), (t)-[:AST_parentOf]->(call_expression)
+	OPTIONAL MATCH (tt)-[:AST_parentOf]->(t) WHERE tt.Type='VariableDeclaration' OR tt.Type='ExpressionStatement'
+	RETURN 'set_form_calls' AS kind, tt, t, call_expression AS n, arg AS a, null AS aa
+	UNION ALL
+	MATCH (run:ASTNode {Type: 'Identifier', Code: 'Run'%(scope)s})<-[:AST_parentOf {RelationType: 'property'}]-(member_expr {Type: 'MemberExpression'})<-[:AST_parentOf {RelationType: 'callee'}]-(call_expr {Type: 'CallExpression'})<-[:AST_parentOf {RelationType: 'expression'}]-(t {Type: 'ExpressionStatement'}),
+	(member_expr)-[:AST_parentOf {RelationType: 'object'}]->(inner_member_expression {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(ci {Type: 'Identifier', Code: 'CriticalImages'}), (inner_member_expression)-[:AST_parentOf {RelationType: 'object'}]->(ps {Type: 'Identifier', Code: 'pagespeed'}),
+	(call_expr)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	RETURN 'pagespeed_calls' AS kind, null AS tt, t, call_expr AS n, a, null AS aa
+	UNION ALL
+	MATCH (ajaxSettingsIdentifier:ASTNode {Type: 'Identifier', Code: 'ajaxSettings'%(scope)s})<-[:AST_parentOf {RelationType: 'key'}]-(ajaxSettingsProperty {Type: 'Property'})<-[:AST_parentOf {RelationType: 'properties'}]-(obj_expr {Type: 'ObjectExpression'})<-[:AST_parentOf {RelationType: 'arguments'}]-(call_expr {Type: 'CallExpression'})<-[:AST_parentOf*1..5]-(t {Type: 'ExpressionStatement'}),
+	(ajaxSettingsProperty)-[:AST_parentOf {RelationType: 'value'}]->(ajaxSettingsObjExpr {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(urlProperty {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(url {Type: 'Identifier', Code: 'url'}),
+	(urlProperty)-[:AST_parentOf {RelationType: 'value'}]->(a)
+	RETURN 'ajax_setting_objects' AS kind, null AS tt, t, ajaxSettingsProperty AS n, a, null AS aa
+	""",
+
+	'fetch_call_url_argument': """
+	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n:ASTNode {Id: $id%(scope)s, Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (req {Type: 'Identifier', Code: 'fetch'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(a)
+	RETURN t, n, a
+	""",
+
+	'open_call_url_argument': """
+	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n:ASTNode {Id: $id%(scope)s, Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'open'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	RETURN t, n, a
+	""",
+
+	'ajax_call_url_argument': """
+	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n:ASTNode {Id: $id%(scope)s, Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]-> (n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'ajax'}),
+	(n1)-[:AST_parentOf {RelationType: 'object'}]->(n2 {Type: 'Identifier', Code: '$'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":0}'}]->(n3 {Type: 'ObjectExpression'})-[:AST_parentOf {RelationType: 'properties'}]->(n4 {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(n5 {Type: 'Identifier', Code: 'url'}),
+	(n4)-[:AST_parentOf {RelationType: 'value'}]->(a)
+	RETURN t, n, a
+	""",
+
+	'asyncRequest_call_url_argument': """
+	MATCH (t {Type: 'ExpressionStatement'})-[:AST_parentOf {RelationType: 'expression'}]->(n:ASTNode {Id: $id%(scope)s, Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(n1 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(req {Type: 'Identifier', Code: 'asyncRequest'}),
+	(n)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(a)
+	RETURN t, n, a
+	""",
+
+	## ------------------------------------------------------------------ ##
+	## library models, see `symbolic_modeling/analysis.py`
+	## ------------------------------------------------------------------ ##
+
+	# the functions enclosing an identifier `$name`, with the identifiers of their `this.x` member expressions
+	# e.g., var o = { function_name: function(){ ... } }
+	'property_functions_enclosing_identifier': """
+	MATCH (request:ASTNode {Type: 'Identifier', Code: $name%(scope)s})<-[:AST_parentOf*]-(function_expression { Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'value'}]-(property {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(function_name {Type: 'Identifier'})
+	OPTIONAL MATCH (function_expression)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
+	WHERE filter_node.Type <> 'CallExpression'
+	RETURN distinct(function_name) as function_name, function_expression, collect (distinct this_identifier) as this_list
+	""",
+
+	# e.g., function function_name(){ ... }
+	'function_declarations_enclosing_identifier': """
+	MATCH (request:ASTNode {Type: 'Identifier', Code: $name%(scope)s})<-[:AST_parentOf*]-(function_declaration { Type: 'FunctionDeclaration'})-[:AST_parentOf {RelationType: 'id'}]->(function_name {Type: 'Identifier'})
+	OPTIONAL MATCH (function_declaration)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
+	WHERE filter_node.Type <> 'CallExpression'
+	RETURN function_declaration, function_name, collect (distinct this_identifier) as this_list
+	""",
+
+	# e.g., var function_name = function(){ ... }
+	'variable_functions_enclosing_identifier': """
+	MATCH (request:ASTNode {Type: 'Identifier', Code: $name%(scope)s})<-[:AST_parentOf*]-(function_expression { Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'init'}]-(var_declarator {Type: 'VariableDeclarator'})-[:AST_parentOf {RelationType: 'id'}]->(function_name {Type: 'Identifier'})
+	OPTIONAL MATCH (function_expression)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
+	WHERE filter_node.Type <> 'CallExpression'
+	RETURN distinct(function_name) as function_name, function_expression, collect (distinct this_identifier) as this_list
+	""",
+
+	# e.g., obj.function_name = function(){ ... }
+	'member_functions_enclosing_identifier': """
+	MATCH (assignment {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'left'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(function_name {Type: 'Identifier'}),
+	(assignment)-[:AST_parentOf {RelationType: 'right'}]-(function_expression {Type: 'FunctionExpression'})-[:AST_parentOf*]->(request:ASTNode {Type: 'Identifier', Code: $name%(scope)s})
+	OPTIONAL MATCH (function_expression)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
+	WHERE filter_node.Type <> 'CallExpression'
+	RETURN distinct(function_name) as function_name, function_expression, collect (distinct this_identifier) as this_list
+	""",
+
+	'function_send_identifiers': """
+	MATCH (function:ASTNode {Id: $id%(scope)s})-[:AST_parentOf*]->(node {Type: 'Identifier', Code: 'send'})
+	RETURN node
+	""",
+
+	# the identifier passed as url to a `.open(method, url, ...)` call within the function
+	'function_open_call_url_parameters': """
+	MATCH (top_function:ASTNode {Id: $id%(scope)s})-[:AST_parentOf*]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(open_identifier {Code: 'open'}),
+	(call_expr)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(param {Type: 'Identifier'})
+	RETURN param
+	""",
+
+	'function_definition_params': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})-[:AST_parentOf{RelationType: 'params'}]-(i {Type: 'Identifier'})
+	WHERE n.Type='FunctionDeclaration'
+	OR n.Type='FunctionExpression'
+	RETURN n, collect(distinct i) as params
+	""",
+
+	# the function declarations that assign to `this.$name`
+	'this_property_assignment_functions': """
+	MATCH (assignment_expr {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'left'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(this_identifier:ASTNode { Code: $name%(scope)s}),
+	p=shortestPath((function {Type: 'FunctionDeclaration'})-[:AST_parentOf*]->(assignment_expr)),
+	(function)-[:AST_parentOf {RelationType: 'id'}]->(function_name {Type: 'Identifier'})
+	RETURN function, function_name
+	""",
+
+	# the names of the properties `obj.alias = $name` assigned next to the declaration of the function `$name`
+	'function_name_aliases': """
+	MATCH (alias_top_expr {Type: 'ExpressionStatement'})-[:AST_parentOf]->(assignment {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'left'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(target_property_name {Type: 'Identifier'}),
+	(assignment)-[:AST_parentOf {RelationType: 'right'}]-> (function_name { Type: 'Identifier', Code: $name}),
+	(alias_top_expr)<-[:AST_parentOf]-(same_parent_block)-[:AST_parentOf]->(n:ASTNode { Id: $id%(scope)s})
+	RETURN distinct(target_property_name.Code) as name
+	""",
+
+	# the `test` of the IfStatement, ForStatement, WhileStatement, etc, and the `discriminant` of the SwitchStatement within the function
+	'function_control_predicates': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})-[:AST_parentOf*]->(control)-[:AST_parentOf {RelationType: 'test'}]->(test)
+	OPTIONAL MATCH (control)-[:AST_parentOf {RelationType: 'discriminant'}]->(test2)
+	RETURN test, test2
+	""",
+
+	'function_declaration_name': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})-[:AST_parentOf {RelationType: 'id'}]->(name)
+	WHERE name.Type = 'Identifier'
+	OR name.Type = 'MemberExpression'
+	RETURN name
+	""",
+
+	# the name of a function expression in an object expression, assignment expression or variable declarator
+	'function_expression_name': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})<-[:AST_parentOf]-(parent)-[:AST_parentOf]->(name)
+	WHERE name.Type = 'Identifier'
+	OR name.Type = 'MemberExpression'
+	RETURN name
+	""",
+}
+
+
+
+# the queries of the request sinks that `request_sink_calls` runs at once, i.e., the values of its `kind` column
+REQUEST_SINK_QUERIES = [
+	'window_open_calls', 'xhr_open_calls', 'fetch_calls', 'ajax_calls', 'xhr_post_calls',
+	'async_request_calls', 'set_form_calls', 'pagespeed_calls', 'ajax_setting_objects'
+]
+
+
+
+# variants of the queries with unbounded `AST_parentOf*` and `CFG_parentOf*` patterns that look up the
+# `EnclosingFunctions`, `EnclosingBlocks` and `ReturnStatements` node properties instead (see `hpg_neo4j/hpg_enclosing.py`);
+# used in place of the above on the HPGs that have these properties
+_ENCLOSING_QUERY_TEMPLATES = {
+
+	'function_return_statements': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})
+	UNWIND n.ReturnStatements AS return_id
+	MATCH (ret:ASTNode {Id: return_id%(scope)s, Type: 'ReturnStatement'})-[:AST_parentOf]->(m)
+	RETURN ret
+	""",
+
+	'this_in_assigned_function': """
+	MATCH (this_st:ASTNode {Id: $id%(scope)s})
+	UNWIND this_st.EnclosingFunctions AS function_id
+	MATCH (n:ASTNode {Id: function_id%(scope)s, Type: 'FunctionExpression'})<-[:AST_parentOf]-(expr)-[r:AST_parentOf]->(function_name), (expr)<-[:AST_parentOf]-(top)
+	WHERE r.Type= 'left' OR r.Type= 'id'
+	OPTIONAL MATCH (p1:ASTNode {Type: 'AssignmentExpression'%(scope)s})-[:AST_parentOf {RelationType: 'right'}]->(c1 {Type: 'Identifier', Value: function_name.Code}),
+	(p1)-[:AST_parentOf {RelationType: 'left'}]->(c2 {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(owner {Type: 'Identifier'})
+	OPTIONAL MATCH (function_name)-[:AST_parentOf {RelationTYpe: 'object'}]->(true_owner {Type: 'Identifier'})
+	RETURN
+	CASE function_name.Type
+	WHEN 'Identifier' THEN [top, function_name, owner]
+	WHEN 'MemberExpression' THEN [top, true_owner]
+	ELSE 'xx'
+	END
+	""",
+
+	'this_in_object_expression': """
+	MATCH (this_st:ASTNode {Id: $id%(scope)s})
+	UNWIND this_st.EnclosingFunctions AS function_id
+	MATCH (n:ASTNode {Id: function_id%(scope)s, Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'value'}]-(prop {Type: 'Property'})<-[:AST_parentOf {RelationType: 'properties'}]-(expr {Type: 'ObjectExpression'})<-[r:AST_parentOf]-(t)<-[:AST_parentOf]-(tt)
+	WHERE (r.RelationType= 'right' OR r.RelationType= 'init' OR r.RelationType = 'arguments')
+	AND (t.Type = 'AssignmentExpression' OR t.Type='VariableDeclarator' OR t.Type= 'CallExpression')
+	AND (tt.Type = 'ExpressionStatement' OR tt.Type='VariableDeclaration')
+	OPTIONAL MATCH (t)-[r2:AST_parentOf]->(c1 {Type: 'Identifier'}) WHERE r2.RelationType = 'left' OR r2.RelationType = 'id'
+	OPTIONAL MATCH (t)-[:AST_parentOf]->(c3)-[AST_parentOf {RelationType: 'object'}]->(c2 {Type: 'Identifier'})
+	RETURN tt, c2, c1
+	""",
+
+	'this_in_event_target_callback': """
+	MATCH (this_st:ASTNode {Id: $id%(scope)s})
+	UNWIND this_st.EnclosingFunctions AS function_id
+	MATCH (n:ASTNode {Id: function_id%(scope)s, Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'arguments'}]-(top_call_expression)-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(the_event_target_top),
+	(member_expr)-[:AST_parentOf {RelationType: 'property'}]->(prop {Type: 'Identifier', Code: 'on'}), (top_call_expression)<-[:AST_parentOf]-(top)
+	RETURN the_event_target_top, top
+	""",
+
+	'enclosing_block_statement': """
+	MATCH (n:ASTNode {Id: $id%(scope)s})
+	UNWIND n.EnclosingBlocks AS block_id
+	MATCH (block_node:ASTNode {Id: block_id%(scope)s})
+	OPTIONAL MATCH (block_node)<-[:AST_parentOf {RelationType: 'body'}]-(function_expr {Type: 'FunctionExpression'})
+	OPTIONAL MATCH (function_expr)-[:AST_parentOf {RelationType: 'id'}]->(function_def_id {Type: 'Identifier'})
+	RETURN block_node, function_expr, function_def_id
+	""",
+}
+
+
+
+# -------------------------------------------------------------------------- #
+#		Compiled Queries
+# -------------------------------------------------------------------------- #
+
+def _compile_queries(templates):
+	"""
+	@return {dict} query name mapped to the pair (query for a single HPG, query scoped to the `$partition` parameter)
+	"""
+	partition_scope = ", %s: $partition"%constantsModule.HPG_PARTITION_PROPERTY
+	compiled = {}
+	for name, template in templates.items():
+		compiled[name] = (template%{'scope': ''}, template%{'scope': partition_scope})
+	return compiled
+
+_COMPILED_QUERIES = _compile_queries(_QUERY_TEMPLATES)
+_COMPILED_ENCLOSING_QUERIES = _compile_queries(_ENCLOSING_QUERY_TEMPLATES)
+
+
+def get_query_names():
+	"""
+	@return {list} the names of the queries in the catalog
+	"""
+	return list(_COMPILED_QUERIES.keys())
+
+
+def get_enclosing_query_names():
+	"""
+	@return {list} the names of the queries with a variant on the precomputed enclosing properties (see `hpg_neo4j/hpg_enclosing.py`)
+	"""
+	return list(_COMPILED_ENCLOSING_QUERIES.keys())
+
+
+def get_query(name, partitioned=None, enclosing=False):
+	"""
+	@param {string} name: name of the query in the catalog
+	@param {bool} partitioned: whether to get the variant scoped to the `$partition` parameter;
+		defaults to whether or not a partition is currently active
+	@param {bool} enclosing: whether to get the variant on the precomputed enclosing properties, if the query has one
+	@return {string} the cypher query
+	"""
+	if name not in _COMPILED_QUERIES:
+		raise KeyError('query %s is not in the query catalog'%name)
+
+	if partitioned is None:
+		partitioned = get_active_partition() is not None
+
+	if enclosing and name in _COMPILED_ENCLOSING_QUERIES:
+		unscoped, scoped = _COMPILED_ENCLOSING_QUERIES[name]
+	else:
+		unscoped, scoped = _COMPILED_QUERIES[name]
+	if partitioned:
+		return scoped
+	return unscoped
+
+
+# transaction -->> partition -->> whether the HPG has the enclosing properties
+_ENCLOSING_PROPERTIES_CACHE = weakref.WeakKeyDictionary()
+
+
+def has_enclosing_properties(tx):
+	"""
+	@param {neo4j-pointer} tx
+	@return {bool} whether the HPG of the active partition was imported with the enclosing properties,
+		i.e., whether its `Program` nodes are marked; the answer is cached per transaction
+	"""
+	partition_id = get_active_partition()
+	try:
+		cached = _ENCLOSING_PROPERTIES_CACHE.setdefault(tx, {})
+	except TypeError:
+		cached = {}
+	if partition_id not in cached:
+		params = {} if partition_id is None else {'partition': partition_id}
+		records = list(tx.run(get_query('enclosing_properties_marker', partitioned=partition_id is not None), params))
+		cached[partition_id] = len(records) > 0 and records[0]['marker'] is True
+	return cached[partition_id]
+
+
+def run_query(tx, name, **params):
+	"""
+	runs a query of the catalog, scoped to the active partition if any
+	@param {neo4j-pointer} tx
+	@param {string} name: name of the query in the catalog
+	@param {kwargs} params: the query parameters, e.g., `id=node['Id']`
+	@return bolt result
+	"""
+	partition_id = get_active_partition()
+	if partition_id is not None:
+		params['partition'] = partition_id
+	# in-memory HPG transactions answer the catalog queries natively, see `hpg_neo4j.in_memory_graph`
+	if hasattr(tx, 'run_catalog_query'):
+		return tx.run_catalog_query(name, params)
+	enclosing = name in _COMPILED_ENCLOSING_QUERIES and has_enclosing_properties(tx)
+	return tx.run(get_query(name, partitioned=partition_id is not None, enclosing=enclosing), params)
+
@@ -26,6 +26,43 @@
 
 """
 
+import constants as constantsModule
+import hpg_neo4j.query_catalog as QC
+
+
+# -------------------------------------------------------------------------- #
+#		HPG Partitions
+# -------------------------------------------------------------------------- #
+
+# the active partition is kept by the query catalog, per thread (or asyncio task), which scopes
+# the anchors of its queries to it; see `hpg_neo4j.query_catalog`.
+
+def set_active_partition(partition_id):
+	"""
+	@param {string} partition_id: the partition that subsequent queries are scoped to, or None to disable scoping
+	"""
+	QC.set_active_partition(partition_id)
+
+
+def get_active_partition():
+	"""
+	@return {string} the partition that the queries are currently scoped to, or None
+	"""
+	return QC.get_active_partition()
+
+
+def get_partition_scope():
+	"""
+	@return {string} a property map entry restricting a query anchor to the active partition, 
+		e.g., `MATCH (n:ASTNode {Id: '%s'%s})`%(node_id, get_partition_scope()), or an empty string if no partition is active
+	@note only needed for ad-hoc queries that are not part of the query catalog
+	"""
+	partition_id = QC.get_active_partition()
+	if partition_id is None:
+		return ''
+	return ", %s: '%s'"%(constantsModule.HPG_PARTITION_PROPERTY, partition_id)
+
+
 
 # -------------------------------------------------------------------------- #
 #		Neo4j Utility Queries
@@ -38,12 +75,7 @@ def get_node_by_id(tx, node_id):
 	@return node
 	"""
 
-	query = """
-	MATCH (n {Id: '%s'})
-	RETURN n
-	"""%(node_id)
-
-	results = tx.run(query)
+	results = QC.run_query(tx, 'node_by_id', id=node_id)
 	for record in results:
 		n = record['n']
 		return n
@@ -85,12 +117,7 @@ def get_ast_parent(tx, node):
 	@return immediate parent of an AST node
 	"""
 
-	query = """
-	MATCH (parent)-[:AST_parentOf]->(child {Id: '%s'})
-	RETURN parent
-	"""%(node['Id'])
-
-	results = tx.run(query)
+	results = QC.run_query(tx, 'ast_parent', id=node['Id'])
 	for record in results:
 		child = record['parent']
 		return child
@@ -98,6 +125,100 @@ def get_ast_parent(tx, node):
 	return None
 
 
+# index of the topmost parent of each AST node of the current page, see `get_ast_topmost_index()`
+_AST_TOPMOST_INDEX = None
+
+
+def build_ast_topmost_index(tx, program_index=None):
+	"""
+	@param {neo4j-pointer} tx
+	@param {dict} program_index: if given, filled with the id of the `Program` node (i.e., the script) of each AST node
+	@return {dict} the topmost parent (as returned by `get_ast_topmost()`) of each AST node below a `Program` node,
+		keyed by node id; fetched with two queries instead of one query per AST level and node
+	"""
+
+	CFG_LEVEL_STATEMENTS = get_cfg_level_nodes_for_statements()
+
+	nodes = {}
+	parents = {}
+	for record in QC.run_query(tx, 'ast_program_roots'):
+		root = record['root']
+		nodes[root['Id']] = root
+
+	for record in QC.run_query(tx, 'ast_program_edges'):
+		child = record['child']
+		if child['Id'] not in parents:
+			parents[child['Id']] = record['parent_id']
+			nodes[child['Id']] = child
+
+	# topmost(n) = n, if n is a CFG-level statement or has no parent; topmost(parent of n), otherwise
+	index = {}
+	for node_id in nodes:
+		path = []
+		iterator = node_id
+		while iterator not in index:
+			node = nodes[iterator]
+			if node['Type'] in CFG_LEVEL_STATEMENTS or iterator not in parents:
+				index[iterator] = node
+				break
+			path.append(iterator)
+			iterator = parents[iterator]
+		top = index[iterator]
+		for item in path:
+			index[item] = top
+
+	if program_index is not None:
+		# program(n) = n, if n has no parent; program(parent of n), otherwise
+		for node_id in nodes:
+			path = []
+			iterator = node_id
+			while iterator not in program_index and iterator in parents:
+				path.append(iterator)
+				iterator = parents[iterator]
+			program_id = program_index.setdefault(iterator, iterator)
+			for item in path:
+				program_index[item] = program_id
+
+	return index
+
+
+def get_ast_topmost_index(tx):
+	"""
+	@param {neo4j-pointer} tx
+	@return {dict} the index of `build_ast_topmost_index()` for the HPG of the transaction (or of the active partition);
+		built on the first call, and re-built when the transaction or the active partition changes, i.e., per webpage
+	"""
+
+	global _AST_TOPMOST_INDEX
+	partition_id = QC.get_active_partition()
+	if _AST_TOPMOST_INDEX is None or _AST_TOPMOST_INDEX['tx'] is not tx or _AST_TOPMOST_INDEX['partition'] != partition_id:
+		# release the index of the previous webpage before building the new one
+		_AST_TOPMOST_INDEX = None
+		programs = {}
+		_AST_TOPMOST_INDEX = {'tx': tx, 'partition': partition_id, 'nodes': build_ast_topmost_index(tx, programs), 'programs': programs}
+	return _AST_TOPMOST_INDEX['nodes']
+
+
+def get_ast_program_index(tx):
+	"""
+	@param {neo4j-pointer} tx
+	@return {dict} the id of the `Program` node of each AST node of the HPG of the transaction (or of the active partition),
+		keyed by node id; built together with the index of `get_ast_topmost_index()`
+	"""
+
+	get_ast_topmost_index(tx)
+	return _AST_TOPMOST_INDEX['programs']
+
+
+def invalidate_ast_topmost_index():
+	"""
+	drops the index of `get_ast_topmost_index()`, e.g., when the HPG is modified or the analysis of a webpage is done
+	"""
+
+	global _AST_TOPMOST_INDEX
+	_AST_TOPMOST_INDEX = None
+
+
 def get_ast_topmost(tx, node):
 
 	"""
@@ -106,6 +227,11 @@ def get_ast_topmost(tx, node):
 	@return topmost parent of an AST node
 	"""
 
+	top = get_ast_topmost_index(tx).get(node['Id'])
+	if top is not None:
+		return top
+
+	# not below a `Program` node: climb the AST
 	CFG_LEVEL_STATEMENTS = get_cfg_level_nodes_for_statements()
 
 	if "Type" in node:
@@ -522,26 +648,64 @@ def getChildsOf(tx, node, relation_type=''):
 	"""
 	@param {pointer} tx
 	@param {node object} node
-	@param {string} relation_type
+	@param {string} relation_type: only the children of the input node with this relation type (default: all)
 	@return {dict}: wrapperNode= a dict containing the parse tree with its root set to input node, format: {'node': node, 'children': [child_node1, child_node2, ...]} 
 	"""
 
-	outNode =  {'node': node, 'children': []} # wrapper around neo4j node
-	nodeId = node['Id']
-	if relation_type != '':
-		query= """
-		MATCH (root { Id: '%s' })-[:AST_parentOf { RelationType: '%s'}]->(child) RETURN collect(distinct child) AS resultset
-		"""%(nodeId, relation_type)
-	else:
-		query= """
-			MATCH (root { Id: '%s' })-[:AST_parentOf]->(child) RETURN collect(distinct child) AS resultset
-			"""%(nodeId)
+	return getChildsOfMany(tx, [node], relation_type=relation_type)[0]
 
-	results = tx.run(query)
+
+
+def getChildsOfMany(tx, nodes, relation_type=''):
+	"""
+	@param {pointer} tx
+	@param {list} nodes: root nodes
+	@param {string} relation_type: only the children of the root nodes with this relation type (default: all)
+	@return {list}: the wrapperNode of each root node (in the input order), see `getChildsOf()`
+	@description: fetches the AST subtrees of all root nodes in a single query, and builds the wrapper trees client-side
+	"""
+
+	root_ids = []
+	for node in nodes:
+		if node['Id'] not in root_ids:
+			root_ids.append(node['Id'])
+	if len(root_ids) == 0:
+		return []
+
+	if relation_type == '':
+		relation_type = None
+	results = QC.run_query(tx, 'ast_subtrees', ids=root_ids, relation_type=relation_type)
+
+	# (root id, parent id) -> list of (relationship id, child node)
+	edges = {}
 	for item in results:
-		childNodes = item['resultset']
-		for childNode in childNodes:
-			outNode['children'].append(getChildsOf(tx, childNode))
+		edges.setdefault((item['root_id'], item['parent_id']), []).append((item['rel_id'], item['child']))
+
+	return [_build_ast_subtree(node, edges) for node in nodes]
+
+
+
+def _build_ast_subtree(node, edges):
+	"""
+	@param {node object} node: root node
+	@param {dict} edges: (root id, parent id) -> list of (relationship id, child node), as fetched by `getChildsOfMany()`
+	@return {dict}: wrapperNode of the root node
+	"""
+
+	root_id = node['Id']
+	outNode = {'node': node, 'children': []}
+	worklist = [(outNode, root_id)]
+	while len(worklist):
+		wrapperNode, nodeId = worklist.pop()
+		seen = set()
+		# newest relationship first, i.e., the order of neo4j relationship chains
+		for _, childNode in sorted(edges.get((root_id, nodeId), []), key=lambda edge: edge[0], reverse=True):
+			if childNode['Id'] in seen:
+				continue
+			seen.add(childNode['Id'])
+			childWrapperNode = {'node': childNode, 'children': []}
+			wrapperNode['children'].append(childWrapperNode)
+			worklist.append((childWrapperNode, childNode['Id']))
 	return outNode
 
 
@@ -22,18 +22,28 @@
 	Usage:
 	------------
 	$ python3 -m run_pipeline --conf=config.yaml
+	$ python3 -m run_pipeline --conf=config.yaml --workers=8
 
 """
 
 import argparse
+import time
+import queue
 import pandas as pd
 import os, sys
+import multiprocessing
+import functools
 import requests
 
 import utils.io as IOModule
+import utils.process_runner as ProcessRunnerModule
 from utils.logging import logger as LOGGER
+from utils.stage_scheduler import Stage, StageScheduler, QUEUE_PUT_TIMEOUT
 import utils.utility as utilityModule
+import utils.job_ledger as JobLedgerModule
 import constants as constantsModule
+import hpg_neo4j.instance_pool as InstancePoolModule
+import hpg_neo4j.driver_registry as DriverRegistryModule
 import analyses.domclobbering.domc_neo4j_traversals as DOMCTraversalsModule
 import analyses.domclobbering.static_analysis_api as domc_sast_model_construction_api
 
@@ -66,6 +76,692 @@ def save_website_is_down(domain):
 		fd.write(domain)
 
 
+def configure_constants(config):
+
+	"""
+	sets the neo4j, hpg and slicing options of the `staticpass` config, and the job ledger options of the `testbed` config, in the constants module
+	@param {dict} config: pipeline configuration
+	"""
+
+	# set neo4j config
+	if "neo4j_user" in config["staticpass"]:
+		constantsModule.NEO4J_USER = config["staticpass"]["neo4j_user"]
+		constantsModule.NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, constantsModule.NEO4J_BOLT_PORT)
+
+	if "neo4j_pass" in config["staticpass"]:
+		constantsModule.NEO4J_PASS = config["staticpass"]["neo4j_pass"]
+		constantsModule.NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, constantsModule.NEO4J_BOLT_PORT)
+
+	if "neo4j_http_port" in config["staticpass"]:
+		constantsModule.NEO4J_HTTP_PORT = config["staticpass"]["neo4j_http_port"]
+		constantsModule.NEO4J_CONN_HTTP_STRING = "http://127.0.0.1:%s"%str(constantsModule.NEO4J_HTTP_PORT)
+
+	if "neo4j_bolt_port" in config["staticpass"]:
+		constantsModule.NEO4J_BOLT_PORT = config["staticpass"]["neo4j_bolt_port"]
+		constantsModule.NEO4J_CONN_STRING = "bolt://127.0.0.1:%s"%str(constantsModule.NEO4J_BOLT_PORT)
+		constantsModule.NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, constantsModule.NEO4J_BOLT_PORT)
+
+	if "neo4j_use_docker" in config["staticpass"]:
+		constantsModule.NEO4J_USE_DOCKER = config["staticpass"]["neo4j_use_docker"] 
+
+	if "neo4j_instance_pool" in config["staticpass"]:
+		constantsModule.NEO4J_USE_INSTANCE_POOL = config["staticpass"]["neo4j_instance_pool"]
+
+	if "neo4j_instance_pool_size" in config["staticpass"]:
+		constantsModule.NEO4J_INSTANCE_POOL_SIZE = int(config["staticpass"]["neo4j_instance_pool_size"])
+
+	if "neo4j_partitioned_import" in config["staticpass"]:
+		constantsModule.NEO4J_USE_PARTITIONED_IMPORT = config["staticpass"]["neo4j_partitioned_import"]
+
+	if "neo4j_max_connection_pool_size" in config["staticpass"]:
+		constantsModule.NEO4J_MAX_CONNECTION_POOL_SIZE = int(config["staticpass"]["neo4j_max_connection_pool_size"])
+
+	if "neo4j_fetch_size" in config["staticpass"]:
+		constantsModule.NEO4J_FETCH_SIZE = int(config["staticpass"]["neo4j_fetch_size"])
+
+	if "neo4j_split_transaction_queries" in config["staticpass"]:
+		constantsModule.NEO4J_SPLIT_TRANSACTION_QUERIES = int(config["staticpass"]["neo4j_split_transaction_queries"])
+
+	if "in_memory_hpg" in config["staticpass"]:
+		constantsModule.HPG_USE_IN_MEMORY_ENGINE = config["staticpass"]["in_memory_hpg"]
+
+	if "hpg_codec" in config["staticpass"]:
+		constantsModule.HPG_COMPRESSION_CODEC = config["staticpass"]["hpg_codec"]
+
+	if "stream_compressed_hpg" in config["staticpass"]:
+		constantsModule.HPG_STREAM_COMPRESSED = config["staticpass"]["stream_compressed_hpg"]
+
+	if "slice_max_depth" in config["staticpass"]:
+		constantsModule.MAX_RECURSE = int(config["staticpass"]["slice_max_depth"])
+
+	if "slice_max_nodes" in config["staticpass"]:
+		constantsModule.MAX_SLICE_NODES = int(config["staticpass"]["slice_max_nodes"])
+
+	if "slice_all_sinks_together" in config["staticpass"]:
+		constantsModule.SLICE_ALL_SINKS_TOGETHER = config["staticpass"]["slice_all_sinks_together"]
+
+	if "dedup_webpages" in config["staticpass"]:
+		constantsModule.WEBPAGE_DEDUP_ENABLED = config["staticpass"]["dedup_webpages"]
+
+	if "prune_libraries" in config["staticpass"]:
+		constantsModule.HPG_PRUNE_LIBRARIES = config["staticpass"]["prune_libraries"]
+
+	if "library_hashes_file" in config["staticpass"]:
+		constantsModule.HPG_LIBRARY_HASHES_FILE = config["staticpass"]["library_hashes_file"]
+
+	if "sink_cone_pruning" in config["staticpass"]:
+		constantsModule.HPG_SINK_CONE_PRUNING = config["staticpass"]["sink_cone_pruning"]
+
+	if "enclosing_properties" in config["staticpass"]:
+		constantsModule.HPG_ENCLOSING_PROPERTIES = config["staticpass"]["enclosing_properties"]
+
+	if "script_cache" in config["staticpass"]:
+		constantsModule.SCRIPT_CACHE_ENABLED = config["staticpass"]["script_cache"]
+
+	if "script_cache_directory" in config["staticpass"]:
+		constantsModule.SCRIPT_CACHE_DIRECTORY = config["staticpass"]["script_cache_directory"]
+
+	# set job ledger config
+	if "job_ledger" in config["testbed"]:
+		constantsModule.JOB_LEDGER_ENABLED = config["testbed"]["job_ledger"]
+
+	if "job_ledger_file" in config["testbed"]:
+		constantsModule.JOB_LEDGER_FILE = config["testbed"]["job_ledger_file"]
+
+	if "job_ledger_max_attempts" in config["testbed"]:
+		constantsModule.JOB_LEDGER_MAX_ATTEMPTS = int(config["testbed"]["job_ledger_max_attempts"])
+
+	if "job_ledger_retry_backoff" in config["testbed"]:
+		constantsModule.JOB_LEDGER_RETRY_BACKOFF = int(config["testbed"]["job_ledger_retry_backoff"])
+
+	# set resource caps of the crawler, static analysis and verifier processes
+	if "process_memory_limit" in config["testbed"]:
+		constantsModule.PROCESS_MEMORY_LIMIT = int(config["testbed"]["process_memory_limit"])
+
+	if "process_cpu_limit" in config["testbed"]:
+		constantsModule.PROCESS_CPU_LIMIT = int(config["testbed"]["process_cpu_limit"])
+
+	if "process_cgroup_root" in config["testbed"]:
+		constantsModule.PROCESS_CGROUP_ROOT = config["testbed"]["process_cgroup_root"]
+
+
+def crawl_site(config, pipeline, g_index, website_rank, website_url):
+
+	"""
+	runs the crawling pass for one website of the site list
+	@param {dict} config: pipeline configuration
+	@param {dict} pipeline: commands, working directories, timeouts and memory budgets of the passes, see `main()`
+	@param {int} g_index: row of the website in the site list
+	@param {string} website_rank
+	@param {string} website_url
+	@return {list} the `ProcessResult` of the crawler, or False if the website is down
+	"""
+
+	crawling_command = pipeline["crawling_command"]
+	crawler_command_cwd = pipeline["crawler_command_cwd"]
+	crawler_node_memory = pipeline["crawler_node_memory"]
+	crawling_timeout = pipeline["crawling_timeout"]
+
+	if pipeline["domain_health_check"]:
+		LOGGER.info('checking if domain is up with python requests ...')
+		website_up = False
+
+		try:
+			website_up = is_website_up(website_url)
+		except:
+			save_website_is_down(website_url)
+			return False
+
+		if not website_up:
+			LOGGER.warning('domain %s is not up, skipping!'%website_url)
+			save_website_is_down(website_url)
+			return False
+
+	# crawling
+	if (config['domclobbering']['enabled'] and config['domclobbering']["passes"]["crawling"]) or \
+		(config['cs_csrf']['enabled'] and config['cs_csrf']["passes"]["crawling"]) or \
+		(config['open_redirect']['enabled'] and config['open_redirect']["passes"]["crawling"]) or \
+		(config['request_hijacking']['enabled'] and config['request_hijacking']["passes"]["crawling"]):
+
+		LOGGER.info("crawling site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
+		cmd = crawling_command.replace('SEED_URL', website_url).replace('NODE_MEMORY', str(crawler_node_memory))
+		result = IOModule.run_os_command(cmd, cwd=crawler_command_cwd, timeout= crawling_timeout, memory_limit=constantsModule.PROCESS_MEMORY_LIMIT, cpu_limit=constantsModule.PROCESS_CPU_LIMIT, return_result=True)
+		if result.ok:
+			LOGGER.info("successfully crawled %s - %s"%(website_rank, website_url))
+		else:
+			LOGGER.warning("crawling %s - %s did not finish: %s"%(website_rank, website_url, str(result)))
+		return [result]
+
+	return []
+
+
+def build_site_hpgs(config, pipeline, g_index, website_rank, website_url):
+
+	"""
+	runs the static analysis (i.e., HPG construction) passes of the enabled analyses for one website of the site list
+	@param {dict} config: pipeline configuration
+	@param {dict} pipeline: commands, working directories, timeouts and memory budgets of the passes, see `main()`
+	@param {int} g_index: row of the website in the site list
+	@param {string} website_rank
+	@param {string} website_url
+	@return {list} the `ProcessResult` of the HPG construction of each webpage
+	"""
+
+	iterative_output = pipeline["iterative_output"]
+	static_analysis_memory = pipeline["static_analysis_memory"]
+	static_analysis_per_webpage_timeout = pipeline["static_analysis_per_webpage_timeout"]
+	static_analysis_compress_hpg = pipeline["static_analysis_compress_hpg"]
+	static_analysis_overwrite_hpg = pipeline["static_analysis_overwrite_hpg"]
+
+	results = []
+
+	# dom clobbering
+	if config['domclobbering']['enabled']:
+		# static analysis
+		if  config['domclobbering']["passes"]["static"]:
+			LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
+			# cmd = domc_static_analysis_command.replace('SEED_URL', website_url)
+			# IOModule.run_os_command(cmd, print_stdout=False, cwd=domc_analyses_command_cwd, timeout= static_analysis_timeout)
+			results += domc_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
+			LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url))
+
+	# client-side csrf
+	if config['cs_csrf']['enabled']:
+		# static analysis
+		if config['cs_csrf']["passes"]["static"]:
+			LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
+			# cmd = cs_csrf_static_analysis_command.replace('SEED_URL', website_url)
+			# IOModule.run_os_command(cmd, print_stdout=False, cwd=cs_csrf_analyses_command_cwd, timeout= static_analysis_timeout)
+			results += csrf_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
+			LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url))
+
+	# open redirect
+	if config['open_redirect']['enabled']:
+		# static analysis
+		if config['open_redirect']["passes"]["static"]:
+			LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
+			results += or_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
+			LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url))
+
+	# request hijacking
+	if config['request_hijacking']['enabled']:
+		# static analysis
+		if config['request_hijacking']["passes"]["static"]:
+			LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
+			results += rh_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
+			LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url))
+
+	return results
+
+
+def analyze_site_hpgs(config, pipeline, g_index, website_rank, website_url):
+
+	"""
+	runs the neo4j and dynamic verification passes of the enabled analyses for one website of the site list
+	@param {dict} config: pipeline configuration
+	@param {dict} pipeline: commands, working directories, timeouts and memory budgets of the passes, see `main()`
+	@param {int} g_index: row of the website in the site list
+	@param {string} website_rank
+	@param {string} website_url
+	@return {list} the `ProcessResult` of the dynamic passes, and the exit code of the neo4j passes that return one (-1 on failure);
+	the failures of the webpage-level jobs are recorded in the job ledger
+	"""
+
+	static_analysis_per_webpage_timeout = pipeline["static_analysis_per_webpage_timeout"]
+	static_analysis_compress_hpg = pipeline["static_analysis_compress_hpg"]
+	static_analysis_overwrite_hpg = pipeline["static_analysis_overwrite_hpg"]
+	node_force_execution = pipeline["node_force_execution"]
+	force_execution_command_cwd = pipeline["force_execution_command_cwd"]
+	force_execution_timeout = pipeline["force_execution_timeout"]
+	node_dynamic_verifier = pipeline["node_dynamic_verifier"]
+	dynamic_verifier_command_cwd = pipeline["dynamic_verifier_command_cwd"]
+	verification_pass_timeout = pipeline["verification_pass_timeout"]
+
+	results = []
+
+	# dom clobbering
+	if config['domclobbering']['enabled']:
+		if  config['domclobbering']["passes"]["static_neo4j"]:
+			LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
+			results.append(DOMCTraversalsModule.build_and_analyze_hpg_local(website_url))
+			LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
+
+		# dynamic verification
+		if  config['domclobbering']["passes"]["dynamic"]:
+			LOGGER.info("Running dynamic verifier for site %s - %s"%(website_rank, website_url)) 
+			cmd = node_force_execution.replace('SITE_URL', website_url)
+			results.append(IOModule.run_os_command(cmd, cwd=force_execution_command_cwd, timeout= force_execution_timeout, memory_limit=constantsModule.PROCESS_MEMORY_LIMIT, cpu_limit=constantsModule.PROCESS_CPU_LIMIT, return_result=True))
+			LOGGER.info("Dynamic verification completed for site %s - %s"%(website_rank, website_url))
+
+	# client-side csrf
+	if config['cs_csrf']['enabled']:
+		if config['cs_csrf']["passes"]["static_neo4j"]:
+			LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
+			results.append(CSRFTraversalsModule.build_and_analyze_hpg(website_url))
+			LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url))
+
+	# open redirect
+	if config['open_redirect']['enabled']:
+		if config['open_redirect']["passes"]["static_neo4j"]:
+			LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
+			or_neo4j_analysis_api.build_and_analyze_hpg(website_url, timeout=static_analysis_per_webpage_timeout, overwrite=static_analysis_overwrite_hpg, compress_hpg=static_analysis_compress_hpg)
+			LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url))
+
+	# request hijacking
+	if config['request_hijacking']['enabled']:
+		if config['request_hijacking']["passes"]["static_neo4j"]:
+			LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
+			request_hijacking_neo4j_analysis_api.build_and_analyze_hpg(website_url, timeout=static_analysis_per_webpage_timeout, overwrite=static_analysis_overwrite_hpg, compress_hpg=static_analysis_compress_hpg)
+			LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
+
+		# dynamic verification
+		if config['request_hijacking']['passes']['verification']:
+			LOGGER.info("dynamic data flow verification for site %s - %s"%(website_rank, website_url))
+			cmd = node_dynamic_verifier.replace("SITE_URL", website_url)
+			results.append(request_hijacking_verification_api.start_verification_for_site(cmd, website_url, cwd=dynamic_verifier_command_cwd, timeout=verification_pass_timeout, overwrite=False))
+			LOGGER.info("sucessfully finished dynamic data flow verification for site %s - %s"%(website_rank, website_url))
+
+	return results
+
+
+# passes of the analyses run by each site-level stage
+SITE_STAGE_PASSES = {
+	'crawling': ['crawling'],
+	'hpg': ['static'],
+	'neo4j': ['static_neo4j', 'dynamic', 'verification'],
+}
+
+def get_site_stage_job_name(config, stage):
+
+	"""
+	@param {dict} config: pipeline configuration
+	@param {string} stage: a key of `SITE_STAGE_PASSES`
+	@return {string} name of the stage in the job ledger, which includes the enabled passes it runs
+	(so that enabling more passes later does not skip them), or None if the stage runs no pass
+	"""
+
+	passes = []
+	for analysis in ['domclobbering', 'cs_csrf', 'open_redirect', 'request_hijacking']:
+		if analysis in config and config[analysis]['enabled']:
+			for pass_name in SITE_STAGE_PASSES[stage]:
+				if config[analysis]["passes"].get(pass_name, False):
+					passes.append('%s.%s'%(analysis, pass_name))
+	if not len(passes):
+		return None
+	return '%s:%s'%(stage, ','.join(passes))
+
+
+# error of the crawling stage of a site that is down
+WEBSITE_DOWN_ERROR = 'website is down'
+
+def get_stage_exit_status(results):
+
+	"""
+	@param {list} results: `ProcessResult` of the commands run by a stage, or exit codes of the passes that return one (-1 on failure)
+	@return {tuple} (exit_code, timed_out): the exit code of the first failed command (-1 if it was killed for a limit), or 0,
+	and whether any command timed out
+	"""
+
+	exit_code = 0
+	timed_out = False
+	for result in results:
+		if isinstance(result, ProcessRunnerModule.ProcessResult):
+			timed_out = timed_out or result.timed_out
+			if exit_code == 0 and not result.ok:
+				killed = result.timed_out or result.memory_exceeded or result.cpu_exceeded
+				exit_code = -1 if killed or not result.returncode else result.returncode
+		elif exit_code == 0 and isinstance(result, int) and result < 0:
+			exit_code = result
+	return exit_code, timed_out
+
+
+def run_site_stage(config, stage, website_url, fn, *args):
+
+	"""
+	runs a site-level stage, unless the job ledger (if enabled) says it is finished or given up.
+	the stage is marked as failed (and retried by a later run) if a command it ran failed or timed out,
+	or if a webpage-level job of the site failed while it ran
+	@param {dict} config: pipeline configuration
+	@param {string} stage: a key of `SITE_STAGE_PASSES`
+	@param {string} website_url
+	@param {function} fn: the stage; returns its command results (see `get_stage_exit_status()`), or False if the website is down
+	@return the return value of `fn`; if the stage is skipped, False if the website was down, an empty list otherwise
+	"""
+
+	ledger = JobLedgerModule.get_job_ledger()
+	if ledger is None:
+		return fn(*args)
+
+	stage = get_site_stage_job_name(config, stage)
+	if stage is None:
+		return fn(*args)
+
+	if not ledger.should_run(website_url, '', stage):
+		LOGGER.info("[ledger] skipping stage %s for site %s."%(stage, website_url))
+		job = ledger.get_job(website_url, '', stage)
+		if job['status'] != JobLedgerModule.STATUS_DONE and job['error'] == WEBSITE_DOWN_ERROR:
+			return False
+		return []
+
+	started_at = time.time()
+	ledger.start(website_url, '', stage)
+	try:
+		ret = fn(*args)
+	except Exception as e:
+		ledger.fail(website_url, '', stage, error=e)
+		raise
+
+	if ret is False:
+		ledger.fail(website_url, '', stage, exit_code=-1, error=WEBSITE_DOWN_ERROR)
+		return ret
+
+	exit_code, timed_out = get_stage_exit_status(ret)
+	failed_jobs = ledger.get_failed_jobs(website_url, since=started_at)
+	if exit_code != 0 or timed_out:
+		LOGGER.warning("[ledger] stage %s for site %s failed with exit code %s%s."%(stage, website_url, exit_code, ' (timeout)' if timed_out else ''))
+		ledger.fail(website_url, '', stage, exit_code=exit_code, timed_out=timed_out)
+	elif len(failed_jobs):
+		LOGGER.warning("[ledger] stage %s for site %s has %d failed webpage jobs."%(stage, website_url, len(failed_jobs)))
+		ledger.fail(website_url, '', stage, exit_code=0, error='%d failed webpage jobs'%len(failed_jobs))
+	else:
+		ledger.finish(website_url, '', stage, exit_code=0)
+	return ret
+
+
+def test_site(config, pipeline, g_index, website_rank, website_url):
+
+	"""
+	runs the enabled passes of the enabled analyses for one website of the site list.
+	note: the passes are grouped by stage, i.e., the crawling, then the static analysis of every enabled analysis,
+	then their neo4j and dynamic passes; unlike the single site mode (`--site`), which runs all passes of one
+	analysis before the next one. the outputs of each pass are the same either way
+	@param {dict} config: pipeline configuration
+	@param {dict} pipeline: commands, working directories, timeouts and memory budgets of the passes, see `main()`
+	@param {int} g_index: row of the website in the site list
+	@param {string} website_rank
+	@param {string} website_url
+	"""
+
+	# a failed or timed out crawl still leaves the webpages crawled so far for the next stages
+	if run_site_stage(config, 'crawling', website_url, crawl_site, config, pipeline, g_index, website_rank, website_url) is False:
+		return
+
+	run_site_stage(config, 'hpg', website_url, build_site_hpgs, config, pipeline, g_index, website_rank, website_url)
+	run_site_stage(config, 'neo4j', website_url, analyze_site_hpgs, config, pipeline, g_index, website_rank, website_url)
+
+
+def iterate_site_list(testbed_filename, from_row, to_row):
+
+	"""
+	@param {string} testbed_filename: path of the site list csv (rank, domain)
+	@param {int} from_row
+	@param {int} to_row
+	@return {generator} of (g_index, website_rank, website_url) for the sites of the site list within the given rows
+	"""
+
+	chunksize = 10**5
+	iteration = 0
+	done = False
+	for chunk_df in pd.read_csv(testbed_filename, chunksize=chunksize, usecols=[0, 1], header=None, skip_blank_lines=True):
+		if done:
+			break
+
+		iteration = iteration + 1
+		LOGGER.info("starting to crawl chunk: %s -- %s"%((iteration-1)*chunksize, iteration*chunksize))
+		
+		reverse_chunk_df = chunk_df[::-1]
+
+		for (index, row) in reverse_chunk_df.iterrows():
+			g_index = iteration*index+1
+			if g_index >= from_row and g_index <= to_row:
+
+				website_rank = row[0]
+				website_url = 'http://' + row[1]
+				yield (g_index, website_rank, website_url)
+
+			# if g_index > to_row :
+			if g_index < from_row:
+				done = True
+				LOGGER.info("successfully tested sites, terminating!") 
+				break
+
+
+def set_neo4j_ports(http_port, bolt_port):
+
+	"""
+	points the connection strings of this process to the neo4j instance with the given ports
+	@param {int|string} http_port
+	@param {int|string} bolt_port
+	"""
+
+	constantsModule.NEO4J_HTTP_PORT = str(http_port)
+	constantsModule.NEO4J_CONN_HTTP_STRING = "http://127.0.0.1:%s"%str(constantsModule.NEO4J_HTTP_PORT)
+	constantsModule.NEO4J_BOLT_PORT = str(bolt_port)
+	constantsModule.NEO4J_CONN_STRING = "bolt://127.0.0.1:%s"%str(constantsModule.NEO4J_BOLT_PORT)
+	constantsModule.NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, constantsModule.NEO4J_BOLT_PORT)
+
+
+def get_worker_port_step():
+
+	"""
+	@return {int} port offset between the neo4j instances of two consecutive workers;
+	large enough to fit the instance pool of each worker, if any
+	"""
+
+	port_step = int(constantsModule.NEO4J_WORKER_PORT_STEP)
+	if str(constantsModule.NEO4J_USE_INSTANCE_POOL).lower() == 'true':
+		pool_span = int(constantsModule.NEO4J_INSTANCE_POOL_SIZE) * int(constantsModule.NEO4J_INSTANCE_POOL_PORT_STEP)
+		port_step = max(port_step, pool_span)
+	return port_step
+
+
+def assign_worker_neo4j_ports(worker_id):
+
+	"""
+	makes the worker with the given index talk to its own neo4j http/bolt port pair
+	@param {int} worker_id: index of the worker, from 0
+	@return {tuple} (http_port, bolt_port) of the worker
+	"""
+
+	port_step = get_worker_port_step()
+	http_port = int(constantsModule.NEO4J_HTTP_PORT) + worker_id * port_step
+	bolt_port = int(constantsModule.NEO4J_BOLT_PORT) + worker_id * port_step
+	set_neo4j_ports(http_port, bolt_port)
+	return http_port, bolt_port
+
+
+def run_site_worker(worker_id, config, pipeline, site_queue, worker_memory=None):
+
+	"""
+	worker process of the parallel site list mode: tests the sites taken from the shared queue until it receives `None`
+	@param {int} worker_id: index of the worker, from 0
+	@param {dict} config: pipeline configuration
+	@param {dict} pipeline: see `test_site()`
+	@param {multiprocessing.Queue} site_queue: queue of (g_index, website_rank, website_url) entries
+	@param {int} worker_memory: memory budget (MB) of the node processes of the worker; None keeps the config values
+	"""
+
+	# re-apply the config in case the worker is not forked from the main process
+	configure_constants(config)
+	http_port, bolt_port = assign_worker_neo4j_ports(worker_id)
+
+	pipeline = dict(pipeline)
+	if worker_memory is not None:
+		pipeline["crawler_node_memory"] = worker_memory
+		pipeline["static_analysis_memory"] = worker_memory
+
+	LOGGER.info("[worker %s] started with neo4j http port %s and bolt port %s."%(worker_id, http_port, bolt_port))
+
+	try:
+		while True:
+			entry = site_queue.get()
+			if entry is None:
+				break
+
+			g_index, website_rank, website_url = entry
+			LOGGER.info("[worker %s] testing site at row %s - rank %s - %s"%(worker_id, g_index, website_rank, website_url))
+			try:
+				test_site(config, pipeline, g_index, website_rank, website_url)
+			except Exception as e:
+				LOGGER.error("[worker %s] testing site %s - %s failed: %s"%(worker_id, website_rank, website_url, str(e)))
+	finally:
+		teardown_worker(worker_id)
+
+	LOGGER.info("[worker %s] no more sites, terminating!"%(worker_id))
+
+
+def run_site_list_in_parallel(config, pipeline, sites, workers, worker_memory=None):
+
+	"""
+	tests the sites with a pool of worker processes that take the sites from a shared, bounded queue
+	@param {dict} config: pipeline configuration
+	@param {dict} pipeline: see `test_site()`
+	@param {iterable} sites: (g_index, website_rank, website_url) entries
+	@param {int} workers: number of worker processes
+	@param {int} worker_memory: see `run_site_worker()`
+	"""
+
+	# bounded, so that the site list is streamed to the workers instead of being loaded at once
+	site_queue = multiprocessing.Queue(maxsize=2*workers)
+
+	processes = []
+	for worker_id in range(workers):
+		process = multiprocessing.Process(target=run_site_worker, args=(worker_id, config, pipeline, site_queue, worker_memory))
+		process.start()
+		processes.append(process)
+
+	for entry in sites:
+		if not put_site(site_queue, entry, processes):
+			LOGGER.error("all workers died, not testing the remaining sites.")
+			break
+
+	for _ in range(workers):
+		if not put_site(site_queue, None, processes):
+			break
+
+	for process in processes:
+		process.join()
+
+
+def put_site(site_queue, entry, processes):
+
+	"""
+	@param {multiprocessing.Queue} site_queue
+	@param {tuple} entry: a site entry, or None to stop a worker
+	@param {list} processes: the workers that consume the queue
+	@return {bool} whether the entry was put; blocks while the queue is full, unless all workers died
+	"""
+
+	while True:
+		try:
+			site_queue.put(entry, timeout=QUEUE_PUT_TIMEOUT)
+			return True
+		except queue.Full:
+			if not any(process.is_alive() for process in processes):
+				return False
+
+
+def crawling_stage(config, pipeline, worker_id, entry):
+
+	"""
+	@param {dict} config
+	@param {dict} pipeline
+	@param {int} worker_id: index of the worker within the stage
+	@param {tuple} entry: (g_index, website_rank, website_url)
+	@return {tuple} the entry, or None if the website is down
+	"""
+
+	g_index, website_rank, website_url = entry
+	if run_site_stage(config, 'crawling', website_url, crawl_site, config, pipeline, g_index, website_rank, website_url) is False:
+		return None
+	return entry
+
+
+def hpg_stage(config, pipeline, worker_id, entry):
+
+	"""
+	@param {dict} config
+	@param {dict} pipeline
+	@param {int} worker_id: index of the worker within the stage
+	@param {tuple} entry: (g_index, website_rank, website_url)
+	@return {tuple} the entry
+	"""
+
+	g_index, website_rank, website_url = entry
+	run_site_stage(config, 'hpg', website_url, build_site_hpgs, config, pipeline, g_index, website_rank, website_url)
+	return entry
+
+
+def neo4j_stage(config, pipeline, worker_id, entry):
+
+	"""
+	@param {dict} config
+	@param {dict} pipeline
+	@param {int} worker_id: index of the worker within the stage
+	@param {tuple} entry: (g_index, website_rank, website_url)
+	@return {None}
+	"""
+
+	g_index, website_rank, website_url = entry
+	run_site_stage(config, 'neo4j', website_url, analyze_site_hpgs, config, pipeline, g_index, website_rank, website_url)
+	return None
+
+
+def init_stage_worker(config, worker_id):
+
+	"""
+	@param {dict} config
+	@param {int} worker_id: index of the worker within its stage
+	"""
+
+	configure_constants(config)
+
+
+def teardown_worker(worker_id):
+
+	"""
+	releases the neo4j instance pool, drivers and job ledger connections of a worker process before it exits,
+	as `multiprocessing` ends the workers without running their `atexit` handlers
+	@param {int} worker_id
+	"""
+
+	DriverRegistryModule.close_driver_registry()
+	InstancePoolModule.destroy_instance_pool()
+	JobLedgerModule.close_job_ledger()
+
+
+def init_neo4j_stage_worker(config, worker_id):
+
+	"""
+	@param {dict} config
+	@param {int} worker_id: index of the worker within the neo4j stage
+	"""
+
+	configure_constants(config)
+	http_port, bolt_port = assign_worker_neo4j_ports(worker_id)
+	LOGGER.info("[neo4j %s] using neo4j http port %s and bolt port %s."%(worker_id, http_port, bolt_port))
+
+
+def run_site_list_in_stages(config, pipeline, sites, stage_workers, max_hpg_backlog=None):
+
+	"""
+	overlaps the crawling, HPG construction and neo4j analysis of different sites:
+	each stage has its own pool of workers, and the sites flow between the stages through bounded queues
+	@param {dict} config: pipeline configuration
+	@param {dict} pipeline: see `test_site()`
+	@param {iterable} sites: (g_index, website_rank, website_url) entries
+	@param {dict} stage_workers: number of workers of the `crawling`, `hpg` and `neo4j` stages
+	@param {int} max_hpg_backlog: max number of crawled sites waiting for HPG construction; the crawlers block when it is reached
+	"""
+
+	scheduler = StageScheduler([
+		Stage('crawling', functools.partial(crawling_stage, config, pipeline), workers=stage_workers.get("crawling", 1), init_worker=functools.partial(init_stage_worker, config), teardown_worker=teardown_worker),
+		Stage('hpg', functools.partial(hpg_stage, config, pipeline), workers=stage_workers.get("hpg", 1), max_backlog=max_hpg_backlog, init_worker=functools.partial(init_stage_worker, config), teardown_worker=teardown_worker),
+		Stage('neo4j', functools.partial(neo4j_stage, config, pipeline), workers=stage_workers.get("neo4j", 1), init_worker=functools.partial(init_neo4j_stage_worker, config), teardown_worker=teardown_worker),
+	])
+	scheduler.run(sites)
+
+
 def main():
 
 	BASE_DIR= os.path.dirname(os.path.realpath(__file__))
@@ -99,6 +795,11 @@ def main():
 					help='the last entry to consider when a site list is provided; overrides config file (default: %(default)s)',
 					type=int)
 
+	p.add_argument('--workers', "-W",
+					default=-1,
+					help='number of worker processes testing the sites of the site list in parallel; overrides config file (default: %(default)s)',
+					type=int)
+
 
 
 	args= vars(p.parse_args())
@@ -108,6 +809,7 @@ def main():
 	override_site_list = args["list"]
 	override_site_list_from = args["from"]
 	override_site_list_to = args["to"]
+	override_workers = args["workers"]
 
 	domain_health_check = config["crawler"]["domain_health_check"]
 
@@ -123,6 +825,9 @@ def main():
 	if override_site_list_to != -1:
 		config["testbed"]["to_row"] = override_site_list_to
 
+	if override_workers != -1:
+		config["testbed"]["workers"] = override_workers
+
 
 	LOGGER.info("loading config: %s"%str(config))
 
@@ -145,13 +850,12 @@ def main():
 		crawler_node_memory = config["crawler"]["memory"]
 		
 	# crawling
-	crawling_command = "node --max-old-space-size={5} DRIVER_ENTRY --seedurl=SEED_URL --maxurls={0} --browser={1} --headless={2} --overwrite={3} --foxhound={4}".format(
+	crawling_command = "node --max-old-space-size=NODE_MEMORY DRIVER_ENTRY --seedurl=SEED_URL --maxurls={0} --browser={1} --headless={2} --overwrite={3} --foxhound={4}".format(
 		config["crawler"]["maxurls"],
 		config["crawler"]["browser"]["name"],
 		config["crawler"]["browser"]["headless"],
 		config["crawler"]["overwrite"],
 		config["crawler"]["browser"]["foxhound"], # should_use_foxhound
-		crawler_node_memory
 	)
 	
 	
@@ -182,26 +886,7 @@ def main():
 	if "overwrite_hpg" in config["staticpass"]:
 		static_analysis_overwrite_hpg = config["staticpass"]["overwrite_hpg"]
 
-	# set neo4j config
-	if "neo4j_user" in config["staticpass"]:
-		constantsModule.NEO4J_USER = config["staticpass"]["neo4j_user"]
-		constantsModule.NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, constantsModule.NEO4J_BOLT_PORT)
-
-	if "neo4j_pass" in config["staticpass"]:
-		constantsModule.NEO4J_PASS = config["staticpass"]["neo4j_pass"]
-		constantsModule.NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, constantsModule.NEO4J_BOLT_PORT)
-
-	if "neo4j_http_port" in config["staticpass"]:
-		constantsModule.NEO4J_HTTP_PORT = config["staticpass"]["neo4j_http_port"]
-		constantsModule.NEO4J_CONN_HTTP_STRING = "http://127.0.0.1:%s"%str(constantsModule.NEO4J_HTTP_PORT)
-
-	if "neo4j_bolt_port" in config["staticpass"]:
-		constantsModule.NEO4J_BOLT_PORT = config["staticpass"]["neo4j_bolt_port"]
-		constantsModule.NEO4J_CONN_STRING = "bolt://127.0.0.1:%s"%str(constantsModule.NEO4J_BOLT_PORT)
-		constantsModule.NEOMODEL_NEO4J_CONN_STRING = "bolt://%s:%s@127.0.0.1:%s"%(constantsModule.NEO4J_USER, constantsModule.NEO4J_PASS, constantsModule.NEO4J_BOLT_PORT)
-
-	if "neo4j_use_docker" in config["staticpass"]:
-		constantsModule.NEO4J_USE_DOCKER = config["staticpass"]["neo4j_use_docker"] 
+	configure_constants(config)
 
 
 	## dom clobbering
@@ -242,6 +927,43 @@ def main():
 	node_dynamic_verifier_driver_program = os.path.join(dynamic_verifier_command_cwd, "verify.js")
 	node_dynamic_verifier = node_dynamic_verfier_command.replace("DRIVER_ENTRY", node_dynamic_verifier_driver_program)
 
+	pipeline = {
+		"domain_health_check": domain_health_check,
+		"iterative_output": iterative_output,
+		"crawling_command": crawling_command,
+		"crawler_command_cwd": crawler_command_cwd,
+		"crawler_node_memory": crawler_node_memory,
+		"crawling_timeout": crawling_timeout,
+		"static_analysis_memory": static_analysis_memory,
+		"static_analysis_per_webpage_timeout": static_analysis_per_webpage_timeout,
+		"static_analysis_compress_hpg": static_analysis_compress_hpg,
+		"static_analysis_overwrite_hpg": static_analysis_overwrite_hpg,
+		"node_force_execution": node_force_execution,
+		"force_execution_command_cwd": force_execution_command_cwd,
+		"force_execution_timeout": force_execution_timeout,
+		"node_dynamic_verifier": node_dynamic_verifier,
+		"dynamic_verifier_command_cwd": dynamic_verifier_command_cwd,
+		"verification_pass_timeout": verification_pass_timeout,
+	}
+
+	# parallel site list mode: number of worker processes, and memory budget (MB) of the node processes of each worker
+	workers = 1
+	if "workers" in config["testbed"]:
+		workers = max(1, int(config["testbed"]["workers"]))
+
+	worker_memory = None
+	if "worker_memory" in config["testbed"]:
+		worker_memory = int(config["testbed"]["worker_memory"])
+
+	# stage-pipelined site list mode: number of workers per stage, and bound on the crawled sites waiting for HPG construction
+	stage_workers = None
+	if "stage_workers" in config["testbed"] and config["testbed"]["stage_workers"]:
+		stage_workers = dict((stage, max(1, int(n))) for stage, n in config["testbed"]["stage_workers"].items())
+
+	max_hpg_backlog = None
+	if "max_hpg_backlog" in config["testbed"]:
+		max_hpg_backlog = int(config["testbed"]["max_hpg_backlog"])
+
 
 
 	if "site" in config["testbed"]:
@@ -268,9 +990,9 @@ def main():
 					save_website_is_down(website_url)
 
 			LOGGER.info("crawling site %s."%(website_url))
-			cmd = crawling_command.replace('SEED_URL', website_url)
+			cmd = crawling_command.replace('SEED_URL', website_url).replace('NODE_MEMORY', str(crawler_node_memory))
 			LOGGER.debug(cmd)
-			IOModule.run_os_command(cmd, cwd=crawler_command_cwd, timeout= crawling_timeout)
+			IOModule.run_os_command(cmd, cwd=crawler_command_cwd, timeout= crawling_timeout, memory_limit=constantsModule.PROCESS_MEMORY_LIMIT, cpu_limit=constantsModule.PROCESS_CPU_LIMIT)
 			LOGGER.info("successfully crawled %s."%(website_url)) 
 
 		# dom clobbering
@@ -293,7 +1015,7 @@ def main():
 			if config['domclobbering']["passes"]["dynamic"]:
 				LOGGER.info("Running dynamic verifier for site %s."%(website_url))
 				cmd = node_force_execution.replace('SITE_URL', website_url)
-				IOModule.run_os_command(cmd, cwd=force_execution_command_cwd, timeout= force_execution_timeout)
+				IOModule.run_os_command(cmd, cwd=force_execution_command_cwd, timeout= force_execution_timeout, memory_limit=constantsModule.PROCESS_MEMORY_LIMIT, cpu_limit=constantsModule.PROCESS_CPU_LIMIT)
 				LOGGER.info("Dynamic verification completed for site %s."%(website_url))
 
 
@@ -355,130 +1077,19 @@ def main():
 		from_row = int(config["testbed"]["from_row"])
 		to_row = int(config["testbed"]["to_row"])
 
-		chunksize = 10**5
-		iteration = 0
-		done = False
-		for chunk_df in pd.read_csv(testbed_filename, chunksize=chunksize, usecols=[0, 1], header=None, skip_blank_lines=True):
-			if done:
-				break
+		sites = iterate_site_list(testbed_filename, from_row, to_row)
+
+		if stage_workers is not None:
+			LOGGER.info("testing the site list with the stage workers %s."%(str(stage_workers)))
+			run_site_list_in_stages(config, pipeline, sites, stage_workers, max_hpg_backlog=max_hpg_backlog)
+		elif workers > 1:
+			LOGGER.info("testing the site list with %s workers."%(workers))
+			run_site_list_in_parallel(config, pipeline, sites, workers, worker_memory=worker_memory)
+		else:
+			for (g_index, website_rank, website_url) in sites:
+				test_site(config, pipeline, g_index, website_rank, website_url)
 
-			iteration = iteration + 1
-			LOGGER.info("starting to crawl chunk: %s -- %s"%((iteration-1)*chunksize, iteration*chunksize))
-			
-			reverse_chunk_df = chunk_df[::-1]
-
-			for (index, row) in reverse_chunk_df.iterrows():
-				g_index = iteration*index+1
-				if g_index >= from_row and g_index <= to_row:
-
-					website_rank = row[0]
-					website_url = 'http://' + row[1]
-					
-
-					if domain_health_check:
-						LOGGER.info('checking if domain is up with python requests ...')
-						website_up = False
-
-						try:
-							website_up = is_website_up(website_url)
-						except:
-							save_website_is_down(website_url)
-							continue
-
-						if not website_up:
-							LOGGER.warning('domain %s is not up, skipping!'%website_url)
-							save_website_is_down(website_url)
-							continue
-
-					# crawling
-					if (config['domclobbering']['enabled'] and config['domclobbering']["passes"]["crawling"]) or \
-						(config['cs_csrf']['enabled'] and config['cs_csrf']["passes"]["crawling"]) or \
-						(config['open_redirect']['enabled'] and config['open_redirect']["passes"]["crawling"]) or \
-						(config['request_hijacking']['enabled'] and config['request_hijacking']["passes"]["crawling"]):
-
-						LOGGER.info("crawling site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-						cmd = crawling_command.replace('SEED_URL', website_url)
-						IOModule.run_os_command(cmd, cwd=crawler_command_cwd, timeout= crawling_timeout)
-						LOGGER.info("successfully crawled %s - %s"%(website_rank, website_url)) 
-
-					# dom clobbering
-					if config['domclobbering']['enabled']:
-						# static analysis
-						if  config['domclobbering']["passes"]["static"]:
-							LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-							# cmd = domc_static_analysis_command.replace('SEED_URL', website_url)
-							# IOModule.run_os_command(cmd, print_stdout=False, cwd=domc_analyses_command_cwd, timeout= static_analysis_timeout)
-							domc_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
-							LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-						
-						if  config['domclobbering']["passes"]["static_neo4j"]:
-							LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-							DOMCTraversalsModule.build_and_analyze_hpg_local(website_url)
-							LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-
-						# dynamic verification
-						if  config['domclobbering']["passes"]["dynamic"]:
-							LOGGER.info("Running dynamic verifier for site %s - %s"%(website_rank, website_url)) 
-							cmd = node_force_execution.replace('SITE_URL', website_url)
-							IOModule.run_os_command(cmd, cwd=force_execution_command_cwd, timeout= force_execution_timeout)
-							LOGGER.info("Dynamic verification completed for site %s - %s"%(website_rank, website_url)) 
-
-
-					# client-side csrf
-					if config['cs_csrf']['enabled']:
-						# static analysis
-						if config['cs_csrf']["passes"]["static"]:
-							LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-							# cmd = cs_csrf_static_analysis_command.replace('SEED_URL', website_url)
-							# IOModule.run_os_command(cmd, print_stdout=False, cwd=cs_csrf_analyses_command_cwd, timeout= static_analysis_timeout)
-							csrf_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
-							LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-						
-						if config['cs_csrf']["passes"]["static_neo4j"]:
-							LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-							CSRFTraversalsModule.build_and_analyze_hpg(website_url)
-							LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-
-					# open redirect
-					if config['open_redirect']['enabled']:
-						# static analysis
-						if config['open_redirect']["passes"]["static"]:
-							LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-							or_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
-							LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-						
-						if config['open_redirect']["passes"]["static_neo4j"]:
-							LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-							or_neo4j_analysis_api.build_and_analyze_hpg(website_url, timeout=static_analysis_per_webpage_timeout, overwrite=static_analysis_overwrite_hpg, compress_hpg=static_analysis_compress_hpg)
-							LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-
-
-					# request hijacking
-					if config['request_hijacking']['enabled']:
-						# static analysis
-						if config['request_hijacking']["passes"]["static"]:
-							LOGGER.info("static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-							rh_sast_model_construction_api.start_model_construction(website_url, iterative_output=iterative_output, memory=static_analysis_memory, timeout=static_analysis_per_webpage_timeout, compress_hpg=static_analysis_compress_hpg, overwrite_hpg=static_analysis_overwrite_hpg)
-							LOGGER.info("successfully finished static analysis for site at row %s - rank %s - %s"%(g_index, website_rank, website_url)) 
-						
-						if config['request_hijacking']["passes"]["static_neo4j"]:
-							LOGGER.info("HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-							request_hijacking_neo4j_analysis_api.build_and_analyze_hpg(website_url, timeout=static_analysis_per_webpage_timeout, overwrite=static_analysis_overwrite_hpg, compress_hpg=static_analysis_compress_hpg)
-							LOGGER.info("finished HPG construction and analysis over neo4j for site %s - %s"%(website_rank, website_url)) 
-
-						# dynamic verification
-						if config['request_hijacking']['passes']['verification']:
-							LOGGER.info("dynamic data flow verification for site %s - %s"%(website_rank, website_url))
-							cmd = node_dynamic_verifier.replace("SITE_URL", website_url)
-							request_hijacking_verification_api.start_verification_for_site(cmd, website_url, cwd=dynamic_verifier_command_cwd, timeout=verification_pass_timeout, overwrite=False)
-							LOGGER.info("sucessfully finished dynamic data flow verification for site %s - %s"%(website_rank, website_url))
-
-
-				# if g_index > to_row :
-				if g_index < from_row:
-					done = True
-					LOGGER.info("successfully tested sites, terminating!") 
-					break
+		JobLedgerModule.close_job_ledger()
 
 if __name__ == "__main__":
 	main()
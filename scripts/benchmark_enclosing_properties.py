@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	regression benchmark of the precomputed enclosing functions and blocks (`hpg_neo4j/hpg_enclosing.py`)
+	on the HPGs of the modeled libraries in `data/libraries`. For each library, the in-memory HPG answers
+		(1) the enclosing function expressions of the `ThisExpression` nodes (`this_in_*` queries),
+		(2) the enclosing blocks of the CFG nodes (`enclosing_block_statement`), and
+		(3) the return statements of the functions (`symbolic_modeling.analysis.get_return_statements()`),
+	once by walking the unbounded `AST_parentOf*` and `CFG_parentOf*` paths, and once with the precomputed
+	lookups. The times are logged as a table, and the script fails if the two give different results,
+	or if a library has no HPG.
+
+	The HPGs of the libraries that do not have one yet (e.g., jquery) are constructed first, unless `--no-build` is given.
+
+	With `--conn`, the cypher queries themselves are compared as well: each query of
+	`query_catalog.get_enclosing_query_names()` runs in its unbounded and in its precomputed variant
+	against the neo4j database at `--conn`, which must hold the HPG of the `--input` library, imported
+	with the nodes file of `python3 -m hpg_neo4j.hpg_enclosing --input=<library folder>` (written into its
+	`hpg_enclosing` folder). The rows are compared per node id.
+
+
+	Running:
+	------------
+	$ python3 -m scripts.benchmark_enclosing_properties
+	$ python3 -m scripts.benchmark_enclosing_properties --input=data/libraries/jquery
+	$ python3 -m scripts.benchmark_enclosing_properties --input=data/libraries/jquery --conn=bolt://127.0.0.1:7687
+
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import collections
+import constants as constantsModule
+import utils.io as IOModule
+import hpg_neo4j.in_memory_graph as InMemoryGraphModule
+import hpg_neo4j.hpg_enclosing as HPGEnclosingModule
+import hpg_neo4j.query_catalog as QC
+from utils.logging import logger as LOGGER
+
+
+LIBRARIES_DIRECTORY = os.path.join(constantsModule.DATA_DIR, 'libraries')
+HPG_CSV_DELIMITER = constantsModule.outputCSVDelimiter
+
+
+
+def _build_library_hpg(library_folder):
+	"""
+	constructs the HPG of the (first) script of the library folder, as done by `symbolic_modeling.analysis`
+	"""
+	scripts = sorted(item for item in os.listdir(library_folder) if item.endswith('.js'))
+	if len(scripts) == 0:
+		return
+	command = "node %s --input=%s --output=%s --graphid=%s --mode=csv --lang=js"%(constantsModule.STATIC_ANALYZER_CLI_DRIVER_PATH, os.path.join(library_folder, scripts[0]), library_folder + '/', uuid.uuid4().hex)
+	IOModule.bash_command(command, capture_output=True, log_command=True)
+
+
+def _normalize_legacy_file(file_path, output_folder):
+	"""
+	the HPGs shipped with some of the libraries were constructed by an older version of the engine,
+	whose csv fields are separated by the delimiter and a space; writes a copy without the spaces
+	@return {string} path of the file to load
+	"""
+	with IOModule.open_graph_file(file_path, 'r', newline='') as fd:
+		header = fd.readline()
+	legacy_delimiter = HPG_CSV_DELIMITER + ' '
+	if legacy_delimiter not in header:
+		return file_path
+
+	output_file = os.path.join(output_folder, os.path.basename(file_path).split('.csv')[0] + '.csv')
+	with IOModule.open_graph_file(file_path, 'r', newline='') as fd_in, open(output_file, 'w', encoding='utf-8', newline='') as fd_out:
+		for line in fd_in:
+			fd_out.write(line.replace(legacy_delimiter, HPG_CSV_DELIMITER))
+	return output_file
+
+
+def _load_library_hpg(library_folder):
+	nodes_file = IOModule.get_graph_file(os.path.join(library_folder, constantsModule.NODE_INPUT_FILE_NAME))
+	rels_file = IOModule.get_graph_file(os.path.join(library_folder, constantsModule.RELS_INPUT_FILE_NAME))
+	if nodes_file is None or rels_file is None:
+		return None
+	rels_dynamic_file = IOModule.get_graph_file(os.path.join(library_folder, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME))
+	with tempfile.TemporaryDirectory() as temp_folder:
+		nodes_file = _normalize_legacy_file(nodes_file, temp_folder)
+		rels_file = _normalize_legacy_file(rels_file, temp_folder)
+		return InMemoryGraphModule.InMemoryHPG.from_csv(nodes_file, rels_file, rels_dynamic_file)
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Unbounded Paths
+# ------------------------------------------------------------------------------------ #
+
+def _walk_function_expressions(tx, node):
+	return [n for n in tx._ancestors(node) if tx.graph.node_has_type(n, 'FunctionExpression')]
+
+
+def _walk_enclosing_blocks(graph, node):
+	blocks = []
+	visited = set()
+	stack = [node]
+	while stack:
+		current = stack.pop()
+		for _, predecessor in graph.get_neighbours(current, InMemoryGraphModule.CFG_RELATION, InMemoryGraphModule.INCOMING):
+			if predecessor in visited:
+				continue
+			visited.add(predecessor)
+			stack.append(predecessor)
+			if graph.get_node_property(predecessor, 'Type') in InMemoryGraphModule.ENCLOSING_BLOCK_TYPES:
+				blocks.append(predecessor)
+	return sorted(blocks)
+
+
+def _walk_return_statements(graph, function):
+	out = []
+	stack = [function]
+	while stack:
+		current = stack.pop()
+		for _, child in graph.get_neighbours(current, InMemoryGraphModule.AST_RELATION, InMemoryGraphModule.OUTGOING):
+			if graph.node_has_type(child, 'ReturnStatement'):
+				out.append(child)
+			stack.append(child)
+	return sorted(out)
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Benchmark
+# ------------------------------------------------------------------------------------ #
+
+def _time(fn, items):
+	start = time.time()
+	results = [fn(item) for item in items]
+	return time.time() - start, results
+
+
+def benchmark_library(library_folder):
+	"""
+	@return {dict} the times of the unbounded walks and of the precomputed lookups, and the number of mismatches; None if the folder has no HPG
+	"""
+
+	graph = _load_library_hpg(library_folder)
+	if graph is None:
+		return None
+	tx = graph.begin_transaction()
+
+	this_nodes = graph.get_nodes_by_type('ThisExpression')
+	cfg_nodes = [node for node in range(graph.get_node_count()) if graph.get_edges(node, InMemoryGraphModule.CFG_RELATION, InMemoryGraphModule.INCOMING)]
+	functions = [node for name in InMemoryGraphModule.FUNCTION_TYPES for node in graph.get_nodes_by_type(name)]
+
+	start = time.time()
+	graph.build_enclosing_indexes()
+	# the `ReturnStatements` property of the function nodes
+	returns_by_function = HPGEnclosingModule.get_return_statements_by_function(graph)
+	result = {"library": os.path.basename(library_folder.rstrip('/')), "nodes": graph.get_node_count(), "precompute": time.time() - start, "mismatches": 0}
+
+	def lookup_function_expressions(node):
+		return [n for n in graph.get_enclosing_functions(node) if graph.node_has_type(n, 'FunctionExpression')]
+
+	def lookup_enclosing_blocks(node):
+		return sorted(graph.get_enclosing_blocks(node))
+
+	def lookup_return_statements(function):
+		return returns_by_function.get(function, [])
+
+	benchmarks = [
+		('this', this_nodes, lambda node: _walk_function_expressions(tx, node), lookup_function_expressions),
+		('block', cfg_nodes, lambda node: _walk_enclosing_blocks(graph, node), lookup_enclosing_blocks),
+		('return', functions, lambda node: _walk_return_statements(graph, node), lookup_return_statements),
+	]
+	for name, items, walk_fn, lookup_fn in benchmarks:
+		result[name + '_items'] = len(items)
+		result[name + '_walk'], walked = _time(walk_fn, items)
+		result[name + '_lookup'], looked_up = _time(lookup_fn, items)
+		for item, expected, actual in zip(items, walked, looked_up):
+			if expected != actual:
+				result["mismatches"] += 1
+				LOGGER.warning('[%s] %s: node %s has %s with the unbounded paths, but %s precomputed'%(result["library"], name, graph.get_node_property(item, 'Id'), str(expected), str(actual)))
+	return result
+
+
+
+# ------------------------------------------------------------------------------------ #
+# 	Cypher Variants
+# ------------------------------------------------------------------------------------ #
+
+def _normalize_value(value):
+	"""
+	@return the value with the nodes replaced by their ids, and the relationships by (type, start id, end id)
+	"""
+	if isinstance(value, (list, tuple)):
+		return tuple(_normalize_value(item) for item in value)
+	if hasattr(value, 'start_node'):
+		return (value.type, value.start_node.get('Id'), value.end_node.get('Id'))
+	if hasattr(value, 'labels'):
+		return value.get('Id')
+	return value
+
+
+def _run_query_variants(run_fn, node_ids):
+	"""
+	@param {pointer} run_fn: function of the node id and of whether to use the precomputed variant, that returns the rows of the query
+	@return {list} (node id, rows of the unbounded variant, rows of the precomputed variant) of the nodes whose rows differ
+	"""
+	mismatches = []
+	for node_id in node_ids:
+		expected = collections.Counter(_normalize_value(row) for row in run_fn(node_id, False))
+		actual = collections.Counter(_normalize_value(row) for row in run_fn(node_id, True))
+		if expected != actual:
+			mismatches.append((node_id, expected, actual))
+	return mismatches
+
+
+def check_cypher_variants(tx, sample_size):
+	"""
+	runs the unbounded and the precomputed variants of the queries on the HPG of the database, see the module description
+	@param {neo4j-pointer} tx
+	@param {int} sample_size: maximum number of nodes per query
+	@return {dict} query name -->> (number of nodes, number of mismatches)
+	"""
+
+	if not QC.has_enclosing_properties(tx):
+		LOGGER.error('[cypher] the hpg of the database was imported without the enclosing properties')
+		return {}
+
+	def get_node_ids(query, **params):
+		return [record['id'] for record in tx.run(query + ' RETURN DISTINCT n.Id AS id ORDER BY id LIMIT $limit', limit=int(sample_size), **params)]
+
+	node_ids = {
+		'enclosing_block_statement': get_node_ids("MATCH (n)<-[:CFG_parentOf]-()"),
+		'function_return_statements': get_node_ids("MATCH (n) WHERE n.Type IN $types", types=InMemoryGraphModule.FUNCTION_TYPES),
+	}
+	this_ids = get_node_ids("MATCH (n {Type: 'ThisExpression'})")
+
+	def run_catalog_query(name):
+		return lambda node_id, enclosing: [record.values() for record in tx.run(QC.get_query(name, partitioned=False, enclosing=enclosing), id=node_id)]
+
+	result = {}
+	for name in QC.get_enclosing_query_names():
+		mismatches = _run_query_variants(run_catalog_query(name), node_ids.get(name, this_ids))
+		for node_id, expected, actual in mismatches:
+			LOGGER.warning('[cypher] %s: node %s has %s with the unbounded paths, but %s precomputed'%(name, node_id, str(sorted(expected.items())), str(sorted(actual.items()))))
+		result[name] = (len(node_ids.get(name, this_ids)), len(mismatches))
+	return result
+
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script benchmarks the precomputed enclosing functions and blocks against the unbounded AST/CFG paths.')
+	p.add_argument('--input', "-I",
+					default=LIBRARIES_DIRECTORY,
+					help='library folder, or folder of library folders (default: %(default)s)',
+					type=str)
+	p.add_argument('--no-build', "-N",
+					default=False,
+					action='store_true',
+					help='do not construct the HPGs of the libraries that do not have one (default: %(default)s)')
+	p.add_argument('--conn', "-C",
+					default=None,
+					help='bolt connection string of a neo4j database with the HPG of the --input library, to compare the cypher variants (default: %(default)s)',
+					type=str)
+	p.add_argument('--sample', "-S",
+					default=1000,
+					help='maximum number of nodes per cypher query (default: %(default)s)',
+					type=int)
+
+	args = vars(p.parse_args())
+	input_folder = args["input"]
+	if any(item.endswith('.js') for item in os.listdir(input_folder)):
+		library_folders = [input_folder]
+	else:
+		library_folders = sorted(os.path.join(input_folder, item) for item in os.listdir(input_folder) if os.path.isdir(os.path.join(input_folder, item)))
+
+	results = []
+	missing = []
+	for library_folder in library_folders:
+		if not args["no_build"] and IOModule.get_graph_file(os.path.join(library_folder, constantsModule.NODE_INPUT_FILE_NAME)) is None:
+			LOGGER.info('constructing the hpg of %s'%library_folder)
+			_build_library_hpg(library_folder)
+		result = benchmark_library(library_folder)
+		if result is None:
+			missing.append(os.path.basename(library_folder.rstrip('/')))
+			continue
+		results.append(result)
+
+	LOGGER.info('%-20s %9s %9s | %8s %9s %9s | %8s %9s %9s | %8s %9s %9s | %s'%('library', 'nodes', 'index(s)', 'this', 'walk(s)', 'lookup(s)', 'blocks', 'walk(s)', 'lookup(s)', 'funcs', 'walk(s)', 'lookup(s)', 'mismatches'))
+	for r in results:
+		LOGGER.info('%-20s %9d %9.3f | %8d %9.3f %9.3f | %8d %9.3f %9.3f | %8d %9.3f %9.3f | %d'%(r["library"], r["nodes"], r["precompute"],
+			r["this_items"], r["this_walk"], r["this_lookup"], r["block_items"], r["block_walk"], r["block_lookup"],
+			r["return_items"], r["return_walk"], r["return_lookup"], r["mismatches"]))
+
+	failed = False
+	if missing:
+		LOGGER.error('no hpg for the libraries: %s'%', '.join(missing))
+		failed = True
+	if any(r["mismatches"] for r in results):
+		LOGGER.error('the precomputed enclosing functions and blocks differ from the unbounded paths')
+		failed = True
+
+	if args["conn"] is not None:
+		import hpg_neo4j.db_utility as DU
+		cypher_results = DU.exec_fn_within_transaction(check_cypher_variants, args["sample"], conn=args["conn"])
+		if not cypher_results:
+			failed = True
+		for name, (count, mismatches) in cypher_results.items():
+			LOGGER.info('[cypher] %-30s %8d nodes, %d mismatches'%(name, count, mismatches))
+		if any(mismatches for _, mismatches in cypher_results.values()):
+			LOGGER.error('the precomputed cypher variants differ from the unbounded ones')
+			failed = True
+
+	if failed:
+		sys.exit(1)
+
+
+
+if __name__ == "__main__":
+	main()
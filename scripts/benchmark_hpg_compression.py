@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	compares, for the HPG csv files of a webpage, the time and the extra disk space of
+		(1) decompressing the files to disk, reading them, and compressing them again (`pigz` if installed), and
+		(2) reading the compressed files as streams (`IOModule.open_graph_file()`),
+	for each available codec. The files are copied into a temporary folder, and the given folder is left as is.
+	With `--replicate N`, the rows of the files are repeated N times to emulate larger webpages.
+
+
+	Running:
+	------------
+	$ python3 -m scripts.benchmark_hpg_compression --input=data/test_program --replicate=20000
+
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import constants as constantsModule
+import utils.io as IOModule
+from utils.logging import logger as LOGGER
+
+
+HPG_FILE_NAMES = [constantsModule.NODE_INPUT_FILE_NAME, constantsModule.RELS_INPUT_FILE_NAME, constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME]
+
+
+
+def _prepare_input(input_folder, output_folder, replicate):
+	"""
+	writes the uncompressed csv files of `input_folder` into `output_folder`, with their rows repeated `replicate` times
+	@return {int} total size of the uncompressed files in bytes
+	"""
+
+	total_size = 0
+	for file_name in HPG_FILE_NAMES:
+		file_path = IOModule.get_graph_file(os.path.join(input_folder, file_name))
+		if file_path is None:
+			continue
+
+		with IOModule.open_graph_file(file_path, 'r', newline='') as fd:
+			lines = fd.readlines()
+		header, rows = ([], lines) if file_name == constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME else (lines[:1], lines[1:])
+
+		output_file = os.path.join(output_folder, file_name)
+		with open(output_file, 'w', encoding='utf-8', newline='') as fd:
+			fd.writelines(header)
+			for _ in range(replicate):
+				fd.writelines(rows)
+		total_size += os.path.getsize(output_file)
+	return total_size
+
+
+
+def _get_folder_size(folder):
+	return sum(os.path.getsize(os.path.join(folder, item)) for item in os.listdir(folder))
+
+
+
+def _read_lines(file_path):
+	count = 0
+	with IOModule.open_graph_file(file_path, 'r') as fd:
+		for _ in fd:
+			count += 1
+	return count
+
+
+
+def benchmark_decompress_to_disk(folder, codec):
+	"""
+	the previous workflow: decompress, read the plain files (as neo4j-admin or a loader does), compress again
+	@return {tuple} (seconds, peak extra bytes on disk)
+	"""
+
+	compressed_size = _get_folder_size(folder)
+	use_pigz = codec == 'gzip' and shutil.which('pigz') is not None
+
+	start = time.time()
+	if use_pigz:
+		IOModule.bash_command('pigz -d %s'%' '.join(os.path.join(folder, item) for item in os.listdir(folder)))
+	else:
+		IOModule.decompress_graph(folder)
+	peak_size = _get_folder_size(folder)
+
+	for file_name in HPG_FILE_NAMES:
+		file_path = os.path.join(folder, file_name)
+		if os.path.exists(file_path):
+			_read_lines(file_path)
+
+	if use_pigz:
+		IOModule.bash_command('pigz %s'%' '.join(os.path.join(folder, item) for item in os.listdir(folder)))
+	else:
+		IOModule.compress_graph(folder, codec=codec)
+	return time.time() - start, peak_size - compressed_size
+
+
+
+def benchmark_streaming(folder):
+	"""
+	the streaming workflow: read the compressed files as they are
+	@return {tuple} (seconds, peak extra bytes on disk)
+	"""
+
+	start = time.time()
+	for file_name in HPG_FILE_NAMES:
+		file_path = IOModule.get_graph_file(os.path.join(folder, file_name))
+		if file_path is not None:
+			_read_lines(file_path)
+	return time.time() - start, 0
+
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script benchmarks decompressing the HPG csv files to disk against streaming them.')
+	p.add_argument('--input', "-I",
+					default=os.path.join(constantsModule.DATA_DIR, 'test_program'),
+					help='webpage folder with the (possibly compressed) nodes.csv and rels.csv files (default: %(default)s)',
+					type=str)
+	p.add_argument('--replicate', "-R",
+					default=1000,
+					help='number of times the rows of the files are repeated (default: %(default)s)',
+					type=int)
+
+	args = vars(p.parse_args())
+
+	codecs = ['gzip']
+	if IOModule.zstandard is not None:
+		codecs.append('zstd')
+	else:
+		LOGGER.warning('zstandard is not installed, skipping the zstd codec.')
+
+	work_directory = tempfile.mkdtemp(prefix='hpg_benchmark_')
+	try:
+		plain_folder = os.path.join(work_directory, 'plain')
+		os.makedirs(plain_folder)
+		uncompressed_size = _prepare_input(args["input"], plain_folder, args["replicate"])
+		LOGGER.info('uncompressed hpg: %.1f MB'%(uncompressed_size / 1e6))
+
+		LOGGER.info('%-6s %-20s %10s %14s %16s'%('codec', 'workflow', 'time (s)', 'on disk (MB)', 'extra disk (MB)'))
+		for codec in codecs:
+			folder = os.path.join(work_directory, codec)
+			shutil.copytree(plain_folder, folder)
+			IOModule.compress_graph(folder, codec=codec)
+			compressed_size = _get_folder_size(folder)
+
+			seconds, extra = benchmark_decompress_to_disk(folder, codec)
+			LOGGER.info('%-6s %-20s %10.2f %14.1f %16.1f'%(codec, 'decompress-to-disk', seconds, compressed_size / 1e6, extra / 1e6))
+
+			seconds, extra = benchmark_streaming(folder)
+			LOGGER.info('%-6s %-20s %10.2f %14.1f %16.1f'%(codec, 'streaming', seconds, compressed_size / 1e6, extra / 1e6))
+	finally:
+		shutil.rmtree(work_directory, ignore_errors=True)
+
+
+
+if __name__ == "__main__":
+	main()
+
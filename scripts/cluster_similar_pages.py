@@ -35,19 +35,10 @@ import constants as constantsModule
 
 from utils.logging import logger as LOGGER
 import utils.utility as utilityModule
+import utils.page_dedup as PageDedupModule
 
 
 
-def cluster(input_dict):
-	clusters = {}
-	for key, val in input_dict.items():
-		if val not in clusters:
-			clusters[val] = [key]
-		else:
-			clusters[val].append(key)
-	return clusters
-
-
 def main():
 
 	INPUT_FILE_NAME_DEFAULT = 'sitelist_crawled.csv'
@@ -88,27 +79,8 @@ def main():
 			if os.path.exists(app_path_name) and os.path.isdir(app_path_name):
 				files = os.listdir(app_path_name)
 				if len(files) > 1:
-					website_clusters = {} #  webpage unique hash -> list of webpage folder names with that unique hash
-					webpage_hashes = {}   #  webpage folder name -> webpage unique hash based on scripts' content
-					for webpage_name in files:
-						webpage_path_name = os.path.join(app_path_name, webpage_name)
-						if os.path.exists(webpage_path_name) and os.path.isdir(webpage_path_name):
-							webpage_script_hashes = []
-							script_mapping_file = os.path.join(webpage_path_name, 'scripts_mapping.json')
-							if os.path.exists(script_mapping_file):
-								with open(script_mapping_file, 'r', encoding='utf-8') as fd:
-									script_mapping_json = json.load(fd)
-									for key in script_mapping_json:
-										script_item = script_mapping_json[key]
-										script_hash = script_item['hash']
-										webpage_script_hashes.append(script_hash)
-
-							if len(webpage_script_hashes) > 0:
-								webpage_script_hashes_as_string = '_'.join(webpage_script_hashes).strip().strip('\n').strip()
-								webpage_unique_hash = utilityModule.sha256(webpage_script_hashes_as_string)
-								webpage_hashes[webpage_name] = webpage_unique_hash
-
-					website_clusters = cluster(webpage_hashes)
+					#  webpage unique hash based on scripts' content -> list of webpage folder names with that unique hash
+					website_clusters = PageDedupModule.cluster_webpages(app_path_name, files)
 					# clusters[app_name]=website_clusters
 					
 					with open(os.path.join(app_path_name, outputs_file_name), 'w+') as fd:
@@ -30,6 +30,8 @@ import utils.io as IOModule
 import docker.neo4j.manage_container as dockerModule
 import hpg_neo4j.db_utility as neo4jDatabaseUtilityModule
 import hpg_neo4j.query_utility as neo4jQueryUtilityModule
+import hpg_neo4j.query_catalog as QC
+import hpg_neo4j.hpg_enclosing as HPGEnclosingModule
 import constants as constantsModule
 import functools
 from utils.logging import logger
@@ -88,11 +90,19 @@ def build_hpg_for_library(file_path, analyze=True, build=True, activate= False):
 
 
 
+		nodes_file = None
+		if str(constantsModule.HPG_ENCLOSING_PROPERTIES).lower() == 'true':
+			# lets `get_return_statements()` look up the return statements of the functions
+			enclosing_files = HPGEnclosingModule.add_webpage_enclosing_properties(os.path.dirname(file_path))
+			if enclosing_files is not None:
+				nodes_file = os.path.join(HPGEnclosingModule.ENCLOSING_FOLDER_NAME, os.path.basename(enclosing_files[0]))
+
 		remove_str = constantsModule.DATA_DIR + '/'
 		relative_import_path = utilityModule.remove_part_from_str(file_path, remove_str)
 		relative_import_path = utilityModule.get_directory_without_last_part(relative_import_path)
 
-		dockerModule.import_data_inside_container(container_name, database_name, relative_import_path, 'CSV')
+		dockerModule.import_data_inside_container(container_name, database_name, relative_import_path, 'CSV', nodes_file=nodes_file)
+		HPGEnclosingModule.remove_enclosing_properties(os.path.dirname(file_path))
 		logger.info('waiting for the tcp port 7474 of the neo4j container to be ready...')
 		connection_success = neo4jDatabaseUtilityModule.wait_for_neo4j_bolt_connection(timeout=150)
 		if not connection_success:
@@ -156,49 +166,18 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 	processed_functions = []
 
 
-	def __get_functions_with_function_expressions_query(function_name):
+	def __get_functions_with_function_expressions_query():
 
 		"""
-		queries to find functions with request sending statements
+		names of the catalog queries to find the functions enclosing an identifier `$name`, e.g., a request sending function
 		"""
 
 		# case 1)  var o = { function_name: function(){} }
-		# Look for all nodes of type 'Property' with 'value'
-		# relation to a node of 'FunctionExpression' type and 'key'
-		# relation to an identifier as funciton name
-		query1 = """
-		MATCH (request { Type: 'Identifier', Code: '%s'})<-[:AST_parentOf*]-(function_expression { Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'value'}]-(property {Type: 'Property'})-[:AST_parentOf {RelationType: 'key'}]->(function_name {Type: 'Identifier'})
-		OPTIONAL MATCH (function_expression)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
-		WHERE filter_node.Type <> 'CallExpression'
-		RETURN distinct(function_name) as function_name, function_expression, collect (distinct this_identifier) as this_list
-		"""%(function_name)
-
-		# case 2: function declarations
-		query2 = """
-		MATCH (request { Type: 'Identifier', Code: '%s'})<-[:AST_parentOf*]-(function_declaration { Type: 'FunctionDeclaration'})-[:AST_parentOf {RelationType: 'id'}]->(function_name {Type: 'Identifier'})
-		OPTIONAL MATCH (function_declaration)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
-		WHERE filter_node.Type <> 'CallExpression'
-		RETURN function_declaration, function_name, collect (distinct this_identifier) as this_list
-		"""%(function_name)
-
-		# case 3: var function_name = function(){}
-		query3 = """
-		MATCH (request { Type: 'Identifier', Code: '%s'})<-[:AST_parentOf*]-(function_expression { Type: 'FunctionExpression'})<-[:AST_parentOf {RelationType: 'init'}]-(var_declarator {Type: 'VariableDeclarator'})-[:AST_parentOf {RelationType: 'id'}]->(function_name {Type: 'Identifier'})
-		OPTIONAL MATCH (function_expression)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
-		WHERE filter_node.Type <> 'CallExpression'
-		RETURN distinct(function_name) as function_name, function_expression, collect (distinct this_identifier) as this_list
-		"""%(function_name)
-
-		#case 4:  obj.function_name = function(){}
-		query4 = """
-		MATCH (assignment {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'left'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(function_name {Type: 'Identifier'}),
-		(assignment)-[:AST_parentOf {RelationType: 'right'}]-(function_expression {Type: 'FunctionExpression'})-[:AST_parentOf*]->(request { Type: 'Identifier', Code: '%s'})
-		OPTIONAL MATCH (function_expression)-[:AST_parentOf*]->(filter_node)-[:AST_parentOf]->(this_member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'object'}]->(this_expr {Type: 'ThisExpression'}), (this_member_expr)-[:AST_parentOf {RelationType: 'property'}]->(this_identifier {Type: 'Identifier'})
-		WHERE filter_node.Type <> 'CallExpression'
-		RETURN distinct(function_name) as function_name, function_expression, collect (distinct this_identifier) as this_list
-		"""%(function_name)
-		queries = [query1, query2, query3, query4]
-		return queries
+		# case 2)  function declarations
+		# case 3)  var function_name = function(){}
+		# case 4)  obj.function_name = function(){}
+		# see the catalog queries for the patterns
+		return ['property_functions_enclosing_identifier', 'function_declarations_enclosing_identifier', 'variable_functions_enclosing_identifier', 'member_functions_enclosing_identifier']
 
 	def __does_function_sends_request(function_dictionary):
 		
@@ -212,11 +191,7 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 		function_id = function_dictionary['id']
 		function_type = function_dictionary['type']
 
-		query = """
-		MATCH (function {Id :'%s'})-[:AST_parentOf*]->(node {Type: 'Identifier', Code: 'send'})
-		RETURN node
-		"""%(function_id)
-		results = tx.run(query)
+		results = QC.run_query(tx, 'function_send_identifiers', id=str(function_id))
 		for record in results:
 			if record['node'] is not None and record['node'] != '':
 				return True
@@ -235,9 +210,9 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 		function_name = function_dictionary['name']
 		if function_name not in processed_functions:
 			processed_functions.append(function_name)
-			queries = __get_functions_with_function_expressions_query(function_name)
-			for query in queries:
-				results = tx.run(query)
+			query_names = __get_functions_with_function_expressions_query()
+			for query_name in query_names:
+				results = QC.run_query(tx, query_name, name=function_name)
 				for record in results:
 					record_keys = record.__dict__
 					record_keys = record_keys['_Record__keys']
@@ -357,13 +332,13 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 
 		if function_name not in processed_functions:
 			if function_name == 'INITIAL':
-				queries = __get_finding_url_location_usage_queries()
+				runs = [functools.partial(tx.run, query) for query in __get_finding_url_location_usage_queries()]
 			else:
 				processed_functions.append(function_name)
-				queries = __get_functions_with_function_expressions_query(function_name)
+				runs = [functools.partial(QC.run_query, tx, query_name, name=function_name) for query_name in __get_functions_with_function_expressions_query()]
 
-			for query in queries:
-				results = tx.run(query)
+			for run in runs:
+				results = run()
 				for record in results:
 					## was checking the jquery library ... here
 					record_keys = record.__dict__
@@ -450,12 +425,7 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 		"""
 
 		# look for .open(a, url, ...)
-		query = """
-		MATCH (top_function { Id: '%s'})-[:AST_parentOf*]->(call_expr {Type: 'CallExpression'})-[:AST_parentOf {RelationType: 'callee'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(open_identifier {Code: 'open'}),
-		(call_expr)-[:AST_parentOf {RelationType: 'arguments', Arguments: '{\"arg\":1}'}]->(param {Type: 'Identifier'})
-		RETURN param
-		"""%(function_dictionary['id'])
-		results = tx.run(query)
+		results = QC.run_query(tx, 'function_open_call_url_parameters', id=str(function_dictionary['id']))
 		for item in results:
 			parameter = item['param']
 			return parameter['Code']
@@ -497,13 +467,7 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 		@description finds the id of all `FunctionDeclaration` and 'FunctionExpression' nodes
 		"""
 
-		query="""
-		MATCH (n {Id: '%s'})-[:AST_parentOf{RelationType: 'params'}]-(i {Type: 'Identifier'})
-		WHERE n.Type='FunctionDeclaration'
-		OR n.Type='FunctionExpression'
-		RETURN n, collect(distinct i) as params
-		"""%(str(node_id))
-		results = tx.run(query)
+		results = QC.run_query(tx, 'function_definition_params', id=str(node_id))
 		for node_item in results:
 			node = node_item['n']
 			params = node_item['params']
@@ -545,15 +509,8 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 		# RETURN function, function_name, alias_name
 		# """%(this_node['Code'])
 
-		query = """
-		MATCH (assignment_expr {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'left'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(this_identifier { Code: '%s'}),
-		p=shortestPath((function {Type: 'FunctionDeclaration'})-[:AST_parentOf*]->(assignment_expr)), 
-		(function)-[:AST_parentOf {RelationType: 'id'}]->(function_name {Type: 'Identifier'})
-		RETURN function, function_name
-		"""%(this_node['Code'])
-
 		out = {}
-		results = tx.run(query)
+		results = QC.run_query(tx, 'this_property_assignment_functions', name=this_node['Code'])
 		for record in results:
 			out[record['function_name']['Code']] = record['function']
 		return out
@@ -567,14 +524,7 @@ def query_library_database_for_signatures(tx, library_name, save_directory):
 
 			function_declaration = function_definitions[function_name]
 			# object expressions
-			query = """
-			MATCH (alias_top_expr {Type: 'ExpressionStatement'})-[:AST_parentOf]->(assignment {Type: 'AssignmentExpression'})-[:AST_parentOf {RelationType: 'left'}]->(member_expr {Type: 'MemberExpression'})-[:AST_parentOf {RelationType: 'property'}]->(target_property_name {Type: 'Identifier'}),
-			(assignment)-[:AST_parentOf {RelationType: 'right'}]-> (function_name { Type: 'Identifier', Code: '%s'}),
-			(alias_top_expr)<-[:AST_parentOf]-(same_parent_block)-[:AST_parentOf]->(n { Id: '%s'})
-			RETURN distinct(target_property_name.Code) as name
-			"""%(function_name, function_declaration['Id'])
-
-			results = tx.run(query)
+			results = QC.run_query(tx, 'function_name_aliases', name=function_name, id=function_declaration['Id'])
 			for record in results:
 				out[record['name']] = function_declaration # set the definition of alias to the real function
 
@@ -780,13 +730,8 @@ def get_return_statements(tx, function_node_id):
 	@description checks if a function node has any enclosed `ReturnStatement` in its body, and outputs ALL those statement
 	"""
 
-	query="""
-	MATCH (n {Id: '%s'})-[:AST_parentOf*]->(ret {Type: 'ReturnStatement'})-[:AST_parentOf]-(m)
-	RETURN ret
-	"""%str(function_node_id) # Note: parameter m filters out returns without arguments like return;
-
 	out = []
-	results = tx.run(query)
+	results = QC.run_query(tx, 'function_return_statements', id=str(function_node_id))
 	for node_item in results:
 		node = node_item['ret']
 		out.append(node)
@@ -798,14 +743,8 @@ def get_control_predicates(tx, function_node_id):
 
 	# Check `test` relation of IfStatement, ForStatement, SwitchStatement, WhileStatement, etc,
 	# for SwitchStatement, optional match discriminant
-	query="""
-	MATCH (n {Id: '%s'})-[:AST_parentOf*]->(control)-[:AST_parentOf {RelationType: 'test'}]->(test)
-	OPTIONAL MATCH (control)-[:AST_parentOf {RelationType: 'discriminant'}]->(test2)
-	RETURN test, test2
-	"""%str(function_node_id)
-
 	out = []
-	results = tx.run(query)
+	results = QC.run_query(tx, 'function_control_predicates', id=str(function_node_id))
 	for node_item in results:
 		test_node_1 = node_item['test']
 		test_node_2 = node_item['test2']
@@ -831,10 +770,7 @@ def get_value_of(tx, varname, context_node, calls=[]):
 	if DEBUG:
 		print("[+] get_value_of(%s, %s)"%(varname, node_id))
 
-	query = """
-	MATCH (n_s { Id: '%s' })<-[:PDG_parentOf { Arguments: '%s' }]-(n_t) RETURN collect(distinct n_t) AS resultset
-	"""%(node_id, varname)
-	results = tx.run(query)
+	results = QC.run_query(tx, 'pdg_parents', id=node_id, varname=varname)
 	for item in results: 
 		current_nodes = item['resultset'] 
 		for iterator_node in current_nodes:
@@ -867,22 +803,12 @@ def get_function_name(tx, function_node):
 	loc = function_node['Location']
 	function_node_id = function_node['Id']
 	if t == 'FunctionDeclaration':
-		query="""
-		MATCH (n {Id: '%s'})-[:AST_parentOf {RelationType: 'id'}]->(name)
-		WHERE name.Type = 'Identifier'
-		OR name.Type = 'MemberExpression'
-		RETURN name
-		"""%(function_node_id)
+		query_name = 'function_declaration_name'
 	else:
 		# handle all cases in one go: object expr, assignment expr, var declarator
-		query="""
-		MATCH (n {Id: '%s'})<-[:AST_parentOf]-(parent)-[:AST_parentOf]->(name)
-		WHERE name.Type = 'Identifier'
-		OR name.Type = 'MemberExpression'
-		RETURN name
-		"""%(function_node_id)
+		query_name = 'function_expression_name'
 
-	results = tx.run(query)
+	results = QC.run_query(tx, query_name, id=function_node_id)
 	for item in results:
 		node = item['name']
 		if node['Type'] == 'Identifier':
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+"""
+	the python tests import the modules of the repository by their top-level names (e.g., `constants`),
+	like the scripts that are run from the root of the repository
+"""
+
+import os
+import sys
+
+ROOT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if ROOT_DIRECTORY not in sys.path:
+	sys.path.insert(0, ROOT_DIRECTORY)
+
+TEST_PROGRAM_DIRECTORY = os.path.join(ROOT_DIRECTORY, 'data', 'test_program')
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+	backward slices of `data/test_program` with the iterative slicer of `analyses/general/data_flow.py`, on the
+	in-memory HPG; the queries outside `IN_MEMORY_QUERIES` (e.g., call graph lookups) find nothing in this program
+"""
+
+import os
+
+import pytest
+
+from conftest import TEST_PROGRAM_DIRECTORY
+import constants as constantsModule
+import hpg_neo4j.in_memory_graph as InMemoryGraphModule
+import hpg_neo4j.query_catalog as QC
+import analyses.general.data_flow as DF
+
+
+# `window.open(newPageUrl)`
+SINK_STATEMENT_ID = '20'
+
+EXPECTED_SLICE = [
+	['var newPageUrl = domain + path', [], {'path': '19', 'domain': '18', 'newPageUrl': '16'}, '{start:{line:26,column:0},end:{line:26,column:31}}'],
+	['var path = window.location.hash', [], {'hash': '9', 'location': '8', 'window': '7', 'path': '4'}, '{start:{line:24,column:0},end:{line:24,column:32}}'],
+	['var domain = "https://example.com/"', ['"https://example.com/"'], {'domain': '12'}, '{start:{line:25,column:0},end:{line:25,column:35}}'],
+]
+
+
+def sorted_slice(slice_values):
+	"""
+	the sub-slices of a statement follow the (hash) order of its identifiers, which changes between runs
+	"""
+	return slice_values[:1] + sorted(slice_values[1:], key=lambda line: line[3])
+
+
+class EmptyTransaction(object):
+
+	def __init__(self):
+		self.queries = []
+
+	def run(self, query, parameters=None, **kwparameters):
+		self.queries.append(query)
+		return []
+
+
+@pytest.fixture(scope='module')
+def graph():
+	return InMemoryGraphModule.InMemoryHPG.from_csv(os.path.join(TEST_PROGRAM_DIRECTORY, 'nodes.csv'), os.path.join(TEST_PROGRAM_DIRECTORY, 'rels.csv'))
+
+
+@pytest.fixture
+def fallback_tx():
+	return EmptyTransaction()
+
+
+@pytest.fixture
+def tx(graph, fallback_tx):
+	return graph.begin_transaction(fallback_tx=fallback_tx)
+
+
+@pytest.fixture
+def sink_node(tx):
+	return list(QC.run_query(tx, 'node_by_id', id=SINK_STATEMENT_ID))[0]['n']
+
+
+def test_slice_of_the_sink(tx, sink_node):
+	slicing_cache = DF.SlicingCache()
+	assert sorted_slice(DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache)) == EXPECTED_SLICE
+	assert slicing_cache.misses == 4 and slicing_cache.hits == 0
+	assert slicing_cache.truncated_slices == 0
+	assert slicing_cache.param_stack == []
+
+
+def test_slices_are_answered_from_the_cache(tx, fallback_tx, sink_node):
+	slicing_cache = DF.SlicingCache()
+	DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache)
+	query_count = len(fallback_tx.queries)
+
+	assert sorted_slice(DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache)) == EXPECTED_SLICE
+	assert slicing_cache.hits == 1
+	assert len(fallback_tx.queries) == query_count
+
+
+def test_slice_cache_evicts_the_least_recently_used_entry():
+	slicing_cache = DF.SlicingCache(maxsize=2)
+	slicing_cache.put('a', [1])
+	slicing_cache.put('b', [2])
+	assert slicing_cache.get('a') == [1]
+	slicing_cache.put('c', [3])
+	assert slicing_cache.get('b') is None
+	assert slicing_cache.get('a') == [1] and slicing_cache.get('c') == [3]
+	assert slicing_cache.evictions == 1 and len(slicing_cache) == 2
+
+
+def test_bounded_pdg_caches_give_the_same_slice(tx, sink_node):
+	slicing_cache = DF.SlicingCache(maxsize=1, max_pdg_parents=1, max_statement_trees=1)
+	assert sorted_slice(DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache)) == EXPECTED_SLICE
+	assert len(slicing_cache.pdg_parents) == 1 and len(slicing_cache.statement_trees) == 1
+	assert slicing_cache.pdg_parents.evictions > 0 and slicing_cache.statement_trees.evictions > 0
+
+
+def test_backward_closure_gives_the_same_slice(tx, sink_node):
+	slicing_cache = DF.SlicingCache()
+	assert DF.compute_backward_closure(tx, [(sink_node, 'newPageUrl')], slicing_cache) == 4
+	assert sorted_slice(DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache)) == EXPECTED_SLICE
+
+
+def test_backward_closure_with_bounded_caches(tx, sink_node):
+	slicing_cache = DF.SlicingCache(max_pdg_parents=1, max_statement_trees=1)
+	assert DF.compute_backward_closure(tx, [(sink_node, 'newPageUrl')], slicing_cache) == 4
+	assert sorted_slice(DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache)) == EXPECTED_SLICE
+
+
+def test_depth_budget_truncates_the_slice(tx, sink_node, monkeypatch):
+	monkeypatch.setattr(constantsModule, 'MAX_RECURSE', 1)
+	slicing_cache = DF.SlicingCache()
+	assert DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache) == EXPECTED_SLICE[:1]
+	assert slicing_cache.truncated_slices == 2
+	# truncated slices depend on the budgets, and are not cached
+	assert len(slicing_cache) == 0
+
+
+def test_node_budget_truncates_the_slice(tx, sink_node, monkeypatch):
+	monkeypatch.setattr(constantsModule, 'MAX_SLICE_NODES', 2)
+	slicing_cache = DF.SlicingCache()
+	slice_values = DF._get_varname_value_from_context(tx, 'newPageUrl', sink_node, slicing_cache=slicing_cache)
+	assert len(slice_values) == 2
+	assert slice_values[0] == EXPECTED_SLICE[0] and slice_values[1] in EXPECTED_SLICE[1:]
+	assert slicing_cache.truncated_slices >= 1
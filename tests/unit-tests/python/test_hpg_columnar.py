@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+	parquet round-trip of the HPG of `data/test_program` with `hpg_neo4j/hpg_columnar.py`; needs `pyarrow`
+"""
+
+import os
+import json
+import shutil
+
+import pytest
+
+from conftest import TEST_PROGRAM_DIRECTORY, FIXTURES_DIRECTORY
+import hpg_neo4j.hpg_columnar as HPGColumnarModule
+import hpg_neo4j.in_memory_graph as InMemoryGraphModule
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def webpage_folder(tmp_path):
+	webpage_folder = str(tmp_path)
+	for file_name in ['nodes.csv', 'rels.csv']:
+		shutil.copyfile(os.path.join(TEST_PROGRAM_DIRECTORY, file_name), os.path.join(webpage_folder, file_name))
+	return webpage_folder
+
+
+def test_parquet_hpg_answers_like_the_csv_hpg(webpage_folder):
+	assert not HPGColumnarModule.has_parquet_hpg(webpage_folder)
+	assert HPGColumnarModule.convert_webpage_hpg(webpage_folder)
+	assert HPGColumnarModule.has_parquet_hpg(webpage_folder)
+	# not converted again
+	assert not HPGColumnarModule.convert_webpage_hpg(webpage_folder)
+
+	nodes, rels = HPGColumnarModule.read_hpg_tables(webpage_folder)
+	assert nodes.num_rows == 26 and rels.num_rows == 32
+
+	with open(os.path.join(FIXTURES_DIRECTORY, 'test_program_cypher.json'), 'r', encoding='utf-8') as fd:
+		recorded = json.load(fd)
+	graph = InMemoryGraphModule.InMemoryHPG.from_parquet(webpage_folder)
+	for name, (count, mismatches) in InMemoryGraphModule.compare_catalog_queries(graph, recorded).items():
+		assert count > 0, name
+		assert mismatches == 0, name
+
+
+def test_parquet_hpg_of_other_csv_content_is_stale(webpage_folder):
+	HPGColumnarModule.convert_webpage_hpg(webpage_folder)
+	with open(os.path.join(webpage_folder, 'nodes.csv'), 'a') as fd:
+		fd.write('27¿Identifier¿¿x¿¿¿¿¿¿ASTNode¿\n')
+	assert not HPGColumnarModule.has_parquet_hpg(webpage_folder)
+	assert HPGColumnarModule.convert_webpage_hpg(webpage_folder)
+	assert HPGColumnarModule.has_parquet_hpg(webpage_folder)
+
+
+def test_parse_location():
+	assert HPGColumnarModule.parse_location('{start:{line:24,column:0},end:{line:27,column:24}}') == (24, 0, 27, 24)
+	assert HPGColumnarModule.parse_location('') is None
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+	compares the `IN_MEMORY_QUERIES` of the in-memory HPG of `data/test_program` with the cypher results
+	recorded in `fixtures/test_program_cypher.json`; re-record them against neo4j with:
+
+	$ python3 -m hpg_neo4j.in_memory_graph --input=data/test_program --record=tests/unit-tests/python/fixtures/test_program_cypher.json
+"""
+
+import os
+import copy
+import json
+
+import pytest
+
+from conftest import TEST_PROGRAM_DIRECTORY, FIXTURES_DIRECTORY
+import hpg_neo4j.in_memory_graph as InMemoryGraphModule
+import hpg_neo4j.query_catalog as QC
+
+
+@pytest.fixture(scope='module')
+def graph():
+	return InMemoryGraphModule.InMemoryHPG.from_csv(os.path.join(TEST_PROGRAM_DIRECTORY, 'nodes.csv'), os.path.join(TEST_PROGRAM_DIRECTORY, 'rels.csv'))
+
+
+@pytest.fixture(scope='module')
+def recorded():
+	with open(os.path.join(FIXTURES_DIRECTORY, 'test_program_cypher.json'), 'r', encoding='utf-8') as fd:
+		return json.load(fd)
+
+
+def test_recorded_queries_cover_the_declared_subset(recorded):
+	assert sorted(recorded) == sorted(InMemoryGraphModule.IN_MEMORY_QUERIES)
+	assert set(InMemoryGraphModule.IN_MEMORY_QUERIES) <= set(QC.get_query_names())
+
+
+def test_in_memory_queries_match_the_recorded_cypher_results(graph, recorded):
+	result = InMemoryGraphModule.compare_catalog_queries(graph, recorded)
+	assert sorted(result) == sorted(InMemoryGraphModule.IN_MEMORY_QUERIES)
+	for name, (count, mismatches) in result.items():
+		assert count > 0, name
+		assert mismatches == 0, name
+
+
+def test_a_different_child_order_is_a_mismatch(graph, recorded):
+	recorded = copy.deepcopy(recorded)
+	item = next(item for item in recorded['ast_children'] if len(item["records"][0]["resultset"]) > 1)
+	item["records"][0]["resultset"].reverse()
+	count, mismatches = InMemoryGraphModule.compare_catalog_queries(graph, recorded)['ast_children']
+	assert mismatches == 1
+
+
+class FallbackTransaction(object):
+
+	def __init__(self):
+		self.queries = []
+
+	def run(self, query, parameters=None, **kwparameters):
+		self.queries.append(query)
+		return []
+
+
+def test_queries_outside_the_subset_fall_back_to_neo4j(graph):
+	fallback_tx = FallbackTransaction()
+	tx = graph.begin_transaction(fallback_tx=fallback_tx)
+
+	records = QC.run_query(tx, 'node_by_id', id='1')
+	assert [record['n']['Type'] for record in records] == ['Program']
+	assert fallback_tx.queries == []
+
+	QC.run_query(tx, 'identifier_declarations', varname='domain')
+	assert QC.get_query('identifier_declarations', partitioned=False) in fallback_tx.queries
+	tx.run('MATCH (n) RETURN n')
+	assert fallback_tx.queries[-1] == 'MATCH (n) RETURN n'
+
+
+def test_queries_outside_the_subset_without_neo4j(graph):
+	with pytest.raises(NotImplementedError):
+		QC.run_query(graph.begin_transaction(), 'identifier_declarations', varname='domain')
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+	job states, retries and reports of the sqlite job ledger of `utils/job_ledger.py`
+"""
+
+import os
+import time
+import threading
+
+import pytest
+
+import utils.job_ledger as JobLedgerModule
+
+
+SITE = 'https://example.com'
+
+
+@pytest.fixture
+def ledger(tmp_path):
+	ledger = JobLedgerModule.JobLedger(os.path.join(str(tmp_path), 'ledger', 'jobs.sqlite'), max_attempts=2, backoff=0)
+	yield ledger
+	ledger.close()
+
+
+def test_new_jobs_run_and_done_jobs_are_skipped(ledger):
+	assert ledger.get_job(SITE, 'page', 'rh_traversals') is None
+	assert ledger.should_run(SITE, 'page', 'rh_traversals')
+
+	ledger.start(SITE, 'page', 'rh_traversals')
+	assert ledger.get_job(SITE, 'page', 'rh_traversals')['status'] == JobLedgerModule.STATUS_RUNNING
+	ledger.finish(SITE, 'page', 'rh_traversals')
+
+	job = ledger.get_job(SITE, 'page', 'rh_traversals')
+	assert job['status'] == JobLedgerModule.STATUS_DONE and job['attempts'] == 1 and job['exit_code'] == 0
+	assert ledger.is_done(SITE, 'page', 'rh_traversals')
+	assert not ledger.should_run(SITE, 'page', 'rh_traversals')
+	# the stages of a page are separate jobs
+	assert ledger.should_run(SITE, 'page', 'or_traversals')
+
+
+def test_failed_jobs_are_retried_up_to_max_attempts(ledger):
+	ledger.start(SITE, 'page', 'rh_traversals')
+	ledger.fail(SITE, 'page', 'rh_traversals', exit_code=1, timed_out=True, error='timeout')
+	job = ledger.get_job(SITE, 'page', 'rh_traversals')
+	assert job['status'] == JobLedgerModule.STATUS_FAILED and job['timed_out'] and job['error'] == 'timeout'
+	assert ledger.should_run(SITE, 'page', 'rh_traversals')
+
+	ledger.start(SITE, 'page', 'rh_traversals')
+	ledger.fail(SITE, 'page', 'rh_traversals', exit_code=1)
+	assert ledger.get_job(SITE, 'page', 'rh_traversals')['attempts'] == 2
+	assert not ledger.should_run(SITE, 'page', 'rh_traversals')
+
+
+def test_failed_jobs_wait_for_their_backoff(tmp_path):
+	ledger = JobLedgerModule.JobLedger(os.path.join(str(tmp_path), 'jobs.sqlite'), max_attempts=3, backoff=3600)
+	ledger.fail(SITE, 'page', 'crawling', exit_code=2)
+	assert ledger.get_job(SITE, 'page', 'crawling')['attempts'] == 1
+	assert not ledger.should_run(SITE, 'page', 'crawling')
+	ledger.close()
+
+
+def test_a_job_left_running_counts_as_an_attempt(ledger):
+	ledger.start(SITE, 'page', 'rh_traversals')
+	assert ledger.should_run(SITE, 'page', 'rh_traversals')
+	ledger.start(SITE, 'page', 'rh_traversals')
+	assert not ledger.should_run(SITE, 'page', 'rh_traversals')
+
+
+def test_failed_webpage_jobs_since_a_site_stage_started(ledger):
+	ledger.start(SITE, 'old', 'rh_traversals')
+	ledger.fail(SITE, 'old', 'rh_traversals', exit_code=1)
+	time.sleep(0.01)
+	since = time.time()
+
+	ledger.start(SITE, '', 'static')
+	ledger.start(SITE, 'a', 'rh_traversals')
+	ledger.finish(SITE, 'a', 'rh_traversals')
+	ledger.start(SITE, 'b', 'rh_traversals')
+	ledger.fail(SITE, 'b', 'rh_traversals', exit_code=3, timed_out=True)
+	ledger.fail(SITE, '', 'static', exit_code=1)
+
+	assert ledger.get_failed_jobs(SITE, since=since) == [('b', 'rh_traversals', 3, True)]
+	assert [job[0] for job in ledger.get_failed_jobs(SITE)] == ['old', 'b']
+	assert ledger.get_failed_jobs('https://other.com') == []
+
+
+def test_report_per_stage(ledger):
+	ledger.start(SITE, 'a', 'rh_traversals')
+	ledger.finish(SITE, 'a', 'rh_traversals')
+	ledger.start(SITE, 'b', 'rh_traversals')
+	ledger.fail(SITE, 'b', 'rh_traversals', timed_out=True)
+	ledger.start(SITE, '', 'crawling')
+
+	report = {row[0]: row for row in ledger.report()}
+	assert sorted(report) == ['crawling', 'rh_traversals']
+	assert report['rh_traversals'][1:5] == (1, 1, 0, 1)
+	assert report['crawling'][1:5] == (0, 0, 1, 0)
+
+
+def test_threads_share_the_ledger(ledger):
+
+	def run_jobs(thread_index):
+		for page_index in range(20):
+			page = 'page_%d_%d'%(thread_index, page_index)
+			ledger.start(SITE, page, 'rh_traversals')
+			ledger.finish(SITE, page, 'rh_traversals')
+
+	threads = [threading.Thread(target=run_jobs, args=(i,)) for i in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert {row[0]: row[1] for row in ledger.report()} == {'rh_traversals': 80}
+	ledger.close()
+	assert len(ledger._connections) == 0
+	# reopened on the next use
+	assert ledger.is_done(SITE, 'page_0_0', 'rh_traversals')
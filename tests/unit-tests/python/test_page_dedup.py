@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+	clusters of near-duplicate webpages, and the results linked to the duplicates, of `utils/page_dedup.py`
+"""
+
+import os
+import json
+
+import pytest
+
+import utils.page_dedup as PageDedupModule
+
+
+def write_webpage(website_folder, webpage, script_hashes, url):
+	webpage_folder = os.path.join(website_folder, webpage)
+	os.makedirs(webpage_folder, exist_ok=True)
+	with open(os.path.join(webpage_folder, 'scripts_mapping.json'), 'w') as fd:
+		json.dump({'%d.js'%i: {'hash': script_hash} for i, script_hash in enumerate(script_hashes)}, fd)
+	with open(os.path.join(webpage_folder, 'url.out'), 'w') as fd:
+		fd.write(url)
+	return webpage_folder
+
+
+@pytest.fixture
+def website_folder(tmp_path):
+	website_folder = str(tmp_path)
+	write_webpage(website_folder, 'a', ['h1', 'h2'], 'https://example.com/a')
+	write_webpage(website_folder, 'b', ['h1', 'h2'], 'https://example.com/b')
+	write_webpage(website_folder, 'c', ['h3'], 'https://example.com/c')
+	write_webpage(website_folder, 'd', ['h1', 'h2'], 'https://example.com/d')
+	# no scripts: never a duplicate
+	write_webpage(website_folder, 'e', [], 'https://example.com/e')
+	return website_folder
+
+
+def test_webpages_with_the_same_scripts_are_duplicates(website_folder):
+	representatives, duplicates = PageDedupModule.get_representative_webpages(website_folder, ['a', 'b', 'c', 'd', 'e'])
+	assert representatives == ['a', 'c', 'e']
+	assert duplicates == {'b': 'a', 'd': 'a'}
+
+
+def test_representatives_are_stable_across_passes(website_folder):
+	PageDedupModule.get_representative_webpages(website_folder, ['a', 'b', 'c', 'd'])
+	# a later pass over a subset keeps the clusters, and picks the first webpage of the subset
+	representatives, duplicates = PageDedupModule.get_representative_webpages(website_folder, ['b', 'd'])
+	assert representatives == ['b']
+	assert duplicates == {'d': 'b'}
+
+
+def test_recrawled_webpages_are_clustered_again(website_folder):
+	assert PageDedupModule.get_representative_webpages(website_folder, ['a', 'b'])[1] == {'b': 'a'}
+
+	webpage_folder = write_webpage(website_folder, 'b', ['h4'], 'https://example.com/b')
+	script_mapping_file = os.path.join(webpage_folder, 'scripts_mapping.json')
+	mtime = os.path.getmtime(script_mapping_file) + 10
+	os.utime(script_mapping_file, (mtime, mtime))
+
+	assert PageDedupModule.get_representative_webpages(website_folder, ['a', 'b']) == (['a', 'b'], {})
+
+
+def test_new_webpages_are_clustered_again(website_folder):
+	PageDedupModule.get_representative_webpages(website_folder, ['a', 'c'])
+	assert PageDedupModule.get_representative_webpages(website_folder, ['a', 'b', 'c'])[1] == {'b': 'a'}
+
+
+def test_clusters_in_the_old_format_are_stale(website_folder):
+	with open(os.path.join(website_folder, PageDedupModule.WEBPAGE_CLUSTERS_FILE_NAME), 'w') as fd:
+		json.dump({'fingerprint': ['a', 'b', 'c']}, fd)
+	assert PageDedupModule.get_representative_webpages(website_folder, ['a', 'b', 'c'])[1] == {'b': 'a'}
+
+
+def test_linked_results_name_the_duplicate(website_folder):
+	with open(os.path.join(website_folder, 'a', 'sinks.flows.out'), 'w') as fd:
+		fd.write('[*] webpage URL: https://example.com/a\n\n[*] webpage: a\n[*] slice: fetch("https://example.com/a")\n')
+	with open(os.path.join(website_folder, 'a', 'sinks.flows.out.json'), 'w') as fd:
+		json.dump({'url': 'https://example.com/a', 'flows': [{'webpage': 'a', 'code': 'https://example.com/a'}]}, fd)
+
+	PageDedupModule.link_duplicate_results(website_folder, {'b': 'a'}, ['sinks.flows.out', 'sinks.flows.out.json', 'missing.out'])
+
+	with open(os.path.join(website_folder, 'b', 'sinks.flows.out'), 'r') as fd:
+		assert fd.read() == '[*] webpage URL: https://example.com/b\n\n[*] webpage: b\n[*] slice: fetch("https://example.com/a")\n'
+	with open(os.path.join(website_folder, 'b', 'sinks.flows.out.json'), 'r') as fd:
+		assert json.load(fd) == {'url': 'https://example.com/b', 'flows': [{'webpage': 'b', 'code': 'https://example.com/a'}]}
+	with open(os.path.join(website_folder, 'b', PageDedupModule.DUPLICATE_OF_FILE_NAME), 'r') as fd:
+		assert json.load(fd) == {'representative': 'a'}
+	assert not os.path.exists(os.path.join(website_folder, 'b', 'missing.out'))
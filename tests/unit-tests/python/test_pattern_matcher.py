@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+	checks the Aho-Corasick matcher of `utils/pattern_matcher.py` against a plain substring search
+"""
+
+import random
+
+from conftest import TEST_PROGRAM_DIRECTORY
+from utils.pattern_matcher import MultiPatternMatcher
+import analyses.request_hijacking.semantic_types as RHSemanticTypesModule
+
+
+def naive_match(pattern_table, text):
+	return [label for label, patterns in pattern_table if any(pattern in text for pattern in patterns)]
+
+
+def test_overlapping_patterns():
+	pattern_table = [('HE', ['he']), ('SHE', ['she']), ('HERS', ['hers']), ('HIS', ['his']), ('NONE', ['xyz'])]
+	matcher = MultiPatternMatcher(pattern_table)
+	assert matcher.match('ushers') == ['HE', 'SHE', 'HERS']
+	assert matcher.match('ahishers') == ['HE', 'SHE', 'HERS', 'HIS']
+	assert matcher.match('') == []
+
+
+def test_source_patterns_on_the_test_program():
+	pattern_table = RHSemanticTypesModule.SOURCE_PATTERNS
+	matcher = MultiPatternMatcher(pattern_table)
+	with open('%s/test.js'%TEST_PROGRAM_DIRECTORY, 'r') as fd:
+		lines = fd.readlines()
+	for line in lines:
+		assert matcher.match(line) == naive_match(pattern_table, line)
+	assert 'RD_WIN_LOC' in matcher.match('var path = window.location.hash;')
+
+
+def test_random_patterns_match_a_substring_search():
+	rng = random.Random(7)
+	alphabet = 'ab.('
+	pattern_table = [('L%d'%i, [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 3))]) for i in range(12)]
+	matcher = MultiPatternMatcher(pattern_table, cache_size=8)
+	for _ in range(500):
+		text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+		assert matcher.match(text) == naive_match(pattern_table, text)
+		# memoized answers, also after the cache was cleared
+		assert matcher.match(text) == naive_match(pattern_table, text)
+	assert len(matcher._cache) <= 8
+
+
+def test_masks_combine():
+	matcher = MultiPatternMatcher([('A', ['a']), ('B', ['b']), ('C', ['c'])])
+	mask = matcher.match_mask('xa') | matcher.match_mask('cx')
+	assert matcher.labels_of_mask(mask) == ['A', 'C']
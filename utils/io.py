@@ -21,16 +21,41 @@
 
 import io
 import subprocess
-import signal
 import yaml
 import zipfile
+import gzip
 import os
 import re
 import shutil
+import shlex
+import tempfile
+import threading
+import contextlib
 import constants as constantsModule
-from threading import Timer
+import utils.process_runner as ProcessRunnerModule
 from utils.logging import logger
 
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+
+# codec -->> file name suffix of the compressed HPG csv files
+HPG_CODEC_SUFFIXES = {
+	'gzip': '.gz',
+	'zstd': '.zst',
+}
+
+# codec -->> compression level; the HPGs are written once and read a few times, so favour speed (as pigz does)
+HPG_CODEC_LEVELS = {
+	'gzip': 6,
+	'zstd': 3,
+}
+
+# size of the blocks streamed through the codecs
+STREAM_CHUNK_SIZE = 1024 * 1024
+
 
 
 
@@ -45,74 +70,25 @@ def load_config_yaml(yaml_file):
 	return config
 
 
-def run_os_command(cmd, print_stdout=True, timeout=30*60, cwd='default', log_command=False, prettify=False):
+def run_os_command(cmd, print_stdout=True, timeout=30*60, cwd='default', log_command=False, prettify=False, memory_limit=None, cpu_limit=None, return_result=False):
 	
 	"""
-	@description run a bash command
+	@description run a bash command; stdout and stderr are drained concurrently, see `utils.process_runner`
+	@param {int} timeout: wall-clock seconds before the whole process group is terminated
+	@param {int} memory_limit: max total resident memory (MB) of the process group, or None
+	@param {int} cpu_limit: max CPU seconds of each process, or None
+	@param {bool} return_result: whether to return the `ProcessResult` (exit status and resource usage)
+	@return {int|ProcessResult} -1 if the command timed out or exceeded its memory or CPU limit, its exit code otherwise
 	"""
 
-	def kill(process): 
-		logger.warning('Killing Process.')
-		logger.warning('TimeoutExpired (%s seconds) for cmd: %s'%(str(timeout), cmd))
-		# kill the whole process group (i.e., including all subprocesses, not just the process)
-		# process.kill()
-		os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-		
-
-	
-	if log_command:
-		logger.debug('Running command: %s'%cmd)
-		
-	if cwd == 'default':
-		p = subprocess.Popen(cmd, start_new_session=True, shell=True, stdout = subprocess.PIPE, stderr= subprocess.PIPE)
-	else:
-		p = subprocess.Popen(cmd, start_new_session=True, shell=True, stdout = subprocess.PIPE, stderr= subprocess.PIPE, cwd=cwd)
-	my_timer = Timer(timeout, kill, [p])
-
-	ret = -1
-	try:
-		my_timer.start()
-
-		try:
-			if print_stdout:
-				if not prettify:
-					if p.stdout:
-						for line in io.TextIOWrapper(p.stdout, encoding="utf-8"):
-							if len(line.strip()) > 0:
-								logger.info(line.strip())		
-
-					if p.stderr:
-						for line in io.TextIOWrapper(p.stderr, encoding="utf-8"):
-							if len(line.strip()) > 0:
-								logger.info(line.strip())	
-				else:
-					if p.stdout:
-						lst = []
-						for line in io.TextIOWrapper(p.stdout, encoding="utf-8"):
-							if len(line.strip()) > 0:
-								lst.append(line.strip())
-						logger.info(re.sub(' +', ' ', '\n'.join(lst)))
-
-					if p.stderr:
-						lst = []
-						for line in io.TextIOWrapper(p.stderr, encoding="utf-8"):
-							if len(line.strip()) > 0:
-								lst.append(line.strip())
-						logger.info(re.sub(' +', ' ', '\n'.join(lst)))
-		except Exception as e:
-			logger.warning('error while reading the stdout')
-			logger.error(e)
-		p.wait(timeout=timeout)
-		# ret = p.returncode
-		ret = 1
-	except subprocess.TimeoutExpired:
-		logger.warning('TimeoutExpired (%s s)for cmd: %s'%(str(timeout), cmd))
-		os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-		ret = -1
-	finally:
-		my_timer.cancel()
+	result = ProcessRunnerModule.run_process(cmd, cwd=None if cwd == 'default' else cwd, timeout=timeout, memory_limit=memory_limit, cpu_limit=cpu_limit,
+		print_stdout=print_stdout, prettify=prettify, log_command=log_command)
 
-	return ret
+	if return_result:
+		return result
+	if result.timed_out or result.memory_exceeded or result.cpu_exceeded:
+		return -1
+	return result.returncode
 
 
 
@@ -161,28 +137,186 @@ def unzip(path_to_zip_file, directory_to_extract_to):
 		zip_ref.extractall(directory_to_extract_to)
 
 
-def compress_graph(webpage_folder_path, node_file=constantsModule.NODE_INPUT_FILE_NAME, edge_file=constantsModule.RELS_INPUT_FILE_NAME, edges_file_dynamic=constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME):
+def _get_codec_of_file(file_path):
+	for codec, suffix in HPG_CODEC_SUFFIXES.items():
+		if file_path.endswith(suffix):
+			return codec
+	return None
 
-	cmd1="pigz %s"%(os.path.join(webpage_folder_path, node_file))
-	cmd2="pigz %s"%(os.path.join(webpage_folder_path, edge_file))
 
-	bash_command(cmd1)
-	bash_command(cmd2)
+def _check_codec(codec):
+	if codec not in HPG_CODEC_SUFFIXES:
+		raise ValueError('unknown hpg compression codec: %s'%codec)
+	if codec == 'zstd' and zstandard is None:
+		raise ImportError('the zstd codec needs the `zstandard` package: pip install zstandard')
 
-	if os.path.exists(os.path.join(webpage_folder_path, edges_file_dynamic)):
-		cmd3="pigz %s"%(os.path.join(webpage_folder_path, edges_file_dynamic))
-		bash_command(cmd3)
 
-def decompress_graph(webpage_folder_path, node_file=constantsModule.NODE_INPUT_FILE_NAME, edge_file=constantsModule.RELS_INPUT_FILE_NAME, edges_file_dynamic=constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME):
+def get_graph_file(file_path):
+	"""
+	@param {string} file_path: path of an uncompressed HPG csv file, e.g., `<webpage>/nodes.csv`
+	@return {string} the path of the file as stored on disk, i.e., either uncompressed or with the suffix of a codec; or None
+	"""
 
-	cmd1="pigz -d %s"%(os.path.join(webpage_folder_path, node_file))
-	cmd2="pigz -d %s"%(os.path.join(webpage_folder_path, edge_file))
-	
-	bash_command(cmd1)
-	bash_command(cmd2)
+	if os.path.exists(file_path):
+		return file_path
+	for suffix in HPG_CODEC_SUFFIXES.values():
+		if os.path.exists(file_path + suffix):
+			return file_path + suffix
+	return None
+
+
+def open_graph_file(file_path, mode='r', encoding='utf-8', newline=None):
+	"""
+	opens a (possibly compressed) HPG csv file as a stream, without decompressing it to disk
+	@param {string} file_path: path of the file, uncompressed or with the suffix of a codec
+	@param {string} mode: `r`, `w`, `rb` or `wb`
+	@return {file} file object
+	"""
+
+	codec = _get_codec_of_file(file_path)
+	binary = 'b' in mode
+	raw_mode = mode.replace('t', '').replace('b', '') + 'b'
+
+	if codec is None:
+		if binary:
+			return open(file_path, raw_mode)
+		return open(file_path, mode, encoding=encoding, newline=newline)
+
+	_check_codec(codec)
+	if codec == 'gzip':
+		fd = gzip.open(file_path, raw_mode, compresslevel=HPG_CODEC_LEVELS[codec]) if 'w' in raw_mode else gzip.open(file_path, raw_mode)
+	else:
+		fd = zstandard.open(file_path, raw_mode, cctx=zstandard.ZstdCompressor(level=HPG_CODEC_LEVELS[codec], threads=-1)) if 'w' in raw_mode else zstandard.open(file_path, raw_mode)
+
+	if binary:
+		return fd
+	return io.TextIOWrapper(fd, encoding=encoding, newline=newline)
+
+
+def _has_pigz():
+	return shutil.which('pigz') is not None
 
-	if os.path.exists(os.path.join(webpage_folder_path, f"{edges_file_dynamic}.gz")):
-		cmd3="pigz -d %s"%(os.path.join(webpage_folder_path, edges_file_dynamic))
-		bash_command(cmd3)
 
+def compress_file(file_path, codec='gzip'):
+	"""
+	compresses a file (with the multi-threaded `pigz` for gzip if installed, in a streaming fashion otherwise) and removes the uncompressed file
+	@param {string} file_path
+	@param {string} codec: one of `HPG_CODEC_SUFFIXES`
+	@return {string} path of the compressed file
+	"""
+
+	_check_codec(codec)
+	compressed_file_path = file_path + HPG_CODEC_SUFFIXES[codec]
+	if codec == 'gzip' and _has_pigz():
+		# multi-threaded; removes the uncompressed file itself
+		bash_command('pigz -%d -f %s'%(HPG_CODEC_LEVELS[codec], shlex.quote(file_path)))
+		if os.path.exists(compressed_file_path) and not os.path.exists(file_path):
+			return compressed_file_path
+	with open(file_path, 'rb') as fd_in, open_graph_file(compressed_file_path, 'wb') as fd_out:
+		shutil.copyfileobj(fd_in, fd_out, STREAM_CHUNK_SIZE)
+	os.remove(file_path)
+	return compressed_file_path
+
+
+def decompress_file(compressed_file_path):
+	"""
+	decompresses a file (with `pigz` for gzip if installed, in a streaming fashion otherwise) and removes the compressed file
+	@param {string} compressed_file_path: path with the suffix of a codec
+	@return {string} path of the uncompressed file
+	"""
+
+	codec = _get_codec_of_file(compressed_file_path)
+	file_path = compressed_file_path[:-len(HPG_CODEC_SUFFIXES[codec])]
+	if codec == 'gzip' and _has_pigz():
+		bash_command('pigz -d -f %s'%shlex.quote(compressed_file_path))
+		if os.path.exists(file_path) and not os.path.exists(compressed_file_path):
+			return file_path
+	with open_graph_file(compressed_file_path, 'rb') as fd_in, open(file_path, 'wb') as fd_out:
+		shutil.copyfileobj(fd_in, fd_out, STREAM_CHUNK_SIZE)
+	os.remove(compressed_file_path)
+	return file_path
+
+
+def _feed_fifo(compressed_file_path, fifo_path):
+	try:
+		with open_graph_file(compressed_file_path, 'rb') as fd_in, open(fifo_path, 'wb') as fd_out:
+			shutil.copyfileobj(fd_in, fd_out, STREAM_CHUNK_SIZE)
+	except BrokenPipeError:
+		logger.warning('the reader of %s closed the pipe early'%fifo_path)
+
+
+@contextlib.contextmanager
+def graph_files_for_import(file_paths):
+	"""
+	maps (possibly compressed) HPG csv files to paths that `neo4j-admin import` can read: uncompressed and
+	gzip files are read as they are, and any other codec is decompressed on the fly into a named pipe
+	@param {list} file_paths: paths as returned by `get_graph_file()`
+	@return {list} paths to pass to neo4j-admin, valid within the `with` block
+	"""
+
+	fifo_directory = None
+	feeders = []
+	import_paths = []
+	try:
+		for file_path in file_paths:
+			codec = _get_codec_of_file(file_path)
+			if codec is None or codec == 'gzip':
+				import_paths.append(file_path)
+				continue
+
+			if fifo_directory is None:
+				fifo_directory = tempfile.mkdtemp(prefix='hpg_import_')
+			fifo_path = os.path.join(fifo_directory, '%d_%s'%(len(feeders), os.path.basename(file_path)[:-len(HPG_CODEC_SUFFIXES[codec])]))
+			os.mkfifo(fifo_path)
+			feeder = threading.Thread(target=_feed_fifo, args=(file_path, fifo_path), daemon=True)
+			feeder.start()
+			feeders.append((feeder, fifo_path))
+			import_paths.append(fifo_path)
+
+		yield import_paths
+	finally:
+		for feeder, fifo_path in feeders:
+			if feeder.is_alive():
+				# unblock a feeder whose pipe was never opened by the reader
+				try:
+					fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+					os.close(fd)
+				except OSError:
+					pass
+			feeder.join(timeout=5)
+		if fifo_directory is not None:
+			shutil.rmtree(fifo_directory, ignore_errors=True)
+
+
+def compress_graph(webpage_folder_path, node_file=constantsModule.NODE_INPUT_FILE_NAME, edge_file=constantsModule.RELS_INPUT_FILE_NAME, edges_file_dynamic=constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME, codec=None):
+	"""
+	compresses the uncompressed HPG csv files of a webpage with the given codec (default: `constantsModule.HPG_COMPRESSION_CODEC`)
+	"""
+
+	if codec is None:
+		codec = constantsModule.HPG_COMPRESSION_CODEC
+
+	for file_name in [node_file, edge_file, edges_file_dynamic]:
+		file_path = os.path.join(webpage_folder_path, file_name)
+		if not os.path.exists(file_path):
+			continue
+		try:
+			compress_file(file_path, codec)
+		except (OSError, ImportError, ValueError) as e:
+			logger.error('could not compress %s: %s'%(file_path, str(e)))
+
+
+def decompress_graph(webpage_folder_path, node_file=constantsModule.NODE_INPUT_FILE_NAME, edge_file=constantsModule.RELS_INPUT_FILE_NAME, edges_file_dynamic=constantsModule.RELS_DYNAMIC_INPUT_FILE_NAME):
+	"""
+	decompresses the compressed HPG csv files of a webpage, whatever their codec
+	"""
+
+	for file_name in [node_file, edge_file, edges_file_dynamic]:
+		file_path = get_graph_file(os.path.join(webpage_folder_path, file_name))
+		if file_path is None or _get_codec_of_file(file_path) is None:
+			continue
+		try:
+			decompress_file(file_path)
+		except (OSError, ImportError, ValueError) as e:
+			logger.error('could not decompress %s: %s'%(file_path, str(e)))
 
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+	Description:
+	------------
+	SQLite-backed ledger of the (site, page, stage) jobs of a site list run, with their status,
+	number of attempts, duration, exit code and timeout flag. Finished jobs are skipped with a
+	single lookup on restart, and failed jobs are retried with an exponential backoff.
+	Site-level stages use the empty string as page.
+
+	Usage:
+	------------
+	> import utils.job_ledger as JobLedgerModule
+	> ledger = JobLedgerModule.get_job_ledger()
+	> if ledger is None or ledger.should_run(site, page, 'rh_traversals'): ...
+
+	$ python3 -m utils.job_ledger --ledger=data/jobs.sqlite
+
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import threading
+import constants as constantsModule
+from utils.logging import logger
+
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+	site TEXT NOT NULL,
+	page TEXT NOT NULL,
+	stage TEXT NOT NULL,
+	status TEXT NOT NULL,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	started_at REAL,
+	finished_at REAL,
+	duration REAL,
+	exit_code INTEGER,
+	timed_out INTEGER NOT NULL DEFAULT 0,
+	next_attempt_at REAL NOT NULL DEFAULT 0,
+	error TEXT,
+	PRIMARY KEY (site, page, stage)
+)
+"""
+
+
+
+class JobLedger(object):
+
+	"""
+	the connection is opened lazily per process, so that a ledger can be shared with forked workers
+	"""
+
+	def __init__(self, db_file, max_attempts=3, backoff=60):
+		"""
+		@param {string} db_file: path of the sqlite database
+		@param {int} max_attempts: max number of attempts of a job before it is given up
+		@param {int} backoff: seconds to wait before the first retry of a failed job; doubles with each attempt
+		"""
+
+		self.db_file = db_file
+		self.max_attempts = int(max_attempts)
+		self.backoff = float(backoff)
+		self._connections = {}
+		self._lock = threading.Lock()
+
+
+	def _connection(self):
+		key = (os.getpid(), threading.get_ident())
+		conn = self._connections.get(key)
+		if conn is None:
+			directory = os.path.dirname(self.db_file)
+			if directory and not os.path.exists(directory):
+				os.makedirs(directory, exist_ok=True)
+			# each thread uses its own connection, but `close()` may close it from another thread
+			conn = sqlite3.connect(self.db_file, timeout=60, isolation_level=None, check_same_thread=False)
+			conn.execute('PRAGMA journal_mode=WAL')
+			conn.execute('PRAGMA synchronous=NORMAL')
+			conn.execute(_SCHEMA)
+			with self._lock:
+				self._connections[key] = conn
+		return conn
+
+
+	def close(self):
+		"""
+		closes the connections opened by the threads of this process; the next call opens a new one
+		"""
+
+		pid = os.getpid()
+		with self._lock:
+			for key in list(self._connections):
+				conn = self._connections.pop(key)
+				# connections inherited from a parent process are dropped, but never closed by a child
+				if key[0] == pid:
+					conn.close()
+
+
+	def get_job(self, site, page, stage):
+		"""
+		@return {dict} the row of the job, or None if the job was never started
+		"""
+
+		cursor = self._connection().execute('SELECT status, attempts, duration, exit_code, timed_out, next_attempt_at, error FROM jobs WHERE site=? AND page=? AND stage=?', (site, page, stage))
+		row = cursor.fetchone()
+		if row is None:
+			return None
+		return {
+			'status': row[0],
+			'attempts': row[1],
+			'duration': row[2],
+			'exit_code': row[3],
+			'timed_out': bool(row[4]),
+			'next_attempt_at': row[5],
+			'error': row[6],
+		}
+
+
+	def is_done(self, site, page, stage):
+		job = self.get_job(site, page, stage)
+		return job is not None and job['status'] == STATUS_DONE
+
+
+	def should_run(self, site, page, stage):
+		"""
+		@return {bool} false if the job is done, ran out of attempts, or is waiting for its retry backoff
+		@description a job left `running` by a crashed process counts as a failed attempt
+		"""
+
+		job = self.get_job(site, page, stage)
+		if job is None:
+			return True
+		if job['status'] == STATUS_DONE:
+			return False
+		if job['attempts'] >= self.max_attempts:
+			return False
+		if job['status'] == STATUS_FAILED and job['next_attempt_at'] > time.time():
+			return False
+		return True
+
+
+	def start(self, site, page, stage):
+		"""
+		marks the job as running and counts a new attempt
+		"""
+
+		self._connection().execute("""
+			INSERT INTO jobs (site, page, stage, status, attempts, started_at) VALUES (?, ?, ?, ?, 1, ?)
+			ON CONFLICT(site, page, stage) DO UPDATE SET status=excluded.status, attempts=attempts+1, started_at=excluded.started_at,
+				finished_at=NULL, duration=NULL, exit_code=NULL, timed_out=0, error=NULL
+		""", (site, page, stage, STATUS_RUNNING, time.time()))
+
+
+	def _finish(self, site, page, stage, status, exit_code, timed_out, error):
+		now = time.time()
+		conn = self._connection()
+		row = conn.execute('SELECT attempts, started_at FROM jobs WHERE site=? AND page=? AND stage=?', (site, page, stage)).fetchone()
+		if row is None:
+			self.start(site, page, stage)
+			row = (1, now)
+		attempts, started_at = row
+		duration = now - started_at if started_at is not None else None
+
+		next_attempt_at = 0
+		if status == STATUS_FAILED:
+			next_attempt_at = now + self.backoff * (2 ** max(0, attempts - 1))
+
+		conn.execute("""
+			UPDATE jobs SET status=?, finished_at=?, duration=?, exit_code=?, timed_out=?, next_attempt_at=?, error=?
+			WHERE site=? AND page=? AND stage=?
+		""", (status, now, duration, exit_code, int(bool(timed_out)), next_attempt_at, error, site, page, stage))
+
+
+	def finish(self, site, page, stage, exit_code=0):
+		self._finish(site, page, stage, STATUS_DONE, exit_code, False, None)
+
+
+	def fail(self, site, page, stage, exit_code=None, timed_out=False, error=None):
+		self._finish(site, page, stage, STATUS_FAILED, exit_code, timed_out, None if error is None else str(error)[:1000])
+
+
+	def get_failed_jobs(self, site, since=None):
+		"""
+		@param {float} since: only the jobs started at or after this timestamp, if given
+		@return {list} (page, stage, exit_code, timed_out) of the failed webpage-level jobs of the site
+		"""
+
+		rows = self._connection().execute("""
+			SELECT page, stage, exit_code, timed_out FROM jobs
+			WHERE site=? AND page!='' AND status=? AND started_at>=?
+			ORDER BY started_at
+		""", (site, STATUS_FAILED, since if since is not None else 0)).fetchall()
+		return [(page, stage, exit_code, bool(timed_out)) for page, stage, exit_code, timed_out in rows]
+
+
+	def report(self):
+		"""
+		@return {list} per stage: (stage, #done, #failed, #running, #timeouts, total duration of the done jobs, mean duration, jobs per hour)
+		"""
+
+		rows = self._connection().execute("""
+			SELECT stage,
+				SUM(status='done'), SUM(status='failed'), SUM(status='running'), SUM(timed_out),
+				SUM(CASE WHEN status='done' THEN duration ELSE 0 END),
+				AVG(CASE WHEN status='done' THEN duration END),
+				MIN(started_at), MAX(finished_at)
+			FROM jobs GROUP BY stage ORDER BY stage
+		""").fetchall()
+
+		out = []
+		for stage, done, failed, running, timeouts, total_duration, mean_duration, first_start, last_finish in rows:
+			throughput = 0.0
+			if first_start is not None and last_finish is not None and last_finish > first_start:
+				throughput = done * 3600.0 / (last_finish - first_start)
+			out.append((stage, done or 0, failed or 0, running or 0, timeouts or 0, total_duration or 0.0, mean_duration or 0.0, throughput))
+		return out
+
+
+
+_JOB_LEDGER = None
+
+def get_job_ledger():
+	"""
+	@return {JobLedger} the ledger of this run, or None if the ledger is disabled
+	"""
+
+	global _JOB_LEDGER
+	if str(constantsModule.JOB_LEDGER_ENABLED).lower() != 'true':
+		return None
+	if _JOB_LEDGER is None or _JOB_LEDGER.db_file != constantsModule.JOB_LEDGER_FILE:
+		_JOB_LEDGER = JobLedger(constantsModule.JOB_LEDGER_FILE, max_attempts=constantsModule.JOB_LEDGER_MAX_ATTEMPTS, backoff=constantsModule.JOB_LEDGER_RETRY_BACKOFF)
+	return _JOB_LEDGER
+
+
+def close_job_ledger():
+	"""
+	closes the connections of the ledger of this run opened by this process, e.g., before a worker exits
+	"""
+
+	if _JOB_LEDGER is not None:
+		_JOB_LEDGER.close()
+
+
+
+def print_report(ledger):
+	logger.info('%-20s %8s %8s %8s %8s %12s %10s %10s'%('stage', 'done', 'failed', 'running', 'timeout', 'total (s)', 'mean (s)', 'jobs/h'))
+	for stage, done, failed, running, timeouts, total_duration, mean_duration, throughput in ledger.report():
+		logger.info('%-20s %8d %8d %8d %8d %12.1f %10.1f %10.1f'%(stage, done, failed, running, timeouts, total_duration, mean_duration, throughput))
+
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='This script prints the per stage throughput report of the job ledger.')
+	p.add_argument('--ledger', "-L",
+					default=constantsModule.JOB_LEDGER_FILE,
+					help='job ledger database file (default: %(default)s)',
+					type=str)
+
+	args = vars(p.parse_args())
+	if not os.path.exists(args["ledger"]):
+		logger.error('job ledger %s does not exist.'%args["ledger"])
+		return
+
+	ledger = JobLedger(args["ledger"])
+	print_report(ledger)
+	ledger.close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Near-duplicate webpage detection: webpages of a site that load the very same scripts
+	(as per the hashes of their `scripts_mapping.json`) share a fingerprint. Only one representative
+	webpage per cluster needs an HPG and an analysis; its results are then linked to the duplicates.
+
+	The clusters of a site are stored in `webpage_clusters.json`, together with the modification time of the
+	`scripts_mapping.json` of each clustered webpage, and are computed again once the site is crawled again.
+	The results copied to a duplicate name the url (`url.out`) and the folder of the duplicate, not of its representative.
+
+
+	Usage:
+	------------
+	> import utils.page_dedup as PageDedupModule
+	> representatives, duplicates = PageDedupModule.get_representative_webpages(website_folder, webpages)
+	> ...
+	> PageDedupModule.link_duplicate_results(website_folder, duplicates, ['sinks.flows.out'])
+
+"""
+
+import os
+import json
+import shutil
+import utils.utility as utilityModule
+from utils.logging import logger as LOGGER
+
+
+WEBPAGE_CLUSTERS_FILE_NAME = 'webpage_clusters.json'
+DUPLICATE_OF_FILE_NAME = 'duplicate_of.json'
+
+# result lines that name the analyzed webpage, see `run_traversals()` of the request hijacking and open redirect analyses
+WEBPAGE_URL_LINE_PREFIX = '[*] webpage URL: '
+WEBPAGE_LINE_PREFIX = '[*] webpage: '
+
+
+
+def get_webpage_fingerprint(webpage_folder):
+	"""
+	@param {string} webpage_folder
+	@return {string} hash of the hashes of the scripts of the webpage, or None if the webpage has no scripts mapping
+	"""
+
+	script_mapping_file = os.path.join(webpage_folder, 'scripts_mapping.json')
+	if not os.path.exists(script_mapping_file):
+		return None
+
+	webpage_script_hashes = []
+	with open(script_mapping_file, 'r', encoding='utf-8') as fd:
+		script_mapping_json = json.load(fd)
+		for key in script_mapping_json:
+			script_item = script_mapping_json[key]
+			webpage_script_hashes.append(script_item['hash'])
+
+	if len(webpage_script_hashes) == 0:
+		return None
+
+	webpage_script_hashes_as_string = '_'.join(webpage_script_hashes).strip().strip('\n').strip()
+	return utilityModule.sha256(webpage_script_hashes_as_string)
+
+
+
+def cluster_webpages(website_folder, webpages):
+	"""
+	@param {string} website_folder
+	@param {list} webpages: names of the webpage folders
+	@return {dict} fingerprint -> list of webpage folder names with that fingerprint, in the order of `webpages`
+	"""
+
+	clusters = {}
+	for webpage in webpages:
+		webpage_folder = os.path.join(website_folder, webpage)
+		if not os.path.isdir(webpage_folder):
+			continue
+		fingerprint = get_webpage_fingerprint(webpage_folder)
+		if fingerprint is None:
+			continue
+		if fingerprint not in clusters:
+			clusters[fingerprint] = [webpage]
+		else:
+			clusters[fingerprint].append(webpage)
+	return clusters
+
+
+
+def get_crawl_times(website_folder, webpages):
+	"""
+	@param {string} website_folder
+	@param {list} webpages: names of the webpage folders
+	@return {dict} webpage folder name -> modification time of its `scripts_mapping.json`, or None if it has none
+	"""
+
+	crawl_times = {}
+	for webpage in webpages:
+		try:
+			crawl_times[webpage] = os.path.getmtime(os.path.join(website_folder, webpage, 'scripts_mapping.json'))
+		except OSError:
+			crawl_times[webpage] = None
+	return crawl_times
+
+
+
+def load_or_cluster_webpages(website_folder, webpages):
+	"""
+	@param {string} website_folder
+	@param {list} webpages: names of the webpage folders
+	@return {dict} the clusters of the site as stored in `webpage_clusters.json` by an earlier pass, or computed and stored otherwise
+	@description reusing the stored clusters keeps the representative of each cluster stable across the
+	model construction and the analysis passes; they are computed again if one of the `webpages` was not
+	clustered, or was crawled again since
+	"""
+
+	clusters_file = os.path.join(website_folder, WEBPAGE_CLUSTERS_FILE_NAME)
+	crawl_times = get_crawl_times(website_folder, webpages)
+	if os.path.exists(clusters_file):
+		try:
+			with open(clusters_file, 'r', encoding='utf-8') as fd:
+				stored = json.load(fd)
+		except ValueError:
+			stored = {}
+		stored_crawl_times = stored.get('crawl_times')
+		if isinstance(stored_crawl_times, dict) and all(webpage in stored_crawl_times and stored_crawl_times[webpage] == crawl_time for webpage, crawl_time in crawl_times.items()):
+			return stored['clusters']
+		LOGGER.info('[dedup] the webpages of %s were crawled since their clustering, clustering them again.'%website_folder)
+
+	clusters = cluster_webpages(website_folder, webpages)
+	with open(clusters_file, 'w+', encoding='utf-8') as fd:
+		json.dump({'crawl_times': crawl_times, 'clusters': clusters}, fd, ensure_ascii=False, indent=4)
+	return clusters
+
+
+
+def get_representative_webpages(website_folder, webpages):
+	"""
+	@param {string} website_folder
+	@param {list} webpages: names of the webpage folders
+	@return {tuple} (representatives, duplicates): the webpages to analyze, in the order of `webpages`,
+	and a dict mapping each skipped duplicate webpage to the representative of its cluster
+	"""
+
+	clusters = load_or_cluster_webpages(website_folder, webpages)
+
+	# the representative of a cluster is its first webpage that is to be analyzed
+	webpage_set = set(webpages)
+	representative_of = {}
+	for cluster in clusters.values():
+		members = [webpage for webpage in cluster if webpage in webpage_set]
+		for webpage in members[1:]:
+			representative_of[webpage] = members[0]
+
+	representatives = []
+	duplicates = {}
+	for webpage in webpages:
+		if webpage in representative_of:
+			duplicates[webpage] = representative_of[webpage]
+		else:
+			representatives.append(webpage)
+
+	if len(duplicates):
+		LOGGER.info('[dedup] analyzing %d out of %d webpages of %s; %d are near-duplicates.'%(len(representatives), len(webpages), website_folder, len(duplicates)))
+	return representatives, duplicates
+
+
+
+def _get_webpage_url(webpage_folder):
+	url_file = os.path.join(webpage_folder, 'url.out')
+	if not os.path.exists(url_file):
+		return None
+	with open(url_file, 'r') as fd:
+		return fd.read()
+
+
+def _rename_json_webpage(value, representative, webpage):
+	"""
+	replaces the `webpage` fields that name the representative folder, at any depth of a json result
+	"""
+	if isinstance(value, dict):
+		for key in value:
+			if key == 'webpage' and value[key] == representative:
+				value[key] = webpage
+			else:
+				_rename_json_webpage(value[key], representative, webpage)
+	elif isinstance(value, list):
+		for item in value:
+			_rename_json_webpage(item, representative, webpage)
+
+
+def copy_result_file(source, destination, representative, webpage, representative_url, webpage_url):
+	"""
+	copies a result file of a representative webpage to a duplicate webpage, with the url and the folder name
+	of the representative replaced by the ones of the duplicate
+	@param {string} source: result file of the representative
+	@param {string} destination: result file of the duplicate
+	@param {string} representative: folder name of the representative
+	@param {string} webpage: folder name of the duplicate
+	@param {string} representative_url: content of the `url.out` of the representative, or None
+	@param {string} webpage_url: content of the `url.out` of the duplicate, or None
+	"""
+
+	if source.endswith('.json'):
+		try:
+			with open(source, 'r', encoding='utf-8') as fd:
+				result = json.load(fd)
+		except ValueError:
+			shutil.copyfile(source, destination)
+			return
+		if isinstance(result, dict) and webpage_url is not None and result.get('url') == representative_url:
+			result['url'] = webpage_url
+		_rename_json_webpage(result, representative, webpage)
+		with open(destination, 'w+', encoding='utf-8') as fd:
+			json.dump(result, fd, ensure_ascii=False, indent=4)
+		return
+
+	with open(source, 'r', encoding='utf-8', errors='surrogateescape', newline='') as fd_in, open(destination, 'w+', encoding='utf-8', errors='surrogateescape', newline='') as fd_out:
+		for line in fd_in:
+			if webpage_url is not None and line.startswith(WEBPAGE_URL_LINE_PREFIX + representative_url):
+				line = WEBPAGE_URL_LINE_PREFIX + webpage_url + line[len(WEBPAGE_URL_LINE_PREFIX + representative_url):]
+			elif line.startswith(WEBPAGE_LINE_PREFIX + representative):
+				line = WEBPAGE_LINE_PREFIX + webpage + line[len(WEBPAGE_LINE_PREFIX + representative):]
+			fd_out.write(line)
+
+
+
+def link_duplicate_results(website_folder, duplicates, result_file_names):
+	"""
+	copies the results of each representative to its duplicates, and records the representative in `duplicate_of.json`
+	@param {string} website_folder
+	@param {dict} duplicates: duplicate webpage -> representative webpage
+	@param {list} result_file_names: names of the result files in a webpage folder
+	"""
+
+	for webpage, representative in duplicates.items():
+		webpage_folder = os.path.join(website_folder, webpage)
+		representative_folder = os.path.join(website_folder, representative)
+		if not os.path.isdir(webpage_folder):
+			continue
+
+		with open(os.path.join(webpage_folder, DUPLICATE_OF_FILE_NAME), 'w+', encoding='utf-8') as fd:
+			json.dump({'representative': representative}, fd, ensure_ascii=False, indent=4)
+
+		representative_url = _get_webpage_url(representative_folder)
+		webpage_url = _get_webpage_url(webpage_folder)
+		if representative_url is None:
+			webpage_url = None
+
+		for file_name in result_file_names:
+			source = os.path.join(representative_folder, file_name)
+			if os.path.exists(source):
+				copy_result_file(source, os.path.join(webpage_folder, file_name), representative, webpage, representative_url, webpage_url)
@@ -0,0 +1,127 @@
+"""
+	Copyright (C) 2020  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Multi-pattern substring matcher (Aho-Corasick automaton) that finds which labels of a
+	pattern table occur in a text with a single pass over the text, independently of the
+	number of patterns. Used to map program slices to the semantic types of their sources.
+
+	Usage:
+	------------
+	> from utils.pattern_matcher import MultiPatternMatcher
+	> matcher = MultiPatternMatcher([('RD_WIN_LOC', ['window.location', 'location.href']), ('RD_COOKIE', ['document.cookie'])])
+	> matcher.match('var x = document.cookie + window.location.href')
+	['RD_WIN_LOC', 'RD_COOKIE']
+
+"""
+
+
+
+class MultiPatternMatcher(object):
+
+	"""
+	a deterministic Aho-Corasick automaton built from an ordered table of (label, [patterns])
+	"""
+
+	def __init__(self, pattern_table, cache_size=4096):
+		"""
+		@param {list} pattern_table: ordered pairs of (label, list of substring patterns)
+		@param {int} cache_size: max number of texts whose matches are memoized
+		"""
+
+		self.labels = [label for label, _ in pattern_table]
+		self.cache_size = cache_size
+		self._cache = {}
+
+		# trie of the patterns; the output of a state is the bitmask of the labels of the patterns ending at it
+		goto = [{}]
+		output = [0]
+		for label_index, (_, patterns) in enumerate(pattern_table):
+			for pattern in patterns:
+				state = 0
+				for ch in pattern:
+					if ch not in goto[state]:
+						goto.append({})
+						output.append(0)
+						goto[state][ch] = len(goto) - 1
+					state = goto[state][ch]
+				output[state] |= 1 << label_index
+
+		# breadth-first: failure links, and the full transition table of each state
+		fail = [0] * len(goto)
+		delta = [None] * len(goto)
+		delta[0] = dict(goto[0])
+		queue = list(goto[0].values())
+		i = 0
+		while i < len(queue):
+			state = queue[i]
+			i += 1
+			output[state] |= output[fail[state]]
+			delta[state] = dict(delta[fail[state]])
+			for ch, next_state in goto[state].items():
+				fail[next_state] = delta[fail[state]].get(ch, 0) if state != 0 else 0
+				delta[state][ch] = next_state
+				queue.append(next_state)
+
+		self._delta = delta
+		self._output = output
+		self._all_labels = (1 << len(self.labels)) - 1
+
+
+	def match_mask(self, text):
+		"""
+		@param {string} text
+		@return {int} bitmask of the indices of the labels whose patterns occur in the text
+		"""
+
+		found = self._cache.get(text)
+		if found is not None:
+			return found
+
+		delta = self._delta
+		output = self._output
+		all_labels = self._all_labels
+		state = 0
+		found = 0
+		for ch in text:
+			state = delta[state].get(ch, 0)
+			if output[state]:
+				found |= output[state]
+				if found == all_labels:
+					break
+
+		if len(self._cache) >= self.cache_size:
+			self._cache.clear()
+		self._cache[text] = found
+		return found
+
+
+	def match(self, text):
+		"""
+		@param {string} text
+		@return {list} the labels whose patterns occur in the text, in the order of the pattern table
+		"""
+
+		return self.labels_of_mask(self.match_mask(text))
+
+
+	def labels_of_mask(self, mask):
+		"""
+		@param {int} mask: bitmask returned by (a bitwise or of) `match_mask()`
+		@return {list} the labels of the mask, in the order of the pattern table
+		"""
+
+		return [label for index, label in enumerate(self.labels) if mask >> index & 1]
+
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	wrapper of the commands of `utils/process_runner.py` that have resource limits: it moves itself into a
+	cgroup and/or sets its `RLIMIT_CPU`, and then replaces itself with the command, which inherits both.
+	This replaces a `preexec_fn` of `subprocess.Popen`, which is not safe in a process with threads
+	(e.g., the thread pool of asyncio, or the threads of the stage scheduler).
+	It is run as a plain script, without the modules of the repository.
+
+
+	Usage:
+	------------
+	$ python3 utils/process_limits.py --cpu-limit=600 --cgroup=/sys/fs/cgroup/jaw/jaw_1_2 -- /bin/sh -c 'node crawler.js ...'
+
+"""
+
+import os
+import sys
+import argparse
+import resource
+
+
+# seconds between the soft limit of RLIMIT_CPU (SIGXCPU) and its hard limit (SIGKILL)
+CPU_LIMIT_GRACE_PERIOD = 5
+
+
+
+def apply_limits(cpu_limit=None, cgroup=None):
+	"""
+	@param {int} cpu_limit: max CPU seconds of the process and of each of its descendants, or None
+	@param {string} cgroup: path of a cgroup to move the process into, or None
+	"""
+
+	if cgroup is not None:
+		with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as fd:
+			fd.write(str(os.getpid()))
+	if cpu_limit is not None:
+		resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_limit), int(cpu_limit) + CPU_LIMIT_GRACE_PERIOD))
+
+
+
+def main():
+
+	p = argparse.ArgumentParser(description='runs a command with a CPU time limit and/or in a cgroup.')
+	p.add_argument('--cpu-limit', type=int, default=None, help='max CPU seconds of each process of the command')
+	p.add_argument('--cgroup', default=None, help='path of the cgroup of the command')
+	p.add_argument('command', nargs=argparse.REMAINDER, help='command and its arguments, after `--`')
+	args = p.parse_args()
+
+	command = args.command[1:] if args.command[:1] == ['--'] else args.command
+	if not command:
+		p.error('no command given')
+
+	apply_limits(args.cpu_limit, args.cgroup)
+	os.execvp(command[0], command)
+
+
+
+if __name__ == '__main__':
+	main()
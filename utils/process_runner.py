@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	asyncio-based runner of shell commands: stdout and stderr are drained concurrently (into the logger
+	and/or a ring buffer of their last lines), and each command runs in its own session with
+		- a wall-clock timeout, after which the whole process group is terminated,
+		- an optional memory limit on the total resident memory of the process group, enforced with a
+		  cgroup v2 `memory.max` if `constantsModule.PROCESS_CGROUP_ROOT` is a delegated cgroup, and by
+		  polling `/proc` otherwise (an address space rlimit would break node and the JVM),
+		- an optional CPU time limit (`RLIMIT_CPU`, per process).
+	The cgroup and the CPU limit are set by the `utils/process_limits.py` wrapper of the command, as a
+	`preexec_fn` is not safe in a process with threads.
+	The result holds the exit status, the reason of a kill, the duration, the CPU seconds and the peak RSS.
+
+
+	Usage:
+	------------
+	> from utils.process_runner import run_process, run_processes
+	> result = run_process('node crawler.js ...', cwd=cwd, timeout=600, memory_limit=4096)
+	> result.ok, result.returncode, result.timed_out, result.cpu_seconds, result.max_rss
+	> results = run_processes([cmd1, cmd2, cmd3], max_concurrency=2, timeout=600)
+
+"""
+
+import os
+import re
+import sys
+import time
+import signal
+import asyncio
+import subprocess
+import collections
+import constants as constantsModule
+from utils.logging import logger
+
+
+# seconds between two checks of the memory of a process group
+MEMORY_POLL_INTERVAL = 1.0
+# seconds between SIGTERM and SIGKILL when a process group is stopped
+KILL_GRACE_PERIOD = 5.0
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+
+class ProcessResult(object):
+
+	"""
+	exit status and resource usage of a command run by `run_process()`
+	"""
+
+	def __init__(self, command):
+		self.command = command
+		# exit code, or minus the number of the signal that ended the process (as with `subprocess`)
+		self.returncode = None
+		self.timed_out = False
+		self.memory_exceeded = False
+		# killed by SIGXCPU for exceeding its CPU limit, i.e., the soft limit of RLIMIT_CPU of one of its processes;
+		# a SIGKILL at the hard limit cannot be told apart from other kills
+		self.cpu_exceeded = False
+		self.duration = 0.0
+		# user + system CPU seconds of the process and its waited-for descendants
+		self.cpu_seconds = 0.0
+		# peak resident memory in bytes (of the largest process, or of the whole group if it was polled or in a cgroup);
+		# as reported by the kernel, it includes the image of the forking process for very short-lived commands
+		self.max_rss = 0
+		self.stdout_tail = []
+		self.stderr_tail = []
+
+	@property
+	def ok(self):
+		return self.returncode == 0 and not self.timed_out and not self.memory_exceeded and not self.cpu_exceeded
+
+	def __str__(self):
+		status = 'timeout' if self.timed_out else 'memory limit' if self.memory_exceeded else 'cpu limit' if self.cpu_exceeded else 'exit code %s'%self.returncode
+		return '%s, %.1f s, %.1f cpu s, %.1f MB peak rss'%(status, self.duration, self.cpu_seconds, self.max_rss / (1024 * 1024))
+
+
+
+def _get_session_rss(session_id):
+	"""
+	@return {int} total resident memory in bytes of the processes of a session
+	"""
+
+	total = 0
+	for pid in os.listdir('/proc'):
+		if not pid.isdigit():
+			continue
+		try:
+			with open('/proc/%s/stat'%pid, 'r') as fd:
+				stat = fd.read()
+		except OSError:
+			continue
+		# the command name may contain spaces and parentheses; the fields after it are space separated
+		fields = stat[stat.rfind(')') + 2:].split()
+		# fields[3] is the session id, fields[21] the rss in pages
+		if len(fields) > 21 and int(fields[3]) == session_id:
+			total += int(fields[21]) * _PAGE_SIZE
+	return total
+
+
+
+def _create_cgroup(memory_limit):
+	"""
+	@param {int} memory_limit: bytes
+	@return {string} path of a new cgroup below `constantsModule.PROCESS_CGROUP_ROOT` with the given `memory.max`, or None
+	"""
+
+	cgroup_root = constantsModule.PROCESS_CGROUP_ROOT
+	if not cgroup_root or not os.path.isdir(cgroup_root):
+		return None
+	cgroup = os.path.join(cgroup_root, 'jaw_%d_%d'%(os.getpid(), time.monotonic_ns()))
+	try:
+		os.mkdir(cgroup)
+		with open(os.path.join(cgroup, 'memory.max'), 'w') as fd:
+			fd.write(str(memory_limit))
+		return cgroup
+	except OSError as e:
+		logger.warning('could not create a cgroup in %s, polling the memory instead: %s'%(cgroup_root, str(e)))
+		if os.path.isdir(cgroup):
+			os.rmdir(cgroup)
+		return None
+
+
+
+def _read_cgroup_memory_events(cgroup):
+	"""
+	@return {tuple} (peak memory in bytes, whether the group was oom-killed)
+	"""
+
+	peak = 0
+	oom_killed = False
+	try:
+		if os.path.exists(os.path.join(cgroup, 'memory.peak')):
+			with open(os.path.join(cgroup, 'memory.peak'), 'r') as fd:
+				peak = int(fd.read().strip())
+		with open(os.path.join(cgroup, 'memory.events'), 'r') as fd:
+			for line in fd:
+				name, value = line.split()
+				if name == 'oom_kill' and int(value) > 0:
+					oom_killed = True
+	except (OSError, ValueError):
+		pass
+	return peak, oom_killed
+
+
+
+_PROCESS_LIMITS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'process_limits.py')
+
+
+def _get_popen_args(cmd, cpu_limit, cgroup):
+	"""
+	@return {tuple} (args, shell) of `subprocess.Popen` for the shell command, wrapped by `utils/process_limits.py`
+	if it has a CPU limit or a cgroup
+	"""
+
+	if cpu_limit is None and cgroup is None:
+		return cmd, True
+	args = [sys.executable, _PROCESS_LIMITS_SCRIPT]
+	if cpu_limit is not None:
+		args.append('--cpu-limit=%d'%int(cpu_limit))
+	if cgroup is not None:
+		args.append('--cgroup=%s'%cgroup)
+	return args + ['--', '/bin/sh', '-c', cmd], False
+
+
+
+def _kill_process_group(pid, sig):
+	try:
+		os.killpg(os.getpgid(pid), sig)
+	except (ProcessLookupError, PermissionError):
+		pass
+
+
+
+async def _drain(stream, tail, log_lines, collected_lines):
+	"""
+	reads the lines of a stream until its end
+	@param {list} tail: ring buffer of the last lines
+	@param {bool} log_lines: whether to log each line
+	@param {list} collected_lines: if not None, collects all lines (for the prettified log)
+	"""
+
+	while True:
+		line = await stream.readline()
+		if not line:
+			break
+		line = line.decode('utf-8', errors='replace').strip()
+		if len(line) == 0:
+			continue
+		tail.append(line)
+		if collected_lines is not None:
+			collected_lines.append(line)
+		elif log_lines:
+			logger.info(line)
+
+
+
+async def run_process_async(cmd, cwd=None, timeout=30*60, memory_limit=None, cpu_limit=None, print_stdout=True, prettify=False, log_command=False, tail_lines=100, env=None):
+	"""
+	@param {string} cmd: shell command
+	@param {string} cwd: working directory (default: the current one)
+	@param {int} timeout: wall-clock seconds before the process group is terminated
+	@param {int} memory_limit: max total resident memory of the process group in MB, or None
+	@param {int} cpu_limit: max CPU seconds of each process of the group, or None
+	@param {bool} print_stdout: whether to log the stdout and stderr lines
+	@param {bool} prettify: log the output once at the end, with runs of spaces collapsed
+	@param {bool} log_command: whether to log the command
+	@param {int} tail_lines: number of last stdout/stderr lines kept in the result
+	@param {dict} env: environment of the process (default: the current one)
+	@return {ProcessResult}
+	"""
+
+	if log_command:
+		logger.debug('Running command: %s'%cmd)
+
+	result = ProcessResult(cmd)
+	memory_limit_bytes = int(memory_limit) * 1024 * 1024 if memory_limit is not None else None
+	cgroup = _create_cgroup(memory_limit_bytes) if memory_limit_bytes is not None else None
+
+	loop = asyncio.get_running_loop()
+	start = time.monotonic()
+	# a plain Popen, so that the process can be reaped with `os.wait4()` for its resource usage
+	popen_args, shell = _get_popen_args(cmd, cpu_limit, cgroup)
+	p = subprocess.Popen(popen_args, shell=shell, start_new_session=True, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+	streams = []
+	transports = []
+	for pipe in [p.stdout, p.stderr]:
+		reader = asyncio.StreamReader(limit=2**24)
+		transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+		streams.append(reader)
+		transports.append(transport)
+
+	stdout_tail = collections.deque(maxlen=tail_lines)
+	stderr_tail = collections.deque(maxlen=tail_lines)
+	stdout_lines = [] if (print_stdout and prettify) else None
+	stderr_lines = [] if (print_stdout and prettify) else None
+	drains = asyncio.gather(
+		_drain(streams[0], stdout_tail, print_stdout, stdout_lines),
+		_drain(streams[1], stderr_tail, print_stdout, stderr_lines),
+	)
+	waiter = loop.run_in_executor(None, os.wait4, p.pid, 0)
+
+	async def watch_memory():
+		while True:
+			await asyncio.sleep(MEMORY_POLL_INTERVAL)
+			rss = _get_session_rss(p.pid)
+			result.max_rss = max(result.max_rss, rss)
+			if rss > memory_limit_bytes:
+				logger.warning('Memory limit (%s MB) exceeded for cmd: %s'%(memory_limit, cmd))
+				result.memory_exceeded = True
+				_kill_process_group(p.pid, signal.SIGKILL)
+				return
+
+	watcher = None
+	if memory_limit_bytes is not None and cgroup is None:
+		watcher = asyncio.ensure_future(watch_memory())
+
+	try:
+		try:
+			_, status, rusage = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+		except asyncio.TimeoutError:
+			logger.warning('TimeoutExpired (%s seconds) for cmd: %s'%(str(timeout), cmd))
+			result.timed_out = True
+			# kill the whole process group (i.e., including all subprocesses, not just the process)
+			_kill_process_group(p.pid, signal.SIGTERM)
+			try:
+				_, status, rusage = await asyncio.wait_for(asyncio.shield(waiter), KILL_GRACE_PERIOD)
+			except asyncio.TimeoutError:
+				_kill_process_group(p.pid, signal.SIGKILL)
+				_, status, rusage = await waiter
+		# tell Popen that the process is reaped
+		p.returncode = os.waitstatus_to_exitcode(status)
+		result.returncode = p.returncode
+
+		# daemons started by the command (e.g., a neo4j server) may hold the pipes open; stop reading, but keep them running
+		try:
+			await asyncio.wait_for(asyncio.shield(drains), KILL_GRACE_PERIOD)
+		except asyncio.TimeoutError:
+			logger.debug('stopped reading the output of the descendants of cmd: %s'%cmd)
+			drains.cancel()
+			try:
+				await drains
+			except asyncio.CancelledError:
+				pass
+	finally:
+		for transport in transports:
+			transport.close()
+		if watcher is not None:
+			watcher.cancel()
+		if cgroup is not None:
+			peak, oom_killed = _read_cgroup_memory_events(cgroup)
+			result.max_rss = max(result.max_rss, peak)
+			result.memory_exceeded = result.memory_exceeded or oom_killed
+			try:
+				os.rmdir(cgroup)
+			except OSError:
+				pass
+
+	result.duration = time.monotonic() - start
+	result.cpu_seconds = rusage.ru_utime + rusage.ru_stime
+	# ru_maxrss is in kilobytes on linux
+	result.max_rss = max(result.max_rss, rusage.ru_maxrss * 1024)
+	if cpu_limit is not None:
+		# the limit is per process, whereas `cpu_seconds` sums the group; the shell reports a child killed by a signal as 128 + the signal number
+		result.cpu_exceeded = result.returncode in (-signal.SIGXCPU, 128 + signal.SIGXCPU)
+	result.stdout_tail = list(stdout_tail)
+	result.stderr_tail = list(stderr_tail)
+
+	if stdout_lines:
+		logger.info(re.sub(' +', ' ', '\n'.join(stdout_lines)))
+	if stderr_lines:
+		logger.info(re.sub(' +', ' ', '\n'.join(stderr_lines)))
+	if log_command:
+		logger.debug('Finished command (%s): %s'%(result, cmd))
+
+	return result
+
+
+
+def run_process(cmd, **kwargs):
+	"""
+	runs a command to completion, see `run_process_async()` for the arguments
+	@return {ProcessResult}
+	"""
+
+	return asyncio.run(run_process_async(cmd, **kwargs))
+
+
+
+def run_processes(commands, max_concurrency=4, **kwargs):
+	"""
+	runs several commands concurrently, at most `max_concurrency` at a time
+	@param {list} commands: shell commands, or (command, cwd) pairs
+	@return {list} a `ProcessResult` per command, in the order of `commands`
+	"""
+
+	async def run_all():
+		semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+		async def run_one(command):
+			async with semaphore:
+				if isinstance(command, (tuple, list)):
+					return await run_process_async(command[0], **dict(kwargs, cwd=command[1]))
+				return await run_process_async(command, **kwargs)
+
+		return await asyncio.gather(*[run_one(command) for command in commands])
+
+	return asyncio.run(run_all())
+
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+	Description:
+	------------
+	Content-addressed store of per-script analysis findings, keyed by the script hash of `scripts_mapping.json`.
+	A finding is the program slice of a sink variable (and its semantic types) that stays within the
+	script of the sink; it holds on every webpage and site that loads the same script, as long as the
+	other scripts of the webpage do not define any of its variables, which the analyses re-check on the
+	PDG of the webpage before reusing it (see `DF.is_script_local_finding()`). Each script has one JSON
+	file `<directory>/<hash[:2]>/<hash>.json`, which is updated under an exclusive lock of `<hash>.lock`.
+
+
+	Usage:
+	------------
+	> import utils.script_cache as ScriptCacheModule
+	> script_cache = ScriptCacheModule.get_script_cache()
+	> if script_cache is not None:
+	> 	script_hashes = script_cache.get_script_hashes(webpage_folder)
+	> 	key = ScriptCacheModule.get_sink_finding_key(sink_node, sink_ast_node, varname)
+	> 	finding = script_cache.get_finding('rh', script_hash, key)
+	> 	...
+	> 	script_cache.add_finding('rh', script_hash, key, finding)
+	> 	script_cache.flush()
+
+"""
+
+import os
+import json
+import tempfile
+import constants as constantsModule
+from utils.logging import logger as LOGGER
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+
+
+class ScriptCache(object):
+
+	"""
+	findings are read lazily per script, and new findings are buffered until `flush()`
+	"""
+
+	def __init__(self, directory):
+		"""
+		@param {string} directory: root directory of the store
+		"""
+
+		self.directory = directory
+		self.hits = 0
+		self.misses = 0
+		self.stores = 0
+		# script hash -->> {namespace -->> {key -->> finding}}
+		self._scripts = {}
+		# script hash -->> {namespace -->> {key -->> finding}}, not yet written
+		self._pending = {}
+
+
+	def _get_script_file(self, script_hash):
+		return os.path.join(self.directory, script_hash[:2], script_hash + '.json')
+
+
+	def _lock(self, script_hash):
+		"""
+		@return {int} descriptor of the lock file of the script, held exclusively until `_unlock()`;
+			None if file locks are not supported on this platform
+		"""
+		if fcntl is None:
+			return None
+		lock_file = os.path.join(self.directory, script_hash[:2], script_hash + '.lock')
+		fd = os.open(lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+		fcntl.flock(fd, fcntl.LOCK_EX)
+		return fd
+
+
+	def _unlock(self, fd):
+		if fd is not None:
+			fcntl.flock(fd, fcntl.LOCK_UN)
+			os.close(fd)
+
+
+	def _load(self, script_hash):
+		if script_hash in self._scripts:
+			return self._scripts[script_hash]
+
+		findings = {}
+		script_file = self._get_script_file(script_hash)
+		if os.path.exists(script_file):
+			try:
+				with open(script_file, 'r', encoding='utf-8') as fd:
+					findings = json.load(fd)
+			except (ValueError, OSError) as e:
+				LOGGER.warning('[script cache] ignoring unreadable entry %s: %s'%(script_file, str(e)))
+		self._scripts[script_hash] = findings
+		return findings
+
+
+	def get_script_hashes(self, webpage_folder):
+		"""
+		@param {string} webpage_folder
+		@return {dict} script file name (e.g., `0.js`) -->> script hash, as per the `scripts_mapping.json` of the webpage
+		"""
+
+		script_mapping_file = os.path.join(webpage_folder, 'scripts_mapping.json')
+		if not os.path.exists(script_mapping_file):
+			return {}
+
+		with open(script_mapping_file, 'r', encoding='utf-8') as fd:
+			script_mapping_json = json.load(fd)
+
+		return {name: item['hash'] for name, item in script_mapping_json.items() if item.get('hash')}
+
+
+	def get_finding(self, namespace, script_hash, key):
+		"""
+		@param {string} namespace: analysis the finding belongs to, e.g., `rh`
+		@param {string} script_hash
+		@param {string} key: script-relative identifier of the finding, e.g., sink location and variable name
+		@return {dict} the finding, or None
+		"""
+
+		finding = self._load(script_hash).get(namespace, {}).get(key)
+		if finding is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return finding
+
+
+	def add_finding(self, namespace, script_hash, key, finding):
+		"""
+		@param {string} namespace
+		@param {string} script_hash
+		@param {string} key
+		@param {dict} finding: JSON-serializable
+		"""
+
+		self._load(script_hash).setdefault(namespace, {})[key] = finding
+		self._pending.setdefault(script_hash, {}).setdefault(namespace, {})[key] = finding
+		self.stores += 1
+
+
+	def flush(self):
+		"""
+		writes the new findings, merged with the findings stored by other processes in the meantime,
+		and drops the findings read so far
+		"""
+
+		for script_hash, new_findings in self._pending.items():
+			script_file = self._get_script_file(script_hash)
+			script_directory = os.path.dirname(script_file)
+			os.makedirs(script_directory, exist_ok=True)
+
+			# the read-merge-write of an entry is serialized across processes, so that no findings are lost
+			lock_fd = self._lock(script_hash)
+			try:
+				# re-read the entry, as other workers may have extended it
+				self._scripts.pop(script_hash, None)
+				findings = self._load(script_hash)
+				for namespace, items in new_findings.items():
+					findings.setdefault(namespace, {}).update(items)
+
+				# atomic replace, so that readers never see a partially written entry
+				fd, temp_file = tempfile.mkstemp(dir=script_directory, suffix='.tmp')
+				try:
+					with os.fdopen(fd, 'w', encoding='utf-8') as temp_fd:
+						json.dump(findings, temp_fd, ensure_ascii=False)
+					os.replace(temp_file, script_file)
+				except OSError as e:
+					LOGGER.warning('[script cache] could not store %s: %s'%(script_file, str(e)))
+					if os.path.exists(temp_file):
+						os.remove(temp_file)
+			finally:
+				self._unlock(lock_fd)
+
+		self._pending = {}
+		self._scripts = {}
+
+
+	def __str__(self):
+		return 'hits=%d, misses=%d, stores=%d'%(self.hits, self.misses, self.stores)
+
+
+
+def get_sink_finding_key(sink_node, sink_ast_node, varname):
+	"""
+	@param {dict} sink_node: a sink of `sinks.out.json`
+	@param {dict} sink_ast_node: the HPG node of the sink
+	@param {string} varname: a taintable identifier of the sink
+	@return {string} key of the slice of `varname` at the sink, or None if the sink node has no `Range`;
+		the character range of the sink is relative to its script, and tells apart the sinks of the same line
+		(e.g., of minified scripts)
+	"""
+
+	if sink_ast_node is None or not sink_ast_node.get('Range'):
+		return None
+	return '%s__Loc=%s__Range=%s__var=%s'%(sink_node["sink_type"], str(sink_node["location"]), sink_ast_node['Range'], varname)
+
+
+
+_SCRIPT_CACHE = None
+
+def get_script_cache():
+	"""
+	@return {ScriptCache} the store of this process, or None if the script cache is disabled
+	"""
+
+	global _SCRIPT_CACHE
+	if str(constantsModule.SCRIPT_CACHE_ENABLED).lower() != 'true':
+		return None
+	if _SCRIPT_CACHE is None or _SCRIPT_CACHE.directory != constantsModule.SCRIPT_CACHE_DIRECTORY:
+		_SCRIPT_CACHE = ScriptCache(constantsModule.SCRIPT_CACHE_DIRECTORY)
+	return _SCRIPT_CACHE
+
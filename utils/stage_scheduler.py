@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Copyright (C) 2022  Soheil Khodayari, CISPA
+	This program is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU Affero General Public License for more details.
+	You should have received a copy of the GNU Affero General Public License
+	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+	Description:
+	------------
+	Stage-pipelined scheduler: items flow through a chain of stages, each with its own
+	pool of worker processes, connected by bounded queues. A stage whose output queue is full
+	blocks until the next stage catches up (backpressure), so different items are in
+	different stages at the same time.
+
+	Every blocking put waits at most `QUEUE_PUT_TIMEOUT` seconds at a time. If all workers of
+	a stage die before it is drained, the scheduler aborts the run: the upstream workers drop
+	their items and exit, instead of blocking forever on the full queue of the dead stage.
+
+	Usage:
+	------------
+	> from utils.stage_scheduler import Stage, StageScheduler
+	> scheduler = StageScheduler([Stage('crawling', crawl_fn, workers=8), Stage('hpg', hpg_fn, workers=4, max_backlog=8)])
+	> scheduler.run(items)
+
+"""
+
+import queue
+import multiprocessing
+from utils.logging import logger
+
+
+# seconds a put on a full queue waits before it re-checks whether the run is aborted
+QUEUE_PUT_TIMEOUT = 10
+
+# seconds between two liveness checks of the workers while the scheduler waits for a stage to drain
+WORKER_JOIN_TIMEOUT = 10
+
+
+
+class Stage(object):
+
+	"""
+	a step of the pipeline.
+	`fn(worker_id, item)` processes an item and returns the item to hand over to the next stage, or None to drop it.
+	`init_worker(worker_id)`, if given, runs once in each worker process before it takes any item,
+	and `teardown_worker(worker_id)` once before it exits, as the `atexit` handlers do not run in the workers.
+	"""
+
+	def __init__(self, name, fn, workers=1, max_backlog=None, init_worker=None, teardown_worker=None):
+		"""
+		@param {string} name
+		@param {function} fn: picklable callable (e.g., a module-level function or a partial of one)
+		@param {int} workers: number of worker processes of the stage
+		@param {int} max_backlog: max number of items waiting for the stage; defaults to twice the number of workers
+		@param {function} init_worker: picklable callable
+		@param {function} teardown_worker: picklable callable
+		"""
+
+		self.name = name
+		self.fn = fn
+		self.workers = max(1, int(workers))
+		if max_backlog is None:
+			max_backlog = 2 * self.workers
+		self.max_backlog = max(1, int(max_backlog))
+		self.init_worker = init_worker
+		self.teardown_worker = teardown_worker
+
+
+
+def _put(out_queue, item, abort):
+	"""
+	@param {multiprocessing.Queue} out_queue
+	@param {multiprocessing.Event} abort: set once a stage died
+	@return {bool} whether the item was put; blocks while the queue is full, unless the run is aborted
+	"""
+
+	while True:
+		try:
+			out_queue.put(item, timeout=QUEUE_PUT_TIMEOUT)
+			return True
+		except queue.Full:
+			if abort.is_set():
+				return False
+
+
+def _run_stage_worker(stage, worker_id, in_queue, out_queue, abort):
+	"""
+	@param {Stage} stage
+	@param {int} worker_id: index of the worker within its stage, from 0
+	@param {multiprocessing.Queue} in_queue: items of the stage; `None` stops the worker
+	@param {multiprocessing.Queue} out_queue: items of the next stage, or None for the last stage
+	@param {multiprocessing.Event} abort: set by the scheduler once a stage died
+	"""
+
+	try:
+		if stage.init_worker is not None:
+			stage.init_worker(worker_id)
+
+		while True:
+			item = in_queue.get()
+			if item is None:
+				break
+
+			try:
+				result = stage.fn(worker_id, item)
+			except Exception as e:
+				logger.error('[%s %s] failed for %s: %s'%(stage.name, worker_id, str(item), str(e)))
+				continue
+
+			# blocks while the next stage is saturated
+			if result is not None and out_queue is not None and not _put(out_queue, result, abort):
+				logger.error('[%s %s] the next stage died, dropping %s and exiting.'%(stage.name, worker_id, str(result)))
+				break
+	finally:
+		if stage.teardown_worker is not None:
+			stage.teardown_worker(worker_id)
+
+
+
+class StageScheduler(object):
+
+	"""
+	runs a chain of stages over a stream of items
+	"""
+
+	def __init__(self, stages):
+		"""
+		@param {list} stages: ordered list of `Stage`
+		"""
+		self.stages = stages
+
+
+	def run(self, items):
+		"""
+		feeds the items to the first stage and returns once every stage has drained
+		@param {iterable} items: picklable items, must not be None
+		"""
+
+		queues = [multiprocessing.Queue(maxsize=stage.max_backlog) for stage in self.stages]
+		abort = multiprocessing.Event()
+
+		processes = []
+		for stage_index, stage in enumerate(self.stages):
+			out_queue = queues[stage_index+1] if stage_index+1 < len(self.stages) else None
+			stage_processes = []
+			for worker_id in range(stage.workers):
+				process = multiprocessing.Process(target=_run_stage_worker, args=(stage, worker_id, queues[stage_index], out_queue, abort))
+				process.start()
+				stage_processes.append(process)
+			processes.append(stage_processes)
+			logger.info('[scheduler] started stage %s with %s workers and a backlog of %s.'%(stage.name, stage.workers, stage.max_backlog))
+
+		# the stages from `drained` on have not been sent their stop items yet, and must have live workers
+		drained = 0
+		for item in items:
+			if not self._put(0, queues, item, abort, processes, drained):
+				logger.error('[scheduler] aborted, not feeding the remaining items.')
+				break
+
+		# a stage is drained once all of its workers exited; only then its successor can be stopped
+		for stage_index, stage in enumerate(self.stages):
+			for _ in range(stage.workers):
+				if not self._put(stage_index, queues, None, abort, processes, drained):
+					break
+			drained = stage_index + 1
+			for process in processes[stage_index]:
+				while process.is_alive():
+					process.join(timeout=WORKER_JOIN_TIMEOUT)
+					self._check_workers(abort, processes, drained)
+			logger.info('[scheduler] stage %s finished.'%(stage.name))
+
+
+	def _check_workers(self, abort, processes, drained):
+		"""
+		aborts the run if all workers of a stage that is not drained yet died
+		"""
+
+		for stage_index in range(drained, len(self.stages)):
+			if not any(process.is_alive() for process in processes[stage_index]):
+				if not abort.is_set():
+					logger.error('[scheduler] all workers of stage %s died, aborting.'%(self.stages[stage_index].name))
+					abort.set()
+				return
+
+
+	def _put(self, stage_index, queues, item, abort, processes, drained):
+		"""
+		@return {bool} whether the item was put into the queue of the given stage; blocks while the queue is full,
+		unless the run is aborted, or (for the stop item `None`) the workers of the stage already exited
+		"""
+
+		while True:
+			self._check_workers(abort, processes, drained)
+			if abort.is_set() and (item is not None or not any(process.is_alive() for process in processes[stage_index])):
+				return False
+			try:
+				queues[stage_index].put(item, timeout=QUEUE_PUT_TIMEOUT)
+				return True
+			except queue.Full:
+				continue